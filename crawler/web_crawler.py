@@ -44,6 +44,7 @@ except Exception:  # pragma: no cover - fallback parser
         return parser.links
 
 from emailbot import config as C
+from emailbot import metrics
 from emailbot.run_control import should_stop
 from emailbot.settings import (
     ALLOWED_CONTENT_TYPES,
@@ -292,6 +293,7 @@ class Crawler:
         except Exception:
             return True
 
+    @metrics.CRAWL_FETCH_SECONDS.time()
     async def fetch_html(self, url: str) -> tuple[str | None, str | None]:
         """Fetch ``url`` and return ``(final_url, html)`` if it looks like HTML."""
 
@@ -78,6 +78,7 @@ def _selfcheck_email_clean_exports() -> None:
 _selfcheck_email_clean_exports()
 
 from emailbot import bot_handlers, messaging, history_service
+from emailbot import log_archive
 from emailbot import compat  # EBOT-105
 from emailbot.boot_check import run_boot_check
 
@@ -113,6 +114,14 @@ async def _notify_admin_startup(app: Application) -> None:
     except Exception:
         _startup_logger.warning("Cannot notify ADMIN_CHAT_ID on startup", exc_info=True)
 
+
+async def _on_startup(app: Application) -> None:
+    await _notify_admin_startup(app)
+    try:
+        await bot_handlers.resume_campaigns(app.bot)
+    except Exception:
+        _startup_logger.warning("Cannot resume queued campaigns", exc_info=True)
+
 # [EBOT-072] Привязка массового отправителя: жёстко связываем
 # штатный send_all с bot_handlers.send_selected, чтобы _resolve_mass_handler()
 # сразу получил корректный обработчик без хрупких динамических импортов.
@@ -342,7 +351,7 @@ def main() -> None:
         logger.warning("[BOOT] path diagnostics failed: %s", _e)
 
     builder = ApplicationBuilder().token(token)
-    builder.post_init(_notify_admin_startup)
+    builder.post_init(_on_startup)
     app = builder.build()
     global application
     application = app
@@ -598,11 +607,16 @@ def main() -> None:
         target=messaging.periodic_unsubscribe_check, args=(stop_event,), daemon=True
     )
     t.start()
+    rotation = threading.Thread(
+        target=log_archive.periodic_rotate, args=(stop_event,), name="log-rotate", daemon=True
+    )
+    rotation.start()
     try:
         app.run_polling()
     finally:
         stop_event.set()
         t.join()
+        rotation.join(timeout=5)
 
 
 if __name__ == "__main__":
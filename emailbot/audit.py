@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import atexit
 import csv
+import io
 import json
 import logging
 import os
@@ -45,21 +47,223 @@ def _json_ready(value: Any) -> Any:
     return str(value)
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+# Seconds after which an idle log closes its file handle.
+_IDLE_CLOSE = 60.0
+
+
+def _strict_default() -> bool:
+    return os.getenv("AUDIT_STRICT", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class _BufferedLog:
+    """Append-only text file kept open with a bounded in-memory buffer.
+
+    Lines are written when ``max_records`` are buffered, when the oldest one
+    is ``flush_interval`` seconds old (checked by a background thread), on
+    :meth:`flush`/:meth:`close` and at interpreter exit.  With ``strict``
+    every line is written and fsynced before :meth:`append` returns.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_records: int | None = None,
+        flush_interval: float | None = None,
+        strict: bool | None = None,
+        header: str | None = None,
+    ) -> None:
+        self.path = path
+        self.max_records = max(1, max_records or _env_int("AUDIT_BUFFER_RECORDS", 256))
+        if flush_interval is None:
+            flush_interval = _env_float("AUDIT_FLUSH_INTERVAL", 1.0)
+        self.flush_interval = flush_interval
+        self.strict = _strict_default() if strict is None else strict
+        self._header = header
+        self._buffer: list[str] = []
+        self._oldest = 0.0
+        self._last_write = time.monotonic()
+        self._handle = None
+        self._lock = threading.Lock()
+        _register(self)
+
+    def _open(self):
+        if self._handle is None:
+            ensure_parent(self.path)
+            new = not self.path.exists() or self.path.stat().st_size == 0
+            self._handle = self.path.open("a", encoding="utf-8", newline="")
+            if new and self._header:
+                self._handle.write(self._header)
+        return self._handle
+
+    def _write_out(self) -> None:
+        if not self._buffer:
+            return
+        handle = self._open()
+        handle.write("".join(self._buffer))
+        self._buffer.clear()
+        handle.flush()
+        if self.strict:
+            os.fsync(handle.fileno())
+        self._last_write = time.monotonic()
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(line)
+            if self.strict or len(self._buffer) >= self.max_records:
+                self._write_out()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_out()
+
+    def flush_if_due(self, now: float) -> None:
+        with self._lock:
+            if self._buffer and now - self._oldest >= self.flush_interval:
+                self._write_out()
+            elif self._handle is not None and now - self._last_write >= _IDLE_CLOSE:
+                # Writers that were never closed must not hold descriptors forever.
+                self._handle.close()
+                self._handle = None
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._write_out()
+            finally:
+                if self._handle is not None:
+                    self._handle.close()
+                    self._handle = None
+        _unregister(self)
+
+
+_LIVE: set[_BufferedLog] = set()
+_LIVE_LOCK = threading.RLock()
+_FLUSHER: threading.Thread | None = None
+
+
+def _flush_due() -> None:
+    while True:
+        with _LIVE_LOCK:
+            logs = list(_LIVE)
+        interval = min((log.flush_interval for log in logs), default=1.0)
+        time.sleep(max(interval, 0.05))
+        now = time.monotonic()
+        for log in logs:
+            try:
+                log.flush_if_due(now)
+            except Exception:
+                logger.debug("audit background flush failed for %s", log.path, exc_info=True)
+
+
+def _register(log: _BufferedLog) -> None:
+    global _FLUSHER
+    with _LIVE_LOCK:
+        _LIVE.add(log)
+        if _FLUSHER is None or not _FLUSHER.is_alive():
+            _FLUSHER = threading.Thread(target=_flush_due, name="audit-flush", daemon=True)
+            _FLUSHER.start()
+
+
+def _unregister(log: _BufferedLog) -> None:
+    with _LIVE_LOCK:
+        _LIVE.discard(log)
+
+
+def flush_all() -> None:
+    """Write every buffered audit record to disk (call before reading audits)."""
+
+    with _LIVE_LOCK:
+        logs = list(_LIVE)
+    for log in logs:
+        try:
+            log.flush()
+        except Exception:
+            logger.debug("audit flush failed for %s", log.path, exc_info=True)
+
+
+def close_all() -> None:
+    with _LIVE_LOCK:
+        logs = list(_LIVE)
+        _SHARED.clear()
+    for log in logs:
+        try:
+            log.close()
+        except Exception:
+            logger.debug("audit close failed for %s", log.path, exc_info=True)
+
+
+atexit.register(close_all)
+
+_SHARED: dict[Path, _BufferedLog] = {}
+
+
+def _shared_log(path: Path, *, header: str | None = None) -> _BufferedLog:
+    with _LIVE_LOCK:
+        log = _SHARED.get(path)
+        if log is None:
+            log = _SHARED[path] = _BufferedLog(path, header=header)
+        return log
+
+
 class AuditWriter:
-    """Append structured audit records for bulk send operations."""
+    """Append structured audit records for bulk send operations.
 
-    def __init__(self, path: Path, label: str, *, enabled: bool = True) -> None:
+    Records are buffered (see :class:`_BufferedLog`); use the writer as a
+    context manager or call :meth:`close` when the batch is over.
+    ``strict=True`` (or ``AUDIT_STRICT=1``) fsyncs every record instead.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        label: str,
+        *,
+        enabled: bool = True,
+        strict: bool | None = None,
+        max_records: int | None = None,
+        flush_interval: float | None = None,
+    ) -> None:
         self.path = path
         self.label = label
         self.enabled = enabled and bool(path)
-        self._lock = threading.Lock()
         self._started_at = datetime.now(timezone.utc)
+        self._log: _BufferedLog | None = None
         if self.enabled:
             try:
                 ensure_parent(path)
             except Exception:
                 logger.debug("bulk audit ensure_parent failed", exc_info=True)
                 self.enabled = False
+        if self.enabled:
+            self._log = _BufferedLog(
+                Path(path),
+                max_records=max_records,
+                flush_interval=flush_interval,
+                strict=strict,
+            )
+
+    def __enter__(self) -> "AuditWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def _now_iso(self) -> str:
         return datetime.now(timezone.utc).isoformat()
@@ -74,9 +278,11 @@ class AuditWriter:
                 "pid": os.getpid(),
             }
         )
+        # Make the file visible right away so that a failing path is noticed.
+        self.flush()
 
     def _write_record(self, record: dict[str, Any]) -> None:
-        if not self.enabled:
+        if not self.enabled or self._log is None:
             return
         try:
             prepared = dict(record)
@@ -89,14 +295,29 @@ class AuditWriter:
             logger.debug("bulk audit json encode failed", exc_info=True)
             return
         try:
-            with self._lock:
-                with self.path.open("a", encoding="utf-8") as fh:
-                    fh.write(payload)
-                    fh.write("\n")
+            self._log.append(payload + "\n")
         except Exception:
             self.enabled = False
             logger.debug("bulk audit append failed", exc_info=True)
 
+    def flush(self) -> None:
+        if self._log is None:
+            return
+        try:
+            self._log.flush()
+        except Exception:
+            self.enabled = False
+            logger.debug("bulk audit flush failed", exc_info=True)
+
+    def close(self) -> None:
+        if self._log is None:
+            return
+        try:
+            self._log.close()
+        except Exception:
+            self.enabled = False
+            logger.debug("bulk audit close failed", exc_info=True)
+
     def log_sent(self, email: str, *, outcome: str | None = None) -> None:
         record = {"type": "sent", "email": email, "ts": self._now_iso()}
         record["outcome"] = str(outcome or "sent")
@@ -167,9 +388,7 @@ def write_audit(
         except Exception:
             record["meta"] = _json_ready(meta)
     try:
-        with path.open("a", encoding="utf-8") as fh:
-            fh.write(json.dumps(record, ensure_ascii=False))
-            fh.write("\n")
+        _shared_log(path).append(json.dumps(record, ensure_ascii=False) + "\n")
     except Exception:
         logger.debug("audit events append failed", exc_info=True)
 
@@ -195,17 +414,20 @@ def start_audit(label: str) -> AuditWriter:
     return AuditWriter(fallback, label, enabled=False)
 
 
+def _csv_line(row: list[str]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(row)
+    return buf.getvalue()
+
+
 def write_audit_drop(email: str, reason: str, details: str = "") -> None:
     """Append a drop record to ``audit.csv``."""
 
     path = _audit_path()
     ensure_parent(path)
-    exists = path.exists()
-    with path.open("a", newline="", encoding="utf-8") as fp:
-        writer = csv.writer(fp)
-        if not exists:
-            writer.writerow(["ts", "email", "action", "reason", "details"])
-        writer.writerow(
+    log = _shared_log(path, header=_csv_line(["ts", "email", "action", "reason", "details"]))
+    log.append(
+        _csv_line(
             [
                 datetime.now(timezone.utc).isoformat(),
                 email,
@@ -214,6 +436,14 @@ def write_audit_drop(email: str, reason: str, details: str = "") -> None:
                 details,
             ]
         )
+    )
 
 
-__all__ = ["AuditWriter", "start_audit", "write_audit", "write_audit_drop"]
+__all__ = [
+    "AuditWriter",
+    "start_audit",
+    "write_audit",
+    "write_audit_drop",
+    "flush_all",
+    "close_all",
+]
@@ -5,7 +5,6 @@ from __future__ import annotations
 import asyncio
 import csv
 from collections import Counter
-import imaplib
 import importlib
 import inspect
 import io
@@ -27,7 +26,12 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 
+from . import campaign_queue
+from . import campaign_worker
+from . import log_archive
+from . import report_rollup
 from . import report_service
+from . import smtp_pool
 from . import send_selected as _pkg_send_selected
 from .extraction_zip import ZIP_MAX_DEPTH, ZIP_MAX_FILES, ZIP_MAX_TOTAL_UNCOMP_MB
 from .handlers.diag import build_pdf_ocr_settings_report
@@ -37,6 +41,7 @@ from zoneinfo import ZoneInfo
 from .utils.zip_limits import validate_zip_safely
 from .worker_archive import run_parse_in_subprocess
 from emailbot.ui.progress import Heartbeat
+from emailbot.ui.progress_bus import deliver_message, publish_message
 from emailbot.ui.progress_state import ParseProgress
 from emailbot.config import (
     CRAWL_MAX_DEPTH,
@@ -189,8 +194,6 @@ try:
 except ValueError:
     ZIP_HEARTBEAT_MIN_SEC = 5.0
 
-_PROGRESS_EDIT_LOCK = asyncio.Lock()
-
 EXCLUDE_GLOBAL_MAIL = str(os.getenv("EXCLUDE_GLOBAL_MAIL", "0")).lower() in {
     "1",
     "true",
@@ -320,7 +323,8 @@ def _extract_emails_loose(text: str) -> list[str]:
     return found
 
 from emailbot.domain_utils import classify_email_domain
-from emailbot.reporting.excel_helpers import append_foreign_review_sheet
+from emailbot.reporting.excel_helpers import foreign_review_rows
+from emailbot.reporting.xlsx_stream import Sheet, export
 from emailbot.ui.keyboards import (
     build_after_parse_combined_kb,
     build_bulk_edit_kb,
@@ -345,7 +349,10 @@ from emailbot.run_control import (
     request_stop,
 )
 
+from . import audit as audit_module
 from . import messaging
+from .mail import imap_pool
+from .net_imap import imap_connect_ssl
 from . import messaging_utils as mu
 from . import extraction as _extraction
 from . import extraction_pdf as _pdf
@@ -716,17 +723,17 @@ async def crawl_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         f" • тайм-бюджет: {budget_profile} сек."
     )
 
-    last_report = {"ts": 0.0}
+    scan_status: dict[str, asyncio.Task | None] = {"task": None}
 
     def _progress(pages: int, page_url: str) -> None:
-        now = time.time()
-        if now - last_report["ts"] <= 2.5:
-            return
-        last_report["ts"] = now
+        # Одно сообщение о ходе обхода; дальнейшие страницы правят его через шину.
+        text = f"Сканирую: {pages} стр. (посл.: {page_url})"
+        task = scan_status["task"]
         try:
-            asyncio.create_task(
-                msg.reply_text(f"Сканирую: {pages} стр. (посл.: {page_url})")
-            )
+            if task is None:
+                scan_status["task"] = asyncio.create_task(msg.reply_text(text))
+            elif task.done() and not task.cancelled() and task.exception() is None:
+                publish_message(task.result(), text)
         except Exception:
             pass
 
@@ -821,9 +828,7 @@ async def _edit_progress_message(progress_msg: Message | None, text: str) -> boo
         heartbeat = Heartbeat(progress_msg, interval_sec=6.0)
         setattr(progress_msg, "_emailbot_heartbeat", heartbeat)
 
-    async with _PROGRESS_EDIT_LOCK:
-        updated = await heartbeat.tick(text)
-    return updated
+    return await heartbeat.tick(text)
 
 
 def _format_elapsed(seconds: float) -> str:
@@ -1337,6 +1342,7 @@ from .messaging import (
     sync_log_with_imap,
     was_emailed_recently,
     count_sent_today,
+    remaining_quota,
     maybe_sync_before_send,
 )
 from .perf import PerfTimer
@@ -1363,6 +1369,7 @@ def _summarize_from_audit(audit_path: str) -> dict[str, int]:
     totals: Counter[str] = Counter()
     total = 0
     path = Path(audit_path)
+    audit_module.flush_all()
     if path.exists():
         try:
             with path.open("r", encoding="utf-8") as handler:
@@ -2772,9 +2779,27 @@ async def diag(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         [
             "Counters:",
             f"  sent_today: {count_sent_today()}",
+            f"  remaining_today: {remaining_quota()}",
             f"  bounces_today: {bounce_today}",
         ]
     )
+    try:
+        accounts = smtp_pool.get_pool().status()
+    except Exception as exc:  # pragma: no cover - defensive
+        accounts = []
+        lines.append(f"SMTP accounts: error {exc}")
+    if len(accounts) > 1:
+        lines.append("SMTP accounts:")
+        for acc in accounts:
+            cap = acc["daily_cap"] or "∞"
+            state = f"rest {acc['resting_for']:.0f}s" if acc["resting_for"] else "ok"
+            lines.append(f"  {acc['name']}: {acc['sent_today']}/{cap} {state}")
+    from . import metrics
+
+    metric_lines = metrics.summary_lines()
+    if metric_lines:
+        lines.append("Metrics:")
+        lines.extend(metric_lines)
     lines.extend(
         [
             "",
@@ -3024,10 +3049,14 @@ async def imap_folders_command(
     try:
         host = os.getenv("IMAP_HOST", "imap.mail.ru")
         port = int(os.getenv("IMAP_PORT", "993"))
-        imap = imaplib.IMAP4_SSL(host, port)
-        imap.login(messaging.EMAIL_ADDRESS, messaging.EMAIL_PASSWORD)
-        status, data = imap.list()
-        imap.logout()
+        with imap_pool.imap_session(
+            host,
+            port,
+            messaging.EMAIL_ADDRESS,
+            messaging.EMAIL_PASSWORD,
+            connect=imap_connect_ssl,
+        ) as imap:
+            status, data = imap.list()
         if status != "OK" or not data:
             await update.message.reply_text("❌ Не удалось получить список папок.")
             return
@@ -3326,69 +3355,29 @@ def _parse_date_range(text: str) -> tuple[str, str] | None:
     return None
 
 
-def _detect_report_delimiter(sample: str) -> str:
-    return ";" if sample.count(";") > sample.count(",") else ","
-
-
-def _parse_report_ts(raw: str, tz: ZoneInfo) -> datetime | None:
-    value = (raw or "").strip()
-    if not value:
-        return None
-    normalized = value.replace("Z", "+00:00")
-    try:
-        ts = datetime.fromisoformat(normalized)
-    except ValueError:
-        return None
-    if ts.tzinfo is None:
-        return ts.replace(tzinfo=tz)
-    return ts.astimezone(tz)
-
+def _report_sources(base_dir: Path, tz: ZoneInfo) -> list[report_rollup.RollupSource]:
+    return [
+        report_rollup.RollupSource(
+            "sent_log", base_dir / "sent_log.csv", tz, ts_fields=("last_sent_at", "ts")
+        ),
+        report_rollup.RollupSource(
+            "send_stats", base_dir / "send_stats.jsonl", tz, ts_fields=("ts", "last_sent_at")
+        ),
+    ]
 
-def _iter_report_records(base_dir: Path, tz: ZoneInfo):
-    sent_log = base_dir / "sent_log.csv"
-    if sent_log.exists():
-        try:
-            with sent_log.open("r", encoding="utf-8", newline="") as handle:
-                sample = handle.read(1024)
-                handle.seek(0)
-                delimiter = _detect_report_delimiter(sample)
-                reader = csv.DictReader(handle, delimiter=delimiter)
-                for row in reader:
-                    if not row:
-                        continue
-                    ts = _parse_report_ts(row.get("last_sent_at") or row.get("ts"), tz)
-                    if not ts:
-                        continue
-                    status = (row.get("status") or row.get("result") or "").strip()
-                    yield ts, status
-        except Exception:
-            logger.debug("failed to read sent_log.csv", exc_info=True)
 
-    stats_path = base_dir / "send_stats.jsonl"
-    if stats_path.exists():
-        try:
-            with stats_path.open("r", encoding="utf-8") as handle:
-                for line in handle:
-                    payload = line.strip()
-                    if not payload:
-                        continue
-                    try:
-                        data = json.loads(payload)
-                    except json.JSONDecodeError:
-                        continue
-                    ts = _parse_report_ts(
-                        str(data.get("ts") or data.get("last_sent_at") or ""), tz
-                    )
-                    if not ts:
-                        continue
-                    status_raw = data.get("status")
-                    if status_raw:
-                        status = str(status_raw).strip()
-                    else:
-                        status = "success" if data.get("success") else ""
-                    yield ts, status
-        except Exception:
-            logger.debug("failed to read send_stats.jsonl", exc_info=True)
+def _audit_sources(
+    audit_dir: Path, start: datetime | None = None, end: datetime | None = None
+) -> list[report_rollup.RollupSource]:
+    paths = sorted(audit_dir.glob("bulk_audit_*.jsonl"))
+    archive = log_archive.archive_dir(audit_dir / "bulk_audit")
+    paths += log_archive.segment_paths(audit_dir, start, end, archive=archive)
+    return [
+        report_rollup.RollupSource(
+            "audit", path, LOCAL_TZ, ts_fields=("timestamp", "time", "ts")
+        )
+        for path in paths
+    ]
 
 
 def _load_audit_records(
@@ -3402,6 +3391,7 @@ def _load_audit_records(
 
     records: list[dict] = []
     dropped_no_ts = 0
+    audit_module.flush_all()
     if not audit_dir.exists():
         _LAST_AUDIT_DROP_NO_TS = 0
         return records
@@ -3464,7 +3454,47 @@ def _summarize(
             outcome = "unknown"
         counter[outcome] += 1
 
-    total = len(records)
+    return _render_summary(counter, len(records), start, end)
+
+
+def _summarize_audit(
+    audit_dir: Path,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> str:
+    """Summarize ``bulk_audit_*.jsonl`` from the pre-aggregated daily counters."""
+
+    global _LAST_AUDIT_DROP_NO_TS
+
+    audit_module.flush_all()
+    counter: Counter[str] = Counter()
+    dropped_no_ts = 0
+    if audit_dir.exists():
+        first = start.astimezone(LOCAL_TZ).date() if start else None
+        last = end.astimezone(LOCAL_TZ).date() if end else None
+        for source in _audit_sources(audit_dir, start, end):
+            try:
+                counter.update(report_rollup.counts(source, first, last))
+                if start or end:
+                    dropped_no_ts += report_rollup.undated(source)
+            except Exception:
+                logger.debug("failed to aggregate %s", source.path, exc_info=True)
+    _LAST_AUDIT_DROP_NO_TS = dropped_no_ts
+    if dropped_no_ts:
+        logger.warning(
+            "audit: %s записей без timestamp отфильтрованы", dropped_no_ts
+        )
+    return _render_summary(counter, sum(counter.values()), start, end)
+
+
+def _render_summary(
+    counter: Counter[str],
+    total: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> str:
+    """Format outcome counts as the report text."""
+
     tzname = os.getenv("EMAILBOT_TZ", "Europe/Amsterdam")
     header = ""
     if start and end:
@@ -3512,29 +3542,25 @@ def _summarize(
 def report_day(audit_dir: Path) -> str:
     now = datetime.now(tz=LOCAL_TZ)
     start, end = day_bounds(now)
-    records = _load_audit_records(audit_dir, start, end)
-    return _summarize(records, start, end)
+    return _summarize_audit(audit_dir, start, end)
 
 
 def report_week(audit_dir: Path) -> str:
     end = datetime.now(tz=LOCAL_TZ)
     start = end - timedelta(days=7)
-    records = _load_audit_records(audit_dir, start, end)
-    return _summarize(records, start, end)
+    return _summarize_audit(audit_dir, start, end)
 
 
 def report_month(audit_dir: Path) -> str:
     end = datetime.now(tz=LOCAL_TZ)
     start = end - timedelta(days=30)
-    records = _load_audit_records(audit_dir, start, end)
-    return _summarize(records, start, end)
+    return _summarize_audit(audit_dir, start, end)
 
 
 def report_year(audit_dir: Path) -> str:
     end = datetime.now(tz=LOCAL_TZ)
     start = end - timedelta(days=365)
-    records = _load_audit_records(audit_dir, start, end)
-    return _summarize(records, start, end)
+    return _summarize_audit(audit_dir, start, end)
 
 
 def report_period(base_dir: Path, *, start: str, end: str) -> str:
@@ -3553,17 +3579,20 @@ def report_period(base_dir: Path, *, start: str, end: str) -> str:
     success = 0
     errors = 0
 
-    for ts, status in _iter_report_records(base_dir, tz):
-        ts_date = ts.date()
-        if not (start_date <= ts_date <= end_date):
+    for source in _report_sources(base_dir, tz):
+        try:
+            sources = report_rollup.with_archive(source, start_date, end_date)
+            by_status = report_rollup.counts(sources, start_date, end_date)
+        except Exception:
+            logger.debug("failed to aggregate %s", source.path, exc_info=True)
             continue
-        status_norm = (status or "").strip().lower()
-        if status_norm in _REPORT_SUCCESS or not status_norm:
-            success += 1
-        elif status_norm in _REPORT_ERRORS:
-            errors += 1
-        else:
-            success += 1
+        for status, value in by_status.items():
+            if status in _REPORT_SUCCESS or not status:
+                success += value
+            elif status in _REPORT_ERRORS:
+                errors += value
+            else:
+                success += value
 
     if success == 0 and errors == 0:
         return "Нет данных о рассылках."
@@ -3978,19 +4007,15 @@ def _export_emails_xlsx(emails: list[str], run_id: str) -> Path:
     out_dir = Path("var/exports") / run_id
     out_dir.mkdir(parents=True, exist_ok=True)
     path = out_dir / f"emails_{run_id}.xlsx"
-    df = pd.DataFrame({"email": list(emails)})
-    if "comment" not in df.columns:
-        df["comment"] = ""
-    with pd.ExcelWriter(path, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False)
+    sheets = [Sheet("Sheet1", ["email", "comment"], ([addr, ""] for addr in emails))]
     try:
-        normalized = [
-            value for value in (_normalize_email(addr) for addr in emails) if value
-        ]
-        append_foreign_review_sheet(str(path), normalized)
+        normalized = (_normalize_email(addr) for addr in emails)
+        foreign = list(foreign_review_rows(value for value in normalized if value))
+        if foreign:
+            sheets.append(Sheet("Foreign_Review", ["email", "domain_type"], foreign))
     except Exception as ex:  # pragma: no cover - defensive branch
         logger.warning("Не удалось добавить лист Foreign_Review в Excel: %s", ex)
-    return path
+    return export(path, sheets, rows_hint=len(emails))
 
 
 def _after_parse_extra_rows(state: SessionState | None) -> list[list[InlineKeyboardButton]]:
@@ -4140,8 +4165,8 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 hb.stop()
             try:
                 if progress_msg:
-                    await progress_msg.edit_text(
-                        f"⛔ Не удалось скачать файл: {type(e).__name__}"
+                    await deliver_message(
+                        progress_msg, f"⛔ Не удалось скачать файл: {type(e).__name__}"
                     )
                 elif hasattr(message, "reply_text"):
                     await message.reply_text(
@@ -4193,7 +4218,9 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                         f"Загрузите более компактный архив (≤{ZIP_MAX_FILES} файлов, "
                         f"≤{ZIP_MAX_TOTAL_UNCOMP_MB} МБ распаковано, глубина ≤{ZIP_MAX_DEPTH})."
                     )
-                    handled = await _edit_progress_message(progress_msg, warning_text)
+                    handled = (
+                        await deliver_message(progress_msg, warning_text) if progress_msg else False
+                    )
                     if not handled and hasattr(message, "reply_text"):
                         await message.reply_text(warning_text)
                     _safe_unlink(file_path)
@@ -4204,7 +4231,9 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     timeout_text = (
                         "⏱️ Время обработки архива истекло. Попробуйте загрузить меньший архив или разбить его на части."
                     )
-                    handled = await _edit_progress_message(progress_msg, timeout_text)
+                    handled = (
+                        await deliver_message(progress_msg, timeout_text) if progress_msg else False
+                    )
                     if not handled and hasattr(message, "reply_text"):
                         await message.reply_text(timeout_text)
                     _safe_unlink(file_path)
@@ -4248,7 +4277,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 if hb:
                     hb.stop()
                 if progress_msg:
-                    await progress_msg.edit_text("🛑 Ошибка при анализе файла.")
+                    await deliver_message(progress_msg, "🛑 Ошибка при анализе файла.")
                 elif hasattr(message, "reply_text"):
                     await message.reply_text("🛑 Ошибка при анализе файла.")
             except Exception:
@@ -4272,11 +4301,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             else "🛑 Процесс был остановлен."
         )
         if progress_msg:
-            try:
-                await progress_msg.edit_text(cancelled_text)
-                notified = True
-            except Exception:
-                pass
+            notified = await deliver_message(progress_msg, cancelled_text)
         if not notified and hasattr(message, "reply_text"):
             try:
                 await message.reply_text(cancelled_text)
@@ -4288,11 +4313,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         error_text = "❌ Ошибка при обработке файла. Подробности в логах."
         handled = False
         if progress_msg:
-            try:
-                await progress_msg.edit_text(error_text)
-                handled = True
-            except Exception:
-                handled = False
+            handled = await deliver_message(progress_msg, error_text)
         if not handled and hasattr(message, "reply_text"):
             try:
                 await message.reply_text(error_text)
@@ -4378,7 +4399,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             summary_text = f"✅ Готово: {', '.join(summary_items)}. Формирую превью…"
         else:
             summary_text = "✅ Готово. Формирую превью…"
-        await progress_msg.edit_text(summary_text)
+        await deliver_message(progress_msg, summary_text)
     except Exception:
         pass
     await heartbeat()
@@ -5702,6 +5723,73 @@ async def toggle_ignore_180d(
         except Exception:
             pass
 
+_CAMPAIGN_SKIP_LABELS = {
+    campaign_queue.DUPLICATE: "пропущено (дубль за 24 ч)",
+    campaign_queue.COOLDOWN: "пропущено (кулдаун 180 дней)",
+    campaign_queue.BLOCKED: "пропущено (стоп-лист)",
+}
+
+
+async def _observe_campaign(bot, chat_id: int, job_id: str, cancel_event=None) -> None:
+    """Report progress of a queued campaign until the worker has finished it."""
+
+    queue = campaign_queue.get_queue()
+    interval = float(os.getenv("CAMPAIGN_OBSERVE_SECONDS", "5") or 5)
+    last_notice = 0
+    while True:
+        if (cancel_event and cancel_event.is_set()) or is_cancelled(chat_id):
+            queue.cancel(job_id)
+        progress = queue.progress(job_id)
+        if not progress:
+            return
+        finished = progress["state"] in (campaign_queue.DONE, campaign_queue.CANCELLED)
+        if finished and not progress[campaign_queue.LEASED]:
+            break
+        done = progress["done"]
+        if done - last_notice >= 20:
+            try:
+                await bot.send_message(
+                    chat_id=chat_id, text=f"📬 Прогресс: {done}/{progress['total']}"
+                )
+                last_notice = done
+            except Exception:
+                logger.debug("campaign progress notification failed", exc_info=True)
+        await asyncio.sleep(interval)
+
+    sent_count = progress[campaign_queue.SENT]
+    if progress["state"] == campaign_queue.CANCELLED:
+        text = f"🛑 Остановлено. Отправлено писем: {sent_count}"
+    else:
+        text = f"✅ Отправлено писем: {sent_count}"
+    await bot.send_message(chat_id=chat_id, text=text)
+    error_details = [
+        label for state, label in _CAMPAIGN_SKIP_LABELS.items() for _ in range(progress[state])
+    ]
+    error_details.extend(
+        error or "ошибка отправки"
+        for _, error in queue.errors(job_id)
+        if error != "cancelled"
+    )
+    summary = format_error_details(error_details)
+    if summary:
+        await bot.send_message(chat_id=chat_id, text=summary)
+    clear_recent_sent_cache()
+    disable_force_send(chat_id)
+
+
+async def resume_campaigns(bot) -> None:
+    """Re-attach progress reporting to campaigns left unfinished by a restart."""
+
+    if not campaign_queue.enabled():
+        return
+    campaign_worker.ensure_inline_worker()
+    for job in campaign_queue.get_queue().jobs():
+        messaging.create_task_with_logging(
+            _observe_campaign(bot, job.chat_id, job.job_id),
+            task_name="campaign_observer",
+        )
+
+
 async def _send_batch_with_sessions(
     query: CallbackQuery,
     context: ContextTypes.DEFAULT_TYPE,
@@ -5747,6 +5835,29 @@ async def _send_batch_with_sessions(
 
     attempt_total = len(to_send)
 
+    if campaign_queue.enabled():
+        job_id = campaign_queue.get_queue().enqueue(
+            chat_id,
+            to_send,
+            group_code=group_code,
+            template_path=template_path,
+            subject=messaging.DEFAULT_SUBJECT,
+            override_180d=ignore_cooldown,
+            ignore_limit=is_force_send(chat_id),
+        )
+        campaign_worker.ensure_inline_worker()
+        await query.message.reply_text(
+            f"✉️ Рассылка поставлена в очередь. Отправляем {attempt_total} писем..."
+        )
+        messaging.create_task_with_logging(
+            _observe_campaign(
+                context.bot, chat_id, job_id, context.chat_data.get("cancel_event")
+            ),
+            query.message.reply_text,
+            task_name="campaign_observer",
+        )
+        return
+
     await query.message.reply_text(
         f"✉️ Рассылка начата. Отправляем {attempt_total} писем..."
     )
@@ -5754,8 +5865,13 @@ async def _send_batch_with_sessions(
     try:
         host = os.getenv("IMAP_HOST", "imap.mail.ru")
         port = int(os.getenv("IMAP_PORT", "993"))
-        imap = imaplib.IMAP4_SSL(host, port)
-        imap.login(messaging.EMAIL_ADDRESS, messaging.EMAIL_PASSWORD)
+        imap = imap_pool.acquire_session(
+            host,
+            port,
+            messaging.EMAIL_ADDRESS,
+            messaging.EMAIL_PASSWORD,
+            connect=imap_connect_ssl,
+        )
         sent_folder = get_preferred_sent_folder(imap)
         imap.select(f'"{sent_folder}"')
     except Exception as exc:
@@ -5849,10 +5965,7 @@ async def _send_batch_with_sessions(
                                 "• <имя_шаблона>.body.txt — будет вставлен в {BODY}/{{BODY}}."
                             ),
                         )
-                        try:
-                            imap.logout()
-                        except Exception:
-                            pass
+                        imap_pool.release_session(imap)
                         return
                     except Exception as err:
                         error_details.append(str(err))
@@ -5947,18 +6060,12 @@ async def _send_batch_with_sessions(
             if attempt >= retries:
                 logger.exception("SMTP connection retries exhausted", exc_info=exc)
                 await query.message.reply_text(f"❌ SMTP ошибка: {exc}")
-                try:
-                    imap.logout()
-                except Exception:
-                    pass
+                imap_pool.release_session(imap)
                 return
             await asyncio.sleep(backoff)
             backoff *= 2
 
-    try:
-        imap.logout()
-    except Exception:
-        pass
+    imap_pool.release_session(imap)
 
     if aborted:
         await query.message.reply_text(
@@ -6297,7 +6404,7 @@ async def handle_url_text(
     async def _reply_status_error(text: str) -> None:
         if status_msg:
             try:
-                await status_msg.edit_text(text)
+                await deliver_message(status_msg, text)
             except Exception:
                 pass
         else:
@@ -6328,7 +6435,7 @@ async def handle_url_text(
         )
         if status_msg:
             try:
-                await status_msg.edit_text(cancelled_text)
+                await deliver_message(status_msg, cancelled_text)
             except Exception:
                 pass
         else:
@@ -6368,7 +6475,7 @@ async def handle_url_text(
     if not found:
         if status_msg:
             try:
-                await status_msg.edit_text("⛔️ Не удалось найти адреса")
+                await deliver_message(status_msg, "⛔️ Не удалось найти адреса")
             except Exception:
                 pass
         explanation = (
@@ -6417,7 +6524,7 @@ async def handle_url_text(
 
     if status_msg:
         try:
-            await status_msg.edit_text("✅ Готово. Формирую превью…")
+            await deliver_message(status_msg, "✅ Готово. Формирую превью…")
         except Exception:
             pass
     await heartbeat()
@@ -6467,8 +6574,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
                 if base_dir_raw
                 else Path(os.getenv("REPORT_BASE_DIR", "var") or "var")
             )
-            records = _load_audit_records(base_dir, start_dt, end_dt)
-            summary = _summarize(records, start_dt, end_dt)
+            summary = _summarize_audit(base_dir, start_dt, end_dt)
             REPORT_STATE.pop(uid, None)
             tzname = os.getenv("EMAILBOT_TZ", "Europe/Amsterdam")
             await message.reply_text(
@@ -6771,8 +6877,13 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
         try:
             host = os.getenv("IMAP_HOST", "imap.mail.ru")
             port = int(os.getenv("IMAP_PORT", "993"))
-            imap = imaplib.IMAP4_SSL(host, port)
-            imap.login(messaging.EMAIL_ADDRESS, messaging.EMAIL_PASSWORD)
+            imap = imap_pool.acquire_session(
+                host,
+                port,
+                messaging.EMAIL_ADDRESS,
+                messaging.EMAIL_PASSWORD,
+                connect=imap_connect_ssl,
+            )
             sent_folder = get_preferred_sent_folder(imap)
             imap.select(f'"{sent_folder}"')
         except Exception as e:
@@ -6791,10 +6902,7 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         if is_cancelled(chat_id):
             await query.message.reply_text("⛔ Остановлено (после фильтрации).")
-            try:
-                imap.logout()
-            except Exception:
-                pass
+            imap_pool.release_session(imap)
             clear_cancel(chat_id)
             return
 
@@ -6807,10 +6915,7 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 f"❗ Все адреса уже есть в {reason}."
             )
             context.user_data["manual_emails"] = []
-            try:
-                imap.logout()
-            except Exception:
-                pass
+            imap_pool.release_session(imap)
             clear_recent_sent_cache()
             clear_cancel(chat_id)
             return
@@ -6961,10 +7066,7 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
                             "• <имя_шаблона>.body.txt — будет вставлен в {BODY}/{BODY}."
                         ),
                     )
-                    try:
-                        imap.logout()
-                    except Exception:
-                        pass
+                    imap_pool.release_session(imap)
                     clear_cancel(chat_id)
                     return
                 except (smtplib.SMTPServerDisconnected, TimeoutError, OSError):
@@ -6975,7 +7077,7 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     await asyncio.sleep(backoff)
                     backoff *= 2
         clear_cancel(chat_id)
-        imap.logout()
+        imap_pool.release_session(imap)
         if aborted:
             await query.message.reply_text(
                 f"🛑 Остановлено. Отправлено писем: {sent_count}"
@@ -7333,8 +7435,13 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
         try:
             host = os.getenv("IMAP_HOST", "imap.mail.ru")
             port = int(os.getenv("IMAP_PORT", "993"))
-            imap = imaplib.IMAP4_SSL(host, port)
-            imap.login(messaging.EMAIL_ADDRESS, messaging.EMAIL_PASSWORD)
+            imap = imap_pool.acquire_session(
+                host,
+                port,
+                messaging.EMAIL_ADDRESS,
+                messaging.EMAIL_PASSWORD,
+                connect=imap_connect_ssl,
+            )
             sent_folder = get_preferred_sent_folder(imap)
             imap.select(f'"{sent_folder}"')
         except Exception as e:
@@ -7475,14 +7582,12 @@ async def send_manual_email(update: Update, context: ContextTypes.DEFAULT_TYPE)
                             "• <имя_шаблона>.body.txt — будет вставлен в {BODY}/{BODY}."
                         ),
                     )
-                    try:
-                        imap.logout()
-                    except Exception:
-                        pass
+                    imap_pool.release_session(imap)
                     clear_cancel(chat_id)
                     return
                 aborted = aborted or aborted_now
         clear_cancel(chat_id)
+        imap_pool.release_session(imap)
         if not to_send:
             mass_state.clear_chat_state(chat_id)
 
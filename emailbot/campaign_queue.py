@@ -0,0 +1,535 @@
+"""Durable queue of bulk-mailing campaigns.
+
+A bulk mailing used to live entirely inside the Telegram handler coroutine
+that started it: a restart mid-campaign lost the pacing and the list of
+addresses still to go.  :class:`CampaignQueue` stores each campaign as a
+*job* with one row per recipient in SQLite instead.  Handlers only
+:meth:`~CampaignQueue.enqueue` a job and poll :meth:`~CampaignQueue.progress`;
+:mod:`emailbot.campaign_worker` does the sending.
+
+Recipients move through ``pending`` → ``leased`` → a final state (``sent``,
+``duplicate``, ``cooldown``, ``blocked`` or ``failed``).  A worker leases a
+batch for :data:`LEASE_SECONDS`; a lease that is neither completed nor
+renewed in time (the worker crashed or was killed) expires and the recipient
+is leased again by the next worker.  A recipient sent just before such a
+crash is then caught by the 24-hour duplicate check of
+:func:`emailbot.messaging.send_email_with_sessions` and recorded as
+``duplicate`` rather than sent twice.
+
+Temporary failures go back to ``pending`` with an exponential back-off in
+``next_attempt_at`` until ``max_attempts`` is reached.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from emailbot import metrics
+from utils.paths import ensure_parent, expand_path
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 600.0
+RETRY_BASE_SECONDS = 60.0
+MAX_ATTEMPTS = 3
+
+# Recipient states.
+PENDING = "pending"
+LEASED = "leased"
+SENT = "sent"
+DUPLICATE = "duplicate"
+COOLDOWN = "cooldown"
+BLOCKED = "blocked"
+FAILED = "failed"
+FINAL_STATES = (SENT, DUPLICATE, COOLDOWN, BLOCKED, FAILED)
+
+# Job states.
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+ACTIVE_JOB_STATES = (QUEUED, RUNNING, PAUSED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_jobs (
+    job_id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    group_code TEXT NOT NULL,
+    template_path TEXT NOT NULL,
+    subject TEXT,
+    batch_id TEXT,
+    override_180d INTEGER NOT NULL DEFAULT 0,
+    ignore_limit INTEGER NOT NULL DEFAULT 0,
+    sleep_between REAL NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS campaign_jobs_chat ON campaign_jobs (chat_id, state);
+CREATE TABLE IF NOT EXISTS campaign_recipients (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS campaign_recipients_due
+    ON campaign_recipients (state, next_attempt_at);
+"""
+
+
+def default_path() -> Path:
+    return expand_path(os.getenv("CAMPAIGN_QUEUE_DB", "var/campaign_queue.sqlite"))
+
+
+def enabled() -> bool:
+    """Whether handlers should hand bulk mailings to the queue (``CAMPAIGN_QUEUE``)."""
+
+    return os.getenv("CAMPAIGN_QUEUE", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class Job:
+    job_id: str
+    chat_id: int
+    group_code: str
+    template_path: str
+    subject: str | None
+    batch_id: str | None
+    override_180d: bool
+    ignore_limit: bool
+    sleep_between: float
+    max_attempts: int
+    state: str
+    total: int
+    meta: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Lease:
+    """One leased recipient; pass it back to :meth:`CampaignQueue.complete`."""
+
+    job_id: str
+    seq: int
+    email: str
+    attempts: int
+
+
+_JOB_COLUMNS = (
+    "job_id, chat_id, group_code, template_path, subject, batch_id, override_180d,"
+    " ignore_limit, sleep_between, max_attempts, state, total, meta"
+)
+
+
+def _job(row: tuple) -> Job:
+    return Job(
+        job_id=row[0],
+        chat_id=int(row[1]),
+        group_code=row[2],
+        template_path=row[3],
+        subject=row[4],
+        batch_id=row[5],
+        override_180d=bool(row[6]),
+        ignore_limit=bool(row[7]),
+        sleep_between=float(row[8]),
+        max_attempts=int(row[9]),
+        state=row[10],
+        total=int(row[11]),
+        meta=json.loads(row[12]) if row[12] else {},
+    )
+
+
+class CampaignQueue:
+    """SQLite-backed store of campaign jobs and their recipients."""
+
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path) if path is not None else default_path()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_parent(self.path)
+            conn = sqlite3.connect(
+                str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _write(self, fn, *args):
+        with self._lock, metrics.SQLITE_SECONDS.time(db="campaign_queue"):
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return result
+
+    # -- producers -----------------------------------------------------------
+    def enqueue(
+        self,
+        chat_id: int,
+        emails: Iterable[str],
+        *,
+        group_code: str,
+        template_path: str,
+        subject: str | None = None,
+        batch_id: str | None = None,
+        override_180d: bool = False,
+        ignore_limit: bool = False,
+        sleep_between: float = 1.5,
+        max_attempts: int | None = None,
+        meta: dict[str, Any] | None = None,
+        now: float | None = None,
+    ) -> str:
+        """Store a new job for ``emails`` (duplicates dropped) and return its id."""
+
+        recipients = list(dict.fromkeys(e for e in emails if e))
+        job_id = uuid.uuid4().hex
+        now = time.time() if now is None else now
+        if max_attempts is None:
+            max_attempts = int(_env_float("CAMPAIGN_MAX_ATTEMPTS", MAX_ATTEMPTS))
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                f"INSERT INTO campaign_jobs ({_JOB_COLUMNS}, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    int(chat_id),
+                    group_code,
+                    str(template_path),
+                    subject,
+                    batch_id,
+                    int(override_180d),
+                    int(ignore_limit),
+                    float(sleep_between),
+                    max(1, int(max_attempts)),
+                    QUEUED if recipients else DONE,
+                    len(recipients),
+                    json.dumps(meta, ensure_ascii=False) if meta else None,
+                    now,
+                    now,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO campaign_recipients"
+                " (job_id, seq, email, state, next_attempt_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((job_id, seq, email, PENDING, now, now) for seq, email in enumerate(recipients)),
+            )
+
+        self._write(insert)
+        return job_id
+
+    def set_state(self, job_id: str, state: str) -> bool:
+        """Pause, resume (``queued``) or cancel an unfinished job."""
+
+        def update(conn: sqlite3.Connection) -> bool:
+            cur = conn.execute(
+                "UPDATE campaign_jobs SET state = ?, updated_at = ?"
+                " WHERE job_id = ? AND state IN (?, ?, ?)",
+                (state, time.time(), job_id, *ACTIVE_JOB_STATES),
+            )
+            if state == CANCELLED and cur.rowcount:
+                # Leased rows are left to their worker, which completes them.
+                conn.execute(
+                    "UPDATE campaign_recipients SET state = ?, error = 'cancelled'"
+                    " WHERE job_id = ? AND state = ?",
+                    (FAILED, job_id, PENDING),
+                )
+            return cur.rowcount > 0
+
+        return self._write(update)
+
+    def pause(self, job_id: str) -> bool:
+        return self.set_state(job_id, PAUSED)
+
+    def resume(self, job_id: str) -> bool:
+        return self.set_state(job_id, QUEUED)
+
+    def cancel(self, job_id: str) -> bool:
+        return self.set_state(job_id, CANCELLED)
+
+    # -- workers -------------------------------------------------------------
+    def lease(
+        self,
+        owner: str,
+        limit: int,
+        *,
+        lease_seconds: float | None = None,
+        ignore_limit_only: bool = False,
+        now: float | None = None,
+    ) -> list[Lease]:
+        """Lease up to ``limit`` due recipients of one job for ``owner``.
+
+        Due means ``pending`` with ``next_attempt_at`` in the past, or leased
+        with an expired lease.  Jobs are served oldest first; with
+        ``ignore_limit_only`` only jobs started with "ignore the daily limit"
+        are considered.
+        """
+
+        if limit <= 0:
+            return []
+        now = time.time() if now is None else now
+        if lease_seconds is None:
+            lease_seconds = _env_float("CAMPAIGN_LEASE_SECONDS", LEASE_SECONDS)
+        job_filter = "j.state IN (?, ?)" + (" AND j.ignore_limit = 1" if ignore_limit_only else "")
+
+        def take(conn: sqlite3.Connection) -> list[Lease]:
+            row = conn.execute(
+                "SELECT j.job_id FROM campaign_jobs j"
+                f" WHERE {job_filter} AND EXISTS ("
+                "  SELECT 1 FROM campaign_recipients r WHERE r.job_id = j.job_id AND ("
+                "   (r.state = ? AND r.next_attempt_at <= ?)"
+                "   OR (r.state = ? AND r.lease_until <= ?)))"
+                " ORDER BY j.created_at LIMIT 1",
+                (QUEUED, RUNNING, PENDING, now, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return []
+            job_id = row[0]
+            rows = conn.execute(
+                "SELECT seq, email, attempts FROM campaign_recipients"
+                " WHERE job_id = ? AND ((state = ? AND next_attempt_at <= ?)"
+                " OR (state = ? AND lease_until <= ?))"
+                " ORDER BY seq LIMIT ?",
+                (job_id, PENDING, now, LEASED, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE campaign_recipients SET state = ?, lease_owner = ?, lease_until = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE job_id = ? AND seq = ?",
+                ((LEASED, owner, now + lease_seconds, now, job_id, seq) for seq, _, _ in rows),
+            )
+            conn.execute(
+                "UPDATE campaign_jobs SET state = ?, updated_at = ? WHERE job_id = ? AND state = ?",
+                (RUNNING, now, job_id, QUEUED),
+            )
+            return [Lease(job_id, seq, email, attempts + 1) for seq, email, attempts in rows]
+
+        return self._write(take)
+
+    def renew(self, owner: str, leases: Iterable[Lease], *, lease_seconds: float | None = None):
+        """Extend the leases ``owner`` still holds."""
+
+        if lease_seconds is None:
+            lease_seconds = _env_float("CAMPAIGN_LEASE_SECONDS", LEASE_SECONDS)
+        until = time.time() + lease_seconds
+        params = [(until, lease.job_id, lease.seq, owner, LEASED) for lease in leases]
+
+        def update(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "UPDATE campaign_recipients SET lease_until = ?"
+                " WHERE job_id = ? AND seq = ? AND lease_owner = ? AND state = ?",
+                params,
+            )
+
+        self._write(update)
+
+    def complete(
+        self,
+        lease: Lease,
+        state: str,
+        *,
+        error: str | None = None,
+        retry: bool = False,
+        now: float | None = None,
+    ) -> str:
+        """Record the outcome of ``lease`` and return the recipient's new state.
+
+        With ``retry`` a failed recipient goes back to ``pending`` after a
+        back-off of ``CAMPAIGN_RETRY_BASE_SECONDS * 2**(attempts - 1)`` unless
+        the job's ``max_attempts`` is used up.
+        """
+
+        now = time.time() if now is None else now
+
+        def update(conn: sqlite3.Connection) -> str:
+            new_state, due = state, now
+            if state == FAILED and retry:
+                row = conn.execute(
+                    "SELECT max_attempts FROM campaign_jobs WHERE job_id = ?", (lease.job_id,)
+                ).fetchone()
+                if row is not None and lease.attempts < int(row[0]):
+                    new_state = PENDING
+                    base = _env_float("CAMPAIGN_RETRY_BASE_SECONDS", RETRY_BASE_SECONDS)
+                    due = now + base * 2 ** (lease.attempts - 1)
+            conn.execute(
+                "UPDATE campaign_recipients SET state = ?, error = ?, next_attempt_at = ?,"
+                " lease_owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE job_id = ? AND seq = ?",
+                (new_state, error, due, now, lease.job_id, lease.seq),
+            )
+            self._finish_if_drained(conn, lease.job_id, now)
+            return new_state
+
+        return self._write(update)
+
+    def release(self, leases: Iterable[Lease]) -> None:
+        """Give back leases that were not attempted, without counting an attempt."""
+
+        params = [(PENDING, time.time(), lease.job_id, lease.seq, LEASED) for lease in leases]
+
+        def update(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "UPDATE campaign_recipients SET state = ?, attempts = MAX(attempts - 1, 0),"
+                " lease_owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE job_id = ? AND seq = ? AND state = ?",
+                params,
+            )
+
+        self._write(update)
+
+    @staticmethod
+    def _finish_if_drained(conn: sqlite3.Connection, job_id: str, now: float) -> None:
+        open_row = conn.execute(
+            "SELECT 1 FROM campaign_recipients WHERE job_id = ? AND state IN (?, ?) LIMIT 1",
+            (job_id, PENDING, LEASED),
+        ).fetchone()
+        if open_row is None:
+            conn.execute(
+                "UPDATE campaign_jobs SET state = ?, updated_at = ?"
+                " WHERE job_id = ? AND state IN (?, ?)",
+                (DONE, now, job_id, QUEUED, RUNNING),
+            )
+
+    # -- observers -----------------------------------------------------------
+    def job(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(f"SELECT {_JOB_COLUMNS} FROM campaign_jobs WHERE job_id = ?", (job_id,))
+                .fetchone()
+            )
+        return _job(row) if row else None
+
+    def jobs(self, chat_id: int | None = None, *, active_only: bool = True) -> list[Job]:
+        """Jobs of ``chat_id`` (all chats when ``None``), oldest first."""
+
+        clauses, params = [], []
+        if chat_id is not None:
+            clauses.append("chat_id = ?")
+            params.append(int(chat_id))
+        if active_only:
+            clauses.append("state IN (?, ?, ?)")
+            params.extend(ACTIVE_JOB_STATES)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = (
+                self._connection()
+                .execute(
+                    f"SELECT {_JOB_COLUMNS} FROM campaign_jobs{where} ORDER BY created_at", params
+                )
+                .fetchall()
+            )
+        return [_job(row) for row in rows]
+
+    def progress(self, job_id: str) -> dict[str, Any]:
+        """Recipient counts by state plus ``total``, ``done`` and the job ``state``."""
+
+        with self._lock:
+            conn = self._connection()
+            job_row = conn.execute(
+                "SELECT state, total FROM campaign_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            rows = conn.execute(
+                "SELECT state, COUNT(*) FROM campaign_recipients WHERE job_id = ? GROUP BY state",
+                (job_id,),
+            ).fetchall()
+        if job_row is None:
+            return {}
+        counts = {state: 0 for state in (PENDING, LEASED, *FINAL_STATES)}
+        counts.update({state: int(n) for state, n in rows})
+        counts["total"] = int(job_row[1])
+        counts["done"] = sum(counts[state] for state in FINAL_STATES)
+        counts["state"] = job_row[0]
+        return counts
+
+    def errors(self, job_id: str) -> list[tuple[str, str]]:
+        """``(email, error)`` of recipients that ended in ``failed``."""
+
+        with self._lock:
+            return (
+                self._connection()
+                .execute(
+                    "SELECT email, error FROM campaign_recipients"
+                    " WHERE job_id = ? AND state = ? ORDER BY seq",
+                    (job_id, FAILED),
+                )
+                .fetchall()
+            )
+
+
+_QUEUE: CampaignQueue | None = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_queue() -> CampaignQueue:
+    """Return the process queue, reopened when ``CAMPAIGN_QUEUE_DB`` changes."""
+
+    global _QUEUE
+    path = default_path()
+    with _QUEUE_LOCK:
+        if _QUEUE is None or _QUEUE.path != path:
+            if _QUEUE is not None:
+                _QUEUE.close()
+            _QUEUE = CampaignQueue(path)
+        return _QUEUE
+
+
+def close() -> None:
+    global _QUEUE
+    with _QUEUE_LOCK:
+        queue, _QUEUE = _QUEUE, None
+    if queue is not None:
+        queue.close()
+
+
+__all__ = [
+    "CampaignQueue",
+    "Job",
+    "Lease",
+    "default_path",
+    "enabled",
+    "get_queue",
+    "close",
+]
@@ -0,0 +1,356 @@
+"""Send worker for :mod:`emailbot.campaign_queue`.
+
+The worker leases recipients in batches of ``CAMPAIGN_BATCH_SIZE``, shards
+them over the SMTP accounts of :mod:`emailbot.smtp_pool`, sends them through
+:func:`emailbot.send_core.run_smtp_send` and records every outcome in the
+queue, so sending runs independently of Telegram update handling and a
+restarted worker continues where the previous one stopped.
+
+Run it as its own process::
+
+    python -m emailbot.campaign_worker
+
+or, for single-process deployments, set ``CAMPAIGN_WORKER=inline`` and the
+bot starts it in a background thread (:func:`ensure_inline_worker`).  The
+daily limit is checked before each lease; once it is used up only jobs
+started with "ignore the limit" are served.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import smtplib
+import socket
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+from . import campaign_queue, smtp_pool
+from .campaign_queue import CampaignQueue, Job, Lease
+from .smtp_pool import AccountPool, NoAccountAvailable, SmtpAccount
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+POLL_SECONDS = 2.0
+
+# report(lease, state, error=None, retry=False)
+Report = Callable[..., None]
+SendBatch = Callable[[Job, list[Lease], Report, Callable[[], bool]], Awaitable[None]]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _record_bounce(job: Job, email: str, exc: Exception, code, msg) -> bool:
+    """Bounce bookkeeping shared with the handlers; return ``True`` for hard bounces."""
+
+    from .messaging_utils import (
+        add_bounce,
+        is_hard_bounce,
+        is_soft_bounce,
+        log_soft_bounce,
+        suppress_add,
+    )
+
+    if isinstance(msg, (bytes, bytearray)):
+        msg = msg.decode("utf-8", "ignore")
+    add_bounce(email, code, str(msg or exc), phase="campaign")
+    if is_hard_bounce(code, msg):
+        suppress_add(email, code, "hard bounce on send")
+        return True
+    if is_soft_bounce(code, msg):
+        try:
+            code_int = int(code) if code is not None else None
+        except (TypeError, ValueError):
+            code_int = None
+        try:
+            log_soft_bounce(
+                email,
+                reason=str(msg or exc),
+                group_code=job.group_code,
+                chat_id=job.chat_id,
+                template_path=job.template_path,
+                code=code_int,
+            )
+        except Exception:
+            logger.debug("soft bounce logging failed", exc_info=True)
+    return False
+
+
+async def _send_on_account(
+    account: SmtpAccount,
+    pool: AccountPool,
+    job: Job,
+    leases: list[Lease],
+    report: Report,
+    should_stop: Callable[[], bool],
+) -> None:
+    from . import messaging
+    from .mail import imap_pool
+    from .messaging_utils import mark_soft_bounce_success
+    from .net_imap import imap_connect_ssl
+    from .send_core import run_smtp_send
+
+    by_email = {lease.email: lease for lease in leases}
+    reported: set[int] = set()
+
+    def _report(lease: Lease, state: str, **kwargs) -> None:
+        reported.add(lease.seq)
+        report(lease, state, **kwargs)
+
+    def on_sent(email: str, token, log_key, content_hash) -> None:
+        pool.record_success(account)
+        try:
+            mark_soft_bounce_success(email)
+        except Exception:
+            pass
+        _report(by_email[email], campaign_queue.SENT)
+
+    def on_error(email: str, exc: Exception, code: int | None, msg) -> None:
+        pool.record_failure(account, code, str(exc))
+        hard = _record_bounce(job, email, exc, code, msg)
+        _report(by_email[email], campaign_queue.FAILED, error=str(exc), retry=not hard)
+
+    imap = imap_pool.acquire_session(
+        account.imap_host,
+        account.imap_port,
+        account.address,
+        account.password,
+        connect=imap_connect_ssl,
+    )
+    broken = False
+    try:
+        sent_folder = account.sent_folder or messaging.get_preferred_sent_folder(imap)
+        imap.select(f'"{sent_folder}"')
+        with account.client() as client:
+            await run_smtp_send(
+                client,
+                [lease.email for lease in leases],
+                template_path=job.template_path,
+                group_code=job.group_code,
+                imap=imap,
+                sent_folder=sent_folder,
+                chat_id=job.chat_id,
+                sleep_between=max(job.sleep_between, account.min_interval),
+                should_stop_cb=lambda: should_stop() or pool.resting(account),
+                on_sent=on_sent,
+                on_duplicate=lambda e: _report(by_email[e], campaign_queue.DUPLICATE),
+                on_cooldown=lambda e: _report(by_email[e], campaign_queue.COOLDOWN),
+                on_blocked=lambda e: _report(by_email[e], campaign_queue.BLOCKED),
+                on_error=on_error,
+                on_unknown=lambda e: _report(
+                    by_email[e], campaign_queue.FAILED, error="unknown outcome", retry=True
+                ),
+                subject=job.subject or messaging.DEFAULT_SUBJECT,
+                batch_id=job.batch_id,
+                override_180d=job.override_180d,
+            )
+    except messaging.TemplateRenderError as err:
+        missing = ", ".join(sorted(err.missing)) if err.missing else "—"
+        error = f"template {err.path}: missing {missing}"
+        for lease in leases:
+            if lease.seq not in reported:
+                _report(lease, campaign_queue.FAILED, error=error)
+    except (smtplib.SMTPException, OSError) as exc:
+        # The connection or login failed: rest the account, leave the
+        # recipients to be released and sharded again.
+        broken = True
+        pool.record_failure(account, getattr(exc, "smtp_code", None), str(exc))
+        logger.warning("campaign send via %s failed: %s", account.name, exc)
+    finally:
+        imap_pool.release_session(imap, broken=broken)
+
+
+async def smtp_send_batch(
+    job: Job, leases: list[Lease], report: Report, should_stop: Callable[[], bool]
+) -> None:
+    """Shard ``leases`` over the SMTP account pool and send the shards concurrently.
+
+    Each account sends its shard over one SMTP connection and IMAP session,
+    paced by its own ``per_minute``.  Recipients no account can take now are
+    left unreported and go back to the queue.
+    """
+
+    pool = smtp_pool.get_pool()
+    by_email = {lease.email: lease for lease in leases}
+    plan = pool.shard([lease.email for lease in leases])
+    if not plan:
+        raise NoAccountAvailable(pool.retry_after())
+    await asyncio.gather(
+        *(
+            _send_on_account(account, pool, job, [by_email[e] for e in emails], report, should_stop)
+            for account, emails in plan
+        )
+    )
+
+
+class CampaignWorker:
+    """Lease-send-report loop over a :class:`CampaignQueue`."""
+
+    def __init__(
+        self,
+        queue: CampaignQueue | None = None,
+        *,
+        worker_id: str | None = None,
+        batch_size: int | None = None,
+        poll_interval: float | None = None,
+        send_batch: SendBatch | None = None,
+        remaining_quota: Callable[[], int] | None = None,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = max(1, batch_size or _env_int("CAMPAIGN_BATCH_SIZE", BATCH_SIZE))
+        if poll_interval is None:
+            poll_interval = float(os.getenv("CAMPAIGN_POLL_SECONDS", "") or POLL_SECONDS)
+        self.poll_interval = poll_interval
+        self.send_batch = send_batch or smtp_send_batch
+        self._remaining_quota = remaining_quota
+        self._stop = threading.Event()
+
+    def _queue(self) -> CampaignQueue:
+        return self.queue if self.queue is not None else campaign_queue.get_queue()
+
+    def _quota(self) -> int:
+        if self._remaining_quota is not None:
+            return self._remaining_quota()
+        from .messaging import remaining_quota
+
+        return remaining_quota()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run_once(self) -> int:
+        """Lease and send one batch; return the number of recipients leased."""
+
+        queue = self._queue()
+        quota = self._quota()
+        if quota > 0:
+            leases = queue.lease(self.worker_id, min(self.batch_size, quota))
+        else:
+            leases = queue.lease(self.worker_id, self.batch_size, ignore_limit_only=True)
+        if not leases:
+            return 0
+        job = queue.job(leases[0].job_id)
+        if job is None:
+            queue.release(leases)
+            return 0
+
+        open_leases = {lease.seq: lease for lease in leases}
+        lease_seconds = float(
+            os.getenv("CAMPAIGN_LEASE_SECONDS", "") or campaign_queue.LEASE_SECONDS
+        )
+        renewed = time.monotonic()
+
+        def report(lease: Lease, state: str, error: str | None = None, retry: bool = False):
+            nonlocal renewed
+            open_leases.pop(lease.seq, None)
+            queue.complete(lease, state, error=error, retry=retry)
+            if open_leases and time.monotonic() - renewed > lease_seconds / 3:
+                queue.renew(self.worker_id, open_leases.values(), lease_seconds=lease_seconds)
+                renewed = time.monotonic()
+
+        def should_stop() -> bool:
+            if self._stop.is_set():
+                return True
+            current = queue.job(job.job_id)
+            return current is None or current.state in (
+                campaign_queue.PAUSED,
+                campaign_queue.CANCELLED,
+            )
+
+        try:
+            await self.send_batch(job, leases, report, should_stop)
+        finally:
+            # Whatever was not attempted (stop, pause, connection loss) goes back.
+            if open_leases:
+                queue.release(open_leases.values())
+        return len(leases)
+
+    async def run(self) -> None:
+        """Work until :meth:`stop` is called."""
+
+        backoff = self.poll_interval
+        logger.info("campaign worker %s started", self.worker_id)
+        while not self._stop.is_set():
+            try:
+                leased = await self.run_once()
+                backoff = self.poll_interval
+            except NoAccountAvailable as exc:
+                logger.info("campaign worker idle: %s", exc)
+                leased = 0
+                backoff = exc.retry_after
+            except Exception:
+                logger.exception("campaign worker batch failed")
+                leased = 0
+                backoff = min(max(backoff, 1.0) * 2, 300.0)
+            if not leased:
+                await asyncio.to_thread(self._stop.wait, backoff)
+        logger.info("campaign worker %s stopped", self.worker_id)
+
+
+_INLINE: tuple[CampaignWorker, threading.Thread] | None = None
+_INLINE_LOCK = threading.Lock()
+
+
+def ensure_inline_worker() -> bool:
+    """Start the in-process worker thread when ``CAMPAIGN_WORKER=inline``."""
+
+    global _INLINE
+    if os.getenv("CAMPAIGN_WORKER", "process").strip().lower() != "inline":
+        return False
+    with _INLINE_LOCK:
+        if _INLINE is None or not _INLINE[1].is_alive():
+            worker = CampaignWorker()
+            thread = threading.Thread(
+                target=lambda: asyncio.run(worker.run()),
+                name="campaign-worker",
+                daemon=True,
+            )
+            thread.start()
+            _INLINE = (worker, thread)
+    return True
+
+
+def stop_inline_worker(timeout: float | None = 5.0) -> None:
+    global _INLINE
+    with _INLINE_LOCK:
+        inline, _INLINE = _INLINE, None
+    if inline is not None:
+        inline[0].stop()
+        inline[1].join(timeout)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    worker = CampaignWorker()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+    try:
+        asyncio.run(worker.run())
+    finally:
+        campaign_queue.close()
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = [
+    "CampaignWorker",
+    "smtp_send_batch",
+    "ensure_inline_worker",
+    "stop_inline_worker",
+    "main",
+]
@@ -0,0 +1,338 @@
+"""Indexed "sent today" counter behind the daily sending limit.
+
+``get_sent_today()`` and the same-content guard used to scan the whole
+``sent_log.csv`` on every call.  This module mirrors the recent part of the
+log (the last :data:`RETAIN_DAYS` local days) into the history database, so
+the daily counter, :func:`remaining_quota` and per-recipient checks are
+indexed lookups.
+
+Each row is stored with its local day in ``REPORT_TZ``; naive timestamps are
+read as ``REPORT_TZ`` exactly like the sent-log writer stores them, so the
+counter rolls over at local midnight.  The writer in
+:mod:`emailbot.messaging_utils` reports the rows it rewrote through
+:func:`note_written`.  Any other change of the CSV (another process, a manual
+edit, dedupe or archive compaction) is detected by the file signature
+(inode, ``st_mtime_ns``, size) and triggers one rebuild from the CSV; a change
+of ``REPORT_TZ`` does the same.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import sqlite3
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Lock
+from zoneinfo import ZoneInfo
+
+from emailbot import history_service, history_store
+
+logger = logging.getLogger(__name__)
+
+RETAIN_DAYS = 2
+OK_STATUSES = frozenset({"ok", "sent", "success"})
+_IN_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_sends(
+    log          TEXT    NOT NULL,
+    key          TEXT    NOT NULL,
+    addr         TEXT    NOT NULL,
+    ts           REAL    NOT NULL,
+    day          TEXT    NOT NULL,
+    ok           INTEGER NOT NULL,
+    content_hash TEXT    NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_daily_sends_day ON daily_sends(log, day, ok, addr);
+CREATE INDEX IF NOT EXISTS idx_daily_sends_addr ON daily_sends(log, addr, ts);
+CREATE INDEX IF NOT EXISTS idx_daily_sends_key ON daily_sends(log, key);
+CREATE TABLE IF NOT EXISTS daily_sends_state(
+    log       TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    tz        TEXT NOT NULL
+);
+"""
+
+_LOCK = Lock()
+_SCHEMA_PATH: Path | None = None
+
+Record = tuple[str, str, float, str, int, str]
+
+
+def _connect() -> sqlite3.Connection:
+    global _SCHEMA_PATH
+    history_service.ensure_initialized()
+    path = history_store._DB_PATH
+    conn = history_store.get_connection()
+    with _LOCK:
+        if _SCHEMA_PATH != path:
+            conn.executescript(_SCHEMA)
+            _SCHEMA_PATH = path
+    return conn
+
+
+def _log_id(path: str | Path) -> str:
+    return os.path.abspath(os.fspath(path))
+
+
+def signature(path: str | Path) -> str:
+    """Cheap fingerprint of ``path`` that changes with every rewrite."""
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _tz_name(tz: str | None) -> str:
+    if tz:
+        return tz
+    from .settings import REPORT_TZ
+
+    return REPORT_TZ
+
+
+def _cutoff_day(tz: ZoneInfo, now: datetime | None = None) -> str:
+    now_local = (now or datetime.now(tz)).astimezone(tz)
+    return (now_local.date() - timedelta(days=RETAIN_DAYS)).isoformat()
+
+
+def _record(row: Mapping[str, str], tz: ZoneInfo) -> Record | None:
+    """Translate a sent-log row into ``(key, addr, ts, day, ok, content_hash)``.
+
+    ``key`` is the row's dedupe key (a UUID for rows written by
+    ``log_sent_email``); ``addr`` is the canonical recipient the counters and
+    lookups are based on.
+    """
+
+    from .messaging_utils import _content_hash_from_parts, _row_key, canonical_for_history
+
+    ts_raw = (row.get("last_sent_at") or row.get("ts") or "").strip()
+    if not ts_raw:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts_raw)
+    except ValueError:
+        return None
+    dt_local = dt.replace(tzinfo=tz) if dt.tzinfo is None else dt.astimezone(tz)
+    key = _row_key(dict(row))
+    addr = canonical_for_history(row.get("email") or "") or key
+    if not key:
+        return None
+    status = (row.get("status") or "ok").strip().lower()
+    content_hash = (row.get("content_hash") or row.get("body_hash") or "").strip()
+    if not content_hash:
+        subject = (row.get("subject") or "").strip()
+        body = (row.get("body") or "").strip()
+        if subject or body:
+            content_hash = _content_hash_from_parts(addr, subject, body)
+    return (
+        key,
+        addr,
+        dt_local.timestamp(),
+        dt_local.date().isoformat(),
+        int(status in OK_STATUSES),
+        content_hash,
+    )
+
+
+def _rebuild(conn: sqlite3.Connection, log: str, path: Path, tz_name: str) -> None:
+    tz = ZoneInfo(tz_name)
+    sig = signature(path)
+    cutoff = _cutoff_day(tz)
+    records: list[Record] = []
+    try:
+        with path.open("r", newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                rec = _record(row, tz)
+                if rec is not None and rec[3] >= cutoff:
+                    records.append(rec)
+    except FileNotFoundError:
+        pass
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        conn.execute("DELETE FROM daily_sends WHERE log = ?", (log,))
+        conn.executemany(
+            "INSERT INTO daily_sends(log, key, addr, ts, day, ok, content_hash)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(log, *rec) for rec in records],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO daily_sends_state(log, signature, tz) VALUES (?, ?, ?)",
+            (log, sig, tz_name),
+        )
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    logger.debug("daily_quota: rebuilt %s (%d recent rows)", log, len(records))
+
+
+def _sync(path: str | Path, tz_name: str) -> tuple[sqlite3.Connection, str]:
+    conn = _connect()
+    log = _log_id(path)
+    state = conn.execute(
+        "SELECT signature, tz FROM daily_sends_state WHERE log = ?", (log,)
+    ).fetchone()
+    if state is None or tuple(state) != (signature(path), tz_name):
+        _rebuild(conn, log, Path(path), tz_name)
+    return conn, log
+
+
+def note_written(
+    path: str | Path,
+    before: str,
+    rows: Iterable[Mapping[str, str]],
+    *,
+    tz: str | None = None,
+) -> None:
+    """Mirror ``rows`` just rewritten into ``path`` by the sent-log writer.
+
+    ``before`` is the :func:`signature` taken (under the file lock) before the
+    rewrite.  When the mirror was not in sync with that version it is left
+    stale and the next read rebuilds it from the file instead.
+    """
+
+    tz_name = _tz_name(tz)
+    zone = ZoneInfo(tz_name)
+    log = _log_id(path)
+    cutoff = _cutoff_day(zone)
+    keys: list[str] = []
+    records: list[Record] = []
+    for row in rows:
+        rec = _record(row, zone)
+        if rec is None:
+            continue
+        keys.append(rec[0])
+        if rec[3] >= cutoff:
+            records.append(rec)
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            state = conn.execute(
+                "SELECT signature, tz FROM daily_sends_state WHERE log = ?", (log,)
+            ).fetchone()
+            if state is None or tuple(state) != (before, tz_name):
+                conn.rollback()
+                return
+            conn.executemany(
+                "DELETE FROM daily_sends WHERE log = ? AND key = ?", [(log, k) for k in keys]
+            )
+            conn.executemany(
+                "INSERT INTO daily_sends(log, key, addr, ts, day, ok, content_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(log, *rec) for rec in records],
+            )
+            conn.execute("DELETE FROM daily_sends WHERE log = ? AND day < ?", (log, cutoff))
+            conn.execute(
+                "UPDATE daily_sends_state SET signature = ? WHERE log = ?",
+                (signature(path), log),
+            )
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    except sqlite3.Error:
+        # The CSV is the source of truth; a stale mirror is rebuilt on read.
+        logger.debug("daily_quota: failed to mirror %s", log, exc_info=True)
+
+
+def _today(tz_name: str) -> str:
+    return datetime.now(ZoneInfo(tz_name)).date().isoformat()
+
+
+def sent_today(path: str | Path, *, tz: str | None = None) -> set[str]:
+    """Canonical recipients with a successful send on the current local day."""
+
+    tz_name = _tz_name(tz)
+    conn, log = _sync(path, tz_name)
+    rows = conn.execute(
+        "SELECT DISTINCT addr FROM daily_sends WHERE log = ? AND day = ? AND ok = 1",
+        (log, _today(tz_name)),
+    )
+    return {row[0] for row in rows}
+
+
+def count_today(path: str | Path, *, tz: str | None = None) -> int:
+    tz_name = _tz_name(tz)
+    conn, log = _sync(path, tz_name)
+    row = conn.execute(
+        "SELECT COUNT(DISTINCT addr) FROM daily_sends WHERE log = ? AND day = ? AND ok = 1",
+        (log, _today(tz_name)),
+    ).fetchone()
+    return int(row[0] or 0)
+
+
+def remaining_quota(path: str | Path, limit: int, *, tz: str | None = None) -> int:
+    """How many more recipients may be sent to today under ``limit``."""
+
+    return max(0, int(limit) - count_today(path, tz=tz))
+
+
+def sent_today_many(path: str | Path, emails: Iterable[str], *, tz: str | None = None) -> set[str]:
+    """Subset of ``emails`` already sent to successfully today."""
+
+    from .messaging_utils import canonical_for_history
+
+    by_key: dict[str, list[str]] = {}
+    for addr in emails:
+        key = canonical_for_history(addr or "")
+        if key:
+            by_key.setdefault(key, []).append(addr)
+    if not by_key:
+        return set()
+    tz_name = _tz_name(tz)
+    conn, log = _sync(path, tz_name)
+    day = _today(tz_name)
+    keys = list(by_key)
+    found: set[str] = set()
+    for i in range(0, len(keys), _IN_CHUNK):
+        chunk = keys[i : i + _IN_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            "SELECT DISTINCT addr FROM daily_sends"
+            f" WHERE log = ? AND day = ? AND ok = 1 AND addr IN ({marks})",
+            (log, day, *chunk),
+        )
+        for (key,) in rows:
+            found.update(by_key[key])
+    return found
+
+
+def sent_same_content_since(
+    path: str | Path,
+    addr: str,
+    content_hash: str,
+    since: datetime,
+    *,
+    tz: str | None = None,
+) -> bool:
+    """Whether ``addr`` got a message with ``content_hash`` at or after ``since``."""
+
+    if not addr or not content_hash:
+        return False
+    conn, log = _sync(path, _tz_name(tz))
+    row = conn.execute(
+        "SELECT 1 FROM daily_sends WHERE log = ? AND addr = ? AND ts >= ?"
+        " AND ok = 1 AND content_hash = ? LIMIT 1",
+        (log, addr, since.timestamp(), content_hash),
+    ).fetchone()
+    return row is not None
+
+
+__all__ = [
+    "RETAIN_DAYS",
+    "OK_STATUSES",
+    "signature",
+    "note_written",
+    "sent_today",
+    "count_today",
+    "remaining_quota",
+    "sent_today_many",
+    "sent_same_content_since",
+]
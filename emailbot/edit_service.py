@@ -4,6 +4,7 @@ from __future__ import annotations
 import sqlite3
 import re
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
@@ -21,8 +22,12 @@ _DROP_TOKENS: Set[str] = {"-", "—", "x", "✖", "удалить", "delete", "d
 _MASK_CHARS_RX = re.compile(r'^[*\u2022\u00B7\u2043\u2020\u2021"«»()\[\]\s]+')
 
 
+@lru_cache(maxsize=65536)
 def _norm_key(value: str) -> str:
-    """Return a canonical key for ``value`` suitable for matching edits."""
+    """Return a canonical key for ``value`` suitable for matching edits.
+
+    Cached: a preview refresh matches the whole list against the edits again.
+    """
 
     cleaned = preclean_obfuscations(value or "")
     # Срезаем лидирующие маркеры сносок у «старого»/«нового» значения
@@ -39,7 +39,7 @@ from typing import (
     TYPE_CHECKING,
 )
 
-from . import settings
+from . import metrics, settings
 from .dedupe import merge_footnote_prefix_variants, repair_footnote_singletons
 from .extraction_common import (
     normalize_email,
@@ -1304,6 +1304,7 @@ def extract_from_url(
     log_extract_digest(stats)
     return hits, stats
 
+@metrics.EXTRACT_SECONDS.time()
 def extract_any(
     source: str,
     stop_event: Optional[object] = None,
@@ -1360,6 +1361,7 @@ def extract_any(
             _progress_finish(False)
             raise
         _progress_finish(True)
+        metrics.PDF_PAGES.inc(int(stats.get("pages", 0) or 0))
         if _return_hits:
             return hits, stats
         return sorted({h.email for h in hits}), stats
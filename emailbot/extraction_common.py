@@ -13,6 +13,7 @@ from typing import Any, Iterable
 import idna
 
 from utils.email_deobfuscate import deobfuscate_text
+from utils.email_key import get_email_key
 from emailbot.sanitizer import _join_linebreaks_around_dot, heal_ocr_email_fragments
 from .tld_registry import tld_of, is_known_tld
 from .footnotes import remove_footnotes_safe
@@ -288,6 +289,16 @@ def normalize_domain(domain: str) -> str:
 def normalize_email(s: str) -> str:
     """Normalize an e-mail address for comparison and deduplication.
 
+    Memoized through :func:`utils.email_key.get_email_key` (the ``dedupe``
+    form); see :func:`_normalize_email`.
+    """
+
+    return get_email_key(s).dedupe
+
+
+def _normalize_email(s: str) -> str:
+    """Uncached :func:`normalize_email`.
+
     The function performs a number of transformations so that semantically
     identical addresses map to the same representation:
 
@@ -88,7 +88,7 @@ def backend_status() -> Dict[str, bool | str]:
         status["ocr_reason"] = reason
     return status
 
-from emailbot import settings
+from emailbot import metrics, settings
 from emailbot.config import (
     EMAILBOT_ENABLE_OCR,
     PARSE_COLLECT_ALL,
@@ -550,7 +550,8 @@ def _ocr_page(page) -> str:
     try:
         pix = page.get_pixmap(dpi=_OCR_DPI)
         img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        return pytesseract.image_to_string(img, lang=_OCR_LANG)
+        with metrics.OCR_PAGE_SECONDS.time():
+            return pytesseract.image_to_string(img, lang=_OCR_LANG)
     except Exception:
         return ""
 
@@ -631,7 +632,8 @@ def _document_ocr(data: bytes, *, budget: TimeBudget | None = None) -> tuple[str
             budget.checkpoint()
         page_start = time.time()
         try:
-            text = pytesseract.image_to_string(img, lang=_OCR_LANG)
+            with metrics.OCR_PAGE_SECONDS.time():
+                text = pytesseract.image_to_string(img, lang=_OCR_LANG)
         except Exception:
             text = ""
         if text:
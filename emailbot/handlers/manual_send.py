@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import asyncio
-import imaplib
 import logging
 import os
 import smtplib
@@ -23,7 +22,7 @@ from emailbot.notify import notify
 from bot.keyboards import build_templates_kb, send_flow_keyboard
 
 from emailbot import config as C
-from emailbot import mass_state, messaging
+from emailbot import mass_state, messaging, preview_decisions
 from emailbot import settings as _settings
 from emailbot.dedupe_global import build_hits_with_sources, dedupe_across_sources
 from emailbot.extraction import normalize_email
@@ -38,6 +37,7 @@ from emailbot.messaging import (
     send_bulk,
     send_email_with_sessions,
 )
+from emailbot.mail import imap_pool
 from emailbot.messaging_utils import (
     add_bounce,
     is_foreign,
@@ -54,6 +54,7 @@ from emailbot.ui.progress import ProgressUI
 from emailbot.run_control import clear_stop, should_stop
 from emailbot.utils import log_error
 from emailbot.utils.friendly_errors import to_user_message
+from emailbot.net_imap import imap_connect_ssl
 from emailbot.smtp_client import RobustSMTP
 from emailbot.cooldown import build_cooldown_service
 from emailbot.progress_watchdog import heartbeat_now
@@ -361,14 +362,25 @@ async def select_group(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
     async with chat_lock:
         context.chat_data["preview_source_emails"] = list(emails)
+        ignore_cooldown = bool(context.user_data.get("ignore_cooldown"))
         ready, blocked_foreign, blocked_invalid, skipped_recent, digest = (
             messaging.prepare_mass_mailing(
                 emails,
                 group_code,
                 chat_id=chat_id,
-                ignore_cooldown=bool(context.user_data.get("ignore_cooldown")),
+                ignore_cooldown=ignore_cooldown,
             )
         )
+        # Later edits of this preview only re-filter the addresses they touch.
+        preview_decisions.seed(
+            context.chat_data,
+            group_code,
+            ignore_cooldown,
+            ready,
+            blocked_foreign,
+            blocked_invalid,
+            skipped_recent,
+        )
         source_map = {}
         if getattr(state, "source_map", None):
             try:
@@ -919,8 +931,13 @@ async def send_all(
         try:
             host = os.getenv("IMAP_HOST", "imap.mail.ru")
             port = int(os.getenv("IMAP_PORT", "993"))
-            imap = imaplib.IMAP4_SSL(host, port)
-            imap.login(messaging.EMAIL_ADDRESS, messaging.EMAIL_PASSWORD)
+            imap = imap_pool.acquire_session(
+                host,
+                port,
+                messaging.EMAIL_ADDRESS,
+                messaging.EMAIL_PASSWORD,
+                connect=imap_connect_ssl,
+            )
             sent_folder = get_preferred_sent_folder(imap)
             imap.select(f'"{sent_folder}"')
         except Exception as e:
@@ -945,10 +962,7 @@ async def send_all(
                 smtp.close()
             except Exception:
                 pass
-            try:
-                imap.logout()
-            except Exception:
-                pass
+            imap_pool.release_session(imap)
             return
 
         if progress_ui and planned_total > 0:
@@ -1111,7 +1125,7 @@ async def send_all(
                     await progress_ui.finish()
                 except Exception:
                     pass
-        imap.logout()
+        imap_pool.release_session(imap)
         if not to_send:
             mass_state.clear_chat_state(chat_id)
 
@@ -1130,6 +1144,11 @@ async def send_all(
             "errors": error_count,
             "not_delivered": error_count,
         }
+        if audit_writer is not None and hasattr(audit_writer, "close"):
+            try:
+                audit_writer.close()
+            except Exception:
+                logger.debug("bulk audit close failed", exc_info=True)
         metrics = fallback_metrics
         if audit_path and audit_writer and getattr(audit_writer, "enabled", False):
             metrics = bot_handlers._summarize_from_audit(str(audit_path))
@@ -4,7 +4,7 @@ from __future__ import annotations
 import logging
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterable, Mapping, Sequence, TYPE_CHECKING
+from typing import Any, Callable, Iterable, Mapping, Sequence, TYPE_CHECKING
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
@@ -15,7 +15,7 @@ from services.templates import get_template_label
 
 from emailbot import config as C
 from emailbot import extraction as extraction_module
-from emailbot import history_service, mass_state, messaging, reporting
+from emailbot import history_service, mass_state, messaging, preview_decisions, reporting
 from emailbot.dedupe_global import build_hits_with_sources, dedupe_across_sources
 from emailbot.edit_service import (
     apply_edits as apply_saved_edits,
@@ -206,6 +206,15 @@ def _source_text(
     return ", ".join(sources)
 
 
+LastSent = Callable[[str], "datetime | None"]
+
+
+def _last_sent_lookup(group: str, last_sent: LastSent | None) -> LastSent:
+    if last_sent is not None:
+        return last_sent
+    return lambda email: history_service.get_last_sent(email, group)
+
+
 def _collect_valid(
     emails: Sequence[str],
     group: str,
@@ -213,14 +222,16 @@ def _collect_valid(
     rule_days: int,
     source_map: Mapping[str, Sequence[str]] | None = None,
     fallback_sources: Mapping[str, Sequence[str]] | None = None,
+    last_sent: LastSent | None = None,
 ) -> list[dict[str, Any]]:
+    lookup = _last_sent_lookup(group, last_sent)
     seen: set[str] = set()
     rows: list[dict[str, Any]] = []
     for email in emails:
         if email in seen:
             continue
         seen.add(email)
-        last = history_service.get_last_sent(email, group)
+        last = lookup(email)
         reason_parts: list[str] = []
         if email in fixed_map:
             reason_parts.append(f"fixed:{fixed_map[email]}")
@@ -251,14 +262,16 @@ def _collect_rejected(
     rule_days: int,
     source_map: Mapping[str, Sequence[str]] | None = None,
     fallback_sources: Mapping[str, Sequence[str]] | None = None,
+    last_sent: LastSent | None = None,
 ) -> list[dict[str, Any]]:
+    lookup = _last_sent_lookup(group, last_sent)
     rows: list[dict[str, Any]] = []
     seen: set[str] = set()
     for email in emails:
         if email in seen:
             continue
         seen.add(email)
-        last = history_service.get_last_sent(email, group)
+        last = lookup(email)
         rows.append(
             {
                 "email": email,
@@ -404,6 +417,7 @@ def _build_preview_data(
     blocked_invalid: Sequence[str],
     skipped_recent: Sequence[str],
     rule_days: int,
+    last_sent: LastSent | None = None,
 ) -> PreviewData:
     state = _get_state(context)
     preview_chat = context.chat_data.get("send_preview") or {}
@@ -444,10 +458,10 @@ def _build_preview_data(
             state_sources = None
 
     valid_rows = _collect_valid(
-        ready, group_code, fixed_map, rule_days, source_map, state_sources
+        ready, group_code, fixed_map, rule_days, source_map, state_sources, last_sent
     )
     rejected_rows = _collect_rejected(
-        skipped_recent, group_code, rule_days, source_map, state_sources
+        skipped_recent, group_code, rule_days, source_map, state_sources, last_sent
     )
     suspicious_rows = _collect_suspicious(state, source_map, state_sources)
     blocked_rows, foreign_rows = _collect_blocked(
@@ -512,6 +526,12 @@ async def send_preview_report(
     """Generate an XLSX preview report and send it to the user."""
 
     rule_days = history_service.get_days_rule_default()
+    # Reuse the last-send times of the preview being edited.
+    decisions = context.chat_data.get(preview_decisions.CONTEXT_KEY)
+    last_sent = None
+    if isinstance(decisions, preview_decisions.PreviewDecisions):
+        if decisions.group == group_code:
+            last_sent = decisions.last_sent
     data = _build_preview_data(
         context,
         group_code,
@@ -521,6 +541,7 @@ async def send_preview_report(
         blocked_invalid,
         skipped_recent,
         rule_days,
+        last_sent,
     )
     try:
         reporting.write_preview_stats(data)
@@ -529,9 +550,8 @@ async def send_preview_report(
     chat = update.effective_chat
     chat_id = chat.id if chat else 0
     path = PREVIEW_DIR / f"preview_{chat_id}.xlsx"
-    file_path = path
     try:
-        build_preview_workbook(data, path)
+        file_path = build_preview_workbook(data, path)
     except Exception:  # pragma: no cover - fallback for optional deps
         logger.exception("Failed to build detailed preview workbook; using fallback export.")
         fallback_path = build_preview_excel(
@@ -771,13 +791,12 @@ async def _regenerate_preview(update: Update, context: ContextTypes.DEFAULT_TYPE
     updated_source = apply_saved_edits(list(base_emails), chat_id)
     context.chat_data["preview_source_emails"] = list(updated_source)
 
-    ready, blocked_foreign, blocked_invalid, skipped_recent, _ = (
-        messaging.prepare_mass_mailing(
-            updated_source,
-            group_code,
-            chat_id=chat_id,
-            ignore_cooldown=bool(context.user_data.get("ignore_cooldown")),
-        )
+    # Only addresses the edits introduced go through the filters again.
+    decisions = preview_decisions.for_context(
+        context.chat_data, group_code, bool(context.user_data.get("ignore_cooldown"))
+    )
+    ready, blocked_foreign, blocked_invalid, skipped_recent, _ = decisions.classify(
+        updated_source, chat_id=chat_id
     )
 
     state_source_map = {}
@@ -7,6 +7,7 @@ import unicodedata
 import idna
 
 from utils.email_canonical import canonicalize_email
+from utils.email_key import get_email_key
 
 from emailbot.settings import (
     CANON_GMAIL_DOTS,
@@ -21,6 +22,10 @@ __all__ = ["normalize_history_key"]
 def normalize_history_key(email: str) -> str:
     """Return a canonical key used for history deduplication."""
 
+    return get_email_key(email).history
+
+
+def _history_key(email: str) -> str:
     raw = unicodedata.normalize("NFKC", (email or "").strip())
     if not raw:
         return ""
@@ -9,11 +9,6 @@ from pathlib import Path
 from threading import Lock
 from typing import Iterable, List, Tuple
 
-try:  # pragma: no cover - optional dependency in lightweight deployments
-    import idna
-except Exception:  # pragma: no cover - degrade gracefully when idna is absent
-    idna = None  # type: ignore[assignment]
-
 try:  # pragma: no cover - settings are optional during lightweight imports
     from . import settings  # type: ignore
 except Exception:  # pragma: no cover - degrade gracefully when settings missing
@@ -21,7 +16,7 @@ except Exception:  # pragma: no cover - degrade gracefully when settings missing
 
 from . import history_store
 from emailbot.services.cooldown import _env_int
-from utils.email_clean import normalize_email_unified
+from utils.email_key import get_email_key
 from utils.paths import expand_path, get_temp_dir
 
 _LOCK = Lock()
@@ -121,28 +116,9 @@ def ensure_initialized() -> None:
 
 def _norm_email(email: str) -> str:
     try:
-        base = normalize_email_unified(email)
+        return get_email_key(email).idna
     except Exception:
-        base = (email or "").strip().lower()
-
-    if not base:
-        return ""
-
-    local, sep, domain = base.partition("@")
-    if not sep:
-        return base
-
-    domain_norm = domain.strip()
-    if idna is not None and domain_norm:
-        try:
-            domain_norm = idna.encode(domain_norm, uts46=True).decode("ascii")
-        except Exception:
-            domain_norm = domain_norm.lower()
-
-    if not domain_norm:
-        return base
-
-    return f"{local}@{domain_norm.lower()}"
+        return (email or "").strip().lower()
 
 
 def _norm_group(group: str) -> str:
@@ -190,6 +166,33 @@ def mark_sent(
     )
 
 
+def mark_sent_many(
+    entries: Iterable[tuple[str, str, str | None, datetime | None]],
+    *,
+    run_id: str = "",
+    smtp_result: str = "ok",
+) -> int:
+    """Record several ``(email, group, msg_id, sent_at)`` events at once."""
+
+    ensure_initialized()
+    rows = []
+    for email, group, msg_id, sent_at in entries:
+        norm_email = _norm_email(email)
+        if not norm_email:
+            continue
+        rows.append(
+            (
+                norm_email,
+                _norm_group(group),
+                _ensure_utc(sent_at),
+                (msg_id or "").strip(),
+                run_id,
+                smtp_result,
+            )
+        )
+    return history_store.record_send_many(rows)
+
+
 def register_send_attempt(
     email: str,
     group: str,
@@ -277,6 +280,17 @@ def get_last_sent_any_group(email: str) -> Tuple[str, datetime] | None:
     return history_store.last_send_any_group(norm_email)
 
 
+def get_last_sent_any_group_many(
+    emails: Iterable[str],
+) -> dict[str, Tuple[str, datetime]]:
+    """Bulk :func:`get_last_sent_any_group` keyed by the given addresses."""
+
+    ensure_initialized()
+    norms = {email: _norm_email(email) for email in emails}
+    found = history_store.last_send_any_group_many(n for n in norms.values() if n)
+    return {email: found[norm] for email, norm in norms.items() if norm in found}
+
+
 def get_last_sent_dt(email: str) -> datetime | None:
     """Return the last known send timestamp (any group) as naive UTC."""
 
@@ -309,19 +323,15 @@ def filter_by_days(
     ensure_initialized()
     if days <= 0:
         return list(emails), []
-    norm_group = _norm_group(group)
+    items = [(email, _norm_email(email)) for email in emails]
+    last_sent = history_store.last_send_many(
+        (norm for _, norm in items if norm), _norm_group(group)
+    )
     allowed: List[str] = []
     rejected: List[str] = []
-    cache: dict[str, datetime | None] = {}
     threshold = datetime.now(timezone.utc) - timedelta(days=days)
-    for email in emails:
-        norm_email = _norm_email(email)
-        if not norm_email:
-            allowed.append(email)
-            continue
-        if norm_email not in cache:
-            cache[norm_email] = history_store.last_send(norm_email, norm_group)
-        last = cache[norm_email]
+    for email, norm_email in items:
+        last = last_sent.get(norm_email) if norm_email else None
         if last and last >= threshold:
             rejected.append(email)
         else:
@@ -332,12 +342,14 @@ def filter_by_days(
 __all__ = [
     "ensure_initialized",
     "mark_sent",
+    "mark_sent_many",
     "register_send_attempt",
     "cancel_send_attempt",
     "was_sent_within_days",
     "filter_by_days",
     "get_last_sent",
     "get_last_sent_any_group",
+    "get_last_sent_any_group_many",
     "get_last_sent_dt",
     "can_send_now",
     "get_days_rule_default",
@@ -4,16 +4,20 @@
 
 from __future__ import annotations
 
+import atexit
 import csv
 import json
 import logging
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from threading import Lock
-from typing import Iterable, Optional, Tuple
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
+from . import metrics
 from .history_key import normalize_history_key
 from utils.paths import expand_path, ensure_parent
 
@@ -23,6 +27,15 @@ _DB_PATH: Path = expand_path("var/state.db")
 _INITIALIZED = False
 _LOCK = Lock()
 
+# Connections are kept per thread and reused for every statement; they are
+# reopened when ``init_db`` runs again (new path or re-initialisation).
+_CACHED_STATEMENTS = 256
+_LOCAL = threading.local()
+_GENERATION = 0
+_CONNECTIONS: set[sqlite3.Connection] = set()
+# SQLite limits host parameters per statement; bulk lookups are chunked.
+_IN_CHUNK = 500
+
 
 def _ensure_path(path: Path | str) -> Path:
     return expand_path(path)
@@ -81,6 +94,7 @@ def init_db(path: Path | str | None = None) -> None:
             conn.close()
         _DB_PATH = resolved
         _INITIALIZED = True
+        _bump_generation()
 
 
 def _ensure_initialized() -> None:
@@ -88,13 +102,91 @@ def _ensure_initialized() -> None:
         init_db(_DB_PATH)
 
 
+def _bump_generation() -> None:
+    global _GENERATION
+    _GENERATION += 1
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    # ``check_same_thread`` is off only so that ``close_connections`` may
+    # close connections of other threads; each one is used by its owner.
+    conn = sqlite3.connect(
+        path,
+        timeout=30,
+        cached_statements=_CACHED_STATEMENTS,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA foreign_keys=ON;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    with _LOCK:
+        _CONNECTIONS.add(conn)
+    return conn
+
+
+def _discard(conn: sqlite3.Connection) -> None:
+    with _LOCK:
+        _CONNECTIONS.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
 def _connect() -> sqlite3.Connection:
+    """Return the calling thread's connection to the history database.
+
+    The connection is shared by every call made from the thread and must not
+    be closed by the caller.
+    """
+
     _ensure_initialized()
-    conn = sqlite3.connect(_DB_PATH, timeout=30)
-    conn.execute("PRAGMA foreign_keys=ON;")
+    cached = getattr(_LOCAL, "conn", None)
+    if cached is not None:
+        path, generation, conn = cached
+        if path == _DB_PATH and generation == _GENERATION:
+            return conn
+        _discard(conn)
+    conn = _open(_DB_PATH)
+    _LOCAL.conn = (_DB_PATH, _GENERATION, conn)
     return conn
 
 
+def get_connection() -> sqlite3.Connection:
+    """Public alias of :func:`_connect` for modules sharing the database."""
+
+    return _connect()
+
+
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Connection]:
+    with metrics.SQLITE_SECONDS.time(db="history"):
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def close_connections() -> None:
+    """Close every pooled connection; the next call opens fresh ones."""
+
+    with _LOCK:
+        conns = list(_CONNECTIONS)
+        _CONNECTIONS.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _bump_generation()
+
+
+atexit.register(close_connections)
+
+
 def _canonical_email(email: str) -> str:
     email = (email or "").strip()
     if not email:
@@ -165,9 +257,7 @@ def _prepare_row(
 
 
 def _insert_history_row(row: tuple[str, str, str, str | None, str | None, str | None]) -> None:
-    conn = _connect()
-    try:
-        conn.execute("BEGIN IMMEDIATE;")
+    with _transaction() as conn:
         conn.execute(
             """
             INSERT OR REPLACE INTO send_history(
@@ -176,9 +266,6 @@ def _insert_history_row(row: tuple[str, str, str, str | None, str | None, str |
             """,
             row,
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
 def try_reserve_send(
@@ -219,9 +306,7 @@ def try_reserve_send(
 
     threshold = _ensure_utc(sent_at_utc - cooldown)
     threshold_iso = _isoformat(threshold)
-    conn = _connect()
-    try:
-        conn.execute("BEGIN IMMEDIATE;")
+    with _transaction() as conn:
         cursor = conn.execute(
             """
             INSERT INTO send_history(
@@ -247,10 +332,7 @@ def try_reserve_send(
                 threshold_iso,
             ),
         )
-        conn.commit()
-        return cursor.rowcount == 1
-    finally:
-        conn.close()
+    return cursor.rowcount == 1
 
 
 def delete_send_record(email_norm: str, group_key: str, sent_at_utc: datetime) -> None:
@@ -261,9 +343,7 @@ def delete_send_record(email_norm: str, group_key: str, sent_at_utc: datetime) -
     if not email_norm:
         return
     group_key = (group_key or "").strip().lower()
-    conn = _connect()
-    try:
-        conn.execute("BEGIN IMMEDIATE;")
+    with _transaction() as conn:
         conn.execute(
             """
             DELETE FROM send_history
@@ -271,9 +351,6 @@ def delete_send_record(email_norm: str, group_key: str, sent_at_utc: datetime) -
             """,
             (email_norm, group_key, _isoformat(sent_at_utc)),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
 def record_send(
@@ -299,6 +376,44 @@ def record_send(
     _insert_history_row(row)
 
 
+def record_send_many(
+    rows: Iterable[tuple[str, str, datetime, str | None, str | None, str | None]],
+) -> int:
+    """Insert several ``record_send`` rows inside a single transaction.
+
+    Each row is ``(email_norm, group_key, sent_at_utc, message_id, run_id,
+    smtp_result)``.  Returns the number of rows written.
+    """
+
+    prepared = []
+    for email_norm, group_key, sent_at_utc, message_id, run_id, smtp_result in rows:
+        email_norm = (email_norm or "").strip().lower()
+        if not email_norm:
+            continue
+        prepared.append(
+            (
+                email_norm,
+                (group_key or "").strip().lower(),
+                _isoformat(sent_at_utc),
+                (message_id or "").strip() or None,
+                (run_id or "").strip() or None,
+                (smtp_result or "").strip() or None,
+            )
+        )
+    if not prepared:
+        return 0
+    with _transaction() as conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO send_history(
+                email_norm, group_key, sent_at_utc, message_id, run_id, smtp_result
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            prepared,
+        )
+    return len(prepared)
+
+
 def record_sent(email: str, group: str, msg_id: str | None, sent_at: datetime) -> None:
     row = _prepare_row(email, group, msg_id, sent_at, smtp_result="ok")
     if row is None:
@@ -311,20 +426,15 @@ def last_send(email_norm: str, group_key: str) -> Optional[datetime]:
     if not email_norm:
         return None
     group_key = (group_key or "").strip().lower()
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            """
-            SELECT sent_at_utc FROM send_history
-            WHERE email_norm=? AND group_key=?
-            ORDER BY sent_at_utc DESC
-            LIMIT 1
-            """,
-            (email_norm, group_key),
-        )
-        row = cur.fetchone()
-    finally:
-        conn.close()
+    row = _connect().execute(
+        """
+        SELECT sent_at_utc FROM send_history
+        WHERE email_norm=? AND group_key=?
+        ORDER BY sent_at_utc DESC
+        LIMIT 1
+        """,
+        (email_norm, group_key),
+    ).fetchone()
     if not row:
         return None
     return _parse_datetime(row[0])
@@ -334,20 +444,15 @@ def last_send_any_group(email_norm: str) -> Optional[Tuple[str, datetime]]:
     email_norm = (email_norm or "").strip().lower()
     if not email_norm:
         return None
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            """
-            SELECT group_key, sent_at_utc FROM send_history
-            WHERE email_norm=?
-            ORDER BY sent_at_utc DESC
-            LIMIT 1
-            """,
-            (email_norm,),
-        )
-        row = cur.fetchone()
-    finally:
-        conn.close()
+    row = _connect().execute(
+        """
+        SELECT group_key, sent_at_utc FROM send_history
+        WHERE email_norm=?
+        ORDER BY sent_at_utc DESC
+        LIMIT 1
+        """,
+        (email_norm,),
+    ).fetchone()
     if not row:
         return None
     dt = _parse_datetime(row[1])
@@ -356,6 +461,61 @@ def last_send_any_group(email_norm: str) -> Optional[Tuple[str, datetime]]:
     return row[0], dt
 
 
+def _chunks(keys: list[str]) -> Iterator[list[str]]:
+    for start in range(0, len(keys), _IN_CHUNK):
+        yield keys[start : start + _IN_CHUNK]
+
+
+def _norm_keys(emails: Iterable[str]) -> list[str]:
+    return sorted({(email or "").strip().lower() for email in emails} - {""})
+
+
+def last_send_many(emails: Iterable[str], group_key: str) -> Dict[str, datetime]:
+    """Bulk :func:`last_send`: map each known ``email_norm`` to its last send."""
+
+    group_key = (group_key or "").strip().lower()
+    conn = _connect()
+    result: Dict[str, datetime] = {}
+    for chunk in _chunks(_norm_keys(emails)):
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"""
+            SELECT email_norm, MAX(sent_at_utc) FROM send_history
+            WHERE group_key=? AND email_norm IN ({marks})
+            GROUP BY email_norm
+            """,
+            (group_key, *chunk),
+        )
+        for email_norm, raw in rows:
+            dt = _parse_datetime(raw)
+            if dt is not None:
+                result[email_norm] = dt
+    return result
+
+
+def last_send_any_group_many(emails: Iterable[str]) -> Dict[str, Tuple[str, datetime]]:
+    """Bulk :func:`last_send_any_group`."""
+
+    conn = _connect()
+    result: Dict[str, Tuple[str, datetime]] = {}
+    for chunk in _chunks(_norm_keys(emails)):
+        marks = ",".join("?" * len(chunk))
+        # SQLite takes the bare ``group_key`` from the row holding the MAX().
+        rows = conn.execute(
+            f"""
+            SELECT email_norm, group_key, MAX(sent_at_utc) FROM send_history
+            WHERE email_norm IN ({marks})
+            GROUP BY email_norm
+            """,
+            chunk,
+        )
+        for email_norm, group, raw in rows:
+            dt = _parse_datetime(raw)
+            if dt is not None:
+                result[email_norm] = (group, dt)
+    return result
+
+
 def was_sent_within(email: str, group: str, days: int) -> bool:
     if days <= 0:
         return False
@@ -504,10 +664,15 @@ __all__ = [
     "try_reserve_send",
     "delete_send_record",
     "record_send",
+    "record_send_many",
     "record_sent",
     "was_sent_within",
     "get_last_sent",
     "last_send",
     "last_send_any_group",
+    "last_send_many",
+    "last_send_any_group_many",
     "was_sent_within_any_group",
+    "get_connection",
+    "close_connections",
 ]
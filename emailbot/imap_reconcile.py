@@ -5,10 +5,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Set, Tuple
 from zoneinfo import ZoneInfo
 
-import email as py_email
-import imaplib
-from email.utils import getaddresses, parsedate_to_datetime
-
+from .mail import imap_pool, sent_index
+from .net_imap import get_imap_timeout, imap_connect_ssl
 from .settings import REPORT_TZ, RECONCILE_SINCE_DAYS
 
 IMAP_HOST = os.getenv("IMAP_HOST", "imap.mail.ru")
@@ -66,68 +64,35 @@ def _load_csv_set(tz: ZoneInfo, since_days: int) -> Set[Tuple[str, datetime]]:
     return items
 
 
-def _imap_fetch_since(since_days: int) -> List[bytes]:
-    """Fetch raw IMAP headers for messages in the Sent folder."""
-
-    tz = ZoneInfo(REPORT_TZ)
-    start_local = datetime.now(tz) - timedelta(days=since_days)
-    imap_since = start_local.strftime("%d-%b-%Y")
-
-    conn = imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
-    conn.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-    try:
-        conn.select(SENT_MAILBOX)
-        typ, data = conn.search(None, f'(SINCE "{imap_since}")')
-        if typ != "OK":
-            return []
-
-        ids = data[0].split()
-        headers: List[bytes] = []
-        for mid in ids:
-            typ, msg_data = conn.fetch(mid, "(BODY.PEEK[HEADER.FIELDS (DATE TO)])")
-            if typ == "OK" and msg_data:
-                for part in msg_data:
-                    if isinstance(part, tuple) and part[1]:
-                        headers.append(part[1])
-        return headers
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
-        conn.logout()
-
-
-def _parse_to_date(headers_bytes: bytes, tz: ZoneInfo) -> Tuple[List[str], datetime | None]:
-    msg = py_email.message_from_bytes(headers_bytes)
-    tos = msg.get_all("To", [])
-    addresses = [addr for _, addr in getaddresses(tos)] if tos else []
-
-    date_hdr = msg.get("Date")
-    dt_local = None
-    if date_hdr:
-        try:
-            dt = parsedate_to_datetime(date_hdr)
-            if dt.tzinfo is None:
-                dt_local = dt.replace(tzinfo=tz)
-            else:
-                dt_local = dt.astimezone(tz)
-        except Exception:
-            dt_local = None
-
-    return ([_norm_email(addr) for addr in addresses if addr], dt_local)
+def _sync_sent_index(since_days: int) -> None:
+    """Bring the local Sent-folder index up to date (new UIDs only)."""
+
+    with imap_pool.imap_session(
+        IMAP_HOST,
+        IMAP_PORT,
+        EMAIL_ADDRESS,
+        EMAIL_PASSWORD,
+        timeout=get_imap_timeout(15.0),
+        connect=imap_connect_ssl,
+    ) as conn:
+        sent_index.sync(
+            conn,
+            SENT_MAILBOX,
+            backfill_days=max(since_days, sent_index.SENT_INDEX_BACKFILL_DAYS),
+        )
 
 
 def _imap_to_set(tz: ZoneInfo, since_days: int) -> Set[Tuple[str, datetime]]:
+    _sync_sent_index(since_days)
+    start_local = datetime.now(tz) - timedelta(days=since_days)
     items: Set[Tuple[str, datetime]] = set()
-    for headers in _imap_fetch_since(since_days):
-        addresses, dt_local = _parse_to_date(headers, tz)
-        if not dt_local:
+    for address, sent_at in sent_index.iter_since(start_local, SENT_MAILBOX):
+        email = _norm_email(address)
+        if not email:
             continue
+        dt_local = sent_at.astimezone(tz)
         midnight = dt_local.replace(hour=0, minute=0, second=0, microsecond=0)
-        for email in addresses:
-            if email:
-                items.add((email, midnight))
+        items.add((email, midnight))
     return items
 
 
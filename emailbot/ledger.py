@@ -4,11 +4,14 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime, timezone
+from typing import Iterable
 
 from emailbot.history_service import mark_sent as history_mark_sent
+from emailbot.history_service import mark_sent_many as history_mark_sent_many
 from emailbot.services.cooldown import (
     COOLDOWN_DAYS,
     mark_sent as cooldown_mark_sent,
+    mark_sent_many as cooldown_mark_sent_many,
     should_skip_by_cooldown,
 )
 
@@ -60,5 +63,32 @@ def record_send(
         logger.debug("history mark_sent failed", exc_info=True)
 
 
-__all__ = ["can_send", "record_send"]
+def record_send_many(
+    entries: Iterable[tuple[str, str, datetime | None, str | None, str | None]],
+    *,
+    smtp_result: str = "ok",
+) -> None:
+    """Bulk :func:`record_send` for ``(email, campaign, now, message_id, run_id)``."""
+
+    rows = [
+        (email, campaign, _ensure_aware(now), message_id, run_id or "")
+        for email, campaign, now, message_id, run_id in entries
+    ]
+    if not rows:
+        return
+    try:
+        cooldown_mark_sent_many([(email, ts) for email, _, ts, _, _ in rows])
+    except Exception:  # pragma: no cover - logging only
+        logger.debug("cooldown mark_sent_many failed", exc_info=True)
+    by_run: dict[str, list[tuple[str, str, str | None, datetime]]] = {}
+    for email, campaign, ts, message_id, run_id in rows:
+        by_run.setdefault(run_id, []).append((email, campaign, message_id, ts))
+    for run_id, items in by_run.items():
+        try:
+            history_mark_sent_many(items, run_id=run_id, smtp_result=smtp_result)
+        except Exception:  # pragma: no cover - logging only
+            logger.debug("history mark_sent_many failed", exc_info=True)
+
+
+__all__ = ["can_send", "record_send", "record_send_many"]
 
@@ -0,0 +1,611 @@
+"""Rotation and compaction of the bot's append-only logs.
+
+``send_stats.jsonl``, ``send_history.jsonl``, ``perf.log``, ``bounce_log.csv``,
+``sent_log.csv`` and the ``bulk_audit_*.jsonl`` files used to grow without
+bound.  :func:`rotate` moves old records out of a log into gzip-compressed
+segments partitioned by UTC day::
+
+    <log dir>/archive/<log name>/<YYYY-MM-DD>/<stem>-<stamp>.<ext>.gz
+
+Every segment gets a line in ``<archive>/index.jsonl`` with its minimum and
+maximum timestamp, row count and a Bloom filter over the e-mail addresses.
+Readers call :func:`segments` or :func:`iter_records` with their query window
+(and, for point lookups, the address) and open only the segments that can
+contain matching records.
+
+Three kinds of logs are handled (see :class:`LogSpec`):
+
+``log``
+    Append-only files written with one ``open("a")`` per record.  The file is
+    renamed aside and archived whole once it exceeds ``max_bytes`` or its
+    oldest record is older than ``max_age_days``; writers recreate it.
+``table``
+    ``sent_log.csv`` is a keyed table rewritten under
+    :class:`emailbot.messaging_utils.FileLock`.  Rows older than
+    ``max_age_days`` are moved to the archive once the file exceeds
+    ``max_bytes``; recent rows stay in place.
+``files``
+    One file per run (``bulk_audit_*.jsonl``).  Files not modified for
+    ``max_age_days`` are archived and removed.
+
+:func:`periodic_rotate` runs the default specs in a background thread of the
+bot runtime, every ``LOG_ROTATE_INTERVAL`` seconds.
+"""
+
+from __future__ import annotations
+
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from utils.paths import ensure_parent, expand_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.jsonl"
+UNDATED = "undated"
+# Segments are partitioned with naive timestamps taken as UTC while some
+# readers take them as local time; windows are widened by this much.
+_SLACK = timedelta(days=1)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _enabled() -> bool:
+    return os.getenv("LOG_ARCHIVE", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+# -- Bloom filter ------------------------------------------------------------
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on BLAKE2b)."""
+
+    def __init__(self, bits: int, hashes: int, data: bytes | None = None):
+        self.bits = max(8, bits)
+        self.hashes = max(1, hashes)
+        self._data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def for_count(cls, count: int, error_rate: float = 0.01) -> BloomFilter:
+        # Small segments get a filter sized for a few dozen addresses, so
+        # their false positive rate stays low too.
+        count = max(32, count)
+        bits = math.ceil(-count * math.log(error_rate) / (math.log(2) ** 2))
+        return cls(bits, round(bits / count * math.log(2)))
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._data[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "data": base64.b64encode(bytes(self._data)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> BloomFilter:
+        return cls(int(data["bits"]), int(data["hashes"]), base64.b64decode(data["data"]))
+
+
+# -- segments and index ------------------------------------------------------
+def _email_key(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _parse_ts(raw: Any) -> datetime | None:
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return datetime.fromtimestamp(raw, UTC)
+    text = str(raw or "").strip()
+    if not text:
+        return None
+    try:
+        ts = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=UTC)
+    return ts.astimezone(UTC)
+
+
+@dataclass
+class Segment:
+    """One archived, compressed slice of a log."""
+
+    path: Path
+    min_ts: datetime | None
+    max_ts: datetime | None
+    rows: int
+    bloom: BloomFilter | None
+
+    def overlaps(self, start: datetime | None, end: datetime | None) -> bool:
+        if self.min_ts is None or self.max_ts is None:
+            return True
+        if start is not None and self.max_ts < _as_utc(start) - _SLACK:
+            return False
+        if end is not None and self.min_ts > _as_utc(end) + _SLACK:
+            return False
+        return True
+
+    def may_contain(self, email: str) -> bool:
+        return self.bloom is None or _email_key(email) in self.bloom
+
+    def open_text(self) -> io.TextIOBase:
+        return gzip.open(self.path, "rt", encoding="utf-8", newline="")
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=UTC) if ts.tzinfo is None else ts.astimezone(UTC)
+
+
+def archive_dir(path: Path | str, name: str | None = None) -> Path:
+    """Archive directory of the log at ``path`` (or of ``name`` next to it)."""
+
+    path = Path(path)
+    return path.parent / "archive" / (name or path.name)
+
+
+def _load_index(root: Path) -> list[Segment]:
+    try:
+        text = (root / INDEX_NAME).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return []
+    result = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            bloom = entry.get("bloom")
+            result.append(
+                Segment(
+                    root / entry["file"],
+                    _parse_ts(entry.get("min_ts")),
+                    _parse_ts(entry.get("max_ts")),
+                    int(entry.get("rows") or 0),
+                    BloomFilter.from_dict(bloom) if bloom else None,
+                )
+            )
+        except (KeyError, TypeError, ValueError):
+            logger.warning("log archive: skipping bad index entry in %s", root)
+    return result
+
+
+def segments(
+    path: Path | str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    email: str | None = None,
+    archive: Path | str | None = None,
+) -> list[Segment]:
+    """Segments of the log at ``path`` that may hold records for the query.
+
+    ``start``/``end`` bound the record timestamps; ``email`` additionally
+    skips segments whose Bloom filter rules the address out.
+    """
+
+    root = Path(archive) if archive is not None else archive_dir(path)
+    found = []
+    for segment in _load_index(root):
+        if not segment.overlaps(start, end):
+            continue
+        if email and not segment.may_contain(email):
+            continue
+        if segment.path.exists():
+            found.append(segment)
+    return found
+
+
+def segment_paths(
+    path: Path | str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    archive: Path | str | None = None,
+) -> list[Path]:
+    return [segment.path for segment in segments(path, start, end, archive=archive)]
+
+
+def _is_csv(path: Path) -> bool:
+    suffixes = [s.lower() for s in path.suffixes]
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] == ".csv"
+
+
+def _read_segment(segment: Segment) -> Iterator[dict[str, Any]]:
+    with segment.open_text() as fh:
+        if _is_csv(segment.path):
+            yield from csv.DictReader(fh)
+            return
+        for line in fh:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def iter_records(
+    path: Path | str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    email: str | None = None,
+    archive: Path | str | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield archived records of the log at ``path`` from overlapping segments.
+
+    Records are not filtered individually; callers apply their own checks.
+    """
+
+    for segment in segments(path, start, end, email=email, archive=archive):
+        try:
+            yield from _read_segment(segment)
+        except (OSError, EOFError):
+            logger.warning("log archive: failed to read %s", segment.path, exc_info=True)
+
+
+# -- writing segments --------------------------------------------------------
+@dataclass(frozen=True)
+class LogSpec:
+    """How a log is rotated; ``path`` is resolved on every run."""
+
+    name: str
+    path: Callable[[], Path | str | None]
+    mode: str = "log"
+    ts_fields: tuple[str, ...] = ("ts",)
+    email_field: str | None = "email"
+    max_bytes: int | None = None
+    max_age_days: float | None = None
+    pattern: str | None = None
+
+
+class _Partition:
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.emails: set[str] = set()
+        self.min_ts: datetime | None = None
+        self.max_ts: datetime | None = None
+
+    def add(self, line: str, ts: datetime | None, email: str) -> None:
+        self.lines.append(line if line.endswith("\n") else line + "\n")
+        if email:
+            self.emails.add(email)
+        if ts is not None:
+            self.min_ts = ts if self.min_ts is None else min(self.min_ts, ts)
+            self.max_ts = ts if self.max_ts is None else max(self.max_ts, ts)
+
+
+def _record_ts(record: dict[str, Any], fields: Iterable[str]) -> datetime | None:
+    for field in fields:
+        ts = _parse_ts(record.get(field))
+        if ts is not None:
+            return ts
+    return None
+
+
+def _write_segments(
+    root: Path,
+    stem: str,
+    suffix: str,
+    partitions: dict[str, _Partition],
+    header: str | None = None,
+) -> list[Segment]:
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+    written = []
+    index_lines = []
+    for day, part in sorted(partitions.items()):
+        if not part.lines:
+            continue
+        target = root / day / f"{stem}-{stamp}{suffix}.gz"
+        ensure_parent(target)
+        with open(target, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+                if header:
+                    gz.write(header.encode("utf-8"))
+                gz.write("".join(part.lines).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        bloom = BloomFilter.for_count(len(part.emails)) if part.emails else None
+        for email in part.emails:
+            bloom.add(email)
+        segment = Segment(target, part.min_ts, part.max_ts, len(part.lines), bloom)
+        written.append(segment)
+        index_lines.append(
+            json.dumps(
+                {
+                    "file": target.relative_to(root).as_posix(),
+                    "min_ts": part.min_ts.isoformat() if part.min_ts else None,
+                    "max_ts": part.max_ts.isoformat() if part.max_ts else None,
+                    "rows": len(part.lines),
+                    "bloom": bloom.to_dict() if bloom else None,
+                }
+            )
+            + "\n"
+        )
+    if index_lines:
+        index = root / INDEX_NAME
+        ensure_parent(index)
+        with index.open("a", encoding="utf-8") as fh:
+            fh.write("".join(index_lines))
+            fh.flush()
+            os.fsync(fh.fileno())
+    return written
+
+
+def _partition(lines: Iterable[tuple[str, dict[str, Any]]], spec: LogSpec) -> dict[str, _Partition]:
+    partitions: dict[str, _Partition] = {}
+    for line, record in lines:
+        ts = _record_ts(record, spec.ts_fields)
+        day = ts.date().isoformat() if ts else UNDATED
+        email = _email_key(record.get(spec.email_field)) if spec.email_field else ""
+        partitions.setdefault(day, _Partition()).add(line, ts, email)
+    return partitions
+
+
+def _split_suffix(path: Path) -> tuple[str, str]:
+    return path.stem, path.suffix or ".log"
+
+
+def _jsonl_lines(text: str) -> Iterator[tuple[str, dict[str, Any]]]:
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = {}
+        yield line, record if isinstance(record, dict) else {}
+
+
+def _csv_lines(text: str) -> tuple[str, list[tuple[str, dict[str, Any]]]]:
+    header, _, body = text.partition("\n")
+    header = header.rstrip("\r")
+    fields = next(csv.reader([header]), [])
+    rows = []
+    for values in csv.reader(io.StringIO(body)):
+        if not values:
+            continue
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(values)
+        rows.append((buf.getvalue(), dict(zip(fields, values, strict=False))))
+    return header + "\n", rows
+
+
+def _archive_text(path: Path, text: str, spec: LogSpec, root: Path) -> list[Segment]:
+    stem, suffix = _split_suffix(path)
+    if suffix.lower() == ".csv":
+        header, rows = _csv_lines(text)
+        return _write_segments(root, stem, suffix, _partition(rows, spec), header)
+    return _write_segments(root, stem, suffix, _partition(_jsonl_lines(text), spec))
+
+
+def _oldest_ts(path: Path, spec: LogSpec) -> datetime | None:
+    try:
+        with path.open("r", encoding="utf-8", newline="") as fh:
+            first = fh.readline()
+            if path.suffix.lower() == ".csv":
+                fields = next(csv.reader([first]), [])
+                first = fh.readline()
+                record = dict(zip(fields, next(csv.reader([first]), []), strict=False))
+            else:
+                record = json.loads(first) if first.strip() else {}
+    except (OSError, ValueError):
+        return None
+    return _record_ts(record, spec.ts_fields) if isinstance(record, dict) else None
+
+
+def _rotate_log(path: Path, spec: LogSpec, root: Path, now: datetime, force: bool) -> list[Segment]:
+    rotating = path.with_name(path.name + ".rotating")
+    if not rotating.exists():
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return []
+        if not size:
+            return []
+        due = force or (spec.max_bytes is not None and size >= spec.max_bytes)
+        if not due and spec.max_age_days is not None:
+            oldest = _oldest_ts(path, spec)
+            due = oldest is not None and oldest < now - timedelta(days=spec.max_age_days)
+        if not due:
+            return []
+        # Writers open the file per record, so they start a fresh one.
+        os.replace(path, rotating)
+    text = rotating.read_text(encoding="utf-8", errors="replace")
+    written = _archive_text(path, text, spec, root)
+    rotating.unlink()
+    return written
+
+
+def _compact_table(
+    path: Path, spec: LogSpec, root: Path, now: datetime, force: bool
+) -> list[Segment]:
+    from emailbot.messaging_utils import FileLock
+
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return []
+    if spec.max_age_days is None or not (force or spec.max_bytes is None or size >= spec.max_bytes):
+        return []
+    cutoff = now - timedelta(days=spec.max_age_days)
+    with FileLock(path):
+        text = path.read_text(encoding="utf-8")
+        header, rows = _csv_lines(text)
+        old = []
+        keep = []
+        for line, record in rows:
+            ts = _record_ts(record, spec.ts_fields)
+            (old if ts is not None and ts < cutoff else keep).append((line, record))
+        if not old:
+            return []
+        written = _write_segments(root, *_split_suffix(path), _partition(old, spec), header)
+        tmp = path.with_name(path.name + ".compact")
+        with tmp.open("w", encoding="utf-8", newline="") as fh:
+            fh.write(header)
+            fh.write("".join(line for line, _ in keep))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    return written
+
+
+def _archive_files(spec: LogSpec, directory: Path, now: datetime) -> list[Segment]:
+    if spec.max_age_days is None or not directory.is_dir():
+        return []
+    root = archive_dir(directory / spec.name)
+    cutoff = now.timestamp() - spec.max_age_days * 86400
+    written = []
+    for path in sorted(directory.glob(spec.pattern or "*")):
+        try:
+            if path.stat().st_mtime >= cutoff:
+                continue
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        written.extend(_archive_text(path, text, spec, root))
+        path.unlink()
+    return written
+
+
+def rotate(spec: LogSpec, *, now: datetime | None = None, force: bool = False) -> list[Segment]:
+    """Rotate or compact the log described by ``spec``; return new segments."""
+
+    now = now or datetime.now(UTC)
+    raw = spec.path()
+    if not raw:
+        return []
+    path = Path(raw)
+    if spec.mode == "files":
+        return _archive_files(spec, path, now)
+    root = archive_dir(path)
+    if spec.mode == "table":
+        return _compact_table(path, spec, root, now, force)
+    return _rotate_log(path, spec, root, now, force)
+
+
+# -- runtime -----------------------------------------------------------------
+def _module_path(module: str, attr: str) -> Callable[[], Path | None]:
+    def resolve() -> Path | None:
+        import importlib
+
+        try:
+            value = getattr(importlib.import_module(module), attr)
+        except Exception:
+            return None
+        value = value() if callable(value) else value
+        return expand_path(value) if value else None
+
+    return resolve
+
+
+def default_specs() -> list[LogSpec]:
+    max_bytes = int(_env_float("LOG_ROTATE_MAX_MB", 50) * 1024 * 1024)
+    max_age = _env_float("LOG_ROTATE_MAX_AGE_DAYS", 30)
+    keep_days = _env_float("SENT_LOG_KEEP_DAYS", 400)
+    return [
+        LogSpec(
+            "send_stats", _module_path("utils.send_stats", "_stats_path"),
+            max_bytes=max_bytes, max_age_days=max_age,
+        ),
+        LogSpec(
+            "send_history", _module_path("utils.rules", "HISTORY_PATH"),
+            max_bytes=max_bytes, max_age_days=max_age,
+        ),
+        LogSpec(
+            "perf", _module_path("emailbot.perf", "PERF_LOG_PATH"),
+            email_field=None, max_bytes=max_bytes, max_age_days=max_age,
+        ),
+        LogSpec(
+            "bounce_log", _module_path("emailbot.messaging_utils", "BOUNCE_LOG_PATH"),
+            max_bytes=max_bytes, max_age_days=max_age,
+        ),
+        LogSpec(
+            "sent_log", _module_path("emailbot.messaging_utils", "SENT_LOG_PATH"),
+            mode="table", ts_fields=("last_sent_at",),
+            max_bytes=max_bytes, max_age_days=keep_days,
+        ),
+        LogSpec(
+            "bulk_audit", lambda: expand_path("var"), mode="files",
+            ts_fields=("timestamp", "time", "ts"), max_age_days=max_age,
+            pattern="bulk_audit_*.jsonl",
+        ),
+    ]  # fmt: skip
+
+
+def run_once(specs: Iterable[LogSpec] | None = None) -> int:
+    """Rotate every spec; return the number of segments written."""
+
+    total = 0
+    for spec in default_specs() if specs is None else specs:
+        try:
+            written = rotate(spec)
+        except Exception:
+            logger.warning("log archive: rotating %s failed", spec.name, exc_info=True)
+            continue
+        if written:
+            rows = sum(segment.rows for segment in written)
+            logger.info(
+                "log archive: %s -> %d segment(s), %d row(s)", spec.name, len(written), rows
+            )
+        total += len(written)
+    return total
+
+
+def periodic_rotate(stop_event: threading.Event, interval: float | None = None) -> None:
+    """Run :func:`run_once` until ``stop_event`` is set."""
+
+    if not _enabled():
+        return
+    interval = interval or _env_float("LOG_ROTATE_INTERVAL", 3600)
+    while not stop_event.is_set():
+        run_once()
+        stop_event.wait(interval)
+
+
+__all__ = [
+    "BloomFilter",
+    "Segment",
+    "LogSpec",
+    "archive_dir",
+    "segments",
+    "segment_paths",
+    "iter_records",
+    "rotate",
+    "default_specs",
+    "run_once",
+    "periodic_rotate",
+]
@@ -2,12 +2,9 @@
 
 from __future__ import annotations
 
-import email
-import email.utils as eut
 import os
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from typing import Optional
-from contextlib import closing
 
 try:  # pragma: no cover - optional dependency
     from imapclient.imapclient import imap_utf7
@@ -15,9 +12,10 @@ except Exception:  # pragma: no cover - fallback to internal helper
     imap_utf7 = None
 
 from emailbot.messaging_utils import _imap_utf7_encode as _imap_utf7_encode
-from emailbot.messaging_utils import parse_imap_date_to_utc
 from emailbot.net_imap import get_imap_timeout, imap_connect_ssl
 
+from . import imap_pool, sent_index
+
 
 def _encode_mailbox(name: str) -> str:
     if not name:
@@ -31,11 +29,15 @@ def _encode_mailbox(name: str) -> str:
         return _imap_utf7_encode(name)
     except Exception:  # pragma: no cover - give up
         return name
-from emailbot.services.cooldown import normalize_email_for_key
 
 
 def find_last_sent_at(email_norm: str, mailbox: str, days: int) -> Optional[datetime]:
-    """Return the most recent ``Date`` of a message sent to ``email_norm``."""
+    """Return the most recent ``Date`` of a message sent to ``email_norm``.
+
+    The Sent folder is first brought up to date in the local
+    :mod:`~emailbot.mail.sent_index` (new UIDs only); the answer itself is a
+    local query.
+    """
 
     host = os.getenv("IMAP_HOST")
     port_raw = os.getenv("IMAP_PORT", "993")
@@ -49,47 +51,14 @@ def find_last_sent_at(email_norm: str, mailbox: str, days: int) -> Optional[date
     except Exception:
         port = 993
 
-    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%d-%b-%Y")
-
+    encoded = _encode_mailbox(mailbox)
     timeout = get_imap_timeout(15.0)
-    with closing(imap_connect_ssl(host, port, timeout=timeout)) as client:
-        client.login(user, password)
-        status, _ = client.select(_encode_mailbox(mailbox))
-        if status != "OK":  # pragma: no cover - depends on server dialect
-            status, _ = client.select(f'"{mailbox}"')
-        if status != "OK":
-            return None
-        search_criteria = [f"(SENTSINCE {since})", f"(SINCE {since})"]
-        data = None
-        for criteria in search_criteria:
-            status, payload = client.search(None, criteria)
-            if status == "OK":
-                data = payload
-                break
-        if not data:
-            return None
-        ids = data[0].split() if data and data[0] else []
-        last: Optional[datetime] = None
-        for msg_id in ids:
-            status, msgdata = client.fetch(msg_id, "(BODY.PEEK[HEADER.FIELDS (TO DATE)])")
-            if status != "OK" or not msgdata or not msgdata[0]:
-                continue
-            header_bytes = msgdata[0][1]
-            if not header_bytes:
-                continue
-            header = email.message_from_bytes(header_bytes)
-            addresses: list[str] = []
-            for value in header.get_all("To", []):
-                for _, addr in eut.getaddresses([value]):
-                    if addr:
-                        addresses.append(addr)
-            normalised = {normalize_email_for_key(addr) for addr in addresses if addr}
-            if email_norm not in normalised:
-                continue
-            dt_raw = header.get("Date")
-            if not dt_raw:
-                continue
-            parsed = parse_imap_date_to_utc(dt_raw)
-            if last is None or parsed > last:
-                last = parsed
-        return last
+    with imap_pool.imap_session(
+        host, port, user, password, timeout=timeout, connect=imap_connect_ssl
+    ) as client:
+        sent_index.sync(
+            client,
+            encoded,
+            backfill_days=max(days, sent_index.SENT_INDEX_BACKFILL_DAYS),
+        )
+    return sent_index.last_sent_at(email_norm, encoded, days)
@@ -0,0 +1,354 @@
+"""Process-wide pool of authenticated IMAP sessions.
+
+Every IMAP user in the bot (bulk sends, saving to "Sent", Sent-folder sync,
+bounce/unsubscribe scans, folder pickers) used to open its own TLS
+connection and ``LOGIN``.  :func:`imap_session` hands out a live session for
+the account instead and takes it back afterwards::
+
+    with imap_pool.imap_session() as imap:
+        imap.select("INBOX")
+        ...
+
+Sessions are checked with ``NOOP`` when they were idle for a while, dropped
+after ``IMAP_POOL_IDLE_TIMEOUT`` seconds and discarded when the caller's
+block raises a connection error.  Within one checkout :class:`ImapSession`
+remembers which mailbox is selected (repeated ``SELECT`` of the same mailbox
+is skipped, e.g. once per message when saving to "Sent" during a bulk send);
+the resolved "Sent" folder name is cached per account.
+"""
+
+from __future__ import annotations
+
+import atexit
+import imaplib
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from emailbot.net_imap import get_imap_timeout, imap_connect_ssl
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+IDLE_TIMEOUT = _env_float("IMAP_POOL_IDLE_TIMEOUT", 300.0)
+CHECK_AFTER = _env_float("IMAP_POOL_CHECK_AFTER", 30.0)
+MAX_IDLE = int(_env_float("IMAP_POOL_MAX_IDLE", 2))
+
+_BROKEN = (imaplib.IMAP4.abort, OSError, EOFError)
+
+PoolKey = tuple[str, int, str, Callable[..., Any]]
+
+
+def _mailbox_name(mailbox: str) -> str:
+    return str(mailbox or "INBOX").strip().strip('"')
+
+
+class ImapSession:
+    """Logged-in IMAP client borrowed from an :class:`ImapPool`.
+
+    Unknown attributes are delegated to the wrapped ``imaplib`` client, so a
+    session can be passed wherever an ``IMAP4_SSL`` instance is expected.
+    """
+
+    def __init__(self, pool: ImapPool, key: PoolKey, client: Any):
+        self._pool = pool
+        self._key = key
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.selected: str | None = None
+        self._readonly = False
+        self._uidvalidity: list[Any] = [None]
+        self.broken = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    @property
+    def sent_folder(self) -> str | None:
+        return self._pool.sent_folder(self._key)
+
+    @sent_folder.setter
+    def sent_folder(self, name: str | None) -> None:
+        self._pool.remember_sent_folder(self._key, name)
+
+    def select(self, mailbox: str = "INBOX", readonly: bool = False):
+        name = _mailbox_name(mailbox)
+        if self.selected == name and (readonly or not self._readonly):
+            return "OK", [b""]
+        self.selected = None
+        try:
+            status, data = self.client.select(mailbox, readonly=readonly)
+        except TypeError:
+            status, data = self.client.select(mailbox)
+        if status == "OK":
+            self.selected = name
+            self._readonly = readonly
+            try:
+                _, self._uidvalidity = self.client.response("UIDVALIDITY")
+            except Exception:
+                self._uidvalidity = [None]
+        return status, data
+
+    def response(self, code: str):
+        if code.upper() == "UIDVALIDITY" and self.selected is not None:
+            return code, self._uidvalidity
+        return self.client.response(code)
+
+    def close(self):
+        self.selected = None
+        return self.client.close()
+
+    def logout(self):
+        """Log out for real; the session will not return to the pool."""
+
+        self.broken = True
+        self.selected = None
+        return self.client.logout()
+
+    def noop(self):
+        return self.client.noop()
+
+
+class ImapPool:
+    """Keeps up to ``max_idle`` idle sessions per account."""
+
+    def __init__(
+        self,
+        *,
+        idle_timeout: float = IDLE_TIMEOUT,
+        check_after: float = CHECK_AFTER,
+        max_idle: int = MAX_IDLE,
+    ):
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self._idle: dict[PoolKey, list[ImapSession]] = {}
+        self._sent_folders: dict[PoolKey, str] = {}
+        self._lock = threading.Lock()
+
+    # -- sent folder cache ---------------------------------------------------
+    def sent_folder(self, key: PoolKey) -> str | None:
+        with self._lock:
+            return self._sent_folders.get(key)
+
+    def remember_sent_folder(self, key: PoolKey, name: str | None) -> None:
+        with self._lock:
+            if name:
+                self._sent_folders[key] = name
+            else:
+                self._sent_folders.pop(key, None)
+
+    def forget_sent_folder(self) -> None:
+        with self._lock:
+            self._sent_folders.clear()
+
+    # -- checkout ------------------------------------------------------------
+    def discard(self, session: ImapSession) -> None:
+        """Log the session out and forget it."""
+
+        session.broken = True
+        try:
+            session.client.logout()
+        except Exception:
+            logger.debug("imap_pool: logout failed", exc_info=True)
+
+    def _healthy(self, session: ImapSession, now: float) -> bool:
+        idle = now - session.last_used
+        if idle > self.idle_timeout:
+            return False
+        if idle < self.check_after:
+            return True
+        try:
+            status, _ = session.noop()
+        except Exception:
+            return False
+        return status == "OK"
+
+    def acquire(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        *,
+        timeout: float | None = None,
+        connect: Callable[..., Any] | None = None,
+    ) -> ImapSession:
+        connect = connect or imap_connect_ssl
+        key: PoolKey = (host, port, user, connect)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                session = idle.pop() if idle else None
+            if session is None:
+                break
+            if self._healthy(session, time.monotonic()):
+                session.last_used = time.monotonic()
+                session.selected = None
+                return session
+            self.discard(session)
+        client = connect(host, port, timeout)
+        try:
+            client.login(user, password)
+        except Exception:
+            try:
+                client.logout()
+            except Exception:
+                pass
+            raise
+        return ImapSession(self, key, client)
+
+    def release(self, session: ImapSession) -> None:
+        if session.broken:
+            return
+        session.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(session._key, [])
+            if len(idle) < self.max_idle:
+                idle.append(session)
+                return
+        self.discard(session)
+
+    @contextmanager
+    def session(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        *,
+        timeout: float | None = None,
+        connect: Callable[..., Any] | None = None,
+    ) -> Iterator[ImapSession]:
+        session = self.acquire(host, port, user, password, timeout=timeout, connect=connect)
+        try:
+            yield session
+        except _BROKEN:
+            self.discard(session)
+            raise
+        except BaseException:
+            # The connection itself is fine but its state is unknown.
+            session.selected = None
+            self.release(session)
+            raise
+        else:
+            self.release(session)
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+            self._sent_folders.clear()
+        for session in sessions:
+            self.discard(session)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+
+_POOL = ImapPool()
+
+
+def get_pool() -> ImapPool:
+    return _POOL
+
+
+def _account(
+    host: str | None,
+    port: int | None,
+    user: str | None,
+    password: str | None,
+    timeout: float | None,
+) -> tuple[str, int, str, str, float | None]:
+    if host is None:
+        host = os.getenv("IMAP_HOST", "imap.mail.ru")
+    if port is None:
+        try:
+            port = int(os.getenv("IMAP_PORT", "993"))
+        except ValueError:
+            port = 993
+    if user is None:
+        user = os.getenv("EMAIL_ADDRESS", "")
+    if password is None:
+        password = os.getenv("EMAIL_PASSWORD", "")
+    if timeout is None:
+        timeout = get_imap_timeout(15.0)
+    return host, port, user, password, timeout
+
+
+def imap_session(
+    host: str | None = None,
+    port: int | None = None,
+    user: str | None = None,
+    password: str | None = None,
+    *,
+    timeout: float | None = None,
+    connect: Callable[..., Any] | None = None,
+):
+    """Borrow a session for the account configured in the environment.
+
+    Explicit arguments override ``IMAP_HOST``/``IMAP_PORT``/``EMAIL_ADDRESS``/
+    ``EMAIL_PASSWORD``; ``connect`` defaults to
+    :func:`emailbot.net_imap.imap_connect_ssl`.
+    """
+
+    host, port, user, password, timeout = _account(host, port, user, password, timeout)
+    return _POOL.session(host, port, user, password, timeout=timeout, connect=connect)
+
+
+def acquire_session(
+    host: str | None = None,
+    port: int | None = None,
+    user: str | None = None,
+    password: str | None = None,
+    *,
+    timeout: float | None = None,
+    connect: Callable[..., Any] | None = None,
+) -> ImapSession:
+    """Like :func:`imap_session` for code that cannot use a ``with`` block.
+
+    The caller must hand the session back with :func:`release_session`.
+    """
+
+    host, port, user, password, timeout = _account(host, port, user, password, timeout)
+    return _POOL.acquire(host, port, user, password, timeout=timeout, connect=connect)
+
+
+def release_session(session: ImapSession | None, *, broken: bool = False) -> None:
+    if session is None:
+        return
+    if broken:
+        _POOL.discard(session)
+    else:
+        _POOL.release(session)
+
+
+def close_all() -> None:
+    _POOL.close_all()
+
+
+atexit.register(close_all)
+
+
+__all__ = [
+    "ImapSession",
+    "ImapPool",
+    "get_pool",
+    "imap_session",
+    "acquire_session",
+    "release_session",
+    "close_all",
+]
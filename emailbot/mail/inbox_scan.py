@@ -0,0 +1,215 @@
+"""Single-pass, UID-incremental scanner for the incoming mailbox.
+
+Bounce and unsubscribe processing used to ``SEARCH SINCE`` the last N days
+and download every message as ``RFC822`` on each run.  The engine below keeps
+a UID cursor per mailbox and consumer (in the history database), fetches only
+a few header fields for new messages, downloads full bodies just for the
+candidates accepted by a consumer's cheap header filter and hands each
+message to every interested consumer in the same pass.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from email.message import Message
+from pathlib import Path
+from threading import Lock
+
+from emailbot import history_service, history_store
+from emailbot.net_imap import get_imap_timeout
+
+from . import imap_pool, uid_sync
+
+logger = logging.getLogger(__name__)
+
+INBOX_HEADER_FIELDS: tuple[str, ...] = (
+    "FROM",
+    "SUBJECT",
+    "REPLY-TO",
+    "LIST-UNSUBSCRIBE",
+    "CONTENT-TYPE",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inbox_scan_state(
+    mailbox     TEXT NOT NULL,
+    consumer    TEXT NOT NULL,
+    uidvalidity INTEGER,
+    last_uid    INTEGER NOT NULL DEFAULT 0,
+    scanned_at  TEXT,
+    PRIMARY KEY (mailbox, consumer)
+);
+"""
+
+_LOCK = Lock()
+_SCHEMA_PATH: Path | None = None
+
+
+@dataclass
+class InboxConsumer:
+    """A handler fed by :func:`scan_mailbox`.
+
+    ``accepts`` sees only the headers listed in :data:`INBOX_HEADER_FIELDS`;
+    ``handle`` receives the full message and returns the number of items it
+    recorded.
+    """
+
+    name: str
+    accepts: Callable[[Message], bool]
+    handle: Callable[[Message], int]
+
+
+def _connect() -> sqlite3.Connection:
+    global _SCHEMA_PATH
+    history_service.ensure_initialized()
+    path = history_store._DB_PATH
+    conn = history_store.get_connection()
+    with _LOCK:
+        if _SCHEMA_PATH != path:
+            conn.executescript(_SCHEMA)
+            _SCHEMA_PATH = path
+    return conn
+
+
+def get_cursor(mailbox: str, consumer: str) -> uid_sync.UidCursor:
+    conn = _connect()
+    row = conn.execute(
+        "SELECT uidvalidity, last_uid FROM inbox_scan_state WHERE mailbox=? AND consumer=?",
+        (mailbox, consumer),
+    ).fetchone()
+    if not row:
+        return uid_sync.UidCursor()
+    return uid_sync.UidCursor(uidvalidity=row[0], last_uid=int(row[1] or 0))
+
+
+def _store_cursors(mailbox: str, consumers: Iterable[str], cursor: uid_sync.UidCursor) -> None:
+    now = datetime.now(UTC).isoformat()
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO inbox_scan_state(
+                mailbox, consumer, uidvalidity, last_uid, scanned_at
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            [(mailbox, name, cursor.uidvalidity, cursor.last_uid, now) for name in consumers],
+        )
+
+
+def scan_mailbox(
+    imap,
+    mailbox: str,
+    consumers: Iterable[InboxConsumer],
+    *,
+    since_days: int = 7,
+    batch_size: int | None = None,
+) -> dict[str, int]:
+    """Dispatch new messages of ``mailbox`` to ``consumers`` in one pass.
+
+    ``imap`` must be logged in.  A consumer without a cursor (or after a
+    ``UIDVALIDITY`` change) starts from the last ``since_days`` days.
+    Returns the per-consumer totals reported by ``handle``.
+    """
+
+    consumers = list(consumers)
+    totals = {consumer.name: 0 for consumer in consumers}
+    if not consumers:
+        return totals
+    ok, uidvalidity = uid_sync.select_mailbox(imap, mailbox)
+    if not ok:
+        logger.warning("inbox_scan: cannot select %s", mailbox)
+        return totals
+
+    floors: dict[str, int] = {}
+    for consumer in consumers:
+        cursor = get_cursor(mailbox, consumer.name)
+        floors[consumer.name] = cursor.last_uid if cursor.is_valid_for(uidvalidity) else 0
+    resumed = [floor for floor in floors.values() if floor > 0]
+    uids: set[int] = set()
+    if resumed:
+        uids.update(uid_sync.search_uids(imap, after_uid=min(resumed)))
+    if len(resumed) < len(floors):
+        since = datetime.now(UTC) - timedelta(days=max(since_days, 0))
+        uids.update(uid_sync.search_uids(imap, since=since))
+
+    for batch in uid_sync.iter_batches(sorted(uids), batch_size):
+        headers = uid_sync.fetch_header_batch(imap, batch, INBOX_HEADER_FIELDS)
+        wanted: dict[int, list[InboxConsumer]] = {}
+        for uid, msg in headers:
+            for consumer in consumers:
+                if uid <= floors[consumer.name]:
+                    continue
+                try:
+                    accepted = consumer.accepts(msg)
+                except Exception:
+                    logger.debug("inbox_scan: %s filter failed", consumer.name, exc_info=True)
+                    accepted = False
+                if accepted:
+                    wanted.setdefault(uid, []).append(consumer)
+        for uid, msg in uid_sync.fetch_message_batch(imap, sorted(wanted)):
+            for consumer in wanted.get(uid, []):
+                try:
+                    totals[consumer.name] += int(consumer.handle(msg) or 0)
+                except Exception as exc:
+                    logger.warning("inbox_scan: %s failed on uid %s: %s", consumer.name, uid, exc)
+        cursor = uid_sync.UidCursor(uidvalidity=uidvalidity, last_uid=batch[-1])
+        advanced = [c.name for c in consumers if batch[-1] > floors[c.name]]
+        if uidvalidity is not None and advanced:
+            _store_cursors(mailbox, advanced, cursor)
+    return totals
+
+
+def run_scan(
+    consumers: Iterable[InboxConsumer] | None = None,
+    *,
+    mailbox: str | None = None,
+    since_days: int | None = None,
+) -> dict[str, int] | None:
+    """Connect with the configured credentials and run :func:`scan_mailbox`.
+
+    Defaults to the bounce and unsubscribe consumers.  Returns ``None`` when
+    IMAP is not configured.
+    """
+
+    host = os.getenv("IMAP_HOST")
+    user = os.getenv("EMAIL_ADDRESS")
+    password = os.getenv("EMAIL_PASSWORD")
+    if not host or not user or not password:
+        return None
+    try:
+        port = int(os.getenv("IMAP_PORT", "993"))
+    except ValueError:
+        port = 993
+    if consumers is None:
+        consumers = default_consumers()
+    if mailbox is None:
+        mailbox = os.getenv("INBOX_MAILBOX", "INBOX")
+    if since_days is None:
+        try:
+            since_days = int(os.getenv("BOUNCE_SINCE_DAYS", "7"))
+        except ValueError:
+            since_days = 7
+    with imap_pool.imap_session(host, port, user, password, timeout=get_imap_timeout(15.0)) as imap:
+        return scan_mailbox(imap, mailbox, consumers, since_days=since_days)
+
+
+def default_consumers() -> list[InboxConsumer]:
+    from services.unsubscribe_scanner import unsubscribe_consumer
+    from utils.bounce import bounce_consumer
+
+    return [bounce_consumer(), unsubscribe_consumer()]
+
+
+__all__ = [
+    "INBOX_HEADER_FIELDS",
+    "InboxConsumer",
+    "get_cursor",
+    "scan_mailbox",
+    "run_scan",
+    "default_consumers",
+]
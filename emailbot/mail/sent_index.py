@@ -0,0 +1,240 @@
+"""Local SQLite index of the IMAP "Sent" folder.
+
+The index lives in the history database (``history_store``) and maps a
+normalised recipient to every send date/Message-ID found in the Sent folder.
+It is kept up to date from UID deltas (see :mod:`emailbot.mail.uid_sync`), so
+"when did we last write to X?" and the CSV/IMAP reconciliation become local
+queries instead of full mailbox scans.
+"""
+
+from __future__ import annotations
+
+import email.utils as eut
+import logging
+import os
+import sqlite3
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from threading import Lock
+
+from emailbot import history_service, history_store
+from emailbot.services.cooldown import normalize_email_for_key
+
+from . import uid_sync
+
+logger = logging.getLogger(__name__)
+
+SENT_INDEX_BACKFILL_DAYS = int(os.getenv("SENT_INDEX_BACKFILL_DAYS", "400"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent_index(
+    mailbox     TEXT    NOT NULL,
+    uid         INTEGER NOT NULL,
+    recipient   TEXT    NOT NULL,
+    address     TEXT    NOT NULL,
+    sent_at_utc TEXT,
+    message_id  TEXT,
+    PRIMARY KEY (mailbox, uid, recipient)
+);
+CREATE INDEX IF NOT EXISTS idx_sent_index_recipient
+    ON sent_index(recipient, sent_at_utc DESC);
+CREATE INDEX IF NOT EXISTS idx_sent_index_date
+    ON sent_index(mailbox, sent_at_utc);
+CREATE TABLE IF NOT EXISTS sent_index_state(
+    mailbox     TEXT PRIMARY KEY,
+    uidvalidity INTEGER,
+    last_uid    INTEGER NOT NULL DEFAULT 0,
+    synced_at   TEXT
+);
+"""
+
+_LOCK = Lock()
+_SCHEMA_PATH: Path | None = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _SCHEMA_PATH
+    history_service.ensure_initialized()
+    path = history_store._DB_PATH
+    conn = history_store.get_connection()
+    with _LOCK:
+        if _SCHEMA_PATH != path:
+            conn.executescript(_SCHEMA)
+            _SCHEMA_PATH = path
+    return conn
+
+
+def _isoformat(dt: datetime) -> str:
+    return dt.astimezone(UTC).isoformat().replace("+00:00", "Z")
+
+
+def _parse(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _message_date(raw: str | None) -> datetime | None:
+    if not raw:
+        return None
+    try:
+        dt = eut.parsedate_to_datetime(raw)
+    except Exception:
+        return None
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt
+
+
+def get_cursor(mailbox: str) -> uid_sync.UidCursor:
+    conn = _connect()
+    row = conn.execute(
+        "SELECT uidvalidity, last_uid FROM sent_index_state WHERE mailbox=?",
+        (mailbox,),
+    ).fetchone()
+    if not row:
+        return uid_sync.UidCursor()
+    return uid_sync.UidCursor(uidvalidity=row[0], last_uid=int(row[1] or 0))
+
+
+def sync(imap, mailbox: str, *, backfill_days: int | None = None) -> int:
+    """Index new messages of ``mailbox`` and return the number of rows added.
+
+    ``imap`` must be logged in.  When the stored ``UIDVALIDITY`` no longer
+    matches, the rows of the mailbox are dropped and the last
+    ``backfill_days`` (``SENT_INDEX_BACKFILL_DAYS``) are indexed again.
+    """
+
+    ok, uidvalidity = uid_sync.select_mailbox(imap, f'"{mailbox}"')
+    if not ok:
+        logger.warning("sent_index: cannot select %s", mailbox)
+        return 0
+    cursor = get_cursor(mailbox)
+    if not cursor.is_valid_for(uidvalidity):
+        cursor = uid_sync.UidCursor()
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM sent_index WHERE mailbox=?", (mailbox,))
+            conn.execute("DELETE FROM sent_index_state WHERE mailbox=?", (mailbox,))
+    days = SENT_INDEX_BACKFILL_DAYS if backfill_days is None else backfill_days
+    since = datetime.now(UTC) - timedelta(days=max(days, 0))
+    added = 0
+    for headers, last_uid in uid_sync.iter_new_headers(
+        imap, cursor, uidvalidity, since=since
+    ):
+        rows = []
+        for uid, msg in headers:
+            sent_at = _message_date(msg.get("Date"))
+            msgid = (msg.get("Message-ID") or "").strip() or None
+            addresses = []
+            for hdr in ("To", "Cc", "Bcc"):
+                addresses.extend(eut.getaddresses(msg.get_all(hdr) or []))
+            for _, addr in addresses:
+                key = normalize_email_for_key(addr) if addr else ""
+                if not key:
+                    continue
+                rows.append(
+                    (
+                        mailbox,
+                        uid,
+                        key,
+                        addr.strip().lower(),
+                        _isoformat(sent_at) if sent_at else None,
+                        msgid,
+                    )
+                )
+        conn = _connect()
+        with conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO sent_index(
+                    mailbox, uid, recipient, address, sent_at_utc, message_id
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO sent_index_state(
+                    mailbox, uidvalidity, last_uid, synced_at
+                ) VALUES (?, ?, ?, ?)
+                """,
+                (mailbox, uidvalidity, last_uid, _isoformat(datetime.now(UTC))),
+            )
+        added += len(rows)
+    return added
+
+
+def sent_dates(email_addr: str, mailbox: str | None = None) -> list[tuple[datetime, str | None]]:
+    """Return ``(sent_at, message_id)`` pairs for ``email_addr`` sorted by date."""
+
+    key = normalize_email_for_key(email_addr)
+    if not key:
+        return []
+    query = "SELECT sent_at_utc, message_id FROM sent_index WHERE recipient=?"
+    params: tuple = (key,)
+    if mailbox:
+        query += " AND mailbox=?"
+        params += (mailbox,)
+    query += " AND sent_at_utc IS NOT NULL ORDER BY sent_at_utc"
+    conn = _connect()
+    rows = conn.execute(query, params).fetchall()
+    result = []
+    for raw, msgid in rows:
+        dt = _parse(raw)
+        if dt is not None:
+            result.append((dt, msgid))
+    return result
+
+
+def last_sent_at(
+    email_addr: str, mailbox: str | None = None, days: int | None = None
+) -> datetime | None:
+    """Return the newest indexed send date for ``email_addr``."""
+
+    key = normalize_email_for_key(email_addr)
+    if not key:
+        return None
+    query = "SELECT MAX(sent_at_utc) FROM sent_index WHERE recipient=?"
+    params: tuple = (key,)
+    if mailbox:
+        query += " AND mailbox=?"
+        params += (mailbox,)
+    if days is not None:
+        query += " AND sent_at_utc >= ?"
+        params += (_isoformat(datetime.now(UTC) - timedelta(days=days)),)
+    conn = _connect()
+    row = conn.execute(query, params).fetchone()
+    return _parse(row[0]) if row else None
+
+
+def iter_since(since: datetime, mailbox: str | None = None) -> Iterator[tuple[str, datetime]]:
+    """Yield ``(address, sent_at)`` for every indexed send at or after ``since``."""
+
+    query = "SELECT address, sent_at_utc FROM sent_index WHERE sent_at_utc >= ?"
+    params: tuple = (_isoformat(since),)
+    if mailbox:
+        query += " AND mailbox=?"
+        params += (mailbox,)
+    conn = _connect()
+    rows = conn.execute(query, params).fetchall()
+    for address, raw in rows:
+        dt = _parse(raw)
+        if dt is not None:
+            yield address, dt
+
+
+__all__ = [
+    "SENT_INDEX_BACKFILL_DAYS",
+    "get_cursor",
+    "sync",
+    "sent_dates",
+    "last_sent_at",
+    "iter_since",
+]
@@ -0,0 +1,236 @@
+"""UID-based incremental helpers for scanning IMAP mailboxes.
+
+Instead of ``SEARCH SINCE`` followed by one ``FETCH (RFC822)`` per message the
+helpers below remember ``UIDVALIDITY`` and the last processed UID of a mailbox,
+ask the server only for newer UIDs and fetch header fields in batched UID
+ranges.
+"""
+
+from __future__ import annotations
+
+import email
+import os
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from email.message import Message
+from typing import Any
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+DEFAULT_BATCH_SIZE = _env_int("IMAP_UID_BATCH", 500)
+SENT_HEADER_FIELDS: tuple[str, ...] = ("TO", "CC", "BCC", "DATE", "MESSAGE-ID")
+
+_UID_RE = re.compile(rb"\bUID\s+(\d+)", re.I)
+_UIDVALIDITY_RE = re.compile(rb"UIDVALIDITY\s+(\d+)", re.I)
+
+
+@dataclass
+class UidCursor:
+    """Position of an incremental scan inside a single mailbox."""
+
+    uidvalidity: int | None = None
+    last_uid: int = 0
+
+    def is_valid_for(self, uidvalidity: int | None) -> bool:
+        return (
+            uidvalidity is not None
+            and self.uidvalidity == uidvalidity
+            and self.last_uid > 0
+        )
+
+    def to_dict(self) -> dict[str, int | None]:
+        return {"uidvalidity": self.uidvalidity, "last_uid": self.last_uid}
+
+    @classmethod
+    def from_dict(cls, data: Any) -> UidCursor:
+        if not isinstance(data, dict):
+            return cls()
+        try:
+            validity = data.get("uidvalidity")
+            validity = int(validity) if validity is not None else None
+        except (TypeError, ValueError):
+            validity = None
+        try:
+            last_uid = int(data.get("last_uid") or 0)
+        except (TypeError, ValueError):
+            last_uid = 0
+        return cls(uidvalidity=validity, last_uid=max(last_uid, 0))
+
+
+def _first_int(payload: Any, pattern: re.Pattern[bytes] | None = None) -> int | None:
+    items = payload if isinstance(payload, (list, tuple)) else [payload]
+    for item in items:
+        if item is None:
+            continue
+        raw = item if isinstance(item, bytes) else str(item).encode()
+        if pattern is not None:
+            match = pattern.search(raw)
+            if match:
+                return int(match.group(1))
+            continue
+        raw = raw.strip()
+        if raw.isdigit():
+            return int(raw)
+    return None
+
+
+def select_mailbox(imap, mailbox: str, *, readonly: bool = True) -> tuple[bool, int | None]:
+    """Select ``mailbox`` and return ``(ok, uidvalidity)``."""
+
+    try:
+        status, _ = imap.select(mailbox, readonly=readonly)
+    except TypeError:
+        status, _ = imap.select(mailbox)
+    if status != "OK":
+        return False, None
+    validity: int | None = None
+    try:
+        _, data = imap.response("UIDVALIDITY")
+        validity = _first_int(data)
+    except Exception:
+        validity = None
+    if validity is None:
+        try:
+            status, data = imap.status(mailbox, "(UIDVALIDITY)")
+            if status == "OK":
+                validity = _first_int(data, _UIDVALIDITY_RE)
+        except Exception:
+            validity = None
+    return True, validity
+
+
+def search_uids(
+    imap,
+    *,
+    after_uid: int = 0,
+    since: datetime | None = None,
+) -> list[int]:
+    """Return UIDs newer than ``after_uid`` (or received since ``since``)."""
+
+    if after_uid > 0:
+        criteria = f"UID {after_uid + 1}:*"
+    elif since is not None:
+        criteria = f"SINCE {since.strftime('%d-%b-%Y')}"
+    else:
+        criteria = "ALL"
+    status, data = imap.uid("SEARCH", None, criteria)
+    if status != "OK" or not data:
+        return []
+    uids: set[int] = set()
+    for chunk in data:
+        if not chunk:
+            continue
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        for token in chunk.split():
+            if token.isdigit():
+                uids.add(int(token))
+    # ``UID n:*`` always matches the newest message even when its UID < n.
+    return sorted(uid for uid in uids if uid > after_uid)
+
+
+def uid_set(uids: Sequence[int]) -> str:
+    """Compress sorted ``uids`` into an IMAP sequence set (``1:5,9,11:12``)."""
+
+    parts: list[str] = []
+    start = prev = None
+    for uid in uids:
+        if start is None:
+            start = prev = uid
+            continue
+        if uid == prev + 1:
+            prev = uid
+            continue
+        parts.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    if start is not None:
+        parts.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(parts)
+
+
+def iter_batches(uids: Sequence[int], size: int | None = None) -> Iterator[list[int]]:
+    size = max(int(size or DEFAULT_BATCH_SIZE), 1)
+    for idx in range(0, len(uids), size):
+        yield list(uids[idx : idx + size])
+
+
+def _fetch_batch(imap, uids: Sequence[int], items: str) -> list[tuple[int, Message]]:
+    if not uids:
+        return []
+    status, data = imap.uid("FETCH", uid_set(list(uids)), items)
+    if status != "OK" or not data:
+        return []
+    result: list[tuple[int, Message]] = []
+    for part in data:
+        if not isinstance(part, tuple) or len(part) < 2:
+            continue
+        match = _UID_RE.search(part[0] or b"")
+        if not match or not part[1]:
+            continue
+        result.append((int(match.group(1)), email.message_from_bytes(part[1])))
+    result.sort(key=lambda item: item[0])
+    return result
+
+
+def fetch_header_batch(
+    imap,
+    uids: Sequence[int],
+    fields: Iterable[str] = SENT_HEADER_FIELDS,
+) -> list[tuple[int, Message]]:
+    """Fetch the selected header ``fields`` for ``uids`` in one round trip."""
+
+    spec = " ".join(field.upper() for field in fields)
+    return _fetch_batch(imap, uids, f"(UID BODY.PEEK[HEADER.FIELDS ({spec})])")
+
+
+def fetch_message_batch(imap, uids: Sequence[int]) -> list[tuple[int, Message]]:
+    """Fetch full messages for ``uids`` in one round trip without setting \\Seen."""
+
+    return _fetch_batch(imap, uids, "(UID BODY.PEEK[])")
+
+
+def iter_new_headers(
+    imap,
+    cursor: UidCursor,
+    uidvalidity: int | None,
+    *,
+    since: datetime | None = None,
+    fields: Iterable[str] = SENT_HEADER_FIELDS,
+    batch_size: int | None = None,
+) -> Iterator[tuple[list[tuple[int, Message]], int]]:
+    """Yield ``(headers, last_uid)`` per batch of messages not yet seen.
+
+    ``cursor`` is reset when the server reports a different ``UIDVALIDITY``;
+    in that case the scan starts again from ``since``.
+    """
+
+    fields = tuple(fields)
+    if cursor.is_valid_for(uidvalidity):
+        uids = search_uids(imap, after_uid=cursor.last_uid)
+    else:
+        uids = search_uids(imap, since=since)
+    for batch in iter_batches(uids, batch_size):
+        yield fetch_header_batch(imap, batch, fields), batch[-1]
+
+
+__all__ = [
+    "DEFAULT_BATCH_SIZE",
+    "SENT_HEADER_FIELDS",
+    "UidCursor",
+    "select_mailbox",
+    "search_uids",
+    "uid_set",
+    "iter_batches",
+    "fetch_header_batch",
+    "fetch_message_batch",
+    "iter_new_headers",
+]
@@ -1,27 +1,58 @@
+"""Persisted per-chat state of mass-mailing sessions.
+
+Every chat gets its own pair of files under ``MASS_STATE_DIR`` (default
+``var/mass_state``): a snapshot ``<chat_id>.json`` and an append-only delta
+log ``<chat_id>.log``.  :func:`save_chat_state` compares the new state with
+the one in memory and appends only what changed (items appended to
+``sent_ok``, indices dropped from ``pending``, keys removed from
+``source_map`` ...) as one JSON line, so a progress save after each sent
+message no longer serializes the whole pending list of every chat.
+
+Once the log outgrows the snapshot it is compacted in a background thread:
+the log is moved aside, the state written as a new snapshot and the old log
+removed.  Deltas carry a sequence number and the snapshot records the last
+one it contains, so a compaction interrupted at any point replays correctly.
+
+The state of a chat is read from disk once and then served from memory;
+:func:`resume_info` answers "is there a session to resume and how far did it
+get" without copying the lists.
+
+The former single ``MASS_STATE_PATH`` JSON file (every chat in one document)
+is imported on first use and renamed to ``*.migrated``.
+"""
+
+from __future__ import annotations
+
+import atexit
 import json
+import logging
 import os
+import threading
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any
 
 from utils.paths import ensure_parent, expand_path
 
+logger = logging.getLogger(__name__)
+
 _STATE_ENV = os.getenv("MASS_STATE_PATH", "var/mass_state.json")
 STATE_PATH: Path = expand_path(_STATE_ENV)
 
-# In-memory representation of the persisted state.  The file stores a mapping
-# of ``chat_id`` (as string) to an arbitrary dictionary.  This allows multiple
-# chats to run mass-mailing sessions independently.
-_state_cache: Dict[str, Dict[str, Any]] | None = None
+# Legacy whole-file state, only read to migrate it into the per-chat store.
+_state_cache: dict[str, dict[str, Any]] | None = None
 
+# Logs smaller than this are never compacted.
+_COMPACT_MIN_BYTES = 256 * 1024
 
-def _load_all() -> Dict[str, Dict[str, Any]]:
-    """Load the full state mapping from disk (lazy)."""
+
+def _load_all() -> dict[str, dict[str, Any]]:
+    """Load the legacy state mapping from ``STATE_PATH`` (lazy)."""
 
     global _state_cache
     if _state_cache is not None:
         return _state_cache
     try:
-        with open(STATE_PATH, "r", encoding="utf-8") as f:
+        with open(STATE_PATH, encoding="utf-8") as f:
             data = json.load(f)
             if isinstance(data, dict):
                 _state_cache = data  # type: ignore[assignment]
@@ -34,10 +65,10 @@ def _load_all() -> Dict[str, Dict[str, Any]]:
     return _state_cache
 
 
-def _save_all(state: Dict[str, Dict[str, Any]]) -> None:
+def _save_all(state: dict[str, dict[str, Any]]) -> None:
     global _state_cache
 
-    data: Dict[str, Dict[str, Any]]
+    data: dict[str, dict[str, Any]]
     if isinstance(state, dict) and all(isinstance(v, dict) for v in state.values()):
         _state_cache = state
         data = state
@@ -51,67 +82,519 @@ def _save_all(state: Dict[str, Dict[str, Any]]) -> None:
     os.replace(tmp, STATE_PATH)
 
 
-def load_chat_state(chat_id: int) -> Optional[Dict[str, Any]]:
-    """Return saved state for ``chat_id`` if present."""
+def default_dir() -> Path:
+    return expand_path(os.getenv("MASS_STATE_DIR", "var/mass_state"))
+
+
+# -- deltas --------------------------------------------------------------------
+
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return {k: list(v) if isinstance(v, list) else v for k, v in value.items()}
+    return value
 
+
+def _copy_state(state: dict[str, Any]) -> dict[str, Any]:
+    return {key: _copy_value(value) for key, value in state.items()}
+
+
+def _common_prefix(a: list[Any], b: list[Any]) -> int:
+    """Length of the common prefix, found with C-level slice comparisons."""
+
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _dropped_indices(old: list[Any], new: list[Any]) -> list[int] | None:
+    """Indices to drop from ``old`` to get ``new``, or ``None`` if impossible."""
+
+    removed = len(old) - len(new)
+    head = _common_prefix(old, new)
+    if old[head + removed :] == new[head:]:
+        # The usual case: one contiguous run (e.g. the addresses just sent).
+        return list(range(head, head + removed))
+    dropped: list[int] = []
+    j = 0
+    for i, item in enumerate(old):
+        if j < len(new) and item == new[j]:
+            j += 1
+        else:
+            dropped.append(i)
+    return dropped if j == len(new) else None
+
+
+def _diff_list(field: str, old: list[Any], new: list[Any]) -> list[Any] | None:
+    if len(new) >= len(old):
+        if new[: len(old)] == old:
+            return ["extend", field, new[len(old) :]]
+        return None
+    dropped = _dropped_indices(old, new)
+    if dropped is not None and len(dropped) <= len(new):
+        return ["drop", field, dropped]
+    return None
+
+
+def _diff_dict(field: str, old: dict[str, Any], new: dict[str, Any]) -> list[Any] | None:
+    if new.items() <= old.items():
+        # Only keys removed (the source map shrinking with ``pending``).
+        changed: dict[str, Any] = {}
+    else:
+        changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = list(old.keys() - new.keys())
+    if len(removed) + len(changed) > len(new):
+        return None
+    return ["merge", field, changed, removed]
+
+
+def _diff(old: dict[str, Any], new: dict[str, Any]) -> list[list[Any]]:
+    """Operations turning ``old`` into ``new`` (see :func:`_apply`)."""
+
+    ops: list[list[Any]] = [["del", key] for key in old if key not in new]
+    for key, value in new.items():
+        if key in old:
+            current = old[key]
+            if current == value:
+                continue
+            op = None
+            if isinstance(current, list) and isinstance(value, list):
+                op = _diff_list(key, current, value)
+            elif isinstance(current, dict) and isinstance(value, dict):
+                op = _diff_dict(key, current, value)
+            if op is not None:
+                ops.append(op)
+                continue
+        ops.append(["set", key, value])
+    return ops
+
+
+def _apply(state: dict[str, Any], ops: list[list[Any]]) -> None:
+    """Apply delta ``ops`` to ``state``; values are copied, never shared."""
+
+    for op in ops:
+        kind = op[0]
+        if kind == "set":
+            state[op[1]] = _copy_value(op[2])
+        elif kind == "del":
+            state.pop(op[1], None)
+        elif kind == "extend":
+            state.setdefault(op[1], []).extend(op[2])
+        elif kind == "drop":
+            items = state.get(op[1]) or []
+            for index in sorted(op[2], reverse=True):
+                if index < len(items):
+                    del items[index]
+            state[op[1]] = items
+        elif kind == "merge":
+            target = state.setdefault(op[1], {})
+            target.update((k, _copy_value(v)) for k, v in op[2].items())
+            for key in op[3]:
+                target.pop(key, None)
+        else:
+            logger.warning("mass_state: unknown delta %r ignored", kind)
+
+
+# -- store ---------------------------------------------------------------------
+
+
+class _Chat:
+    def __init__(self, state: dict[str, Any], seq: int, log_bytes: int, snapshot_bytes: int):
+        self.state = state
+        self.seq = seq
+        self.log_bytes = log_bytes
+        self.snapshot_bytes = snapshot_bytes
+        self.handle = None
+        self.compacting = False
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def _read_deltas(path: Path) -> list[dict[str, Any]]:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return []
+    deltas = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            deltas.append(json.loads(line))
+        except json.JSONDecodeError:
+            # A torn last line from a crash mid-write.
+            logger.warning("mass_state: skipping unreadable delta in %s", path)
+    return deltas
+
+
+class MassStateStore:
+    """Per-chat snapshots plus append-only delta logs under ``root``."""
+
+    def __init__(
+        self,
+        root: Path | str | None = None,
+        *,
+        compact_min_bytes: int = _COMPACT_MIN_BYTES,
+        background: bool = True,
+    ):
+        self.root = Path(root) if root is not None else default_dir()
+        self.compact_min_bytes = compact_min_bytes
+        self.background = background
+        self._lock = threading.RLock()
+        self._chats: dict[str, _Chat] = {}
+        self._missing: set[str] = set()
+        self._queue: list[str] = []
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self.compactions = 0
+
+    # -- files -----------------------------------------------------------------
+    def _paths(self, key: str) -> tuple[Path, Path, Path]:
+        base = self.root / key
+        return (
+            base.with_name(f"{key}.json"),
+            base.with_name(f"{key}.log"),
+            base.with_name(f"{key}.log.old"),
+        )
+
+    def _load(self, key: str) -> _Chat | None:
+        chat = self._chats.get(key)
+        if chat is not None or key in self._missing:
+            return chat
+        snapshot, log, old_log = self._paths(key)
+        state: dict[str, Any] = {}
+        seq = 0
+        snapshot_bytes = 0
+        found = False
+        try:
+            text = snapshot.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            text = ""
+        if text:
+            found = True
+            snapshot_bytes = len(text)
+            try:
+                data = json.loads(text)
+                state = dict(data.get("state") or {})
+                seq = int(data.get("seq") or 0)
+            except (ValueError, AttributeError):  # pragma: no cover - corrupt state
+                logger.warning("mass_state: unreadable snapshot %s", snapshot)
+        log_bytes = 0
+        for path in (old_log, log):
+            for delta in _read_deltas(path):
+                found = True
+                delta_seq = int(delta.get("seq") or 0)
+                if delta_seq <= seq:
+                    continue
+                _apply(state, delta.get("ops") or [])
+                seq = delta_seq
+            if path.exists():
+                log_bytes += path.stat().st_size
+        if not found:
+            self._missing.add(key)
+            return None
+        chat = _Chat(state, seq, log_bytes, snapshot_bytes)
+        self._chats[key] = chat
+        return chat
+
+    def _append(self, key: str, chat: _Chat, ops: list[list[Any]]) -> None:
+        line = json.dumps({"seq": chat.seq + 1, "ops": ops}, ensure_ascii=False) + "\n"
+        if chat.handle is None:
+            _, log, _ = self._paths(key)
+            ensure_parent(log)
+            chat.handle = log.open("a", encoding="utf-8")
+        chat.handle.write(line)
+        chat.handle.flush()
+        chat.seq += 1
+        chat.log_bytes += len(line)
+
+    def _maybe_compact(self, key: str, chat: _Chat) -> None:
+        if chat.compacting or chat.log_bytes <= max(self.compact_min_bytes, chat.snapshot_bytes):
+            return
+        chat.compacting = True
+        if self.background:
+            self._queue.append(key)
+            self._ensure_thread()
+            self._wakeup.notify()
+        else:
+            self.compact(key)
+
+    # -- public API ------------------------------------------------------------
+    def load(self, chat_id: int | str) -> dict[str, Any] | None:
+        with self._lock:
+            chat = self._load(str(chat_id))
+            return _copy_state(chat.state) if chat is not None else None
+
+    def get(self, chat_id: int | str, field: str, default: Any = None) -> Any:
+        """Return one top-level field without copying the whole state."""
+
+        with self._lock:
+            chat = self._load(str(chat_id))
+            if chat is None:
+                return default
+            return _copy_value(chat.state.get(field, default))
+
+    def resume_info(self, chat_id: int | str) -> dict[str, Any] | None:
+        with self._lock:
+            chat = self._load(str(chat_id))
+            if chat is None:
+                return None
+            state = chat.state
+            return {
+                "batch_id": state.get("batch_id"),
+                "group": state.get("group"),
+                "template": state.get("template"),
+                "pending": len(state.get("pending") or ()),
+                "sent": len(state.get("sent_ok") or ()),
+            }
+
+    def save(self, chat_id: int | str, state: dict[str, Any]) -> None:
+        key = str(chat_id)
+        with self._lock:
+            chat = self._load(key)
+            if chat is None:
+                chat = _Chat({}, 0, 0, 0)
+                self._chats[key] = chat
+                self._missing.discard(key)
+            ops = _diff(chat.state, state)
+            if not ops:
+                return
+            self._append(key, chat, ops)
+            _apply(chat.state, ops)
+            self._maybe_compact(key, chat)
+
+    def update(self, chat_id: int | str, **fields: Any) -> None:
+        """Set top-level ``fields`` leaving the rest of the state untouched."""
+
+        key = str(chat_id)
+        with self._lock:
+            chat = self._load(key)
+            state = dict(chat.state) if chat is not None else {}
+            state.update(fields)
+            self.save(key, state)
+
+    def remove_fields(self, chat_id: int | str, *fields: str) -> None:
+        key = str(chat_id)
+        with self._lock:
+            chat = self._load(key)
+            if chat is None or not any(field in chat.state for field in fields):
+                return
+            state = {k: v for k, v in chat.state.items() if k not in fields}
+            self.save(key, state)
+
+    def clear(self, chat_id: int | str) -> None:
+        key = str(chat_id)
+        with self._lock:
+            chat = self._chats.pop(key, None)
+            if chat is not None:
+                chat.close()
+            self._missing.add(key)
+            for path in self._paths(key):
+                path.unlink(missing_ok=True)
+
+    def chat_ids(self) -> list[str]:
+        with self._lock:
+            keys = set(self._chats)
+            if self.root.is_dir():
+                for path in self.root.iterdir():
+                    name = path.name
+                    for suffix in (".json", ".log.old", ".log"):
+                        if name.endswith(suffix):
+                            keys.add(name[: -len(suffix)])
+                            break
+            return sorted(key for key in keys if self._load(key) is not None)
+
+    # -- compaction ------------------------------------------------------------
+    def compact(self, chat_id: int | str) -> bool:
+        """Fold the delta log of ``chat_id`` into a new snapshot."""
+
+        key = str(chat_id)
+        snapshot, log, old_log = self._paths(key)
+        with self._lock:
+            chat = self._chats.get(key)
+            if chat is None:
+                return False
+            chat.close()
+            if log.exists():
+                if old_log.exists():
+                    # An earlier compaction failed; keep its deltas for replay.
+                    with old_log.open("a", encoding="utf-8") as dst:
+                        dst.write(log.read_text(encoding="utf-8"))
+                    log.unlink()
+                else:
+                    os.replace(log, old_log)
+            chat.log_bytes = 0
+            state = _copy_state(chat.state)
+            seq = chat.seq
+        try:
+            text = json.dumps({"seq": seq, "state": state}, ensure_ascii=False)
+            ensure_parent(snapshot)
+            tmp = snapshot.with_name(f"{snapshot.name}.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            with self._lock:
+                if self._chats.get(key) is not chat:
+                    # Cleared (or reloaded) meanwhile; the snapshot is stale.
+                    tmp.unlink(missing_ok=True)
+                    return False
+                os.replace(tmp, snapshot)
+                old_log.unlink(missing_ok=True)
+                chat.snapshot_bytes = len(text)
+                self.compactions += 1
+        finally:
+            with self._lock:
+                chat.compacting = False
+        return True
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="mass-state-compact", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                key = self._queue.pop(0)
+            try:
+                self.compact(key)
+            except Exception:
+                logger.warning("mass_state: compaction of %s failed", key, exc_info=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            for chat in self._chats.values():
+                chat.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+
+def _migrate_legacy(store: MassStateStore) -> None:
+    if not STATE_PATH.is_file():
+        return
     data = _load_all()
-    return data.get(str(chat_id))
+    for chat_id, state in data.items():
+        if isinstance(state, dict) and store.load(chat_id) is None:
+            store.save(chat_id, state)
+            store.compact(chat_id)
+    try:
+        os.replace(STATE_PATH, STATE_PATH.with_name(f"{STATE_PATH.name}.migrated"))
+    except OSError:
+        logger.warning("mass_state: could not rename migrated %s", STATE_PATH)
+    logger.info("mass_state: migrated %d chat(s) from %s", len(data), STATE_PATH)
+
+
+_STORE: MassStateStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> MassStateStore:
+    """Return the process store, reopened when ``MASS_STATE_DIR`` changes."""
+
+    global _STORE
+    root = default_dir()
+    with _STORE_LOCK:
+        if _STORE is None or _STORE.root != root:
+            if _STORE is not None:
+                _STORE.close()
+            _STORE = MassStateStore(root)
+            try:
+                _migrate_legacy(_STORE)
+            except Exception:
+                logger.warning("mass_state: legacy migration failed", exc_info=True)
+        return _STORE
+
+
+def close() -> None:
+    global _STORE
+    with _STORE_LOCK:
+        store, _STORE = _STORE, None
+    if store is not None:
+        store.close()
+
+
+atexit.register(close)
 
 
-def save_chat_state(chat_id: int, state: Dict[str, Any]) -> None:
+def load_chat_state(chat_id: int) -> dict[str, Any] | None:
+    """Return saved state for ``chat_id`` if present."""
+
+    return get_store().load(chat_id)
+
+
+def save_chat_state(chat_id: int, state: dict[str, Any]) -> None:
     """Persist ``state`` for ``chat_id`` to disk."""
 
-    data = _load_all()
-    data[str(chat_id)] = state
-    _save_all(data)
+    get_store().save(chat_id, state)
 
 
 def clear_chat_state(chat_id: int) -> None:
     """Remove saved state for ``chat_id`` from disk."""
 
-    data = _load_all()
-    if str(chat_id) in data:
-        del data[str(chat_id)]
-        _save_all(data)
+    get_store().clear(chat_id)
 
 
-def get_batch(chat_id: int) -> Optional[str]:
+def resume_info(chat_id: int) -> dict[str, Any] | None:
+    """Batch, group, template and pending/sent counts of the saved session."""
+
+    return get_store().resume_info(chat_id)
+
+
+def get_batch(chat_id: int) -> str | None:
     """Return the current batch identifier for ``chat_id`` if any."""
 
-    state = load_chat_state(chat_id) or {}
-    batch = state.get("batch_id")
+    batch = get_store().get(chat_id, "batch_id")
     return batch if isinstance(batch, str) else None
 
 
 def set_batch(chat_id: int, batch_id: str) -> None:
     """Persist ``batch_id`` for ``chat_id`` without altering other fields."""
 
-    state = load_chat_state(chat_id) or {}
-    state["batch_id"] = batch_id
-    save_chat_state(chat_id, state)
+    get_store().update(chat_id, batch_id=batch_id)
 
 
 def clear_batch(chat_id: int) -> None:
     """Remove only the batch identifier for ``chat_id``."""
 
-    state = load_chat_state(chat_id) or {}
-    if "batch_id" in state:
-        del state["batch_id"]
-        save_chat_state(chat_id, state)
+    get_store().remove_fields(chat_id, "batch_id")
 
 
 # Backwards compatibility helpers -------------------------------------------------
 
-def load_state() -> Optional[Dict[str, Any]]:  # pragma: no cover - legacy
-    return _load_all()
 
+def load_state() -> dict[str, Any] | None:  # pragma: no cover - legacy
+    store = get_store()
+    return {chat_id: store.load(chat_id) for chat_id in store.chat_ids()}
 
-def save_state(state: Dict[str, Any]) -> None:  # pragma: no cover - legacy
-    _save_all(state)  # type: ignore[arg-type]
+
+def save_state(state: dict[str, Any]) -> None:  # pragma: no cover - legacy
+    store = get_store()
+    for chat_id in store.chat_ids():
+        if chat_id not in state:
+            store.clear(chat_id)
+    for chat_id, chat_state in state.items():
+        if isinstance(chat_state, dict):
+            store.save(chat_id, chat_state)
 
 
 def clear_state() -> None:  # pragma: no cover - legacy
-    try:
-        os.remove(STATE_PATH)
-    except FileNotFoundError:
-        pass
+    store = get_store()
+    for chat_id in store.chat_ids():
+        store.clear(chat_id)
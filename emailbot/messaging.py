@@ -17,10 +17,6 @@ import secrets
 import smtplib
 import uuid
 
-try:  # pragma: no cover - optional dependency in lightweight deployments
-    import idna
-except Exception:  # pragma: no cover - used when idna is absent
-    idna = None
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from dataclasses import dataclass
@@ -47,6 +43,7 @@ from threading import RLock
 
 from .extraction import normalize_email, strip_html
 from utils.email_clean import normalize_email_unified, strip_invisibles
+from utils.email_key import get_email_key
 from .cooldown import (
     audit_emails,
     build_cooldown_service,
@@ -75,6 +72,7 @@ from .messaging_utils import (
     is_suppressed,
     suppress_add,
     upsert_sent_log,
+    upsert_sent_log_many,
     load_sent_log,
     load_seen_events,
     save_seen_events,
@@ -87,7 +85,14 @@ from .suppress_list import add_to_blocklist
 from .run_control import register_task
 from .cancel import is_cancelled
 from .net_imap import imap_connect_ssl, get_imap_timeout
+from . import stoplist_index
+from .mail import imap_pool, uid_sync
+from .mail.uid_sync import UidCursor
 from emailbot.storage import storage_audit_add
+from . import daily_quota
+from . import log_archive
+from . import send_journal
+from . import metrics
 
 _TASK_SEQ = count()
 
@@ -182,13 +187,13 @@ def write_audit(
         logger.debug("write_audit failed", exc_info=True)
 
 
-def _normalize_from_header(msg: EmailMessage) -> None:
-    """Force the ``From`` header to use the configured SMTP address."""
+def _normalize_from_header(msg: EmailMessage, address: str | None = None) -> None:
+    """Force the ``From`` header to use ``address`` (the configured SMTP address)."""
 
     existing = msg.get("From", "")
     name, _addr = parseaddr(existing)
     display_name = os.getenv("EMAIL_FROM_NAME", "").strip() or name
-    normalized = formataddr((display_name or "", EMAIL_ADDRESS))
+    normalized = formataddr((display_name or "", address or EMAIL_ADDRESS))
     if "From" in msg:
         msg.replace_header("From", normalized)
     else:
@@ -319,67 +324,55 @@ async def send_bulk(emails: Iterable[str], template_key: str) -> Tuple[int, int,
         template_label = template_key or Path(template_path).stem
 
         smtp_client = RobustSMTP()
-        imap_client = None
-        sent_folder = ""
         sent_count = 0
         extra_cooldown = 0
         errors = 0
 
+        host = os.getenv("IMAP_HOST", "imap.mail.ru")
+        port = _parse_int(os.getenv("IMAP_PORT"), 993)
         try:
-            host = os.getenv("IMAP_HOST", "imap.mail.ru")
-            port = _parse_int(os.getenv("IMAP_PORT"), 993)
-            timeout = get_imap_timeout()
-            imap_client = imap_connect_ssl(host, port, timeout)
-            imap_client.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            sent_folder = get_preferred_sent_folder(imap_client)
-            imap_client.select(f'"{sent_folder}"')
-        except Exception:
-            logger.exception("bulk send: IMAP initialisation failed")
-            try:
-                smtp_client.close()
-            except Exception:
-                pass
-            if imap_client is not None:
-                try:
-                    imap_client.logout()
-                except Exception:
-                    pass
-            return 0, 0, len(ready_list)
-
-        try:
-            for email_addr in ready_list:
-                try:
-                    outcome, _, _, _ = send_email_with_sessions(
-                        smtp_client,
-                        imap_client,
-                        sent_folder,
-                        email_addr,
-                        template_path,
-                        subject=DEFAULT_SUBJECT,
-                        group_title=template_label,
-                        group_key=template_key,
-                    )
-                except Exception:
-                    errors += 1
-                    logger.exception("bulk send: SMTP failure for %s", email_addr)
-                    continue
+            with imap_pool.imap_session(
+                host,
+                port,
+                EMAIL_ADDRESS,
+                EMAIL_PASSWORD,
+                timeout=get_imap_timeout(),
+                connect=imap_connect_ssl,
+            ) as imap_client:
+                sent_folder = get_preferred_sent_folder(imap_client)
+                imap_client.select(f'"{sent_folder}"')
+
+                for email_addr in ready_list:
+                    try:
+                        outcome, _, _, _ = send_email_with_sessions(
+                            smtp_client,
+                            imap_client,
+                            sent_folder,
+                            email_addr,
+                            template_path,
+                            subject=DEFAULT_SUBJECT,
+                            group_title=template_label,
+                            group_key=template_key,
+                        )
+                    except Exception:
+                        errors += 1
+                        logger.exception("bulk send: SMTP failure for %s", email_addr)
+                        continue
 
-                if outcome == SendOutcome.SENT:
-                    sent_count += 1
-                elif outcome == SendOutcome.COOLDOWN:
-                    extra_cooldown += 1
-                elif outcome == SendOutcome.ERROR:
-                    errors += 1
+                    if outcome == SendOutcome.SENT:
+                        sent_count += 1
+                    elif outcome == SendOutcome.COOLDOWN:
+                        extra_cooldown += 1
+                    elif outcome == SendOutcome.ERROR:
+                        errors += 1
+        except Exception:
+            logger.exception("bulk send: IMAP session failed")
+            return sent_count, extra_cooldown, len(ready_list) - sent_count - extra_cooldown
         finally:
             try:
                 smtp_client.close()
             except Exception:
                 pass
-            if imap_client is not None:
-                try:
-                    imap_client.logout()
-                except Exception:
-                    pass
 
         return sent_count, extra_cooldown, errors
 
@@ -581,16 +574,7 @@ def extract_domain(addr: str) -> str:
 
     if not addr:
         return ""
-    parsed = parseaddr(str(addr))[1]
-    if not parsed or "@" not in parsed:
-        return ""
-    domain = parsed.split("@", 1)[1].strip().lower()
-    if not domain:
-        return ""
-    try:
-        return _to_idna(domain).lower()
-    except Exception:
-        return domain
+    return get_email_key(addr).domain
 
 
 def parse_emails_from_text(text: str) -> list[str]:
@@ -668,29 +652,8 @@ def ensure_blocklist_ready() -> None:
         logger.debug("blocklist init failed", exc_info=True)
 
 
-def _to_idna(domain: str) -> str:
-    if not domain or idna is None:
-        return domain
-    try:
-        return idna.encode(domain, uts46=True).decode("ascii")
-    except Exception:
-        return domain
-
-
 def _normalize_email_for_blocklist(addr: str) -> str:
-    normalized = normalize_email_unified(addr)
-    if not normalized:
-        return ""
-
-    local, sep, dom = normalized.partition("@")
-    if not sep:
-        return normalized
-
-    dom_idna = _to_idna(dom)
-    if not dom_idna:
-        return normalized
-
-    return f"{local}@{dom_idna}"
+    return get_email_key(addr).idna
 
 
 def _canonical_blocked(email_str: str) -> str:
@@ -764,7 +727,7 @@ def _is_blocklisted(email: str) -> bool:
         return True
 
     try:
-        return suppress_list.is_blocked(normalized)
+        return stoplist_index.is_blocked(normalized)
     except Exception:
         logger.debug("blocklist lookup failed", exc_info=True)
         return False
@@ -780,57 +743,21 @@ def _extend_stoplist_snapshot(snapshot: set[str], values: Iterable[str]) -> None
             snapshot.add(canon)
 
 
-def _extend_snapshot_from_history(snapshot: set[str], attr: str) -> None:
-    loader = getattr(history_service, attr, None)
-    if not callable(loader):
-        return
-    try:
-        entries = loader()
-    except TypeError:
-        # Some legacy helpers might accept unused positional arguments.
-        try:
-            entries = loader([])
-        except Exception:
-            logger.debug("stoplist snapshot: %s() call failed", attr, exc_info=True)
-            return
-    except Exception:
-        logger.debug("stoplist snapshot: %s() call failed", attr, exc_info=True)
-        return
-
-    try:
-        _extend_stoplist_snapshot(snapshot, entries)
-    except Exception:
-        logger.debug("stoplist snapshot: failed to extend from %s", attr, exc_info=True)
-
-
 def load_stoplist_snapshot() -> set[str]:
-    """Collect a unified set of blocked addresses from all available sources."""
+    """Collect a unified set of blocked addresses from all available sources.
+
+    Served from :mod:`emailbot.stoplist_index`, which re-reads a source only
+    when it changed on disk.
+    """
 
     ensure_blocklist_ready()
 
     snapshot: set[str] = set()
-
     try:
-        suppress_list.refresh_if_changed()
-        blocked = suppress_list.get_blocked_set()
+        snapshot.update(stoplist_index.get_index().snapshot())
     except Exception:
-        logger.debug("stoplist snapshot: failed to load suppress_list", exc_info=True)
-        blocked = set()
-
-    _extend_stoplist_snapshot(snapshot, blocked)
+        logger.debug("stoplist snapshot: index refresh failed", exc_info=True)
     _extend_stoplist_snapshot(snapshot, _extra_blocklist())
-
-    try:
-        rules_blocked = rules.load_blocklist()
-    except Exception:
-        logger.debug("stoplist snapshot: failed to load rules blocklist", exc_info=True)
-        rules_blocked = set()
-
-    _extend_stoplist_snapshot(snapshot, rules_blocked)
-
-    for attr in ("iter_unsubscribed", "iter_hard_bounces"):
-        _extend_snapshot_from_history(snapshot, attr)
-
     return snapshot
 
 
@@ -1026,36 +953,43 @@ def _load_recent_sent(days: int) -> set[str]:
     return recent
 
 
-def _seen_in_local_history(addr: str, days: int) -> bool:
-    if days <= 0:
-        return False
-    path = rules.HISTORY_PATH
-    if not path.exists():
-        return False
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    try:
+def _iter_local_history(path: Path, cutoff: datetime, addr: str) -> Iterable[dict]:
+    if path.exists():
         with path.open("r", encoding="utf-8") as fh:
             for line in fh:
                 try:
                     rec = json.loads(line)
                 except Exception:
                     continue
-                email = str(rec.get("email", "")).strip().lower()
-                if email != addr:
-                    continue
-                raw_ts = rec.get("ts")
-                if not isinstance(raw_ts, str) or not raw_ts.strip():
-                    continue
-                try:
-                    ts = datetime.fromisoformat(raw_ts)
-                except Exception:
-                    continue
-                if ts.tzinfo is None:
-                    ts = ts.replace(tzinfo=timezone.utc)
-                else:
-                    ts = ts.astimezone(timezone.utc)
-                if ts >= cutoff:
-                    return True
+                if isinstance(rec, dict):
+                    yield rec
+    # Rotated records: only segments that reach the cutoff and may hold ``addr``.
+    yield from log_archive.iter_records(path, cutoff, email=addr)
+
+
+def _seen_in_local_history(addr: str, days: int) -> bool:
+    if days <= 0:
+        return False
+    path = rules.HISTORY_PATH
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    try:
+        for rec in _iter_local_history(path, cutoff, addr):
+            email = str(rec.get("email", "")).strip().lower()
+            if email != addr:
+                continue
+            raw_ts = rec.get("ts")
+            if not isinstance(raw_ts, str) or not raw_ts.strip():
+                continue
+            try:
+                ts = datetime.fromisoformat(raw_ts)
+            except Exception:
+                continue
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            else:
+                ts = ts.astimezone(timezone.utc)
+            if ts >= cutoff:
+                return True
     except Exception:
         return False
     return False
@@ -1101,7 +1035,9 @@ def _need_sync_now(now: datetime) -> tuple[bool, Optional[datetime]]:
 
 
 def _mark_synced(now: datetime) -> None:
-    _write_sync_state({"last_sync_iso": now.isoformat()})
+    state = _read_sync_state()
+    state["last_sync_iso"] = now.isoformat()
+    _write_sync_state(state)
 
 
 def _validate_email_basic(email_value: str) -> bool:
@@ -1254,15 +1190,32 @@ def _register_send(recipient: str, batch_id: str | None) -> bool:
 
 
 def get_preferred_sent_folder(imap: imaplib.IMAP4_SSL) -> str:
-    """Return the preferred "Sent" folder, validating it on the server."""
+    """Return the preferred "Sent" folder, validating it on the server.
 
+    Pooled sessions (:class:`imap_pool.ImapSession`) cache the result per
+    account until the stored folder choice changes.
+    """
+
+    stored = ""
     if IMAP_FOLDER_FILE.exists():
-        name = IMAP_FOLDER_FILE.read_text(encoding="utf-8").strip()
-        if name:
-            status, _ = imap.select(f'"{name}"')
-            if status == "OK":
-                return name
-            logger.warning("Stored sent folder %s not selectable, falling back", name)
+        stored = IMAP_FOLDER_FILE.read_text(encoding="utf-8").strip()
+    pooled = isinstance(imap, imap_pool.ImapSession)
+    if pooled:
+        cached = imap.sent_folder
+        if cached and (not stored or stored == cached):
+            return cached
+    name = _resolve_sent_folder(imap, stored)
+    if pooled:
+        imap.sent_folder = name
+    return name
+
+
+def _resolve_sent_folder(imap: imaplib.IMAP4_SSL, stored: str) -> str:
+    if stored:
+        status, _ = imap.select(f'"{stored}"')
+        if status == "OK":
+            return stored
+        logger.warning("Stored sent folder %s not selectable, falling back", stored)
     detected = detect_sent_folder(imap)
     status, _ = imap.select(f'"{detected}"')
     if status == "OK":
@@ -1325,51 +1278,55 @@ def send_raw_smtp_with_retry(raw_message: str, recipient: str, max_tries=3):
         raise last_exc
 
 
+def _append_to_sent(imap, raw_message: EmailMessage | str | bytes, folder: Optional[str]) -> None:
+    if folder is None:
+        folder = get_preferred_sent_folder(imap)
+    status = "OK"
+    if hasattr(imap, "select"):
+        status, _ = imap.select(folder)
+        if status != "OK":
+            logger.warning("select %s failed (%s), using Sent", folder, status)
+            folder = "Sent"
+            imap.select(folder)
+
+    if isinstance(raw_message, EmailMessage):
+        msg_bytes = raw_message.as_bytes()
+    elif isinstance(raw_message, bytes):
+        msg_bytes = raw_message
+    else:
+        msg_bytes = raw_message.encode("utf-8")
+
+    res = imap.append(
+        folder,
+        "(\\Seen)",
+        imaplib.Time2Internaldate(time.time()),
+        msg_bytes,
+    )
+    logger.info("imap.append to %s: %s", folder, res)
+
+
+@metrics.IMAP_APPEND_SECONDS.time()
 def save_to_sent_folder(
     raw_message: EmailMessage | str | bytes,
     imap: Optional[imaplib.IMAP4_SSL] = None,
     folder: Optional[str] = None,
 ):
     try:
-        close = False
-        if imap is None:
-            host = os.getenv("IMAP_HOST", "imap.mail.ru")
-            port = int(os.getenv("IMAP_PORT", "993"))
-            imap = imaplib.IMAP4_SSL(host, port)
-            imap.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            close = True
-        if folder is None:
-            folder = get_preferred_sent_folder(imap)
-        status = "OK"
-        if hasattr(imap, "select"):
-            status, _ = imap.select(folder)
-            if status != "OK":
-                logger.warning("select %s failed (%s), using Sent", folder, status)
-                folder = "Sent"
-                imap.select(folder)
-
-        if isinstance(raw_message, EmailMessage):
-            msg_bytes = raw_message.as_bytes()
-        elif isinstance(raw_message, bytes):
-            msg_bytes = raw_message
-        else:
-            msg_bytes = raw_message.encode("utf-8")
-
-        res = imap.append(
-            folder,
-            "(\\Seen)",
-            imaplib.Time2Internaldate(time.time()),
-            msg_bytes,
-        )
-        logger.info("imap.append to %s: %s", folder, res)
+        if imap is not None:
+            _append_to_sent(imap, raw_message, folder)
+            return
+        with imap_pool.imap_session(
+            os.getenv("IMAP_HOST", "imap.mail.ru"),
+            _parse_int(os.getenv("IMAP_PORT"), 993),
+            EMAIL_ADDRESS,
+            EMAIL_PASSWORD,
+            timeout=get_imap_timeout(),
+            connect=imap_connect_ssl,
+        ) as session:
+            _append_to_sent(session, raw_message, folder)
     except Exception as e:
+        metrics.IMAP_APPEND_ERRORS.inc()
         log_error(f"save_to_sent_folder: {e}")
-    finally:
-        if close and imap is not None:
-            try:
-                imap.logout()
-            except Exception as e:
-                log_error(f"save_to_sent_folder logout: {e}")
 
 
 def build_message(
@@ -1448,6 +1405,7 @@ def send_email(
     try:
         campaign = Path(html_path).stem
         now = datetime.now(timezone.utc)
+        send_journal.flush_if_pending(canonical_for_history(recipient))
         decision, reason = decide(recipient, campaign, now)
         if decision is Decision.SKIP_COOLDOWN and override_180d:
             decision = Decision.SEND_NOW
@@ -1481,22 +1439,14 @@ def send_email(
         raw = msg.as_string()
         send_raw_smtp_with_retry(raw, transport_recipient, max_tries=3)
         save_to_sent_folder(raw)
-        try:
-            ledger.record_send(
-                recipient,
-                campaign,
-                datetime.now(timezone.utc),
-                message_id=msg.get("Message-ID"),
-                run_id=batch_id,
-            )
-        except Exception:
-            logger.debug("ledger record_send failed", exc_info=True)
-        log_sent_email(
+        _journal_sent(
             recipient,
             campaign,
-            status="ok",
+            campaign,
+            message_id=msg.get("Message-ID"),
+            run_id=batch_id,
             filename=html_path,
-            unsubscribe_token=token,
+            token=token,
             subject=subject_norm,
             content_hash=content_hash,
         )
@@ -1548,6 +1498,7 @@ def create_task_with_logging(
     return task
 
 
+@metrics.SEND_EMAIL_SECONDS.time()
 def send_email_with_sessions(
     client: SmtpClient,
     imap: imaplib.IMAP4_SSL,
@@ -1569,6 +1520,8 @@ def send_email_with_sessions(
     # 0) Проверка кулдауна (если не запросили явный override)
     campaign = group_key or group_title or Path(html_path).stem
     now = datetime.now(timezone.utc)
+    # Кулдаун и проверка дублей читают записи, которые могут ещё быть в журнале.
+    send_journal.flush_if_pending(canonical_for_history(recipient))
     decision, reason = decide(recipient, campaign, now)
     if decision is Decision.SKIP_COOLDOWN and override_180d:
         decision = Decision.SEND_NOW
@@ -1608,7 +1561,11 @@ def send_email_with_sessions(
             msg.replace_header("From", fixed_from)
         except KeyError:
             msg["From"] = fixed_from
-    _normalize_from_header(msg)
+    # Отправляем от имени ящика, через который идёт письмо (пул аккаунтов).
+    sender = getattr(client, "username", None)
+    if not isinstance(sender, str) or "@" not in sender:
+        sender = EMAIL_ADDRESS
+    _normalize_from_header(msg, sender)
 
     # 2) Отправка
     try:
@@ -1626,7 +1583,7 @@ def send_email_with_sessions(
         try:
             client.send(msg)
         except TypeError:
-            client.send(EMAIL_ADDRESS, recipient, raw)
+            client.send(sender, recipient, raw)
         if append_message:
             save_to_sent_folder(raw_bytes, imap=imap, folder=sent_folder)
     except Exception as exc:
@@ -1683,31 +1640,21 @@ def send_email_with_sessions(
         _storage_audit(recipient, SendOutcome.ERROR.value, override=override_180d)
         return SendOutcome.ERROR, "", None, None
 
-    # 3) Зафиксировать отправку для кулдауна
-    try:
-        ledger.record_send(
-            recipient,
-            campaign,
-            datetime.now(timezone.utc),
-            message_id=msg.get("Message-ID"),
-            run_id=batch_id,
-        )
-    except Exception:
-        logger.debug("ledger record_send failed", exc_info=True)
-
+    # 3) Зафиксировать отправку для кулдауна, sent_log и аудита (group commit)
     log_source = group_key or group_title or Path(html_path).stem or "session"
-    log_key = log_sent_email(
+    log_key = _journal_sent(
         recipient,
+        campaign,
         log_source,
-        status="ok",
+        message_id=msg.get("Message-ID"),
+        run_id=batch_id,
         filename=html_path,
-        unsubscribe_token=token,
+        token=token,
         subject=subject_norm,
         content_hash=content_hash,
+        override=override_180d,
     )
 
-    _storage_audit(recipient, SendOutcome.SENT.value, override=override_180d)
-
     if return_raw:
         return SendOutcome.SENT, token, log_key, content_hash, raw_bytes
     return SendOutcome.SENT, token, log_key, content_hash
@@ -2020,6 +1967,21 @@ def log_sent_email(
         extra["content_hash"] = content_hash
     normalized = normalize_email(email_addr)
     used_key = key or str(uuid.uuid4())
+    if send_journal.has_pending(used_key):
+        # The send itself is still queued; keep the row updates in order.
+        send_journal.submit(
+            "sent_log",
+            {
+                "email": normalized,
+                "ts": ts_local.isoformat(),
+                "group": group,
+                "status": status,
+                "extra": extra,
+                "key": used_key,
+            },
+            keys=(used_key, canonical_for_history(email_addr)),
+        )
+        return used_key
     _, _ = upsert_sent_log(
         LOG_FILE,
         normalized,
@@ -2034,6 +1996,113 @@ def log_sent_email(
     return used_key
 
 
+def _apply_sent_log_records(records: list[dict]) -> None:
+    upsert_sent_log_many(
+        LOG_FILE,
+        [
+            (
+                rec["email"],
+                datetime.fromisoformat(rec["ts"]),
+                rec["group"],
+                rec["status"],
+                rec["key"],
+            )
+            for rec in records
+        ],
+        extras=[rec.get("extra") for rec in records],
+    )
+    global _log_cache
+    _log_cache = None
+
+
+def _apply_ledger_records(records: list[dict]) -> None:
+    try:
+        ledger.record_send_many(
+            (
+                rec["email"],
+                rec["campaign"],
+                datetime.fromisoformat(rec["sent_at"]),
+                rec.get("message_id"),
+                rec.get("run_id"),
+            )
+            for rec in records
+        )
+    except Exception:
+        logger.debug("ledger record_send_many failed", exc_info=True)
+
+
+def _apply_storage_audit_records(records: list[dict]) -> None:
+    for rec in records:
+        _storage_audit(rec["email"], rec["status"], override=rec.get("override", False))
+
+
+send_journal.register_applier("ledger", _apply_ledger_records)
+send_journal.register_applier("sent_log", _apply_sent_log_records)
+send_journal.register_applier("storage_audit", _apply_storage_audit_records)
+
+
+def _journal_sent(
+    recipient: str,
+    campaign: str,
+    log_source: str,
+    *,
+    message_id: str | None,
+    run_id: str | None,
+    filename: str,
+    token: str,
+    subject: str,
+    content_hash: str | None,
+    override: bool | None = None,
+) -> str:
+    """Queue the bookkeeping of a successful send; return its sent_log key.
+
+    The cooldown ledger, ``sent_log.csv`` and the storage audit are written by
+    the send journal in group commits (see :mod:`emailbot.send_journal`).
+    """
+
+    recipient_key = canonical_for_history(recipient) or (recipient or "").strip().lower()
+    now = datetime.now(timezone.utc)
+    send_journal.submit(
+        "ledger",
+        {
+            "email": recipient,
+            "campaign": campaign,
+            "sent_at": now.isoformat(),
+            "message_id": message_id,
+            "run_id": run_id,
+        },
+        keys=(recipient_key,),
+    )
+    log_key = str(uuid.uuid4())
+    send_journal.submit(
+        "sent_log",
+        {
+            "email": normalize_email(recipient),
+            "ts": now.astimezone(ZoneInfo(REPORT_TZ)).isoformat(),
+            "group": log_source,
+            "status": "ok",
+            "extra": {
+                "user_id": "",
+                "filename": filename or "",
+                "error_msg": "",
+                "unsubscribe_token": token,
+                "unsubscribed": "",
+                "unsubscribed_at": "",
+                "subject": subject,
+                "content_hash": content_hash or "",
+            },
+            "key": log_key,
+        },
+        keys=(recipient_key, log_key),
+    )
+    if override is not None:
+        send_journal.submit(
+            "storage_audit",
+            {"email": recipient, "status": SendOutcome.SENT.value, "override": override},
+        )
+    return log_key
+
+
 def _parse_list_line(line: bytes):
     s = line.decode(errors="ignore")
     m = re.match(r'^\((?P<flags>[^)]*)\)\s+"(?P<delim>[^"]*)"\s+"?(?P<name>.+?)"?$', s)
@@ -2145,42 +2214,25 @@ def clear_recent_sent_cache():
 
 
 def get_sent_today() -> Set[str]:
-    if not os.path.exists(LOG_FILE):
-        return set()
-    tz = ZoneInfo(REPORT_TZ)
-    now_local = datetime.now(tz)
-    day_start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-    day_end = day_start + timedelta(days=1)
-    sent: Set[str] = set()
-    with open(LOG_FILE, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            status = (row.get("status") or "ok").strip().lower()
-            if status not in {"ok", "sent", "success"}:
-                continue
-            ts_raw = (row.get("last_sent_at") or "").strip()
-            if not ts_raw:
-                continue
-            try:
-                dt = datetime.fromisoformat(ts_raw)
-            except Exception:
-                continue
-            if dt.tzinfo is None:
-                dt_local = dt.replace(tzinfo=tz)
-            else:
-                dt_local = dt.astimezone(tz)
-            if not (day_start <= dt_local < day_end):
-                continue
-            key = (row.get("key") or "").strip()
-            if not key:
-                key = canonical_for_history(row.get("email", ""))
-            if key:
-                sent.add(key)
-    return sent
+    return daily_quota.sent_today(LOG_FILE, tz=REPORT_TZ)
 
 
 def count_sent_today() -> int:
-    return len(get_sent_today())
+    return daily_quota.count_today(LOG_FILE, tz=REPORT_TZ)
+
+
+def remaining_quota(limit: int | None = None) -> int:
+    """Recipients that may still be sent to today under the daily limit."""
+
+    if limit is None:
+        limit = MAX_EMAILS_PER_DAY
+    return daily_quota.remaining_quota(LOG_FILE, limit, tz=REPORT_TZ)
+
+
+def sent_today_many(emails: Iterable[str]) -> Set[str]:
+    """Subset of ``emails`` already sent to successfully today."""
+
+    return daily_quota.sent_today_many(LOG_FILE, emails, tz=REPORT_TZ)
 
 
 def prepare_mass_mailing(
@@ -2200,6 +2252,8 @@ def prepare_mass_mailing(
     _reset_history_shim_warning()
 
     try:
+        # Журнал отправок мог ещё не записать последние отправки.
+        send_journal.flush()
         batch = sanitize_batch(emails)
         cleaned = batch.emails
         dup_skipped = batch.duplicates
@@ -2212,29 +2266,28 @@ def prepare_mass_mailing(
         skipped_recent: list[str] = []
 
         invalid_basic = [addr for addr in cleaned if not _validate_email_basic(addr)]
-        candidates = [addr for addr in cleaned if addr not in invalid_basic]
+        invalid_set = set(invalid_basic)
+        candidates = [addr for addr in cleaned if addr not in invalid_set]
 
-        stoplist_snapshot: set[str] = set()
+        ensure_blocklist_ready()
+        extra_blocked = _extra_blocklist()
         try:
-            stoplist_snapshot = load_stoplist_snapshot()
+            # One signature check for the whole batch, then set lookups
+            # covering the block list, rules, suppression CSV and history.
+            _, index_blocked = stoplist_index.filter_blocked(candidates)
+            stoplist_size = len(stoplist_index.get_index().snapshot() | extra_blocked)
         except Exception as exc:
             logger.warning("blocked list load failed: %s", exc)
+            index_blocked = []
+            stoplist_size = len(extra_blocked)
+        index_blocked_set = set(index_blocked)
 
         queue_after_block: list[str] = []
         for addr in candidates:
             norm = norm_map.get(addr) or normalize_email_unified(addr)
-            if stoplist_snapshot and norm in stoplist_snapshot:
-                blocked_invalid.append(addr)
-                continue
-            if rules.is_blocked(norm):
+            if addr in index_blocked_set or norm in extra_blocked:
                 blocked_invalid.append(addr)
                 continue
-            try:
-                if is_suppressed(addr):
-                    blocked_invalid.append(addr)
-                    continue
-            except Exception as exc:
-                logger.warning("suppression check failed for %s: %s", addr, exc)
             queue_after_block.append(addr)
 
         queue_after_foreign: list[str] = []
@@ -2281,6 +2334,15 @@ def prepare_mass_mailing(
         cooldown_under = (
             set(cooldown_result.get("under", set())) if cooldown_result else set()
         )
+        sent_within: set[str] | None = None
+        if lookback_days > 0:
+            try:
+                # Один запрос к истории на всю очередь вместо запроса на адрес.
+                sent_within = set(
+                    history_service.filter_by_days(queue_after_foreign, "", lookback_days)[1]
+                )
+            except Exception as exc:
+                logger.warning("bulk history check failed: %s", exc)
 
         ready: list[str] = []
         for addr in queue_after_foreign:
@@ -2293,7 +2355,11 @@ def prepare_mass_mailing(
             if not blocked_recent:
                 try:
                     # Единый источник: локальный лог/аудит (normalize + content-hash).
-                    if lookback_days > 0 and was_sent_within(addr, days=lookback_days):
+                    if lookback_days > 0 and (
+                        addr in sent_within
+                        if sent_within is not None
+                        else was_sent_within(addr, days=lookback_days)
+                    ):
                         skipped_recent.append(addr)
                         blocked_recent = True
                 except Exception as exc:
@@ -2347,7 +2413,7 @@ def prepare_mass_mailing(
             "removed_foreign": len(blocked_foreign),
             "removed_today": 0,
             "global_excluded": 0,
-            "stoplist_snapshot_size": len(stoplist_snapshot),
+            "stoplist_snapshot_size": stoplist_size,
             # Больше не возвращаем ru_count/global_count и производные,
             # чтобы репорт их не печатал.
         }
@@ -2361,115 +2427,162 @@ def prepare_mass_mailing(
         }
 
 
+def _sent_uid_cursor(folder: str) -> UidCursor:
+    state = _read_sync_state()
+    cursors = state.get("sent_uid") if isinstance(state, dict) else None
+    if not isinstance(cursors, dict):
+        return UidCursor()
+    return UidCursor.from_dict(cursors.get(folder))
+
+
+def _store_sent_uid_cursor(folder: str, cursor: UidCursor) -> None:
+    state = _read_sync_state()
+    cursors = state.get("sent_uid")
+    if not isinstance(cursors, dict):
+        cursors = {}
+    cursors[folder] = cursor.to_dict()
+    state["sent_uid"] = cursors
+    _write_sync_state(state)
+
+
 def sync_log_with_imap(
     since_dt: Optional[datetime] = None,
     *,
     chat_id: Optional[int] = None,
 ) -> Dict[str, int]:
-    imap = None
+    """Import sends found in the IMAP "Sent" folder into the local logs.
+
+    Only UIDs above the cursor stored in :data:`SYNC_STATE_PATH` are fetched
+    (header fields only, in batches of :data:`uid_sync.DEFAULT_BATCH_SIZE`);
+    when ``UIDVALIDITY`` changes the window falls back to the lookback period.
+    Discovered sends are written with one ``sent_log.csv`` rewrite and one
+    history transaction per batch.
+    """
+
     stats = {
         "new_contacts": 0,
         "updated_contacts": 0,
         "skipped_events": 0,
         "total_rows_after": 0,
         "cancelled": False,
+        "history_failed": False,
     }
     ensure_sent_log_schema(LOG_FILE)
-    try:
-        host = os.getenv("IMAP_HOST", "imap.mail.ru")
-        port = _parse_int(os.getenv("IMAP_PORT"), 993)
-        timeout = get_imap_timeout()
-        imap = imap_connect_ssl(host, port, timeout)
-        imap.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        sent_folder = get_preferred_sent_folder(imap)
-        status, _ = imap.select(f'"{sent_folder}"')
-        if status != "OK":
-            logger.warning("select %s failed (%s), using Sent", sent_folder, status)
-            sent_folder = "Sent"
-            imap.select(f'"{sent_folder}"')
-        now = datetime.utcnow()
-        cutoff = now - timedelta(days=max(EMAIL_LOOKBACK_DAYS, 0))
-        if since_dt:
-            if since_dt.tzinfo:
-                since_dt = since_dt.replace(tzinfo=None)
-            if since_dt > cutoff:
-                cutoff = since_dt
-        date_cutoff = cutoff.strftime("%d-%b-%Y")
-        result, data = imap.search(None, f"SINCE {date_cutoff}")
-        seen_events = load_seen_events(SYNC_SEEN_EVENTS_PATH)
-        changed_events = False
-        message_ids = data[0].split() if data and data[0] else []
-        cancelled = False
-        for num in message_ids:
-            if chat_id is not None and is_cancelled(chat_id):
-                cancelled = True
-                break
-            _, msg_data = imap.fetch(num, "(RFC822)")
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-            msgid = msg.get("Message-ID", "").strip()
-            addresses = []
-            for hdr in ["To", "Cc", "Bcc"]:
-                addresses.extend(email.utils.getaddresses([msg.get(hdr) or ""]))
-            for _, addr in addresses:
-                if not addr:
-                    continue
-                key = canonical_for_history(addr)
-                if msgid and (msgid, key) in seen_events:
-                    stats["skipped_events"] += 1
-                    continue
-                try:
-                    dt = email.utils.parsedate_to_datetime(msg.get("Date"))
-                    if dt and dt.tzinfo:
-                        dt = dt.replace(tzinfo=None)
-                    if dt and dt < cutoff:
+    with imap_pool.imap_session(
+        os.getenv("IMAP_HOST", "imap.mail.ru"),
+        _parse_int(os.getenv("IMAP_PORT"), 993),
+        EMAIL_ADDRESS,
+        EMAIL_PASSWORD,
+        timeout=get_imap_timeout(),
+        connect=imap_connect_ssl,
+    ) as imap:
+        try:
+            sent_folder = get_preferred_sent_folder(imap)
+            ok, uidvalidity = uid_sync.select_mailbox(imap, f'"{sent_folder}"')
+            if not ok:
+                logger.warning("select %s failed, using Sent", sent_folder)
+                sent_folder = "Sent"
+                _, uidvalidity = uid_sync.select_mailbox(imap, f'"{sent_folder}"')
+            now = datetime.utcnow()
+            cutoff = now - timedelta(days=max(EMAIL_LOOKBACK_DAYS, 0))
+            if since_dt:
+                if since_dt.tzinfo:
+                    since_dt = since_dt.replace(tzinfo=None)
+                if since_dt > cutoff:
+                    cutoff = since_dt
+            cursor = _sent_uid_cursor(sent_folder)
+            seen_events = load_seen_events(SYNC_SEEN_EVENTS_PATH)
+            changed_events = False
+            cancelled = False
+            for headers, batch_last_uid in uid_sync.iter_new_headers(
+                imap, cursor, uidvalidity, since=cutoff
+            ):
+                if chat_id is not None and is_cancelled(chat_id):
+                    cancelled = True
+                    break
+                log_entries: list[tuple[str, datetime, str, str, str]] = []
+                history_entries: list[tuple[str, str, str | None, datetime | None]] = []
+                batch_events: set[tuple[str, str]] = set()
+                for uid, msg in headers:
+                    msgid = (msg.get("Message-ID") or "").strip()
+                    try:
+                        dt = email.utils.parsedate_to_datetime(msg.get("Date"))
+                        if dt and dt.tzinfo is None:
+                            dt = dt.replace(tzinfo=timezone.utc)
+                    except Exception:
+                        dt = None
+                    # ``cutoff`` is naive UTC; keep ``dt`` aware for the logs.
+                    if dt and dt.astimezone(timezone.utc).replace(tzinfo=None) < cutoff:
                         continue
-                except Exception:
-                    dt = None
-                unique_marker = msgid or f"uid:{num.decode() if isinstance(num, bytes) else num}"
-                event_key = f"imap:{unique_marker}:{key}"
-                inserted, updated = upsert_sent_log(
-                    LOG_FILE,
-                    normalize_email(addr),
-                    dt or datetime.utcnow(),
-                    "imap_sync",
-                    status="external",
-                    key=event_key,
-                )
-                if inserted:
-                    stats["new_contacts"] += 1
-                elif updated:
-                    stats["updated_contacts"] += 1
-                if msgid:
-                    seen_events.add((msgid, key))
+                    addresses = []
+                    for hdr in ["To", "Cc", "Bcc"]:
+                        addresses.extend(email.utils.getaddresses(msg.get_all(hdr) or []))
+                    for _, addr in addresses:
+                        if not addr:
+                            continue
+                        key = canonical_for_history(addr)
+                        if msgid and ((msgid, key) in seen_events or (msgid, key) in batch_events):
+                            stats["skipped_events"] += 1
+                            continue
+                        unique_marker = msgid or f"uid:{uid}"
+                        log_entries.append(
+                            (
+                                normalize_email(addr),
+                                dt or datetime.now(timezone.utc),
+                                "imap_sync",
+                                "external",
+                                f"imap:{unique_marker}:{key}",
+                            )
+                        )
+                        if dt is not None:
+                            # Undated messages must not open a fresh cooldown window.
+                            history_entries.append((addr, "imap_sync", msgid or None, dt))
+                        if msgid:
+                            batch_events.add((msgid, key))
+                results = upsert_sent_log_many(LOG_FILE, log_entries)
+                for inserted, updated in results:
+                    if inserted:
+                        stats["new_contacts"] += 1
+                    elif updated:
+                        stats["updated_contacts"] += 1
+                if history_entries:
+                    try:
+                        history_service.mark_sent_many(
+                            history_entries, smtp_result="external"
+                        )
+                    except Exception as exc:
+                        # Keep the cursor before this batch so it is retried next run.
+                        log_error(f"sync_log_with_imap history: {exc}")
+                        stats["history_failed"] = True
+                        break
+                if batch_events:
+                    seen_events.update(batch_events)
                     changed_events = True
-        if cancelled:
-            stats["cancelled"] = True
+                cursor = UidCursor(uidvalidity=uidvalidity, last_uid=batch_last_uid)
+            if changed_events:
+                save_seen_events(SYNC_SEEN_EVENTS_PATH, seen_events)
+            if uidvalidity is not None and cursor.last_uid > 0:
+                _store_sent_uid_cursor(sent_folder, cursor)
+            if cancelled:
+                stats["cancelled"] = True
+                return stats
+            stats["total_rows_after"] = len(load_sent_log(Path(LOG_FILE)))
+            added_count = int(stats.get("new_contacts", 0)) + int(
+                stats.get("updated_contacts", 0)
+            )
+            logger.info(
+                "imap_sent_sync",
+                extra={
+                    "folder": sent_folder,
+                    "added": added_count,
+                    "lookback_days": EMAIL_LOOKBACK_DAYS,
+                    "last_uid": cursor.last_uid,
+                },
+            )
             return stats
-        if changed_events:
-            save_seen_events(SYNC_SEEN_EVENTS_PATH, seen_events)
-        stats["total_rows_after"] = len(load_sent_log(Path(LOG_FILE)))
-        added_count = int(stats.get("new_contacts", 0)) + int(
-            stats.get("updated_contacts", 0)
-        )
-        logger.info(
-            "imap_sent_sync",
-            extra={
-                "folder": sent_folder,
-                "added": added_count,
-                "lookback_days": EMAIL_LOOKBACK_DAYS,
-            },
-        )
-        return stats
-    except Exception as e:
-        log_error(f"sync_log_with_imap: {e}")
-        raise
-    finally:
-        if imap is not None:
-            try:
-                imap.logout()
-            except Exception as e:
-                log_error(f"sync_log_with_imap logout: {e}")
+        except Exception as e:
+            log_error(f"sync_log_with_imap: {e}")
+            raise
 
 
 def maybe_sync_before_send(
@@ -2562,6 +2675,8 @@ __all__ = [
     "clear_recent_sent_cache",
     "get_sent_today",
     "count_sent_today",
+    "remaining_quota",
+    "sent_today_many",
     "parse_emails_from_text",
     "prepare_mass_mailing",
     "sync_log_with_imap",
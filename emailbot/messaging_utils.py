@@ -26,7 +26,9 @@ from .history_key import normalize_history_key
 from .tld_registry import tld_of
 
 from utils.tld_utils import allowed_tlds
+from emailbot import daily_quota
 from emailbot import edit_service
+from emailbot import log_archive
 from .suppress_list import is_blocked
 from .settings import REPORT_TZ
 from utils.email_norm import sanitize_for_send
@@ -615,6 +617,9 @@ def ensure_sent_log_schema(path: str) -> List[str]:
         for field in all_fields:
             new_row.setdefault(field, "")
         migrated.append(new_row)
+    if all_fields == headers and migrated == rows:
+        # Already migrated; leave the file (and its signature) untouched.
+        return all_fields
 
     bak = p.with_suffix(p.suffix + ".bak")
     if not bak.exists():
@@ -641,48 +646,42 @@ def _atomic_write(
     os.replace(tmp, path)
 
 
-def load_sent_log(path: Path) -> Dict[str, datetime]:
-    data: Dict[str, datetime] = {}
-    if not path.exists():
-        return data
+def _iter_sent_log_rows(path: Path, since: datetime | None) -> Iterable[Dict[str, str]]:
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    yield from log_archive.iter_records(path, since)
 
-    tz = ZoneInfo(REPORT_TZ)
-    with path.open(encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            email = (row.get("email") or "").strip()
-            if not email:
-                continue
-            ts_raw = (row.get("last_sent_at") or "").strip()
-            if not ts_raw:
-                continue
-            try:
-                dt = datetime.fromisoformat(ts_raw)
-            except Exception:
-                continue
-            if dt.tzinfo is None:
-                dt_local = dt.replace(tzinfo=tz)
-            else:
-                dt_local = dt.astimezone(tz)
-            dt_utc = dt_local.astimezone(timezone.utc)
-            key = canonical_for_history(email)
-            current = data.get(key)
-            if current is None or current < dt_utc:
-                data[key] = dt_utc
-    return data
 
+def load_sent_log(path: Path, since: datetime | None = None) -> Dict[str, datetime]:
+    """Latest send time (UTC) per history key from ``path`` and its archive.
 
-def _iter_sent_rows() -> Iterable[Dict[str, str]]:
-    path = Path(SENT_LOG_PATH)
-    if not path.exists():
-        return []
-    try:
-        with path.open("r", newline="", encoding="utf-8") as f:
-            yield from csv.DictReader(f)
-    except FileNotFoundError:
-        return []
-    except Exception:
-        logger.debug("failed to read sent log rows", exc_info=True)
-        return []
+    With ``since`` only archived segments reaching that far back are read.
+    """
+
+    data: Dict[str, datetime] = {}
+    tz = ZoneInfo(REPORT_TZ)
+    for row in _iter_sent_log_rows(path, since):
+        email = (row.get("email") or "").strip()
+        if not email:
+            continue
+        ts_raw = (row.get("last_sent_at") or "").strip()
+        if not ts_raw:
+            continue
+        try:
+            dt = datetime.fromisoformat(ts_raw)
+        except Exception:
+            continue
+        if dt.tzinfo is None:
+            dt_local = dt.replace(tzinfo=tz)
+        else:
+            dt_local = dt.astimezone(tz)
+        dt_utc = dt_local.astimezone(timezone.utc)
+        key = canonical_for_history(email)
+        current = data.get(key)
+        if current is None or current < dt_utc:
+            data[key] = dt_utc
+    return data
 
 
 def _content_hash_from_parts(key: str, subject: str, body: str) -> str:
@@ -690,83 +689,100 @@ def _content_hash_from_parts(key: str, subject: str, body: str) -> str:
     return hashlib.sha1(payload).hexdigest()
 
 
-def upsert_sent_log(
-    path: str | Path,
+def _row_key(row: Dict[str, str]) -> str:
+    row_key = (row.get("key") or "").strip()
+    if not row_key:
+        row_key = canonical_for_history(row.get("email", ""))
+    return row_key
+
+
+def _merge_sent_row(
+    rows: List[Dict[str, str]],
+    index: Dict[str, Dict[str, str]],
+    fieldnames: List[str],
     email: str,
     ts: datetime,
     source: str,
-    status: str = "synced",
-    extra: Dict[str, str] | None = None,
-    *,
-    key: str | None = None,
+    status: str,
+    extra: Dict[str, str] | None,
+    event_key: str,
 ) -> Tuple[bool, bool]:
-    """Insert or update ``sent_log`` row using ``key`` for deduplication."""
+    """Merge a single event into ``rows`` using the ``index`` by key."""
 
-    p = Path(path)
-    ensure_parent(p)
-    fieldnames = ensure_sent_log_schema(str(p))
-    event_key = (key or "").strip() or canonical_for_history(email)
     tz = ZoneInfo(REPORT_TZ)
     ts_local = _ensure_report_tz(ts)
     ts_utc = ts_local.astimezone(timezone.utc)
-    inserted = False
-    updated = False
+    row = index.get(event_key)
+    if row is not None:
+        existing_ts_raw = (row.get("last_sent_at") or "").strip()
+        ts_to_store = ts_local
+        if existing_ts_raw:
+            try:
+                existing_dt = datetime.fromisoformat(existing_ts_raw)
+                if existing_dt.tzinfo is None:
+                    existing_local = existing_dt.replace(tzinfo=tz)
+                else:
+                    existing_local = existing_dt.astimezone(tz)
+                existing_utc = existing_local.astimezone(timezone.utc)
+                if existing_utc > ts_utc:
+                    ts_to_store = existing_local
+            except Exception:
+                pass
+        row.update(
+            {
+                "key": event_key,
+                "email": email.strip(),
+                "last_sent_at": ts_to_store.isoformat(),
+                "source": source,
+                "status": status,
+            }
+        )
+        target = row
+    else:
+        target = {
+            "key": event_key,
+            "email": email.strip(),
+            "last_sent_at": ts_local.isoformat(),
+            "source": source,
+            "status": status,
+        }
+        rows.append(target)
+        index[event_key] = target
+    if extra:
+        for k_extra, v_extra in extra.items():
+            target[k_extra] = str(v_extra)
+            if k_extra not in fieldnames:
+                fieldnames.append(k_extra)
+    return row is None, row is not None
+
+
+def _rewrite_sent_log(
+    p: Path,
+    entries: Iterable[Tuple[str, datetime, str, str, Dict[str, str] | None, str | None]],
+) -> List[Tuple[bool, bool]]:
+    ensure_parent(p)
+    fieldnames = ensure_sent_log_schema(str(p))
+    results: List[Tuple[bool, bool]] = []
     with FileLock(p):
+        before = daily_quota.signature(p)
         rows: List[Dict[str, str]] = []
         if p.exists():
             with p.open("r", newline="", encoding="utf-8") as f:
                 rows = list(csv.DictReader(f))
+        index: Dict[str, Dict[str, str]] = {}
         for row in rows:
-            row_key = (row.get("key") or "").strip()
-            if not row_key:
-                row_key = canonical_for_history(row.get("email", ""))
-            if row_key != event_key:
-                continue
-            existing_ts_raw = (row.get("last_sent_at") or "").strip()
-            ts_to_store = ts_local
-            if existing_ts_raw:
-                try:
-                    existing_dt = datetime.fromisoformat(existing_ts_raw)
-                    if existing_dt.tzinfo is None:
-                        existing_local = existing_dt.replace(tzinfo=tz)
-                    else:
-                        existing_local = existing_dt.astimezone(tz)
-                    existing_utc = existing_local.astimezone(timezone.utc)
-                    if existing_utc > ts_utc:
-                        ts_to_store = existing_local
-                except Exception:
-                    pass
-            row.update(
-                {
-                    "key": event_key,
-                    "email": email.strip(),
-                    "last_sent_at": ts_to_store.isoformat(),
-                    "source": source,
-                    "status": status,
-                }
+            index.setdefault(_row_key(row), row)
+        touched: Dict[str, Dict[str, str]] = {}
+        for email, ts, source, status, extra, key in entries:
+            event_key = (key or "").strip() or canonical_for_history(email)
+            results.append(
+                _merge_sent_row(
+                    rows, index, fieldnames, email, ts, source, status, extra, event_key
+                )
             )
-            if extra:
-                for k_extra, v_extra in extra.items():
-                    row[k_extra] = str(v_extra)
-                    if k_extra not in fieldnames:
-                        fieldnames.append(k_extra)
-            updated = True
-            break
-        else:
-            new_row = {
-                "key": event_key,
-                "email": email.strip(),
-                "last_sent_at": ts_local.isoformat(),
-                "source": source,
-                "status": status,
-            }
-            if extra:
-                for k_extra, v_extra in extra.items():
-                    new_row[k_extra] = str(v_extra)
-                    if k_extra not in fieldnames:
-                        fieldnames.append(k_extra)
-            rows.append(new_row)
-            inserted = True
+            touched[event_key] = index[event_key]
+        if not results:
+            return results
 
         bak = p.with_suffix(p.suffix + ".bak")
         if p.exists() and not bak.exists():
@@ -777,7 +793,47 @@ def upsert_sent_log(
             if bak.exists():
                 shutil.copy2(bak, p)
             raise
-    return inserted, updated
+        daily_quota.note_written(p, before, touched.values(), tz=REPORT_TZ)
+    return results
+
+
+def upsert_sent_log(
+    path: str | Path,
+    email: str,
+    ts: datetime,
+    source: str,
+    status: str = "synced",
+    extra: Dict[str, str] | None = None,
+    *,
+    key: str | None = None,
+) -> Tuple[bool, bool]:
+    """Insert or update ``sent_log`` row using ``key`` for deduplication."""
+
+    results = _rewrite_sent_log(Path(path), [(email, ts, source, status, extra, key)])
+    return results[0]
+
+
+def upsert_sent_log_many(
+    path: str | Path,
+    entries: Iterable[Tuple[str, datetime, str, str, str | None]],
+    *,
+    extras: Iterable[Dict[str, str] | None] | None = None,
+) -> List[Tuple[bool, bool]]:
+    """Apply several ``(email, ts, source, status, key)`` upserts in one rewrite.
+
+    ``extras`` optionally gives the ``extra`` columns of each entry, in order.
+    Returns the ``(inserted, updated)`` pair for every entry, in order.
+    """
+
+    entries = list(entries)
+    extras_list = list(extras) if extras is not None else [None] * len(entries)
+    prepared = [
+        (email, ts, source, status, extra, key)
+        for (email, ts, source, status, key), extra in zip(entries, extras_list)
+    ]
+    if not prepared:
+        return []
+    return _rewrite_sent_log(Path(path), prepared)
 
 
 def dedupe_sent_log_inplace(path: str | Path) -> Dict[str, int]:
@@ -895,49 +951,14 @@ def was_sent_within(email: str, days: int = 180) -> bool:
 def was_sent_today_same_content(email: str, subject: str, body: str) -> bool:
     """Return True if the same message was sent within the last 24 hours."""
 
-    tz = ZoneInfo(REPORT_TZ)
-    subject_norm = subject or ""
-    body_norm = body or ""
-    start_local = datetime.now(tz) - timedelta(hours=24)
     key = canonical_for_history(email)
     if not key:
         return False
-    target_hash = _content_hash_from_parts(key, subject_norm, body_norm)
-    for row in _iter_sent_rows():
-        status = (row.get("status") or "ok").strip().lower()
-        if status not in {"ok", "sent", "success"}:
-            continue
-        ts_raw = (row.get("last_sent_at") or row.get("ts") or "").strip()
-        if not ts_raw:
-            continue
-        try:
-            dt = datetime.fromisoformat(ts_raw)
-        except Exception:
-            continue
-        if dt.tzinfo is None:
-            dt_local = dt.replace(tzinfo=tz)
-        else:
-            dt_local = dt.astimezone(tz)
-        if dt_local < start_local:
-            continue
-        row_key = (row.get("key") or "").strip()
-        if not row_key:
-            row_key = canonical_for_history(row.get("email", ""))
-        if row_key != key:
-            continue
-        existing_hash = (row.get("content_hash") or row.get("body_hash") or "").strip()
-        if existing_hash:
-            if existing_hash == target_hash:
-                return True
-            continue
-        row_subject = (row.get("subject") or "").strip()
-        row_body = (row.get("body") or "").strip()
-        if not row_subject and not row_body:
-            continue
-        old_hash = _content_hash_from_parts(row_key, row_subject, row_body)
-        if old_hash == target_hash:
-            return True
-    return False
+    target_hash = _content_hash_from_parts(key, subject or "", body or "")
+    since = datetime.now(ZoneInfo(REPORT_TZ)) - timedelta(hours=24)
+    return daily_quota.sent_same_content_since(
+        SENT_LOG_PATH, key, target_hash, since, tz=REPORT_TZ
+    )
 
 
 def add_bounce(email: str, code: int | None, msg: str, phase: str) -> None:
@@ -1216,6 +1237,7 @@ __all__ = [
     "canonical_for_history",
     "last_sent_at",
     "upsert_sent_log",
+    "upsert_sent_log_many",
     "dedupe_sent_log_inplace",
     "add_bounce",
     "classify_smtp_error",
@@ -0,0 +1,355 @@
+"""In-process metrics: counters, gauges and fixed-bucket histograms.
+
+:mod:`emailbot.perf` only appends JSON lines to ``var/perf.log``; nothing
+aggregated them, so p95 SMTP time or PDF pages per second needed ad hoc
+scripts.  The metrics declared at the bottom of this module are fed by
+:class:`emailbot.perf.PerfTimer` and by timers around the send, IMAP append,
+extraction, crawl, OCR and SQLite paths.  :func:`render_prometheus` serves them
+at ``/metrics`` of the aiohttp app in :mod:`emailbot.unsubscribe`, and
+:func:`summary_lines` feeds ``/diag``.
+
+Updates take one lock per metric and never touch the disk.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import math
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def items(self) -> list[tuple[LabelKey, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, value in self.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (cumulative buckets, as Prometheus expects)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._series: dict[LabelKey, _Series] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def time(self, **labels: Any) -> _Timer:
+        """Context manager and decorator that observes the wall time."""
+
+        return _Timer(self, labels)
+
+    def snapshot(self) -> list[tuple[LabelKey, list[int], float, int]]:
+        with self._lock:
+            return [
+                (key, list(series.counts), series.sum, series.count)
+                for key, series in sorted(self._series.items())
+            ]
+
+    def quantile(self, q: float, **labels: Any) -> float | None:
+        """Estimate quantile ``q`` by linear interpolation inside its bucket."""
+
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None or not series.count:
+                return None
+            counts = list(series.counts)
+            total = series.count
+        return _bucket_quantile(self.buckets, counts, total, q)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, counts, total_sum, count in self.snapshot():
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += n
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def _bucket_quantile(
+    buckets: Sequence[float], counts: Sequence[int], total: int, q: float
+) -> float:
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, n in zip((*buckets, math.inf), counts, strict=True):
+        if n and cumulative + n >= rank:
+            if bound == math.inf:
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / n
+        cumulative += n
+        lower = bound
+    return lower
+
+
+class _Timer:
+    __slots__ = ("_hist", "_labels", "_start")
+
+    def __init__(self, hist: Histogram, labels: dict[str, Any]):
+        self._hist = hist
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> _Timer:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._hist.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+    def __call__(self, fn):
+        hist, labels = self._hist, self._labels
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(hist, labels):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(hist, labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+_REGISTRY: dict[str, _Metric] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _register(metric: _Metric) -> Any:
+    with _REGISTRY_LOCK:
+        existing = _REGISTRY.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"metric {metric.name} already registered as {existing.kind}")
+            return existing
+        _REGISTRY[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help: str) -> Counter:
+    return _register(Counter(name, help))
+
+
+def gauge(name: str, help: str) -> Gauge:
+    return _register(Gauge(name, help))
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, buckets))
+
+
+def all_metrics() -> list[_Metric]:
+    with _REGISTRY_LOCK:
+        return list(_REGISTRY.values())
+
+
+def reset() -> None:
+    """Zero every registered metric (tests, ``/diag`` resets)."""
+
+    for metric in all_metrics():
+        metric.reset()
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+
+    lines: list[str] = []
+    for metric in all_metrics():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels_short(key: LabelKey) -> str:
+    return "{" + ",".join(f"{k}={v}" for k, v in key) + "}" if key else ""
+
+
+def _ms(seconds: float | None) -> str:
+    return "—" if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def summary_lines(limit: int = 20) -> list[str]:
+    """Short human-readable digest of non-empty metrics for ``/diag``."""
+
+    lines: list[str] = []
+    for metric in all_metrics():
+        if isinstance(metric, Histogram):
+            for key, counts, total_sum, count in metric.snapshot():
+                if not count:
+                    continue
+                p50 = _bucket_quantile(metric.buckets, counts, count, 0.5)
+                p95 = _bucket_quantile(metric.buckets, counts, count, 0.95)
+                lines.append(
+                    f"  {metric.name}{_format_labels_short(key)}: n={count}"
+                    f" avg={_ms(total_sum / count)} p50={_ms(p50)} p95={_ms(p95)}"
+                )
+        elif isinstance(metric, Counter):
+            for key, value in metric.items():
+                if value:
+                    lines.append(
+                        f"  {metric.name}{_format_labels_short(key)}: {_format_value(value)}"
+                    )
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"  … ещё {len(lines) - limit}"]
+    return lines
+
+
+# -- metrics of the bot ----------------------------------------------------------
+
+PERF_SECONDS = histogram("emailbot_perf_seconds", "PerfTimer sections by event.")
+SEND_EMAIL_SECONDS = histogram(
+    "emailbot_send_email_seconds", "send_email_with_sessions wall time, cooldown check included."
+)
+SMTP_SEND_SECONDS = histogram("emailbot_smtp_send_seconds", "RobustSMTP.send wall time.")
+SMTP_SEND_ERRORS = counter("emailbot_smtp_send_errors_total", "RobustSMTP.send failures.")
+IMAP_APPEND_SECONDS = histogram(
+    "emailbot_imap_append_seconds", "save_to_sent_folder wall time (IMAP APPEND)."
+)
+IMAP_APPEND_ERRORS = counter("emailbot_imap_append_errors_total", "Failed IMAP APPENDs.")
+EXTRACT_SECONDS = histogram("emailbot_extract_seconds", "extract_any wall time per source.")
+PDF_PAGES = counter("emailbot_pdf_pages_total", "PDF pages with text, OCR pages included.")
+OCR_PAGE_SECONDS = histogram("emailbot_ocr_page_seconds", "Tesseract time per PDF page.")
+CRAWL_FETCH_SECONDS = histogram("emailbot_crawl_fetch_seconds", "Crawler.fetch_html wall time.")
+SQLITE_SECONDS = histogram("emailbot_sqlite_seconds", "SQLite write transactions by database.")
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "LATENCY_BUCKETS",
+    "all_metrics",
+    "counter",
+    "gauge",
+    "histogram",
+    "render_prometheus",
+    "reset",
+    "summary_lines",
+]
@@ -3,24 +3,37 @@
 from __future__ import annotations
 
 import re
+import string
 import unicodedata
 
+from utils.obfuscation_scan import (
+    SPACE_RUN,
+    iter_at_matches,
+    run_end,
+    run_start,
+    scan,
+)
+
 __all__ = ["harvest_emails"]
 
 ZWS = "".join(chr(c) for c in (0x200B, 0x200C, 0x200D, 0x2060, 0xFEFF))
 
-# Базовая «строгая» маска
-STRICT_EMAIL = re.compile(r"\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b")
-
-# Разрешаем точки разных юникод-вариантов и обфускации (at/dot/«собака/точка»)
-OBFUSCATED = re.compile(
-    r"""
-  (?P<loc>[A-Za-z0-9._%+\-]{1,64}(?:\s*[.\u00B7\u2219\u30FB\ufe52\-]\s*[A-Za-z0-9._%+\-]{1,64})*)
-  \s*(?:@|\(at\)|\[at\]|{at}| at | собака )\s*
-  (?P<dom>[A-Za-z0-9\-]{1,63}(?:\s*[.\u00B7\u2219\u30FB\ufe52]\s*[A-Za-z0-9\-]{1,63})+)
-""",
-    re.IGNORECASE | re.VERBOSE,
-)
+# Базовая «строгая» маска: \b[A-Za-z0-9._%+\-]+@<STRICT_DOMAIN>
+STRICT_LOCAL_CHARS = string.ascii_letters + string.digits + "._%+-"
+STRICT_DOMAIN = re.compile(r"[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b")
+
+# Разрешаем точки разных юникод-вариантов и обфускации (at/dot/«собака/точка»).
+# Адрес ищется от разделителя наружу: слева до 64 символов local-part (пробелы
+# допускаются только вокруг «точек»), справа метки домена до 63 символов,
+# всего до 253, — без вложенных квантификаторов и без перебора стартов.
+SEPARATOR = re.compile(r"(?i)@|\(at\)|\[at\]|\{at\}| at | собака ")
+LOCAL_CHARS = string.ascii_letters + string.digits + "._%+-"
+LOCAL_DOTS = ".\u00b7\u2219\u30fb\ufe52-"
+DOMAIN_CHARS = string.ascii_letters + string.digits + "-"
+DOMAIN_DOTS = ".\u00b7\u2219\u30fb\ufe52"
+MAX_LOCAL = 64
+MAX_LABEL = 63
+MAX_DOMAIN = 253
 
 DOTS = ("(dot)", "[dot]", "{dot}", " dot ", " точка ", "·", "∙", "•", "⸱", "．", "。")
 
@@ -38,27 +51,62 @@ def _scrub(text: str) -> str:
     return cleaned
 
 
+def _local_start(text: str, sep: int, lo: int) -> int:
+    """Start of the local part ending before the separator at ``sep``."""
+
+    end = i = run_start(text, sep, None, lo)
+    count = 0
+    while i > lo and count < MAX_LOCAL:
+        ch = text[i - 1]
+        if ch in LOCAL_CHARS or ch in LOCAL_DOTS:
+            i -= 1
+            count += 1
+        elif ch.isspace():
+            j = run_start(text, i, None, lo)
+            if text[i] not in LOCAL_DOTS and (j == lo or text[j - 1] not in LOCAL_DOTS):
+                break
+            i = j
+        else:
+            break
+    # local-part начинается с обычного символа, а не с «точки» или пробела
+    while i < end and text[i] not in LOCAL_CHARS:
+        i = SPACE_RUN.match(text, i + 1).end()
+    return i if i < end else -1
+
+
+def _domain_end(text: str, sep_end: int) -> int:
+    """End of a domain of at least two labels after the separator, or ``-1``."""
+
+    i = SPACE_RUN.match(text, sep_end).end()
+    end = -1
+    labels = size = 0
+    while True:
+        j = run_end(text, i, DOMAIN_CHARS, i + MAX_LABEL)
+        if j == i:
+            break
+        labels += 1
+        size += j - i
+        if labels > 1:
+            end = j
+        k = SPACE_RUN.match(text, j).end()
+        if size >= MAX_DOMAIN or k >= len(text) or text[k] not in DOMAIN_DOTS:
+            break
+        i = SPACE_RUN.match(text, k + 1).end()
+    return end
+
+
 def harvest_emails(raw_text: str) -> set[str]:
     """Extract e-mail addresses from ``raw_text`` using aggressive heuristics."""
 
     text = _scrub(raw_text)
-    found: set[str] = {match.group(0) for match in STRICT_EMAIL.finditer(text)}
-    for match in OBFUSCATED.finditer(text):
-        loc = match.group("loc")
-        dom = match.group("dom")
-        if not loc or not dom:
-            continue
-        email = f"{loc}@{dom}"
+    found: set[str] = {
+        text[start:end] for start, end in iter_at_matches(text, STRICT_LOCAL_CHARS, STRICT_DOMAIN)
+    }
+    for start, sep, sep_end, end in scan(text, SEPARATOR, _local_start, _domain_end):
+        email = f"{text[start:sep]}@{text[sep_end:end]}"
         for dot in DOTS:
             email = email.replace(dot, ".")
-        email = (
-            email.replace("(at)", "@")
-            .replace("[at]", "@")
-            .replace("{at}", "@")
-            .replace(" at ", "@")
-            .replace(" собака ", "@")
-        )
-        email = re.sub(r"\s+", "", email)
+        email = "".join(email.split())
         if "@" not in email:
             continue
         _, domain = email.split("@", 1)
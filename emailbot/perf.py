@@ -8,13 +8,16 @@ import time
 from datetime import datetime
 from typing import Any, Dict, Optional
 
+from . import metrics
+
 
 PERF_LOG_PATH = os.getenv("PERF_LOG_PATH", "var/perf.log")
 
 
 def perf_log(event: str, elapsed_ms: float, extra: Optional[Dict[str, Any]] = None) -> None:
-    """Append a structured performance log entry."""
+    """Append a structured performance log entry and feed ``emailbot_perf_seconds``."""
 
+    metrics.PERF_SECONDS.observe(elapsed_ms / 1000.0, event=event)
     directory = os.path.dirname(PERF_LOG_PATH)
     if directory:
         os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,181 @@
+"""Per-address filter outcomes kept between preview refreshes.
+
+A manual edit (``old -> new``) changes one or two addresses, yet refreshing
+the preview used to run :func:`emailbot.messaging.prepare_mass_mailing` and
+one history lookup per row over the whole list again.  :class:`PreviewDecisions`
+remembers, for every address of the current preview, which list the filters
+put it in and when it was last sent to the group.  :meth:`PreviewDecisions.classify`
+filters only the addresses it has not seen (new edit targets), forgets the
+ones that left the list and rebuilds the four result lists from the stored
+decisions in source order, so a refresh costs in proportion to the edit.
+
+Decisions are dropped wholesale when the group or the cooldown override
+changes, or after ``PREVIEW_DECISIONS_TTL`` seconds (900 by default), so
+a long-lived preview still picks up new sends and block-list entries.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Iterable, Sequence
+from datetime import datetime
+from typing import Any
+
+from utils.email_key import get_email_key
+
+CONTEXT_KEY = "preview_decisions"
+
+READY = "ready"
+FOREIGN = "blocked_foreign"
+BLOCKED = "blocked_invalid"
+COOLDOWN = "skipped_recent"
+CATEGORIES = (READY, FOREIGN, BLOCKED, COOLDOWN)
+
+_MISSING = object()
+
+
+def _ttl() -> float:
+    try:
+        return float(os.getenv("PREVIEW_DECISIONS_TTL", "") or 900)
+    except ValueError:
+        return 900.0
+
+
+def _dedupe(emails: Iterable[str]) -> list[str]:
+    """Display forms of ``emails`` as :func:`sanitize_batch` keeps them."""
+
+    seen: set[str] = set()
+    out: list[str] = []
+    for raw in emails or []:
+        display = get_email_key(raw).display
+        if not display:
+            continue
+        key = get_email_key(display).normalized or display.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(display)
+    return out
+
+
+class PreviewDecisions:
+    """Filter decisions and last-send times of one chat's preview."""
+
+    def __init__(self, group: str, ignore_cooldown: bool = False):
+        self.group = group
+        self.ignore_cooldown = ignore_cooldown
+        self.created = time.time()
+        self.decisions: dict[str, str] = {}
+        self._last_sent: dict[str, datetime | None] = {}
+        self.recomputed = 0
+
+    def matches(self, group: str, ignore_cooldown: bool) -> bool:
+        return (
+            self.group == group
+            and self.ignore_cooldown == ignore_cooldown
+            and time.time() - self.created < _ttl()
+        )
+
+    def classify(
+        self, emails: Sequence[str], *, chat_id: int | None = None
+    ) -> tuple[list[str], list[str], list[str], list[str], dict[str, Any]]:
+        """Return ``prepare_mass_mailing``-shaped results for ``emails``.
+
+        Only addresses without a stored decision are filtered; the digest
+        describes that call.
+        """
+
+        from emailbot import messaging
+
+        displays = _dedupe(emails)
+        current = set(displays)
+        for stale in [addr for addr in self.decisions if addr not in current]:
+            del self.decisions[stale]
+            self._last_sent.pop(stale, None)
+
+        missing = [addr for addr in displays if addr not in self.decisions]
+        digest: dict[str, Any] = {"total": 0, "input_total": 0}
+        self.recomputed = len(missing)
+        if missing:
+            *lists, digest = messaging.prepare_mass_mailing(
+                missing,
+                self.group,
+                chat_id=chat_id,
+                ignore_cooldown=self.ignore_cooldown,
+            )
+            if "error" not in digest:
+                self.record(*lists)
+
+        result: dict[str, list[str]] = {category: [] for category in CATEGORIES}
+        for addr in displays:
+            category = self.decisions.get(addr)
+            if category is not None:
+                result[category].append(addr)
+        return (
+            result[READY],
+            result[FOREIGN],
+            result[BLOCKED],
+            result[COOLDOWN],
+            digest,
+        )
+
+    def record(
+        self,
+        ready: Iterable[str],
+        blocked_foreign: Iterable[str],
+        blocked_invalid: Iterable[str],
+        skipped_recent: Iterable[str],
+    ) -> None:
+        """Store the outcome of a :func:`prepare_mass_mailing` call."""
+
+        lists = (ready, blocked_foreign, blocked_invalid, skipped_recent)
+        for category, addrs in zip(CATEGORIES, lists, strict=True):
+            for addr in addrs or []:
+                self.decisions[get_email_key(addr).display or addr] = category
+
+    def last_sent(self, email: str) -> datetime | None:
+        """Last send to ``email`` in the preview group, looked up once."""
+
+        last = self._last_sent.get(email, _MISSING)
+        if last is _MISSING:
+            from emailbot import history_service
+
+            last = self._last_sent[email] = history_service.get_last_sent(email, self.group)
+        return last
+
+
+def for_context(chat_data: dict, group: str, ignore_cooldown: bool = False) -> PreviewDecisions:
+    """The chat's :class:`PreviewDecisions`, replaced when it no longer applies."""
+
+    decisions = chat_data.get(CONTEXT_KEY)
+    if not isinstance(decisions, PreviewDecisions) or not decisions.matches(group, ignore_cooldown):
+        decisions = PreviewDecisions(group, ignore_cooldown)
+        chat_data[CONTEXT_KEY] = decisions
+    return decisions
+
+
+def seed(
+    chat_data: dict,
+    group: str,
+    ignore_cooldown: bool,
+    ready: Iterable[str],
+    blocked_foreign: Iterable[str],
+    blocked_invalid: Iterable[str],
+    skipped_recent: Iterable[str],
+) -> PreviewDecisions:
+    """Start a new preview from the results of a full filtering run."""
+
+    decisions = PreviewDecisions(group, ignore_cooldown)
+    decisions.record(ready, blocked_foreign, blocked_invalid, skipped_recent)
+    chat_data[CONTEXT_KEY] = decisions
+    return decisions
+
+
+__all__ = [
+    "CATEGORIES",
+    "CONTEXT_KEY",
+    "PreviewDecisions",
+    "for_context",
+    "seed",
+]
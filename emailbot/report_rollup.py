@@ -0,0 +1,530 @@
+"""Pre-aggregated daily counters for the report handlers.
+
+``/report``, the console summary and the "today" counters used to re-read
+``send_stats.jsonl``, ``sent_log.csv`` and every ``bulk_audit_*.jsonl`` on
+each request.  :class:`RollupStore` keeps a SQLite table of daily counts per
+source, group, status, recipient domain and error reason instead, so a report
+is one indexed aggregate query whatever the size of the history.
+
+The table is maintained by an offset-tracking tailer: :meth:`RollupStore.sync`
+reads only the bytes appended to a source since the previous call and adds
+them to the counters in the same transaction that advances the offset.  A
+file that was replaced or truncated (``sent_log.csv`` is rewritten on every
+upsert) is detected by its inode, size and a checksum of the bytes before the
+stored offset and is then ingested again from scratch.
+
+A :class:`RollupSource` describes how to read one file: the record ``kind``
+(which picks the extractor), the time zone days are bucketed in, how naive
+timestamps are interpreted and which fields hold the timestamp.  Each
+combination is kept separately, so callers that historically disagreed on
+these details keep their own numbers.
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, replace
+from datetime import UTC, date, datetime, time, tzinfo
+from pathlib import Path
+from typing import Any
+
+from utils.paths import ensure_parent, expand_path
+
+logger = logging.getLogger(__name__)
+
+# Bytes before the stored offset that must be unchanged for a file to count as
+# appended to rather than rewritten.
+_TAIL_CHECK = 256
+_READ_CHUNK = 1 << 20
+_REASON_MAX = 120
+
+_COLUMNS = {
+    "day": "day",
+    "group": "grp",
+    "status": "status",
+    "domain": "domain",
+    "reason": "reason",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    source TEXT NOT NULL,
+    day TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (source, day, grp, status, domain, reason)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_offsets (
+    source TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    tail_crc INTEGER NOT NULL,
+    header TEXT
+);
+"""
+
+# (timestamp, group, status, email, reason) of one record.
+Extracted = tuple[Any, str, str, str, str]
+Extractor = Callable[[dict[str, Any], Sequence[str]], Extracted]
+
+
+def default_path() -> Path:
+    return expand_path(os.getenv("REPORT_ROLLUP_DB", "var/report_rollup.sqlite"))
+
+
+def _first(record: dict[str, Any], fields: Sequence[str]) -> Any:
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return value
+    return None
+
+
+def _text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def _extract_send_stats(record: dict[str, Any], ts_fields: Sequence[str]) -> Extracted:
+    status = _text(record.get("status")).lower()
+    if not status and "success" in record:
+        status = "success" if record.get("success") else "failed"
+    return (
+        _first(record, ts_fields),
+        _text(record.get("group")).lower(),
+        status,
+        _text(record.get("email")),
+        _text(record.get("reason")),
+    )
+
+
+def _extract_sent_log(record: dict[str, Any], ts_fields: Sequence[str]) -> Extracted:
+    status = _text(record.get("status") or record.get("result")).lower()
+    return (
+        _first(record, ts_fields),
+        _text(record.get("group") or record.get("source")).lower(),
+        status,
+        _text(record.get("email")),
+        _text(record.get("error") or record.get("reason")),
+    )
+
+
+def _extract_audit(record: dict[str, Any], ts_fields: Sequence[str]) -> Extracted:
+    return (
+        _first(record, ts_fields),
+        _text(record.get("group")).lower(),
+        _text(record.get("outcome")).lower() or "unknown",
+        _text(record.get("email")),
+        _text(record.get("reason") or record.get("detail")),
+    )
+
+
+_EXTRACTORS: dict[str, Extractor] = {
+    "send_stats": _extract_send_stats,
+    "sent_log": _extract_sent_log,
+    "audit": _extract_audit,
+}
+
+
+def register_extractor(kind: str, extractor: Extractor) -> None:
+    """Teach the tailer a new record ``kind``."""
+
+    _EXTRACTORS[kind] = extractor
+
+
+def _tz_key(tz: tzinfo) -> str:
+    return getattr(tz, "key", None) or str(tz)
+
+
+@dataclass(frozen=True)
+class RollupSource:
+    """One file feeding the rollup and how its records are bucketed."""
+
+    kind: str
+    path: Path
+    tz: tzinfo
+    naive_utc: bool = False
+    ts_fields: tuple[str, ...] = ("ts",)
+
+    @property
+    def key(self) -> str:
+        naive = "utc" if self.naive_utc else "local"
+        fields = ",".join(self.ts_fields)
+        return f"{self.kind}|{_tz_key(self.tz)}|{naive}|{fields}|{Path(self.path)}"
+
+    def day_of(self, raw: Any) -> str:
+        """Local calendar day of ``raw`` as ``YYYY-MM-DD`` or ``""``."""
+
+        if isinstance(raw, datetime):
+            ts = raw
+        elif isinstance(raw, (int, float)) and not isinstance(raw, bool):
+            ts = datetime.fromtimestamp(raw, UTC)
+        else:
+            text = _text(raw)
+            if not text:
+                return ""
+            try:
+                ts = datetime.fromisoformat(text.replace("Z", "+00:00"))
+            except ValueError:
+                return ""
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=UTC if self.naive_utc else self.tz)
+        return ts.astimezone(self.tz).date().isoformat()
+
+
+def _domain(email: str) -> str:
+    _, sep, domain = email.lower().rpartition("@")
+    return domain if sep and domain else ""
+
+
+def _reason_key(reason: str) -> str:
+    return " ".join(reason.split()).lower()[:_REASON_MAX]
+
+
+class RollupStore:
+    """SQLite-backed daily counters fed by :meth:`sync`."""
+
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path) if path is not None else default_path()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.rebuilds = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_parent(self.path)
+            conn = sqlite3.connect(
+                str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- ingestion -----------------------------------------------------------
+    def sync(self, source: RollupSource) -> int:
+        """Fold records appended to ``source`` since the last call; return their number."""
+
+        path = Path(source.path)
+        key = source.key
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = self._sync_locked(conn, key, source, path)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return added
+
+    def _reset(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute("DELETE FROM rollup_daily WHERE source = ?", (key,))
+        conn.execute("DELETE FROM rollup_offsets WHERE source = ?", (key,))
+
+    def _sync_locked(
+        self, conn: sqlite3.Connection, key: str, source: RollupSource, path: Path
+    ) -> int:
+        state = conn.execute(
+            "SELECT inode, offset, tail_crc, header FROM rollup_offsets WHERE source = ?",
+            (key,),
+        ).fetchone()
+        if path.suffix.lower() == ".gz":
+            return self._sync_segment(conn, key, source, path, state)
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            if state is not None:
+                self._reset(conn, key)
+            return 0
+        with handle:
+            st = os.fstat(handle.fileno())
+            inode, offset, tail_crc, header = state if state else (st.st_ino, 0, 0, None)
+            if state is not None and not self._is_append(handle, st, inode, offset, tail_crc):
+                self._reset(conn, key)
+                self.rebuilds += 1
+                inode, offset, header = st.st_ino, 0, None
+            if st.st_size == offset:
+                return 0
+            handle.seek(offset)
+            counts: Counter[tuple[str, str, str, str, str]] = Counter()
+            added = 0
+            while True:
+                chunk = handle.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                end = chunk.rfind(b"\n")
+                if end < 0:
+                    # Incomplete last line; pick it up once it is terminated.
+                    if len(chunk) < _READ_CHUNK:
+                        break
+                    chunk += handle.readline()
+                    end = chunk.rfind(b"\n")
+                    if end < 0:
+                        break
+                complete = chunk[: end + 1]
+                handle.seek(offset + len(complete))
+                text = complete.decode("utf-8", errors="replace")
+                records, header = self._records(path, text, header)
+                added += self._fold(source, records, counts)
+                offset += len(complete)
+            self._store_counts(conn, key, counts)
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_offsets (source, inode, offset, tail_crc, header)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, st.st_ino, offset, self._tail_crc(handle, offset), header),
+            )
+        return added
+
+    def _sync_segment(
+        self, conn: sqlite3.Connection, key: str, source: RollupSource, path: Path, state
+    ) -> int:
+        """Ingest an archived segment once; segments are never modified."""
+
+        if state is not None:
+            if not path.exists():
+                self._reset(conn, key)
+            return 0
+        try:
+            with gzip.open(path, "rb") as fh:
+                text = fh.read().decode("utf-8", errors="replace")
+            st = path.stat()
+        except FileNotFoundError:
+            return 0
+        records, header = self._records(path, text, None)
+        counts: Counter[tuple[str, str, str, str, str]] = Counter()
+        added = self._fold(source, records, counts)
+        self._store_counts(conn, key, counts)
+        conn.execute(
+            "INSERT OR REPLACE INTO rollup_offsets (source, inode, offset, tail_crc, header)"
+            " VALUES (?, ?, ?, 0, ?)",
+            (key, st.st_ino, st.st_size, header),
+        )
+        return added
+
+    @staticmethod
+    def _store_counts(conn: sqlite3.Connection, key: str, counts: Counter) -> None:
+        if counts:
+            conn.executemany(
+                "INSERT INTO rollup_daily (source, day, grp, status, domain, reason, n)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (source, day, grp, status, domain, reason)"
+                " DO UPDATE SET n = n + excluded.n",
+                [(key, *bucket, n) for bucket, n in counts.items()],
+            )
+
+    def _records(
+        self, path: Path, text: str, header: str | None
+    ) -> tuple[Iterable[dict[str, Any]], str | None]:
+        suffixes = [s.lower() for s in path.suffixes if s.lower() != ".gz"]
+        if suffixes and suffixes[-1] == ".csv":
+            return self._csv_records(text, header)
+        return self._jsonl_records(text), header
+
+    @staticmethod
+    def _tail_crc(handle, offset: int) -> int:
+        start = max(0, offset - _TAIL_CHECK)
+        handle.seek(start)
+        return zlib.crc32(handle.read(offset - start))
+
+    def _is_append(self, handle, st: os.stat_result, inode: int, offset: int, crc: int) -> bool:
+        if st.st_ino != inode or st.st_size < offset:
+            return False
+        return self._tail_crc(handle, offset) == crc
+
+    @staticmethod
+    def _jsonl_records(text: str) -> Iterable[dict[str, Any]]:
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+    @staticmethod
+    def _csv_records(text: str, header: str | None) -> tuple[list[dict[str, Any]], str]:
+        if header is None:
+            first, _, text = text.partition("\n")
+            header = first.lstrip("\ufeff").rstrip("\r")
+        delimiter = ";" if header.count(";") > header.count(",") else ","
+        fields = next(csv.reader([header], delimiter=delimiter), [])
+        reader = csv.DictReader(io.StringIO(text), fieldnames=fields, delimiter=delimiter)
+        return [row for row in reader if row], header
+
+    @staticmethod
+    def _fold(source: RollupSource, records: Iterable[dict[str, Any]], counts: Counter) -> int:
+        extractor = _EXTRACTORS[source.kind]
+        added = 0
+        for record in records:
+            try:
+                ts, group, status, email, reason = extractor(record, source.ts_fields)
+            except Exception:
+                logger.debug("report_rollup: skipping %s record", source.kind, exc_info=True)
+                continue
+            counts[(source.day_of(ts), group, status, _domain(email), _reason_key(reason))] += 1
+            added += 1
+        return added
+
+    # -- queries -------------------------------------------------------------
+    def counts(
+        self,
+        source: RollupSource,
+        start: date | None = None,
+        end: date | None = None,
+        *,
+        by: Sequence[str] = ("status",),
+        sync: bool = True,
+    ) -> Counter:
+        """Sum counters of ``source`` for days ``start``..``end`` (inclusive).
+
+        Keys are the values of the single ``by`` column, or tuples of them.
+        With a bound given, records without a timestamp are left out.
+        """
+
+        if sync:
+            self.sync(source)
+        columns = [_COLUMNS[name] for name in by]
+        where = ["source = ?"]
+        params: list[Any] = [source.key]
+        if start is not None or end is not None:
+            where.append("day BETWEEN ? AND ?")
+            params.append(start.isoformat() if start else "0000-00-00")
+            params.append(end.isoformat() if end else "9999-99-99")
+        select = ", ".join(columns)
+        sql = f"SELECT {select}, SUM(n) FROM rollup_daily WHERE {' AND '.join(where)}"
+        if columns:
+            sql += f" GROUP BY {select}"
+        result: Counter = Counter()
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        for row in rows:
+            if row[-1] is None:
+                continue
+            if not columns:
+                result[()] = row[-1]
+            elif len(columns) == 1:
+                result[row[0]] = row[1]
+            else:
+                result[tuple(row[:-1])] = row[-1]
+        return result
+
+    def undated(self, source: RollupSource, *, sync: bool = True) -> int:
+        """Number of records of ``source`` that carried no usable timestamp."""
+
+        if sync:
+            self.sync(source)
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT SUM(n) FROM rollup_daily WHERE source = ? AND day = ''", (source.key,)
+                )
+                .fetchone()
+            )
+        return int(row[0] or 0)
+
+
+_STORE: RollupStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> RollupStore:
+    """Return the process store, reopened when ``REPORT_ROLLUP_DB`` changes."""
+
+    global _STORE
+    path = default_path()
+    with _STORE_LOCK:
+        if _STORE is None or _STORE.path != path:
+            if _STORE is not None:
+                _STORE.close()
+            _STORE = RollupStore(path)
+        return _STORE
+
+
+def with_archive(
+    source: RollupSource,
+    start: date | None = None,
+    end: date | None = None,
+    *,
+    archive: Path | str | None = None,
+) -> list[RollupSource]:
+    """``source`` plus one source per archived segment overlapping the days.
+
+    See :mod:`emailbot.log_archive`; segments are ingested once and then
+    answered from the table like any other source.
+    """
+
+    from emailbot import log_archive
+
+    first = datetime.combine(start, time.min, tzinfo=source.tz) if start else None
+    last = datetime.combine(end, time.max, tzinfo=source.tz) if end else None
+    paths = log_archive.segment_paths(source.path, first, last, archive=archive)
+    return [source, *(replace(source, path=path) for path in paths)]
+
+
+def counts(
+    sources: RollupSource | Iterable[RollupSource],
+    start: date | None = None,
+    end: date | None = None,
+    *,
+    by: Sequence[str] = ("status",),
+) -> Counter:
+    """Summed :meth:`RollupStore.counts` of one or several sources."""
+
+    store = get_store()
+    if isinstance(sources, RollupSource):
+        return store.counts(sources, start, end, by=by)
+    result: Counter = Counter()
+    for source in sources:
+        result.update(store.counts(source, start, end, by=by))
+    return result
+
+
+def undated(sources: RollupSource | Iterable[RollupSource]) -> int:
+    store = get_store()
+    if isinstance(sources, RollupSource):
+        return store.undated(sources)
+    return sum(store.undated(source) for source in sources)
+
+
+def close() -> None:
+    global _STORE
+    with _STORE_LOCK:
+        store, _STORE = _STORE, None
+    if store is not None:
+        store.close()
+
+
+__all__ = [
+    "RollupSource",
+    "RollupStore",
+    "register_extractor",
+    "default_path",
+    "get_store",
+    "with_archive",
+    "counts",
+    "undated",
+    "close",
+]
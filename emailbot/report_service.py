@@ -7,10 +7,11 @@ import datetime as dt
 import json
 import os
 import sys
-from itertools import chain
 from pathlib import Path
 from typing import Iterator
 
+from emailbot import report_rollup
+from emailbot.report_rollup import RollupSource
 from emailbot.suppress_list import blocklist_path
 from utils import send_stats
 
@@ -141,29 +142,32 @@ def _iter_send_stats() -> Iterator[dict[str, object]]:
             yield {"ts_utc": ts_utc, "status": status}
 
 
+def _sent_log_source() -> RollupSource:
+    return RollupSource(
+        "sent_log", SENT_LOG_PATH, REPORT_TZ, naive_utc=True, ts_fields=("last_sent_at", "ts")
+    )
+
+
+def _send_stats_source() -> RollupSource:
+    return RollupSource("send_stats", SEND_STATS_PATH, REPORT_TZ, naive_utc=True)
+
 
 def summarize_day_local(today_local: dt.date | None = None) -> tuple[int, int]:
     """Return counts of successful and failed deliveries for the local day."""
 
     if today_local is None:
         today_local = dt.datetime.now(REPORT_TZ).date()
-    start_local = dt.datetime.combine(today_local, dt.time(0, 0, 0), tzinfo=REPORT_TZ)
-    end_local = start_local + dt.timedelta(days=1)
 
     ok = 0
     err = 0
-    for item in chain(_iter_sent_log(), _iter_send_stats()):
-        ts_utc = item["ts_utc"]
-        if not isinstance(ts_utc, dt.datetime):
-            continue
-        status = str(item.get("status", "")).strip().lower()
-        ts_local = ts_utc.astimezone(REPORT_TZ)
-        if not (start_local <= ts_local < end_local):
-            continue
-        if status in _SUCCESS_STATUSES:
-            ok += 1
-        elif status in _ERROR_STATUSES:
-            err += 1
+    for source in (_sent_log_source(), _send_stats_source()):
+        sources = report_rollup.with_archive(source, today_local, today_local)
+        for status, value in report_rollup.counts(sources, today_local, today_local).items():
+            status = status or ("sent" if source.kind == "sent_log" else "failed")
+            if status in _SUCCESS_STATUSES:
+                ok += value
+            elif status in _ERROR_STATUSES:
+                err += value
     return ok, err
 
 
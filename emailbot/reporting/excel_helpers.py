@@ -3,21 +3,18 @@
 from __future__ import annotations
 
 import os
-from typing import Iterable
+from typing import Iterable, Iterator
 
 import pandas as pd
 
 from emailbot.domain_utils import classify_email_domain
 
-__all__ = ["append_foreign_review_sheet"]
+__all__ = ["append_foreign_review_sheet", "foreign_review_rows"]
 
 
-def append_foreign_review_sheet(xlsx_path: str, emails: Iterable[str]) -> None:
-    """Append or replace the ``Foreign_Review`` sheet in ``xlsx_path``."""
+def foreign_review_rows(emails: Iterable[str]) -> Iterator[list[str]]:
+    """``[email, domain_type]`` for unique addresses on global/foreign domains."""
 
-    if not os.path.exists(xlsx_path):
-        return
-    rows: list[dict[str, str]] = []
     seen: set[str] = set()
     for email in emails:
         if not email:
@@ -27,7 +24,15 @@ def append_foreign_review_sheet(xlsx_path: str, emails: Iterable[str]) -> None:
         seen.add(email)
         domain_type = classify_email_domain(email)
         if domain_type in {"global_mail", "foreign_corporate"}:
-            rows.append({"email": email, "domain_type": domain_type})
+            yield [email, domain_type]
+
+
+def append_foreign_review_sheet(xlsx_path: str, emails: Iterable[str]) -> None:
+    """Append or replace the ``Foreign_Review`` sheet in ``xlsx_path``."""
+
+    if not os.path.exists(xlsx_path):
+        return
+    rows = list(foreign_review_rows(emails))
     if not rows:
         return
     df = pd.DataFrame(rows, columns=["email", "domain_type"])
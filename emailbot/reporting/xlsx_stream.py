@@ -0,0 +1,159 @@
+"""Constant-memory export of tabular data to ``.xlsx`` or ``.csv``.
+
+Previews and address lists used to be built as full openpyxl workbooks (or
+pandas DataFrames first) and then walked cell by cell to size the columns.
+:func:`write_xlsx` uses openpyxl's write-only mode instead: rows are consumed
+from iterables and spilled to disk as they are appended, and column widths
+are estimated from the header and the first :data:`SAMPLE_ROWS` rows before
+anything is written (a write-only sheet cannot be resized afterwards).
+
+:func:`write_csv` is the fast path for very large exports.  A multi-sheet
+export becomes one CSV file with a title line per sheet and an empty line
+between sheets.  :func:`export` picks the format from ``EXPORT_FORMAT``
+(``xlsx`` or ``csv``) and ``EXPORT_CSV_ABOVE_ROWS``.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any
+
+SAMPLE_ROWS = 500
+MIN_WIDTH = 3
+MAX_WIDTH = 80
+
+
+@dataclass
+class Sheet:
+    """One worksheet: ``title``, optional ``header`` and an iterable of rows."""
+
+    title: str
+    header: Sequence[Any] | None
+    rows: Iterable[Sequence[Any]]
+    bold_header: bool = False
+
+
+def _text_len(value: Any) -> int:
+    return len(str(value)) if value is not None else 0
+
+
+def estimate_widths(header: Sequence[Any] | None, sample: Iterable[Sequence[Any]]) -> list[float]:
+    """Column widths fitting ``header`` and ``sample``, capped at :data:`MAX_WIDTH`."""
+
+    widths: list[int] = []
+    for row in chain([header or ()], sample):
+        for index, value in enumerate(row):
+            if index == len(widths):
+                widths.append(MIN_WIDTH)
+            widths[index] = max(widths[index], _text_len(value))
+    return [min(width + 2, MAX_WIDTH) for width in widths]
+
+
+def _peek(rows: Iterable[Sequence[Any]], count: int) -> tuple[list, Iterator]:
+    iterator = iter(rows)
+    return list(islice(iterator, count)), iterator
+
+
+def write_xlsx(
+    path: Path | str, sheets: Iterable[Sheet], *, sample_rows: int = SAMPLE_ROWS
+) -> Path:
+    """Stream ``sheets`` into a workbook at ``path`` using write-only mode."""
+
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    path = Path(path)
+    wb = Workbook(write_only=True)
+    bold = Font(bold=True)
+    for sheet in sheets:
+        ws = wb.create_sheet(sheet.title)
+        sample, rest = _peek(sheet.rows, sample_rows)
+        for index, width in enumerate(estimate_widths(sheet.header, sample), start=1):
+            ws.column_dimensions[get_column_letter(index)].width = width
+        if sheet.header is not None:
+            if sheet.bold_header:
+                header = []
+                for value in sheet.header:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = bold
+                    header.append(cell)
+                ws.append(header)
+            else:
+                ws.append(list(sheet.header))
+        for row in chain(sample, rest):
+            ws.append(list(row))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def write_csv(path: Path | str, sheets: Iterable[Sheet]) -> Path:
+    """Write ``sheets`` as CSV; several sheets become titled sections."""
+
+    path = Path(path)
+    sheets = list(sheets)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8-sig") as fh:
+        writer = csv.writer(fh)
+        for index, sheet in enumerate(sheets):
+            if len(sheets) > 1:
+                if index:
+                    writer.writerow([])
+                writer.writerow([sheet.title])
+            if sheet.header is not None:
+                writer.writerow(sheet.header)
+            writer.writerows(sheet.rows)
+    return path
+
+
+def export_format(rows_hint: int | None = None) -> str:
+    """``"csv"`` or ``"xlsx"`` according to ``EXPORT_FORMAT``/``EXPORT_CSV_ABOVE_ROWS``."""
+
+    fmt = os.getenv("EXPORT_FORMAT", "xlsx").strip().lower()
+    if fmt == "csv":
+        return "csv"
+    try:
+        threshold = int(os.getenv("EXPORT_CSV_ABOVE_ROWS", "0") or 0)
+    except ValueError:
+        threshold = 0
+    if threshold and rows_hint is not None and rows_hint > threshold:
+        return "csv"
+    return "xlsx"
+
+
+def export(
+    path: Path | str,
+    sheets: Iterable[Sheet],
+    *,
+    fmt: str | None = None,
+    rows_hint: int | None = None,
+) -> Path:
+    """Write ``sheets`` as ``fmt`` (default :func:`export_format`).
+
+    The suffix of ``path`` is replaced to match the format; the path actually
+    written is returned.
+    """
+
+    fmt = fmt or export_format(rows_hint)
+    path = Path(path)
+    if fmt == "csv":
+        return write_csv(path.with_suffix(".csv"), sheets)
+    return write_xlsx(path.with_suffix(".xlsx"), sheets)
+
+
+__all__ = [
+    "Sheet",
+    "SAMPLE_ROWS",
+    "estimate_widths",
+    "write_xlsx",
+    "write_csv",
+    "export_format",
+    "export",
+]
@@ -5,6 +5,8 @@ import unicodedata
 from dataclasses import dataclass
 from typing import Iterable, List
 
+from utils.email_key import get_email_key
+
 ZWSP_CHARS = [
     "\u200b",  # ZERO WIDTH SPACE
     "\u200c",  # ZERO WIDTH NON-JOINER
@@ -123,6 +125,10 @@ def normalize_unicode(value: str) -> str:
 def normalize_email(raw: str) -> str:
     """Normalise an address for deterministic comparisons and storage."""
 
+    return get_email_key(raw).normalized
+
+
+def _normalize_email(raw: str) -> str:
     if not raw:
         return ""
     s = normalize_unicode(str(raw))
@@ -264,11 +270,11 @@ def sanitize_batch(emails: Iterable[str]) -> SanitizedBatch:
     duplicates = 0
 
     for raw in emails or []:
-        display = _clean_display(raw)
+        display = get_email_key(raw).display
         if not display:
             continue
-        norm = normalize_email(display)
-        key = email_key(display) or display.lower()
+        norm = get_email_key(display).normalized
+        key = norm or display.lower()
         if key in seen_norms:
             duplicates += 1
             duplicate_items.append(display)
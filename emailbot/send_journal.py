@@ -0,0 +1,350 @@
+"""Write-behind journal for per-send bookkeeping.
+
+After every successful SMTP send the bot used to update the cooldown cache,
+the send history, ``sent_log.csv`` (a full rewrite) and the storage audit
+one by one.  :class:`SendJournal` queues these records instead and applies
+them in group commits, every ``SEND_JOURNAL_BATCH`` records or
+``SEND_JOURNAL_DELAY_MS`` milliseconds, whichever comes first.
+
+Durability comes from an append-only journal file (JSON lines).  A record is
+written to it before :meth:`SendJournal.submit` returns, so it survives a
+crash of the process; the file is fsynced at every group commit, or on every
+submit with ``SEND_JOURNAL_FSYNC=always``.  Before applying a batch the file
+is moved aside (``<path>.commit``) and removed once the batch is applied, so
+records written meanwhile are not lost.  On start-up anything left in either
+file is applied again, therefore appliers must be idempotent (keyed upserts).
+
+Appliers are registered per record kind with :func:`register_applier`.
+Code reading state for a specific recipient should call
+:meth:`SendJournal.flush` first when :meth:`SendJournal.has_pending` says a
+record for it is still queued.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from utils.paths import ensure_parent, expand_path
+
+logger = logging.getLogger(__name__)
+
+Applier = Callable[[list[dict[str, Any]]], None]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _enabled() -> bool:
+    return os.getenv("SEND_JOURNAL", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def default_path() -> Path:
+    return expand_path(os.getenv("SEND_JOURNAL_PATH", "var/send_journal.wal"))
+
+
+_APPLIERS: dict[str, Applier] = {}
+
+
+def register_applier(kind: str, applier: Applier) -> None:
+    """Register ``applier`` for records of ``kind``; it receives a whole batch."""
+
+    _APPLIERS[kind] = applier
+
+
+def _read_records(path: Path) -> list[dict[str, Any]]:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return []
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # A torn last line from a crash mid-write.
+            logger.warning("send_journal: skipping unreadable record in %s", path)
+    return records
+
+
+class SendJournal:
+    """Queue of bookkeeping records applied in group commits."""
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        *,
+        max_batch: int | None = None,
+        max_delay: float | None = None,
+        fsync: str | None = None,
+        appliers: dict[str, Applier] | None = None,
+    ):
+        self.path = Path(path) if path is not None else default_path()
+        self.commit_path = self.path.with_name(self.path.name + ".commit")
+        self.max_batch = max(1, max_batch or _env_int("SEND_JOURNAL_BATCH", 50))
+        if max_delay is None:
+            max_delay = _env_int("SEND_JOURNAL_DELAY_MS", 200) / 1000.0
+        self.max_delay = max_delay
+        self.fsync = (fsync or os.getenv("SEND_JOURNAL_FSYNC", "commit")).lower()
+        self._appliers = appliers
+        self._lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: list[dict[str, Any]] = []
+        self._pending_keys: dict[str, int] = {}
+        self._oldest = 0.0
+        self._handle = None
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._recovered = False
+        self.commits = 0
+
+    # -- journal file --------------------------------------------------------
+    def _write(self, record: dict[str, Any]) -> None:
+        if self._handle is None:
+            ensure_parent(self.path)
+            self._handle = self.path.open("a", encoding="utf-8")
+        self._handle.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._handle.flush()
+        if self.fsync == "always":
+            os.fsync(self._handle.fileno())
+
+    def _rotate(self) -> None:
+        """Move the journal aside so that the batch can be applied."""
+
+        if self._handle is not None:
+            os.fsync(self._handle.fileno())
+            self._handle.close()
+            self._handle = None
+        if not self.path.exists():
+            return
+        if self.commit_path.exists():
+            # A previous commit failed; its records are retried with these.
+            with self.commit_path.open("a", encoding="utf-8") as dst:
+                dst.write(self.path.read_text(encoding="utf-8"))
+                dst.flush()
+                os.fsync(dst.fileno())
+            self.path.unlink()
+        else:
+            os.replace(self.path, self.commit_path)
+
+    def recover(self) -> int:
+        """Apply records left over from a previous run and return their number."""
+
+        with self._flush_lock:
+            with self._lock:
+                self._recovered = True
+                records = _read_records(self.commit_path) + _read_records(self.path)
+                if not records:
+                    return 0
+                self._rotate()
+            try:
+                self._apply(records)
+            except Exception:
+                logger.warning("send_journal: replay failed, will retry", exc_info=True)
+                with self._lock:
+                    self._pending[:0] = records
+                    self._oldest = time.monotonic()
+                return 0
+            self.commit_path.unlink(missing_ok=True)
+        logger.info("send_journal: replayed %d record(s)", len(records))
+        return len(records)
+
+    # -- queue ---------------------------------------------------------------
+    def submit(self, kind: str, data: dict[str, Any], *, keys: Iterable[str] = ()) -> None:
+        """Journal one record; it is applied with the next group commit.
+
+        ``keys`` (e.g. the recipient) are reported by :meth:`has_pending` until
+        the record is applied.
+        """
+
+        if not self._recovered:
+            self.recover()
+        record = {"kind": kind, "data": data, "keys": [k for k in keys if k]}
+        with self._lock:
+            self._write(record)
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(record)
+            for key in record["keys"]:
+                self._pending_keys[key] = self._pending_keys.get(key, 0) + 1
+            full = len(self._pending) >= self.max_batch
+            if not full:
+                self._ensure_thread()
+                self._wakeup.notify()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # Already logged; the records stay journaled and are retried.
+                pass
+
+    def has_pending(self, key: str) -> bool:
+        with self._lock:
+            return bool(key) and key in self._pending_keys
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Apply every queued record now; return the number applied."""
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    return 0
+                self._rotate()
+            try:
+                self._apply(batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._oldest = time.monotonic()
+                logger.warning("send_journal: group commit failed, will retry", exc_info=True)
+                raise
+            self.commit_path.unlink(missing_ok=True)
+            with self._lock:
+                for record in batch:
+                    for key in record.get("keys") or ():
+                        if key in self._pending_keys:
+                            self._pending_keys[key] -= 1
+                            if self._pending_keys[key] <= 0:
+                                del self._pending_keys[key]
+            self.commits += 1
+            return len(batch)
+
+    def _apply(self, records: Iterable[dict[str, Any]]) -> None:
+        appliers = _APPLIERS if self._appliers is None else self._appliers
+        grouped: dict[str, list[dict[str, Any]]] = {}
+        for record in records:
+            grouped.setdefault(record.get("kind", ""), []).append(record.get("data") or {})
+        for kind, items in grouped.items():
+            applier = appliers.get(kind)
+            if applier is None:
+                logger.warning("send_journal: no applier for %r, dropping %d", kind, len(items))
+                continue
+            applier(items)
+
+    # -- background flusher --------------------------------------------------
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="send-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception:
+                with self._lock:
+                    if self._closed:
+                        return
+                    self._wakeup.wait(max(self.max_delay, 1.0))
+
+    def close(self) -> None:
+        """Flush what is queued and stop the background flusher."""
+
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("send_journal: final flush failed", exc_info=True)
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+
+_JOURNAL: SendJournal | None = None
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_journal() -> SendJournal | None:
+    """Return the process journal, or ``None`` when ``SEND_JOURNAL=0``."""
+
+    global _JOURNAL
+    if not _enabled():
+        return None
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            _JOURNAL = SendJournal()
+        return _JOURNAL
+
+
+def submit(kind: str, data: dict[str, Any], *, keys: Iterable[str] = ()) -> None:
+    """Journal a record, or apply it right away when the journal is disabled."""
+
+    journal = get_journal()
+    if journal is None:
+        applier = _APPLIERS.get(kind)
+        if applier is not None:
+            applier([data])
+        return
+    journal.submit(kind, data, keys=keys)
+
+
+def has_pending(key: str) -> bool:
+    journal = _JOURNAL
+    return journal is not None and journal.has_pending(key)
+
+
+def flush_if_pending(key: str) -> None:
+    journal = _JOURNAL
+    if journal is not None and journal.has_pending(key):
+        journal.flush()
+
+
+def flush() -> int:
+    journal = _JOURNAL
+    return journal.flush() if journal is not None else 0
+
+
+def close() -> None:
+    global _JOURNAL
+    with _JOURNAL_LOCK:
+        journal, _JOURNAL = _JOURNAL, None
+    if journal is not None:
+        journal.close()
+
+
+atexit.register(close)
+
+
+__all__ = [
+    "SendJournal",
+    "register_applier",
+    "default_path",
+    "get_journal",
+    "submit",
+    "has_pending",
+    "flush_if_pending",
+    "flush",
+    "close",
+]
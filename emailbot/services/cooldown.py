@@ -11,6 +11,7 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
+from utils.email_key import get_email_key
 from utils.paths import expand_path, ensure_parent
 
 try:
@@ -192,6 +193,44 @@ def mark_sent(
         pass
 
 
+def mark_sent_many(
+    entries: Iterable[Tuple[str, Optional[datetime]]],
+) -> int:
+    """Bulk :func:`mark_sent` for ``(email, sent_at)`` pairs in one transaction."""
+
+    rows: List[Tuple[str, datetime]] = []
+    for email, sent_at in entries:
+        key = normalize_email_for_key(email)
+        if key:
+            rows.append((email, _coerce_utc(sent_at)))
+    if not rows:
+        return 0
+    conn: Optional[sqlite3.Connection] = None
+    try:
+        conn = _ensure_history_db()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO send_history_cache(email, last_sent) VALUES (?, ?)",
+                [(normalize_email_for_key(email), ts.isoformat()) for email, ts in rows],
+            )
+    except Exception:
+        pass
+    finally:
+        if conn is not None:
+            conn.close()
+
+    try:
+        from emailbot import history_service
+
+        history_service.mark_sent_many(
+            [(email, "__cooldown__", None, ts) for email, ts in rows],
+            smtp_result="ok",
+        )
+    except Exception:
+        pass
+    return len(rows)
+
+
 def _cooldown_days(days: Optional[int]) -> int:
     if days is not None:
         return days
@@ -238,6 +277,8 @@ class CooldownService:
         hits: List[CooldownHit] = []
         seen: set[str] = set()
         cache = _merged_history_map()
+        emails = list(emails)
+        history = _last_from_history_many(emails) if window_days > 0 else {}
 
         for email_raw in emails:
             key = normalize_email_for_key(email_raw)
@@ -250,6 +291,7 @@ class CooldownService:
                 days=window_days,
                 now=current,
                 _cache=cache,
+                _history=history,
             )
             if skip:
                 if last is None:
@@ -276,6 +318,10 @@ def _gmail_canonical(local: str, domain: str) -> str:
 def normalize_email_for_key(raw: str) -> str:
     """Return a canonical e-mail identifier suitable for cooldown lookups."""
 
+    return get_email_key(raw).cooldown
+
+
+def _cooldown_key(raw: str) -> str:
     if not raw:
         return ""
     addr = email.utils.parseaddr(str(raw))[1].strip()
@@ -341,6 +387,27 @@ def _last_from_history(email_raw: str) -> tuple[Optional[datetime], Optional[str
     return dt, group or None
 
 
+def _last_from_history_many(
+    emails: Iterable[str],
+) -> Dict[str, Tuple[Optional[datetime], Optional[str]]]:
+    """Bulk :func:`_last_from_history` keyed by the raw addresses."""
+
+    emails = list(emails)
+    try:
+        from emailbot import history_service
+
+        found = history_service.get_last_sent_any_group_many(emails)
+    except Exception:
+        return {}
+
+    result: Dict[str, Tuple[Optional[datetime], Optional[str]]] = {
+        email_raw: (None, None) for email_raw in emails
+    }
+    for email_raw, (group, dt) in found.items():
+        result[email_raw] = (_coerce_utc(dt), group or None)
+    return result
+
+
 def get_last_sent_at(email_raw: str) -> Optional[datetime]:
     key = normalize_email_for_key(email_raw)
     if not key:
@@ -383,6 +450,7 @@ def is_under_cooldown(
     days: int,
     now: Optional[datetime] = None,
     _cache: Optional[Dict[str, datetime]] = None,
+    _history: Optional[Dict[str, Tuple[Optional[datetime], Optional[str]]]] = None,
 ) -> Tuple[bool, Optional[datetime]]:
     if not email or days <= 0:
         return False, None
@@ -392,12 +460,17 @@ def is_under_cooldown(
         return False, None
 
     current = _coerce_utc(now)
-    cache = _cache or _merged_history_map()
+    # An empty ``_cache`` is still the whole (empty) table, not a miss.
+    cache = _cache if _cache is not None else _merged_history_map()
     last = cache.get(key)
-    if last is None:
+    if last is None and _cache is None:
+        # ``_cache`` is already the whole table when the caller passes it.
         last = _load_cached_last(key)
     if last is None:
-        last, _ = _last_from_history(email)
+        if _history is not None and email in _history:
+            last, _ = _history[email]
+        else:
+            last, _ = _last_from_history(email)
     if last is None:
         return False, None
 
@@ -514,6 +587,8 @@ def audit_emails(
         return {"ready": ready_norms, "under": set(), "last_contact": {}}
 
     cache = _merged_history_map()
+    emails = list(emails)
+    history = _last_from_history_many(emails)
     ready: set[str] = set()
     under: set[str] = set()
     last_contact: Dict[str, datetime] = {}
@@ -530,6 +605,7 @@ def audit_emails(
             days=days,
             now=current,
             _cache=cache,
+            _history=history,
         )
         if skip:
             under.add(key)
@@ -566,6 +642,7 @@ __all__ = [
     "get_last_sent_at",
     "is_under_cooldown",
     "mark_sent",
+    "mark_sent_many",
     "normalize_email",
     "normalize_email_for_key",
     "should_skip_by_cooldown",
@@ -15,7 +15,12 @@ import time
 from collections import defaultdict, deque
 from email.message import EmailMessage
 from email.utils import getaddresses
-from typing import Deque, Iterable, List, Optional, Set
+from typing import TYPE_CHECKING, Deque, Iterable, List, Optional, Set
+
+from . import metrics
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .smtp_pool import SmtpAccount
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +70,8 @@ class SmtpClient:
         password: str,
         use_ssl: Optional[bool] = None,
         timeout: Optional[float] = None,
+        *,
+        starttls: bool = True,
     ):
         self.host = host
         self.port = port
@@ -78,6 +85,8 @@ class SmtpClient:
             else:
                 use_ssl = env == "1"
         self.use_ssl = use_ssl
+        # Только для локальных релеев без TLS; по умолчанию STARTTLS обязателен.
+        self.starttls = starttls
         if timeout is None:
             try:
                 timeout = float(os.getenv("SMTP_TIMEOUT", "30"))
@@ -96,7 +105,8 @@ class SmtpClient:
             self._server = smtplib.SMTP(
                 self.host, self.port, timeout=self.timeout
             )
-            self._server.starttls(context=context)
+            if self.starttls:
+                self._server.starttls(context=context)
         self._server.login(self.username, self.password)
         return self
 
@@ -217,7 +227,7 @@ def _throttle_block() -> None:
 class RobustSMTP:
     """SMTP клиент с автоматическим переподключением."""
 
-    def __init__(self) -> None:
+    def __init__(self, account: "SmtpAccount | None" = None) -> None:
         self.host = os.getenv("SMTP_HOST", "smtp.mail.ru")
         try:
             self.port = int(os.getenv("SMTP_PORT", "465"))
@@ -230,6 +240,11 @@ class RobustSMTP:
             self.timeout = 20
         self.user = os.getenv("EMAIL_ADDRESS")
         self.pwd = os.getenv("EMAIL_PASSWORD")
+        if account is not None:
+            # Ящик из пула аккаунтов (см. emailbot.smtp_pool).
+            self.host, self.port = account.host, account.port
+            self.ssl = account.use_ssl if account.use_ssl is not None else account.port == 465
+            self.user, self.pwd = account.address, account.password
         self._smtp: Optional[smtplib.SMTP] = None
         self._logged_config = False
         self._ssl_ctx = ssl.create_default_context()
@@ -283,9 +298,14 @@ class RobustSMTP:
             self.connect()
 
     def send(self, msg: EmailMessage):
-        self.ensure()
-        assert self._smtp is not None
-        return self._smtp.send_message(msg)
+        with metrics.SMTP_SEND_SECONDS.time():
+            try:
+                self.ensure()
+                assert self._smtp is not None
+                return self._smtp.send_message(msg)
+            except Exception:
+                metrics.SMTP_SEND_ERRORS.inc()
+                raise
 
     def close(self) -> None:
         if self._smtp is not None:
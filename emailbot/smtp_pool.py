@@ -0,0 +1,383 @@
+"""Pool of SMTP accounts with per-account daily caps, pacing and health.
+
+A single mailbox used to be the ceiling on campaign throughput: every sender
+read ``EMAIL_ADDRESS``/``EMAIL_PASSWORD``.  :class:`AccountPool` holds several
+accounts described by ``SMTP_ACCOUNTS`` (inline JSON or the path of a JSON
+file), each with its own server, daily cap, per-minute rate and IMAP ``Sent``
+folder::
+
+    [{"name": "main", "address": "a@mail.ru", "password_env": "MAIN_PASSWORD",
+      "daily_cap": 300, "per_minute": 20},
+     {"name": "spare", "address": "b@yandex.ru", "password": "...",
+      "host": "smtp.yandex.ru", "imap_host": "imap.yandex.ru", "daily_cap": 200}]
+
+Without ``SMTP_ACCOUNTS`` the pool has one account built from the usual
+``EMAIL_ADDRESS``/``SMTP_*``/``IMAP_*`` settings and no cap of its own.
+
+:meth:`AccountPool.shard` splits recipients across the accounts that are
+healthy and have capacity left, in proportion to that capacity.  An account
+that gets :data:`BURST` temporary failures (4xx replies or dropped
+connections) in a row is rested for an exponentially growing period;
+authentication failures rest it for the maximum period at once.
+Per-recipient 5xx rejections do not count against the account.
+
+Only the per-account usage lives here (``smtp_account_usage`` in the history
+database); cooldown, history and the global daily limit stay global.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from .smtp_client import SmtpClient
+
+logger = logging.getLogger(__name__)
+
+BURST = 3
+BACKOFF_BASE_SECONDS = 60.0
+BACKOFF_MAX_SECONDS = 3600.0
+AUTH_CODES = frozenset({530, 534, 535})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS smtp_account_usage(
+    account TEXT    NOT NULL,
+    day     TEXT    NOT NULL,
+    sent    INTEGER NOT NULL,
+    PRIMARY KEY (account, day)
+) WITHOUT ROWID;
+"""
+
+_SCHEMA_LOCK = threading.Lock()
+_SCHEMA_PATH: Path | None = None
+
+
+class NoAccountAvailable(RuntimeError):
+    """Every account is resting or has used up its daily cap."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"no SMTP account available, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class SmtpAccount:
+    name: str
+    address: str
+    password: str = field(repr=False)
+    host: str = "smtp.mail.ru"
+    port: int = 465
+    use_ssl: bool | None = None
+    starttls: bool = True
+    daily_cap: int = 0
+    per_minute: int = 0
+    imap_host: str = "imap.mail.ru"
+    imap_port: int = 993
+    sent_folder: str | None = None
+
+    @property
+    def key(self) -> str:
+        return self.address.strip().lower()
+
+    @property
+    def min_interval(self) -> float:
+        """Seconds between two sends that keep within ``per_minute``."""
+
+        return 60.0 / self.per_minute if self.per_minute > 0 else 0.0
+
+    def client(self) -> SmtpClient:
+        return SmtpClient(
+            self.host,
+            self.port,
+            self.address,
+            self.password,
+            use_ssl=self.use_ssl,
+            starttls=self.starttls,
+        )
+
+
+def _bool(value: Any) -> bool | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
+
+
+def _account(entry: dict[str, Any], index: int) -> SmtpAccount:
+    address = str(entry.get("address") or entry.get("user") or "").strip()
+    if not address:
+        raise ValueError(f"SMTP_ACCOUNTS[{index}]: 'address' is required")
+    password = entry.get("password")
+    if password is None and entry.get("password_env"):
+        password = os.getenv(str(entry["password_env"]), "")
+    starttls = _bool(entry.get("starttls"))
+    return SmtpAccount(
+        name=str(entry.get("name") or address),
+        address=address,
+        password=str(password or ""),
+        host=str(entry.get("host") or os.getenv("SMTP_HOST", "smtp.mail.ru")),
+        port=int(entry.get("port") or os.getenv("SMTP_PORT", "465")),
+        use_ssl=_bool(entry.get("ssl")),
+        starttls=True if starttls is None else starttls,
+        daily_cap=max(0, int(entry.get("daily_cap") or 0)),
+        per_minute=max(0, int(entry.get("per_minute") or 0)),
+        imap_host=str(entry.get("imap_host") or os.getenv("IMAP_HOST", "imap.mail.ru")),
+        imap_port=int(entry.get("imap_port") or os.getenv("IMAP_PORT", "993")),
+        sent_folder=entry.get("sent_folder") or None,
+    )
+
+
+def load_accounts(raw: str | None = None) -> list[SmtpAccount]:
+    """Accounts from ``raw`` (default ``SMTP_ACCOUNTS``) or the single env account."""
+
+    raw = (os.getenv("SMTP_ACCOUNTS", "") if raw is None else raw).strip()
+    if not raw:
+        ssl_env = os.getenv("SMTP_SSL")
+        return [
+            SmtpAccount(
+                name="default",
+                address=os.getenv("EMAIL_ADDRESS", ""),
+                password=os.getenv("EMAIL_PASSWORD", ""),
+                host=os.getenv("SMTP_HOST", "smtp.mail.ru"),
+                port=int(os.getenv("SMTP_PORT", "465")),
+                use_ssl=None if not ssl_env else ssl_env == "1",
+                imap_host=os.getenv("IMAP_HOST", "imap.mail.ru"),
+                imap_port=int(os.getenv("IMAP_PORT", "993")),
+            )
+        ]
+    if not raw.startswith("["):
+        raw = Path(raw).expanduser().read_text(encoding="utf-8")
+    entries = json.loads(raw)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("SMTP_ACCOUNTS must be a non-empty JSON list")
+    accounts = [_account(entry, index) for index, entry in enumerate(entries)]
+    if len({account.key for account in accounts}) != len(accounts):
+        raise ValueError("SMTP_ACCOUNTS lists the same address twice")
+    return accounts
+
+
+def _connect():
+    global _SCHEMA_PATH
+    from . import history_service, history_store
+
+    history_service.ensure_initialized()
+    path = history_store._DB_PATH
+    conn = history_store.get_connection()
+    with _SCHEMA_LOCK:
+        if _SCHEMA_PATH != path:
+            conn.executescript(_SCHEMA)
+            _SCHEMA_PATH = path
+    return conn
+
+
+def _today() -> str:
+    from .settings import REPORT_TZ
+
+    return datetime.now(ZoneInfo(REPORT_TZ)).date().isoformat()
+
+
+@dataclass
+class _Health:
+    failures: int = 0
+    trips: int = 0
+    resting_until: float = 0.0
+    last_error: str = ""
+
+
+class AccountPool:
+    """Capacity- and health-aware selection among :class:`SmtpAccount` objects."""
+
+    def __init__(
+        self,
+        accounts: Sequence[SmtpAccount],
+        *,
+        burst: int = BURST,
+        backoff_base: float = BACKOFF_BASE_SECONDS,
+        backoff_max: float = BACKOFF_MAX_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not accounts:
+            raise ValueError("AccountPool needs at least one account")
+        self.accounts = list(accounts)
+        self.burst = max(1, burst)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._health = {account.key: _Health() for account in self.accounts}
+
+    # -- usage ---------------------------------------------------------------
+    def sent_today(self, account: SmtpAccount) -> int:
+        row = (
+            _connect()
+            .execute(
+                "SELECT sent FROM smtp_account_usage WHERE account = ? AND day = ?",
+                (account.key, _today()),
+            )
+            .fetchone()
+        )
+        return int(row[0]) if row else 0
+
+    def remaining(self, account: SmtpAccount) -> int | None:
+        """Sends left today under the account's cap; ``None`` without a cap."""
+
+        if account.daily_cap <= 0:
+            return None
+        return max(0, account.daily_cap - self.sent_today(account))
+
+    # -- health --------------------------------------------------------------
+    def resting(self, account: SmtpAccount) -> bool:
+        with self._lock:
+            return self._health[account.key].resting_until > self._clock()
+
+    def record_success(self, account: SmtpAccount) -> None:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO smtp_account_usage(account, day, sent) VALUES (?, ?, 1)"
+                " ON CONFLICT(account, day) DO UPDATE SET sent = sent + 1",
+                (account.key, _today()),
+            )
+        with self._lock:
+            health = self._health[account.key]
+            health.failures = 0
+            health.trips = 0
+
+    def record_failure(
+        self, account: SmtpAccount, code: int | None = None, error: str = ""
+    ) -> None:
+        """Count a failed send; ``code`` ``None`` means the connection failed."""
+
+        if code is not None and 500 <= code < 600 and code not in AUTH_CODES:
+            return  # the recipient was rejected, the account is fine
+        now = self._clock()
+        with self._lock:
+            health = self._health[account.key]
+            health.last_error = error or str(code or "")
+            if code in AUTH_CODES:
+                health.resting_until = now + self.backoff_max
+                health.failures = 0
+            else:
+                health.failures += 1
+                if health.failures < self.burst:
+                    return
+                health.failures = 0
+                health.trips += 1
+                delay = min(self.backoff_base * 2 ** (health.trips - 1), self.backoff_max)
+                health.resting_until = now + delay
+            until = health.resting_until
+        logger.warning(
+            "smtp account %s rested for %.0fs after %s",
+            account.name,
+            until - now,
+            health.last_error or "errors",
+        )
+
+    # -- selection -----------------------------------------------------------
+    def available(self) -> list[tuple[SmtpAccount, int | None]]:
+        """Healthy accounts with capacity left, with their remaining capacity."""
+
+        result = []
+        for account in self.accounts:
+            if self.resting(account):
+                continue
+            left = self.remaining(account)
+            if left is None or left > 0:
+                result.append((account, left))
+        return result
+
+    def shard(self, recipients: Sequence[str]) -> list[tuple[SmtpAccount, list[str]]]:
+        """Split ``recipients`` over the available accounts by remaining capacity.
+
+        Recipients beyond the total capacity are left out; an empty list
+        means no account can send right now.
+        """
+
+        total = len(recipients)
+        available = self.available()
+        if not total or not available:
+            return []
+        caps = [total if left is None else min(left, total) for _, left in available]
+        budget = min(total, sum(caps))
+        weight = sum(caps)
+        # Largest remainder apportionment, bounded by each account's capacity.
+        shares = [budget * cap // weight for cap in caps]
+        order = sorted(
+            range(len(caps)), key=lambda i: (budget * caps[i] % weight, caps[i]), reverse=True
+        )
+        for i in order:
+            if sum(shares) >= budget:
+                break
+            if shares[i] < caps[i]:
+                shares[i] += 1
+        plan, start = [], 0
+        for (account, _), share in zip(available, shares, strict=True):
+            if share:
+                plan.append((account, list(recipients[start : start + share])))
+                start += share
+        return plan
+
+    def retry_after(self) -> float:
+        """Seconds until a resting account is back (one minute if none is resting)."""
+
+        now = self._clock()
+        with self._lock:
+            waits = [h.resting_until - now for h in self._health.values() if h.resting_until > now]
+        return max(1.0, min(waits)) if waits else 60.0
+
+    def status(self) -> list[dict[str, Any]]:
+        now = self._clock()
+        result = []
+        for account in self.accounts:
+            with self._lock:
+                health = self._health[account.key]
+                rest = max(0.0, health.resting_until - now)
+                last_error = health.last_error
+            result.append(
+                {
+                    "name": account.name,
+                    "sent_today": self.sent_today(account),
+                    "daily_cap": account.daily_cap,
+                    "resting_for": rest,
+                    "last_error": last_error,
+                }
+            )
+        return result
+
+
+_POOL: AccountPool | None = None
+_POOL_CONFIG: str | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> AccountPool:
+    """Return the process pool, rebuilt when ``SMTP_ACCOUNTS`` changes."""
+
+    global _POOL, _POOL_CONFIG
+    config = "|".join(
+        os.getenv(name, "") for name in ("SMTP_ACCOUNTS", "EMAIL_ADDRESS", "SMTP_HOST")
+    )
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_CONFIG != config:
+            _POOL = AccountPool(load_accounts())
+            _POOL_CONFIG = config
+        return _POOL
+
+
+__all__ = [
+    "AccountPool",
+    "NoAccountAvailable",
+    "SmtpAccount",
+    "load_accounts",
+    "get_pool",
+]
@@ -0,0 +1,356 @@
+"""In-memory index over every stop-list source.
+
+Blocked addresses are spread over several stores: the shared
+``blocked_emails.txt`` (written by :mod:`emailbot.suppress_list` and
+:class:`utils.blocked_store.BlockedStore`), the legacy rules blocklist
+(:mod:`utils.rules`), the hard-bounce suppression CSV
+(:data:`emailbot.messaging_utils.SUPPRESS_PATH`), the SQLite
+``blocked_emails`` table of the storage backend and history-derived
+unsubscribes/hard bounces.  Checking them one by one used to re-read and
+re-parse files for every candidate address.
+
+:class:`StopListIndex` keeps the union of all sources in memory.  Each source
+exposes a cheap signature (path, ``st_mtime_ns``, size); a source is re-read
+only when its signature changes, so :meth:`StopListIndex.is_blocked` is a few
+``stat`` calls plus set lookups and :meth:`StopListIndex.filter_blocked`
+checks the signatures once per batch.  Writers append to the files (see
+:func:`emailbot.suppress_list.add_blocked`), never rewrite them.
+"""
+
+from __future__ import annotations
+
+import csv
+import importlib
+import logging
+import os
+import sqlite3
+import time
+import unicodedata
+from collections.abc import Callable, Hashable, Iterable
+from pathlib import Path
+from threading import RLock
+
+from utils.email_key import get_email_key
+
+logger = logging.getLogger(__name__)
+
+Normalizer = Callable[[str], str]
+
+
+def _module_attr(module: str, name: str):
+    try:
+        return getattr(importlib.import_module(module), name)
+    except Exception:
+        return None
+
+
+def _file_signature(path: Path | None) -> Hashable:
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (str(path), None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _read_lines(path: Path) -> set[str]:
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return set()
+    return {line.strip() for line in text.splitlines() if line.strip()}
+
+
+def _read_csv_emails(path: Path) -> set[str]:
+    try:
+        with Path(path).open("r", newline="", encoding="utf-8") as fh:
+            return {(row.get("email") or "").strip() for row in csv.DictReader(fh)} - {""}
+    except FileNotFoundError:
+        return set()
+
+
+class StopListSource:
+    """One origin of blocked addresses.
+
+    ``signature`` must be cheap and change whenever ``load`` would return
+    something different.
+    """
+
+    def __init__(self, name: str, signature: Callable[[], Hashable], load: Callable[[], Iterable[str]]):
+        self.name = name
+        self.signature = signature
+        self.load = load
+
+
+def file_source(name: str, path: Callable[[], Path | str | None], *, csv_column: bool = False) -> StopListSource:
+    """Source backed by a text file (one address per line) or a CSV with ``email``."""
+
+    def resolve() -> Path | None:
+        value = path()
+        return Path(value) if value else None
+
+    def load() -> set[str]:
+        target = resolve()
+        if target is None:
+            return set()
+        return _read_csv_emails(target) if csv_column else _read_lines(target)
+
+    return StopListSource(name, lambda: _file_signature(resolve()), load)
+
+
+def _sqlite_blocked_source() -> StopListSource:
+    def resolve() -> Path | None:
+        if os.getenv("EMAILBOT_STORAGE", "file").lower() != "sqlite":
+            return None
+        return _module_attr("emailbot.storage.sqlite_store", "DB_PATH")
+
+    def signature() -> Hashable:
+        path = resolve()
+        if path is None:
+            return None
+        return (_file_signature(path), _file_signature(Path(f"{path}-wal")))
+
+    def load() -> set[str]:
+        path = resolve()
+        if path is None or not Path(path).exists():
+            return set()
+        conn = sqlite3.connect(str(path), timeout=30)
+        try:
+            return {row[0] for row in conn.execute("SELECT email FROM blocked_emails") if row[0]}
+        except sqlite3.Error:
+            return set()
+        finally:
+            conn.close()
+
+    return StopListSource("sqlite", signature, load)
+
+
+def _history_source() -> StopListSource:
+    """Unsubscribes and hard bounces exposed by :mod:`emailbot.history_service`."""
+
+    attrs = ("iter_unsubscribed", "iter_hard_bounces")
+
+    def loaders() -> list[tuple[str, Callable[[], Iterable[str]]]]:
+        found = ((attr, _module_attr("emailbot.history_service", attr)) for attr in attrs)
+        return [(attr, loader) for attr, loader in found if callable(loader)]
+
+    def signature() -> Hashable:
+        if not loaders():
+            return None
+        path = _module_attr("emailbot.history_store", "_DB_PATH")
+        return (_file_signature(path), _file_signature(Path(f"{path}-wal")) if path else None)
+
+    def load() -> set[str]:
+        result: set[str] = set()
+        for attr, loader in loaders():
+            try:
+                result.update(str(item) for item in loader() or [] if item)
+            except Exception:
+                logger.debug("stoplist index: %s() failed", attr, exc_info=True)
+        return result
+
+    return StopListSource("history", signature, load)
+
+
+def default_sources() -> list[StopListSource]:
+    def suppress_list_path():
+        getter = _module_attr("emailbot.suppress_list", "blocklist_path")
+        return getter() if callable(getter) else None
+
+    return [
+        file_source("blocked_emails", suppress_list_path),
+        file_source("rules", lambda: _module_attr("utils.rules", "BLOCKLIST_PATH")),
+        file_source(
+            "suppress_csv",
+            lambda: _module_attr("emailbot.messaging_utils", "SUPPRESS_PATH"),
+            csv_column=True,
+        ),
+        _sqlite_blocked_source(),
+        _history_source(),
+    ]
+
+
+def _lower(addr: str) -> str:
+    return unicodedata.normalize("NFKC", addr or "").strip().lower()
+
+
+def _idna_key(addr: str) -> str:
+    return get_email_key(addr).idna
+
+
+def _history_key(addr: str) -> str:
+    return get_email_key(addr).history
+
+
+def default_normalizers() -> list[Normalizer]:
+    """Key functions matching the historical checks of every source.
+
+    The forms come from :func:`utils.email_key.get_email_key`, so a batch
+    pays for each address's normalisation once, shared with the other filters.
+    """
+
+    return [_lower, _idna_key, _history_key]
+
+
+class StopListIndex:
+    """Union of :class:`StopListSource` sets, refreshed on signature change."""
+
+    def __init__(
+        self,
+        sources: Iterable[StopListSource] | None = None,
+        *,
+        normalizers: Iterable[Normalizer] | None = None,
+        check_interval: float | None = None,
+    ):
+        self._sources = list(default_sources() if sources is None else sources)
+        self._normalizers = list(default_normalizers() if normalizers is None else normalizers)
+        if check_interval is None:
+            try:
+                check_interval = float(os.getenv("STOPLIST_CHECK_INTERVAL", "0") or 0)
+            except ValueError:
+                check_interval = 0.0
+        self.check_interval = check_interval
+        self._lock = RLock()
+        self._signatures: dict[str, Hashable] = {}
+        self._entries: dict[str, set[str]] = {}
+        self._source_keys: dict[str, tuple[set[str], set[str]]] = {}
+        self._keys: frozenset[str] = frozenset()
+        self._primary: frozenset[str] = frozenset()
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def _keys_for(self, addr: str) -> set[str]:
+        keys = set()
+        for normalize in self._normalizers:
+            try:
+                key = normalize(addr)
+            except Exception:
+                continue
+            if key:
+                keys.add(key)
+        return keys
+
+    def _primary_key(self, addr: str) -> str:
+        for normalize in reversed(self._normalizers[:2]):
+            try:
+                key = normalize(addr)
+            except Exception:
+                continue
+            if key:
+                return key
+        return ""
+
+    def refresh(self, *, force: bool = False) -> bool:
+        """Reload changed sources; return ``True`` when the index changed."""
+
+        now = time.monotonic()
+        with self._lock:
+            if not force and self.check_interval and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            changed = False
+            for source in self._sources:
+                try:
+                    signature = source.signature()
+                except Exception:
+                    logger.debug("stoplist index: %s signature failed", source.name, exc_info=True)
+                    continue
+                known = source.name in self._signatures
+                if not force and known and self._signatures[source.name] == signature:
+                    continue
+                try:
+                    entries = set(source.load())
+                except Exception:
+                    logger.warning("stoplist index: failed to load %s", source.name, exc_info=True)
+                    entries = set()
+                keys: set[str] = set()
+                primary: set[str] = set()
+                for addr in entries:
+                    keys.update(self._keys_for(addr))
+                    key = self._primary_key(addr)
+                    if key and "@" in key:
+                        primary.add(key)
+                self._entries[source.name] = entries
+                self._source_keys[source.name] = (keys, primary)
+                self._signatures[source.name] = signature
+                changed = True
+            if changed:
+                parts = list(self._source_keys.values())
+                self._keys = frozenset().union(*(keys for keys, _ in parts))
+                self._primary = frozenset().union(*(primary for _, primary in parts))
+                self.reloads += 1
+            return changed
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signatures.clear()
+            self._checked_at = 0.0
+
+    def _contains(self, addr: str) -> bool:
+        keys = self._keys
+        return any(key in keys for key in self._keys_for(addr))
+
+    def is_blocked(self, addr: str) -> bool:
+        if not addr:
+            return False
+        self.refresh()
+        return self._contains(addr)
+
+    def filter_blocked(self, emails: Iterable[str]) -> tuple[list[str], list[str]]:
+        """Split ``emails`` into ``(allowed, blocked)`` preserving order."""
+
+        self.refresh()
+        allowed: list[str] = []
+        blocked: list[str] = []
+        for addr in emails:
+            (blocked if addr and self._contains(addr) else allowed).append(addr)
+        return allowed, blocked
+
+    def snapshot(self) -> frozenset[str]:
+        """Canonical form of every blocked address."""
+
+        self.refresh()
+        return self._primary
+
+    def sources(self) -> dict[str, int]:
+        self.refresh()
+        with self._lock:
+            return {name: len(entries) for name, entries in self._entries.items()}
+
+
+_INDEX: StopListIndex | None = None
+_INDEX_LOCK = RLock()
+
+
+def get_index() -> StopListIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = StopListIndex()
+        return _INDEX
+
+
+def is_blocked(addr: str) -> bool:
+    return get_index().is_blocked(addr)
+
+
+def filter_blocked(emails: Iterable[str]) -> tuple[list[str], list[str]]:
+    return get_index().filter_blocked(emails)
+
+
+def invalidate() -> None:
+    get_index().invalidate()
+
+
+__all__ = [
+    "StopListSource",
+    "StopListIndex",
+    "file_source",
+    "default_sources",
+    "default_normalizers",
+    "get_index",
+    "is_blocked",
+    "filter_blocked",
+    "invalidate",
+]
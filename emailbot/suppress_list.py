@@ -107,6 +107,24 @@ def _write_blocklist_locked(items: Iterable[str]) -> None:
     _BLOCKLIST_PATH.write_text(data, encoding="utf-8")
 
 
+def _append_blocklist_locked(items: Iterable[str]) -> None:
+    """Append ``items`` to the block list without rewriting existing lines."""
+
+    _BLOCKLIST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    prefix = ""
+    try:
+        with _BLOCKLIST_PATH.open("rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            if fh.tell():
+                fh.seek(-1, os.SEEK_END)
+                if fh.read(1) != b"\n":
+                    prefix = "\n"
+    except FileNotFoundError:
+        pass
+    with _BLOCKLIST_PATH.open("a", encoding="utf-8") as fh:
+        fh.write(prefix + "".join(f"{item}\n" for item in items))
+
+
 def _ensure_loaded_locked() -> None:
     global _CACHE, _MTIME
 
@@ -159,19 +177,17 @@ def _add_items_locked(items: Iterable[str]) -> int:
         return 0
 
     _ensure_loaded_locked()
-    before = set(_CACHE)
-    updated = before | cleaned
-    if updated == _CACHE:
+    new_items = sorted(cleaned - _CACHE)
+    if not new_items:
         return 0
 
-    ordered = sorted(updated)
-    _write_blocklist_locked(ordered)
-    _CACHE = set(ordered)
+    _append_blocklist_locked(new_items)
+    _CACHE = _CACHE | set(new_items)
     try:
         _MTIME = _BLOCKLIST_PATH.stat().st_mtime
     except FileNotFoundError:
         _MTIME = None
-    return len(updated) - len(before)
+    return len(new_items)
 
 
 def add_blocked(emails: Iterable[str], reason: str | None = None) -> int:
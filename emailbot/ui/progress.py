@@ -1,4 +1,8 @@
-"""Helpers for editing progress messages in Telegram chats."""
+"""Helpers for editing progress messages in Telegram chats.
+
+Edits are queued on :mod:`emailbot.ui.progress_bus`, which coalesces them per
+message and rate-limits them per chat.
+"""
 
 from __future__ import annotations
 
@@ -7,9 +11,9 @@ import time
 from typing import Callable, Optional
 
 from telegram import Message
-from telegram.error import BadRequest
 
 from emailbot.cancel_token import is_cancelled
+from emailbot.ui import progress_bus
 
 
 class Heartbeat:
@@ -41,29 +45,18 @@ class Heartbeat:
         elif now - self._last_sent < self._interval:
             return False
         self._last_sent = now
-        try:
-            await self._msg.edit_text(text)
-            return True
-        except BadRequest as exc:
-            message = str(getattr(exc, "message", exc)).lower()
-            if "message is not modified" in message or "not found" in message:
-                return True
-        except Exception:
-            pass
-        return False
+        progress_bus.publish_message(self._msg, text)
+        return True
 
     async def force(self, text: Optional[str]) -> bool:
-        """Immediately update the message, bypassing the throttle interval."""
+        """Queue the update at once, bypassing the throttle interval."""
 
         if not text or is_cancelled():
             return False
         self._last_text = text
         self._last_sent = time.monotonic()
-        try:
-            await self._msg.edit_text(text)
-            return True
-        except Exception:
-            return False
+        progress_bus.publish_message(self._msg, text)
+        return True
 
     def start(self) -> None:
         """Start background updates using the configured ``supplier``."""
@@ -124,25 +117,11 @@ class ProgressUI:
         if self.total:
             pct = int(min(self.processed, self.total) * 100 / self.total)
         text = f"Отправлено {min(self.processed, self.total)} из {self.total} ({pct}%)"
-        try:
-            await self.bot.edit_message_text(
-                chat_id=self.chat_id,
-                message_id=self.msg_id,
-                text=text,
-            )
-        except Exception:
-            # Прогресс — best-effort, игнорируем ошибки Telegram API.
-            pass
+        # Прогресс — best-effort: промежуточные состояния может вытеснить следующее.
+        progress_bus.publish_edit(self.bot, self.chat_id, self.msg_id, text)
 
     async def finish(self) -> None:
         if self.msg_id is None:
             return
         text = f"Готово. Отправлено {self.processed} из {self.total}."
-        try:
-            await self.bot.edit_message_text(
-                chat_id=self.chat_id,
-                message_id=self.msg_id,
-                text=text,
-            )
-        except Exception:
-            pass
+        await progress_bus.deliver_edit(self.bot, self.chat_id, self.msg_id, text)
@@ -0,0 +1,295 @@
+"""One coalescing queue for every progress-message edit sent to Telegram.
+
+:class:`~emailbot.ui.progress.Heartbeat`, :class:`~emailbot.ui.progress.ProgressUI`,
+the ZIP status pulse and the crawl reports used to call ``edit_text`` on their
+own, so two jobs in one chat (or two producers on one message) could trip the
+flood limit, and a ``RetryAfter`` stalled whichever handler happened to await
+the edit.
+
+Producers now :func:`publish` the latest text of a message and return at once.
+A single drain task per event loop keeps only the newest pending text per
+message (intermediate states are dropped), edits each chat at most once per
+``PROGRESS_EDIT_INTERVAL`` seconds (1.5 by default) and, when Telegram answers
+``RetryAfter``, pauses every chat for the requested time before retrying the
+newest text.  :func:`deliver` does the same but waits for the outcome; use it
+for final states so that no older pending update can land after them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import timedelta
+from typing import Any
+
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+Edit = Callable[[str], Awaitable[Any]]
+Key = tuple[Hashable, Hashable]
+
+
+def _interval() -> float:
+    try:
+        return max(0.0, float(os.getenv("PROGRESS_EDIT_INTERVAL", "") or 1.5))
+    except ValueError:
+        return 1.5
+
+
+def _retry_after_seconds(exc: RetryAfter) -> float:
+    value = getattr(exc, "retry_after", 1)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class _Pending:
+    __slots__ = ("text", "edit", "waiters")
+
+    def __init__(self, text: str, edit: Edit):
+        self.text = text
+        self.edit = edit
+        self.waiters: list[asyncio.Future[bool]] = []
+
+
+class ProgressBus:
+    """Coalesce progress edits per message and rate-limit them per chat."""
+
+    def __init__(
+        self,
+        interval: float | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = _interval() if interval is None else max(0.0, float(interval))
+        self._clock = clock
+        self._pending: dict[Key, _Pending] = {}
+        self._next_edit: dict[Hashable, float] = {}
+        self._paused_until = 0.0
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.stats = {"published": 0, "sent": 0, "superseded": 0, "retry_after": 0}
+
+    def publish(self, key: Key, text: str, edit: Edit) -> asyncio.Future[bool] | None:
+        """Queue ``text`` for the message ``key`` (``(chat_id, message_id)``).
+
+        Never waits for Telegram.  A text still pending for the same message
+        is replaced (its waiters are carried over and get the new outcome).
+        Returns the future of this update, or ``None`` when no event loop runs.
+        """
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        self.stats["published"] += 1
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = _Pending(text, edit)
+        else:
+            if entry.text != text:
+                self.stats["superseded"] += 1
+            entry.text, entry.edit = text, edit
+        future: asyncio.Future[bool] = loop.create_future()
+        entry.waiters.append(future)
+        self._ensure_running()
+        return future
+
+    async def deliver(self, key: Key, text: str, edit: Edit) -> bool:
+        """Queue ``text`` like :meth:`publish` and wait until it is sent."""
+
+        future = self.publish(key, text, edit)
+        if future is None:
+            return await _send(edit, text)
+        return await asyncio.shield(future)
+
+    def discard(self, key: Key) -> None:
+        """Forget a pending update, e.g. before the message is deleted."""
+
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            _resolve(entry, False)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> None:
+        """Wait until every queued update has been sent or dropped."""
+
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    def _ensure_running(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    def _next_ready(self, now: float) -> Key | None:
+        for key in self._pending:
+            if self._next_edit.get(key[0], 0.0) <= now:
+                return key
+        return None
+
+    async def _sleep(self, seconds: float) -> None:
+        assert self._wakeup is not None
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, seconds))
+        except TimeoutError:
+            pass
+
+    async def _drain(self) -> None:
+        while self._pending:
+            now = self._clock()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            key = self._next_ready(now)
+            if key is None:
+                chats = {k[0] for k in self._pending}
+                await self._sleep(min(self._next_edit.get(c, 0.0) for c in chats) - now)
+                continue
+            entry = self._pending.pop(key)
+            self._next_edit[key[0]] = now + self.interval
+            try:
+                await entry.edit(entry.text)
+            except RetryAfter as exc:
+                delay = _retry_after_seconds(exc)
+                self.stats["retry_after"] += 1
+                self._paused_until = self._clock() + delay
+                logger.info("progress edits paused for %.1fs by Telegram", delay)
+                newer = self._pending.get(key)
+                if newer is None:
+                    self._pending[key] = entry
+                else:
+                    newer.waiters[:0] = entry.waiters
+                continue
+            except BadRequest as exc:
+                lowered = str(getattr(exc, "message", exc)).lower()
+                ok = "message is not modified" in lowered or "not found" in lowered
+                if not ok:
+                    logger.debug("progress edit rejected: %s", exc)
+                _resolve(entry, ok)
+                continue
+            except Exception as exc:
+                logger.debug("progress edit failed: %s", exc)
+                _resolve(entry, False)
+                continue
+            self.stats["sent"] += 1
+            _resolve(entry, True)
+        for chat, ready_at in list(self._next_edit.items()):
+            if ready_at <= self._clock():
+                del self._next_edit[chat]
+
+
+def _resolve(entry: _Pending, result: bool) -> None:
+    for future in entry.waiters:
+        if not future.done():
+            future.set_result(result)
+    entry.waiters.clear()
+
+
+async def _send(edit: Edit, text: str) -> bool:
+    try:
+        await edit(text)
+        return True
+    except BadRequest as exc:
+        lowered = str(getattr(exc, "message", exc)).lower()
+        return "message is not modified" in lowered or "not found" in lowered
+    except Exception:
+        return False
+
+
+_BUS: ProgressBus | None = None
+_BUS_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def get_bus() -> ProgressBus:
+    """The bus of the running event loop (a fresh one for each new loop)."""
+
+    global _BUS, _BUS_LOOP
+    try:
+        loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if _BUS is None or (loop is not None and loop is not _BUS_LOOP):
+        _BUS = ProgressBus()
+        _BUS_LOOP = loop
+    return _BUS
+
+
+def reset() -> None:
+    """Drop the shared bus (tests, interval changes)."""
+
+    global _BUS, _BUS_LOOP
+    _BUS = None
+    _BUS_LOOP = None
+
+
+def message_key(msg: Any) -> Key:
+    chat_id = getattr(msg, "chat_id", None)
+    message_id = getattr(msg, "message_id", None)
+    if message_id is None:
+        return ("msg", id(msg))
+    return (chat_id, message_id)
+
+
+def _message_edit(msg: Any, kwargs: dict[str, Any]) -> Edit:
+    def edit(text: str) -> Awaitable[Any]:
+        return msg.edit_text(text, **kwargs)
+
+    return edit
+
+
+def _bot_edit(bot: Any, chat_id: int, message_id: int, kwargs: dict[str, Any]) -> Edit:
+    def edit(text: str) -> Awaitable[Any]:
+        return bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+
+    return edit
+
+
+def publish_message(msg: Any, text: str, **kwargs: Any) -> None:
+    """Queue an ``msg.edit_text(text, **kwargs)`` without waiting."""
+
+    get_bus().publish(message_key(msg), text, _message_edit(msg, kwargs))
+
+
+async def deliver_message(msg: Any, text: str, **kwargs: Any) -> bool:
+    """Edit ``msg`` through the bus and wait for the result."""
+
+    return await get_bus().deliver(message_key(msg), text, _message_edit(msg, kwargs))
+
+
+def publish_edit(bot: Any, chat_id: int, message_id: int, text: str, **kwargs: Any) -> None:
+    """Queue a ``bot.edit_message_text`` call without waiting."""
+
+    edit = _bot_edit(bot, chat_id, message_id, kwargs)
+    get_bus().publish((chat_id, message_id), text, edit)
+
+
+async def deliver_edit(bot: Any, chat_id: int, message_id: int, text: str, **kwargs: Any) -> bool:
+    """``bot.edit_message_text`` through the bus, waiting for the result."""
+
+    edit = _bot_edit(bot, chat_id, message_id, kwargs)
+    return await get_bus().deliver((chat_id, message_id), text, edit)
+
+
+__all__ = [
+    "ProgressBus",
+    "deliver_edit",
+    "deliver_message",
+    "get_bus",
+    "message_key",
+    "publish_edit",
+    "publish_message",
+    "reset",
+]
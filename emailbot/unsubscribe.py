@@ -10,6 +10,7 @@ from aiohttp import web
 
 from utils.email_clean import parse_emails_unified
 
+from . import metrics
 from .messaging import (
     BLOCKED_FILE,
     MarkUnsubscribedResult,
@@ -227,9 +228,14 @@ async def _ping(_: web.Request) -> web.Response:
     return web.Response(text="pong", content_type="text/plain")
 
 
+async def _metrics(_: web.Request) -> web.Response:
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+
 def create_app() -> web.Application:
     app = web.Application()
     app.router.add_get("/unsubscribe", handle)
     app.router.add_post("/unsubscribe", handle)
     app.router.add_get("/unsubscribe/ping", _ping)
+    app.router.add_get("/metrics", _metrics)
     return app
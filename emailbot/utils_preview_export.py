@@ -6,10 +6,12 @@ from datetime import datetime
 from pathlib import Path
 from typing import Iterable
 
+from emailbot.reporting.xlsx_stream import Sheet, export
+
 try:  # pragma: no cover - optional dependency
-    import pandas as pd  # type: ignore
+    import openpyxl  # type: ignore  # noqa: F401
 except Exception:  # pragma: no cover - optional dependency
-    pd = None  # type: ignore
+    openpyxl = None  # type: ignore
 
 
 def _normalize(emails: Iterable[str]) -> list[str]:
@@ -30,23 +32,15 @@ def build_preview_excel(to_send: Iterable[str], suspects: Iterable[str]) -> str:
     outdir = Path("var")
     outdir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path_xlsx = outdir / f"preview_{timestamp}.xlsx"
-    path_csv = outdir / f"preview_{timestamp}.csv"
+    path = outdir / f"preview_{timestamp}.xlsx"
 
     cleaned_to_send = _normalize(to_send)
     cleaned_suspects = _normalize(suspects)
 
-    if pd is None:
-        content = ["to_send", *cleaned_to_send, "", "suspects", *cleaned_suspects]
-        path_csv.write_text("\n".join(content), encoding="utf-8")
-        return str(path_csv)
-
-    with pd.ExcelWriter(path_xlsx, engine="openpyxl") as writer:  # type: ignore[arg-type]
-        pd.DataFrame({"email": cleaned_to_send}).to_excel(
-            writer, sheet_name="to_send", index=False
-        )
-        pd.DataFrame({"email": cleaned_suspects}).to_excel(
-            writer, sheet_name="suspects", index=False
-        )
-    return str(path_xlsx)
-
+    sheets = [
+        Sheet("to_send", ["email"], ([email] for email in cleaned_to_send)),
+        Sheet("suspects", ["email"], ([email] for email in cleaned_suspects)),
+    ]
+    fmt = "csv" if openpyxl is None else None
+    rows = len(cleaned_to_send) + len(cleaned_suspects)
+    return str(export(path, sheets, fmt=fmt, rows_hint=rows))
@@ -33,8 +33,8 @@ from utils.domain_typos import autocorrect_domain
 from utils.dns_check import domain_has_mx
 from utils.email_norm import sanitize_for_send
 from utils.text_normalize import normalize_text
-from utils.email_role import classify_email_role
-from utils.name_match import fio_candidates, fio_match_score
+from utils.email_role import classify_email_role, classify_many
+from utils.name_match import FioMatcher, fio_candidates
 
 from utils.tld_utils import is_allowed_domain, is_foreign_domain
 
@@ -228,6 +228,7 @@ def extract_emails_pipeline(
     except Exception:
         pass
     fio_pairs = fio_candidates(source_text)
+    fio_matcher = FioMatcher(fio_pairs)
 
     def _merge_reason(reason: str | None, extra: str) -> str:
         parts = [
@@ -295,6 +296,7 @@ def extract_emails_pipeline(
         right = min(len(raw_text), end + window)
         return raw_text[left:right]
 
+    pending: List[Tuple[Dict[str, object], str, str, str]] = []
     for item in items:
         if aborted or should_stop():
             aborted = True
@@ -314,10 +316,15 @@ def extract_emails_pipeline(
                 span_tuple = None
         else:
             span_tuple = None
-        snippet = slice_with_context(span_tuple)
-        local, _, domain = candidate.partition("@")
-        info = classify_email_role(local, domain, context_text=snippet)
-        fio_score = fio_match_score(local, raw_text, candidates=fio_pairs)
+        pending.append((item, candidate, sanitized, slice_with_context(span_tuple)))
+
+    infos_batch = classify_many(
+        [candidate for _, candidate, _, _ in pending],
+        contexts=[snippet for _, _, _, snippet in pending],
+        candidates=fio_matcher,
+    )
+    for (item, candidate, sanitized, snippet), info in zip(pending, infos_batch):
+        fio_score = float(info["fio_score"])
         _apply_fio_boost(info, fio_score)
         item["role_class"] = info.get("class")
         item["role_score"] = info.get("score")
@@ -370,13 +377,13 @@ def extract_emails_pipeline(
         if not infos:
             context = snippets.get(addr, raw_text)
             info = classify_email_role(local, domain, context_text=context)
-            score = fio_match_score(local, source_text, candidates=fio_pairs)
+            score = fio_matcher.score(local)
             _apply_fio_boost(info, score)
             infos = [info]
         else:
             missing = [info for info in infos if "fio_score" not in info]
             if missing:
-                score = fio_match_score(local, source_text, candidates=fio_pairs)
+                score = fio_matcher.score(local)
                 for info in missing:
                     _apply_fio_boost(info, score)
 
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Microbenchmark for :class:`emailbot.audit.AuditWriter`.
+
+Usage: ``python scripts/bench_audit_writer.py [COUNT]`` (default 100000).
+Appends COUNT pre-encoded lines with the old open-per-record pattern and
+through the buffered log, then COUNT full records through ``AuditWriter``
+(JSON encoding included) and a sample in strict (fsync per record) mode.
+Prints records/second for each.
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from emailbot.audit import AuditWriter, _BufferedLog
+
+
+def _timed(label: str, count: int, func) -> None:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {count / elapsed:12.0f} records/s ({elapsed:.2f}s)")
+
+
+def _lines(count: int) -> list[str]:
+    return [
+        json.dumps({"type": "sent", "email": f"user{idx}@example.com"}) + "\n"
+        for idx in range(count)
+    ]
+
+
+def _open_per_record(path: Path, lines: list[str]) -> None:
+    for line in lines:
+        with path.open("a", encoding="utf-8") as fh:
+            fh.write(line)
+
+
+def _buffered_lines(path: Path, lines: list[str]) -> None:
+    log = _BufferedLog(path)
+    for line in lines:
+        log.append(line)
+    log.close()
+
+
+def _buffered(path: Path, count: int, *, strict: bool) -> None:
+    with AuditWriter(path, "bench", strict=strict) as writer:
+        for idx in range(count):
+            writer.log_sent(f"user{idx}@example.com")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    strict_count = max(count // 100, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        lines = _lines(count)
+        _timed("open per record", count, lambda: _open_per_record(base / "a.jsonl", lines))
+        _timed("buffered lines", count, lambda: _buffered_lines(base / "b.jsonl", lines))
+        _timed("AuditWriter", count, lambda: _buffered(base / "c.jsonl", count, strict=False))
+        _timed(
+            "strict (fsync)",
+            strict_count,
+            lambda: _buffered(base / "d.jsonl", strict_count, strict=True),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Compare per-address role/FIO classification with ``classify_many``.
+
+Usage: ``python scripts/bench_classify_many.py [COUNT] [TEXT_MB]`` (defaults
+5000 addresses, 2 MB of text).  Builds a synthetic document full of names
+and addresses, classifies every address the way the extraction pipeline used
+to (``classify_email_role`` + ``fio_match_score`` per address) and with one
+``classify_many`` call, checks that both agree and prints the timings.
+"""
+
+import random
+import sys
+import time
+
+from utils.email_role import classify_email_role, classify_many
+from utils.name_match import fio_candidates, fio_match_score
+
+FIRST = ["Сергей", "Анна", "Иван", "Мария", "John", "Mary", "Олег", "Elena", "Пётр", "Ольга"]
+LAST = ["Иванов", "Петрова", "Smith", "Кузнецов", "O'Neil", "Соколова", "Brown", "Лебедев"]
+WORDS = ["кафедра", "автор", "статья", "journal", "университет", "press", "данные", "и", "в"]
+
+
+def _document(count: int, size: int) -> tuple[list[str], str]:
+    rnd = random.Random(42)
+    emails = []
+    for idx in range(count):
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        local = rnd.choice(
+            [f"user{idx}", f"{first[:1]}.{last}{idx}", "info", f"{last}_{idx}", f"x{idx}"]
+        )
+        emails.append(f"{local.lower()}@example{idx % 50}.ru")
+    chunks, length = [], 0
+    while length < size:
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        piece = (
+            f"{first} {last}{rnd.randrange(1000)} {' '.join(rnd.choices(WORDS, k=12))} "
+            f"{rnd.choice(emails)}\n"
+        )
+        chunks.append(piece)
+        length += len(piece)
+    return emails, "".join(chunks)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 2 * 1024 * 1024
+    emails, text = _document(count, size)
+    contexts = [text[i * 97 % len(text) :][:360] for i in range(count)]
+
+    started = time.perf_counter()
+    pairs = fio_candidates(text)
+    candidates_s = time.perf_counter() - started
+    print(f"{len(emails)} addresses, {len(text) / 1e6:.1f} MB text, {len(pairs)} name pairs")
+    print(f"fio_candidates               {candidates_s:8.2f} s")
+
+    started = time.perf_counter()
+    old = []
+    for email, ctx in zip(emails, contexts, strict=True):
+        local, _, domain = email.partition("@")
+        info = classify_email_role(local, domain, context_text=ctx)
+        info["fio_score"] = fio_match_score(local, text, candidates=pairs)
+        old.append(info)
+    print(f"per-address                  {time.perf_counter() - started:8.2f} s")
+
+    started = time.perf_counter()
+    new = classify_many(emails, text, contexts=contexts, candidates=pairs)
+    print(f"classify_many                {time.perf_counter() - started:8.2f} s")
+    assert new == old, "classify_many disagrees with the per-address helpers"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Time ``prepare_mass_mailing`` with cold and warm e-mail key caches.
+
+Usage: ``python scripts/bench_email_key.py [COUNT]`` (default 5000 addresses).
+All state files live in a temporary directory.  The first run fills the
+:mod:`utils.email_key` cache, the second reuses it, as a preview followed by
+the send of the same list does; ``EMAIL_KEY_CACHE_SIZE=0`` disables the cache
+for comparison.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+STATE = Path(tempfile.mkdtemp(prefix="bench_email_key_"))
+for name, filename in {
+    "SEND_STATS_PATH": "send_stats.jsonl",
+    "SENT_LOG_PATH": "sent_log.csv",
+    "SYNC_STATE_PATH": "sync_state.json",
+    "SEND_HISTORY_SQLITE_PATH": "send_history.sqlite",
+    "HISTORY_DB_PATH": "history.sqlite",
+    "MASS_STATE_PATH": "mass_state.json",
+    "CAMPAIGN_QUEUE_DB": "campaign_queue.sqlite",
+    "SEND_JOURNAL_PATH": "send_journal.wal",
+}.items():
+    os.environ[name] = str(STATE / filename)
+
+from emailbot import messaging, suppress_list  # noqa: E402
+from utils import email_key  # noqa: E402
+
+LOCALS = ["ivan", "Anna.K", "info", "x+tag", "petrov.s"]
+DOMAINS = ["gmail.com", "mail.ru", "example.com", "почта.рф", "yandex.ru", "uni.edu"]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rnd = random.Random(1)
+    emails = [f"{rnd.choice(LOCALS)}{i}@{rnd.choice(DOMAINS)}" for i in range(count)]
+    blocked = STATE / "blocked_emails.txt"
+    blocked.write_text("".join(f"{e}\n" for e in emails[::50]), encoding="utf-8")
+    suppress_list.init_blocked(blocked)
+    messaging.BLOCKED_FILE = str(blocked)
+
+    email_key.clear_cache()
+    for label in ("cold", "warm", "warm"):
+        started = time.perf_counter()
+        ready, *_rest, digest = messaging.prepare_mass_mailing(emails)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{label:5} {elapsed:7.3f} s  {elapsed / count * 1e6:7.1f} µs/address  ready={len(ready)}"
+        )
+    print(email_key.cache_info())
+
+
+if __name__ == "__main__":
+    main()
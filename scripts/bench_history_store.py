@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Measure per-address cost of send-history lookups and writes.
+
+Usage: ``python scripts/bench_history_store.py [COUNT]`` (default 5000).
+Runs against a temporary database and prints microseconds per address for
+the single-row helpers and for the bulk ``*_many`` variants.
+"""
+
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from emailbot import history_store
+
+
+def _timed(label: str, count: int, func) -> None:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1e6 / max(count, 1):10.1f} us/address")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    now = datetime.now(UTC)
+    emails = [f"user{idx}@example.com" for idx in range(count)]
+    rows = [
+        (email, "bench", now - timedelta(days=idx % 365), "", "", "ok")
+        for idx, email in enumerate(emails)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history_store.init_db(Path(tmp) / "state.db")
+        _timed("record_send_many", count, lambda: history_store.record_send_many(rows))
+        _timed(
+            "record_send (per address)",
+            count,
+            lambda: [history_store.record_send(e, "bench2", now) for e in emails],
+        )
+        _timed(
+            "last_send (per address)",
+            count,
+            lambda: [history_store.last_send(e, "bench") for e in emails],
+        )
+        _timed("last_send_many", count, lambda: history_store.last_send_many(emails, "bench"))
+        _timed(
+            "last_send_any_group_many",
+            count,
+            lambda: history_store.last_send_any_group_many(emails),
+        )
+        history_store.close_connections()
+
+
+if __name__ == "__main__":
+    main()
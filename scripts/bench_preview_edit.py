@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Time a preview refresh after one manual edit, full versus incremental.
+
+Usage: ``python scripts/bench_preview_edit.py [COUNT]`` (default 3000
+addresses).  All state files live in a temporary directory.  Builds a
+preview, saves one ``old -> new`` edit and refreshes it twice: once running
+every filter and history lookup over the whole list (the old behaviour), once
+through :class:`emailbot.preview_decisions.PreviewDecisions`.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+STATE = Path(tempfile.mkdtemp(prefix="bench_preview_edit_"))
+for name, filename in {
+    "SEND_STATS_PATH": "send_stats.jsonl",
+    "SENT_LOG_PATH": "sent_log.csv",
+    "SYNC_STATE_PATH": "sync_state.json",
+    "SEND_HISTORY_SQLITE_PATH": "send_history.sqlite",
+    "HISTORY_DB_PATH": "history.sqlite",
+    "MASS_STATE_PATH": "mass_state.json",
+    "CAMPAIGN_QUEUE_DB": "campaign_queue.sqlite",
+    "SEND_JOURNAL_PATH": "send_journal.wal",
+}.items():
+    os.environ[name] = str(STATE / filename)
+
+from emailbot import edit_service, messaging, preview_decisions, suppress_list  # noqa: E402
+from emailbot.handlers import preview  # noqa: E402
+from emailbot.report_preview import build_preview_workbook  # noqa: E402
+
+CHAT_ID = 1
+GROUP = "sport"
+
+
+def _refresh(context, emails, incremental: bool) -> float:
+    started = time.perf_counter()
+    source = edit_service.apply_edits(list(emails), CHAT_ID)
+    if incremental:
+        decisions = preview_decisions.for_context(context.chat_data, GROUP)
+        ready, foreign, blocked, recent, _ = decisions.classify(source, chat_id=CHAT_ID)
+        last_sent = decisions.last_sent
+    else:
+        ready, foreign, blocked, recent, _ = messaging.prepare_mass_mailing(
+            source, GROUP, chat_id=CHAT_ID
+        )
+        last_sent = None
+    data = preview._build_preview_data(
+        context, GROUP, GROUP, ready, foreign, blocked, recent, 180, last_sent
+    )
+    build_preview_workbook(data, STATE / "preview.xlsx")
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rnd = random.Random(1)
+    domains = ["gmail.com", "mail.ru", "example.com", "yandex.ru", "uni.edu"]
+    emails = [f"user{i}@{rnd.choice(domains)}" for i in range(count)]
+    blocked = STATE / "blocked_emails.txt"
+    blocked.write_text("".join(f"{e}\n" for e in emails[::40]), encoding="utf-8")
+    suppress_list.init_blocked(blocked)
+    messaging.BLOCKED_FILE = str(blocked)
+    context = SimpleNamespace(chat_data={}, user_data={})
+
+    preview_decisions.seed(
+        context.chat_data, GROUP, False, *messaging.prepare_mass_mailing(emails, GROUP)[:4]
+    )
+    _refresh(context, emails, incremental=True)  # fills the last-send cache
+    edit_service.save_edit(CHAT_ID, emails[7], "fixed.address@example.org")
+
+    full = _refresh(context, emails, incremental=False)
+    incremental = _refresh(context, emails, incremental=True)
+    recomputed = context.chat_data[preview_decisions.CONTEXT_KEY].recomputed
+    print(f"{count} addresses, one edit")
+    print(f"full refresh         {full:7.3f} s")
+    print(f"incremental refresh  {incremental:7.3f} s  ({recomputed} address re-filtered)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Benchmark ``utils.send_stats.summarize`` on a large ``send_stats.jsonl``.
+
+Usage: ``python scripts/bench_report_rollup.py [COUNT]`` (default 500000).
+Writes COUNT records spread over a year, then times the first summary (which
+ingests the whole file into the rollup), a repeated summary and a summary
+after 1000 more records were appended.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+def _timed(label: str, func) -> None:
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<20} {elapsed * 1000:10.1f} ms  {result}")
+
+
+def _write(path: Path, count: int, start: datetime) -> None:
+    step = timedelta(days=365) / max(count, 1)
+    with path.open("a", encoding="utf-8") as fh:
+        for idx in range(count):
+            record = {
+                "ts": (start + step * idx).isoformat().replace("+00:00", "Z"),
+                "email": f"user{idx}@domain{idx % 50}.ru",
+                "group": f"group{idx % 5}",
+                "status": "success" if idx % 10 else "error",
+            }
+            fh.write(json.dumps(record) + "\n")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = Path(tmp) / "send_stats.jsonl"
+        os.environ["SEND_STATS_PATH"] = str(stats)
+        os.environ["REPORT_ROLLUP_DB"] = str(Path(tmp) / "rollup.sqlite")
+        from utils import send_stats
+
+        now = datetime.now(UTC)
+        _write(stats, count, now - timedelta(days=365))
+        print(f"{count} records, {stats.stat().st_size / 1e6:.1f} MB")
+        _timed("first (ingest)", lambda: send_stats.summarize("week"))
+        _timed("repeat", lambda: send_stats.summarize("week"))
+        _write(stats, 1000, now - timedelta(hours=1))
+        _timed("after append", lambda: send_stats.summarize("week"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,9 @@
 #!/usr/bin/env python
 """Rotate the send stats log when it grows too large."""
 # [EBOT-LOG-ROTATE-006]
-import gzip
 import os
-import shutil
-import time
-from pathlib import Path
 
+from emailbot import log_archive
 from utils.paths import expand_path
 
 PATH = expand_path(os.getenv("SEND_STATS_PATH", "var/send_stats.jsonl"))
@@ -14,7 +11,11 @@ MAX_SIZE_MB = int(os.getenv("SEND_STATS_MAX_MB", "50"))
 
 
 def main() -> None:
-    """Rotate the send stats file if it exceeds the configured size."""
+    """Rotate the send stats file if it exceeds the configured size.
+
+    The bot does this on its own (see :mod:`emailbot.log_archive`); the
+    script is kept for cron setups and one-off runs.
+    """
     if not PATH.exists():
         print("no stats file")
         return
@@ -24,14 +25,9 @@ def main() -> None:
         print(f"ok ({size_mb:.1f}MB < {MAX_SIZE_MB}MB)")
         return
 
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    destination = PATH.with_name(f"{PATH.name}.{timestamp}.gz")
-
-    with open(PATH, "rb") as src, gzip.open(destination, "wb", compresslevel=6) as gz:
-        shutil.copyfileobj(src, gz)
-
-    PATH.write_text("")
-    print(f"rotated -> {destination}")
+    spec = log_archive.LogSpec("send_stats", lambda: PATH)
+    written = log_archive.rotate(spec, force=True)
+    print(f"rotated -> {len(written)} segment(s) in {log_archive.archive_dir(PATH)}")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,4 @@
-import datetime
 import email
-import imaplib
 import os
 import re
 from email.header import decode_header, make_header
@@ -15,7 +13,11 @@ from config import (
     IMAP_PORT,
     INBOX_MAILBOX,
 )
+from emailbot.mail.imap_pool import imap_session
+from emailbot.mail.inbox_scan import InboxConsumer, scan_mailbox
+from emailbot.net_imap import get_imap_timeout, imap_connect_ssl
 from utils.blocked_store import BlockedStore
+from utils.bounce_common import is_bounce_from
 from utils.email_normalize import normalize_email
 
 LIST_UNSUB_RE = re.compile(r"<mailto:([^>]+)>", re.I)
@@ -76,10 +78,35 @@ def _search_addrs_from_message(msg) -> Set[str]:
     return normalised
 
 
+REPLY_PREFIXES = ("re:", "ответ:", "fw:", "fwd:")
+
+
+def _is_candidate(msg) -> bool:
+    """Header-only pre-filter: unsubscribe headers, tokens or replies to a mailing."""
+
+    if msg.get("List-Unsubscribe"):
+        return True
+    if is_bounce_from(msg.get("From", "")):
+        return False
+    subject = _decode(msg.get("Subject", "") or "").strip().lower()
+    if any(token in subject for token in UNSUB_TOKENS):
+        return True
+    return subject.startswith(REPLY_PREFIXES)
+
+
+def unsubscribe_consumer(store: BlockedStore | None = None) -> InboxConsumer:
+    """Consumer for :mod:`emailbot.mail.inbox_scan` adding addresses to ``store``."""
+
+    target = store or BlockedStore(BLOCKED_EMAILS_PATH)
+    return InboxConsumer(
+        name="unsubscribe",
+        accepts=_is_candidate,
+        handle=lambda msg: target.add_many(_search_addrs_from_message(msg)),
+    )
+
+
 def run_once() -> int:
-    store = BlockedStore(BLOCKED_EMAILS_PATH)
     since_days = int(os.getenv("BOUNCE_SINCE_DAYS", BOUNCE_SINCE_DAYS))
-    date_since = (datetime.datetime.utcnow() - datetime.timedelta(days=since_days)).strftime("%d-%b-%Y")
 
     mailbox = os.getenv("INBOX_MAILBOX", INBOX_MAILBOX)
     host = os.getenv("IMAP_HOST", IMAP_HOST)
@@ -90,27 +117,11 @@ def run_once() -> int:
     if not host or not user or not password:
         return 0
 
-    conn = imaplib.IMAP4_SSL(host, port)
-    try:
-        conn.login(user, password)
-        conn.select(mailbox)
-        status, data = conn.search(None, f'(SINCE "{date_since}")')
-        if status != "OK":
-            return 0
-        collected: Set[str] = set()
-        ids = data[0].split()
-        for uid in ids[-2000:]:
-            status, msg_data = conn.fetch(uid, "(RFC822)")
-            if status != "OK" or not msg_data:
-                continue
-            msg = email.message_from_bytes(msg_data[0][1])
-            collected.update(_search_addrs_from_message(msg))
-        return store.add_many(collected)
-    finally:
-        try:
-            conn.logout()
-        except Exception:
-            pass
+    with imap_session(
+        host, port, user, password, timeout=get_imap_timeout(15.0), connect=imap_connect_ssl
+    ) as conn:
+        totals = scan_mailbox(conn, mailbox, [unsubscribe_consumer()], since_days=since_days)
+    return totals.get("unsubscribe", 0)
 
 
 if __name__ == "__main__":
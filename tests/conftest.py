@@ -257,3 +257,67 @@ def _isolated_send_stats(tmp_path, monkeypatch):
     monkeypatch.setenv("AUDIT_PATH", str(audit_path))
     monkeypatch.setenv("APPEND_TO_SENT", "0")
     monkeypatch.setenv("SEND_HISTORY_SQLITE_PATH", str(sqlite_path))
+    monkeypatch.setenv("REPORT_ROLLUP_DB", str(tmp_path / "report_rollup.sqlite"))
+    yield
+    from emailbot import report_rollup
+
+    report_rollup.close()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_mass_state(tmp_path, monkeypatch):
+    from emailbot import mass_state
+
+    mass_state.close()
+    monkeypatch.setenv("MASS_STATE_DIR", str(tmp_path / "mass_state"))
+    monkeypatch.setattr(mass_state, "STATE_PATH", tmp_path / "mass_state.json")
+    monkeypatch.setattr(mass_state, "_state_cache", None)
+    yield
+    mass_state.close()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_campaign_queue(tmp_path, monkeypatch):
+    from emailbot import campaign_queue
+
+    campaign_queue.close()
+    monkeypatch.setenv("CAMPAIGN_QUEUE_DB", str(tmp_path / "campaign_queue.sqlite"))
+    yield
+    campaign_queue.close()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_imap_pool():
+    from emailbot.mail import imap_pool
+
+    imap_pool.close_all()
+    yield
+    imap_pool.close_all()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_send_journal(tmp_path, monkeypatch):
+    from emailbot import send_journal
+
+    send_journal.close()
+    monkeypatch.setenv("SEND_JOURNAL_PATH", str(tmp_path / "send_journal.wal"))
+    yield
+    # Apply queued records while the test's patches are still in place.
+    send_journal.close()
+
+
+@pytest.fixture(autouse=True)
+def _closed_audit_logs():
+    yield
+    from emailbot import audit
+
+    audit.close_all()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_email_keys():
+    from utils import email_key
+
+    email_key.clear_cache()
+    yield
+    email_key.clear_cache()
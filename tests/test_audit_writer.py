@@ -0,0 +1,48 @@
+import json
+
+from emailbot import audit
+
+
+def _lines(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_records_are_buffered_until_size_or_exit(tmp_path):
+    path = tmp_path / "bulk_audit_1.jsonl"
+    with audit.AuditWriter(path, "t", max_records=3, flush_interval=60) as writer:
+        writer.log_sent("a@example.com")
+        writer.log_skip("b@example.com", "cooldown_180d")
+        assert _lines(path) == []
+        writer.log_error("c@example.com", "smtp")
+        assert [r["type"] for r in _lines(path)] == ["sent", "skip", "error"]
+        writer.log_sent("d@example.com")
+    assert [r["email"] for r in _lines(path)][-1] == "d@example.com"
+
+
+def test_strict_mode_writes_every_record(tmp_path):
+    path = tmp_path / "bulk_audit_2.jsonl"
+    writer = audit.AuditWriter(path, "t", strict=True, max_records=100)
+    writer.log_sent("a@example.com")
+    assert [r["email"] for r in _lines(path)] == ["a@example.com"]
+    writer.close()
+
+
+def test_background_flush_and_shared_event_logs(tmp_path, monkeypatch):
+    path = tmp_path / "bulk_audit_3.jsonl"
+    writer = audit.AuditWriter(path, "t", max_records=100, flush_interval=0.05)
+    writer.log_sent("a@example.com")
+    writer._log.flush_if_due(writer._log._oldest + 0.05)
+    assert len(_lines(path)) == 1
+
+    events = tmp_path / "events.jsonl"
+    monkeypatch.setenv("AUDIT_EVENTS_PATH", str(events))
+    audit.write_audit("smtp_error", email="x@example.com")
+    audit.write_audit_drop("y@example.com", "cooldown_180d")
+    audit.flush_all()
+    assert _lines(events)[0]["email"] == "x@example.com"
+    rows = audit._audit_path().read_text(encoding="utf-8").splitlines()
+    assert rows[0] == "ts,email,action,reason,details"
+    assert rows[1].split(",")[1:4] == ["y@example.com", "drop", "cooldown_180d"]
+    writer.close()
@@ -0,0 +1,87 @@
+import asyncio
+
+from emailbot import campaign_queue
+from emailbot.campaign_queue import CampaignQueue
+from emailbot.campaign_worker import CampaignWorker
+
+
+def _enqueue(queue, emails, **kwargs):
+    return queue.enqueue(1, emails, group_code="g", template_path="t.html", **kwargs)
+
+
+def test_lease_expiry_resumes_where_a_crashed_worker_stopped(tmp_path):
+    queue = CampaignQueue(tmp_path / "q.sqlite")
+    job_id = _enqueue(queue, ["a@x.com", "b@x.com", "a@x.com", "c@x.com"], now=0)
+    assert queue.progress(job_id)["total"] == 3
+
+    first = queue.lease("w1", 2, lease_seconds=60, now=10)
+    assert [lease.email for lease in first] == ["a@x.com", "b@x.com"]
+    queue.complete(first[0], campaign_queue.SENT, now=11)
+    # w1 dies holding b@x.com; until the lease expires only c@x.com is due.
+    assert [lease.email for lease in queue.lease("w2", 5, lease_seconds=60, now=20)] == ["c@x.com"]
+    retaken = queue.lease("w2", 5, lease_seconds=60, now=71)
+    assert [(lease.email, lease.attempts) for lease in retaken] == [("b@x.com", 2)]
+    queue.close()
+
+    reopened = CampaignQueue(tmp_path / "q.sqlite")
+    assert reopened.progress(job_id)[campaign_queue.LEASED] == 2
+    assert reopened.job(job_id).state == campaign_queue.RUNNING
+
+
+def test_retry_backoff_and_job_completion(tmp_path, monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_RETRY_BASE_SECONDS", "10")
+    queue = CampaignQueue(tmp_path / "q.sqlite")
+    job_id = _enqueue(queue, ["a@x.com", "b@x.com"], max_attempts=2, now=0)
+
+    a, b = queue.lease("w", 5, now=0)
+    assert queue.complete(a, campaign_queue.FAILED, error="421", retry=True, now=1) == "pending"
+    assert queue.complete(b, campaign_queue.DUPLICATE, now=1) == "duplicate"
+    assert queue.lease("w", 5, now=10) == []
+    (again,) = queue.lease("w", 5, now=11)
+    assert queue.complete(again, campaign_queue.FAILED, error="421", retry=True, now=12) == (
+        "failed"
+    )
+    progress = queue.progress(job_id)
+    assert progress["state"] == campaign_queue.DONE
+    assert (progress["done"], progress[campaign_queue.FAILED]) == (2, 1)
+    assert queue.errors(job_id) == [("a@x.com", "421")]
+    assert queue.jobs(1) == []
+
+
+def test_worker_respects_quota_pause_and_releases_unattempted(tmp_path):
+    queue = CampaignQueue(tmp_path / "q.sqlite")
+    limited = _enqueue(queue, [f"u{i}@x.com" for i in range(5)])
+    forced = _enqueue(queue, ["f@x.com"], ignore_limit=True)
+    calls = []
+
+    async def send_batch(job, leases, report, should_stop):
+        calls.append((job.job_id, [lease.email for lease in leases]))
+        for lease in leases:
+            if should_stop():
+                return
+            report(lease, campaign_queue.SENT)
+            if lease.email == "u2@x.com":
+                queue.pause(job.job_id)
+
+    quota = [2]
+    worker = CampaignWorker(
+        queue, batch_size=10, send_batch=send_batch, remaining_quota=lambda: quota[0]
+    )
+    assert asyncio.run(worker.run_once()) == 2
+    assert calls[-1] == (limited, ["u0@x.com", "u1@x.com"])
+
+    quota[0] = 0
+    assert asyncio.run(worker.run_once()) == 1
+    assert calls[-1] == (forced, ["f@x.com"])
+    assert queue.job(forced).state == campaign_queue.DONE
+
+    quota[0] = 10
+    assert asyncio.run(worker.run_once()) == 3
+    progress = queue.progress(limited)
+    assert progress["state"] == campaign_queue.PAUSED
+    assert (progress[campaign_queue.SENT], progress[campaign_queue.PENDING]) == (3, 2)
+    assert asyncio.run(worker.run_once()) == 0
+
+    queue.resume(limited)
+    assert asyncio.run(worker.run_once()) == 2
+    assert queue.progress(limited)["state"] == campaign_queue.DONE
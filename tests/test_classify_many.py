@@ -0,0 +1,51 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from emailbot.extraction import strip_html
+from utils.email_role import classify_email_role, classify_many
+from utils.name_match import FioMatcher, fio_candidates, fio_match_score
+
+GOLD = sorted((Path(__file__).parent / "fixtures" / "gold").glob("*.html"))
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+EXTRA = """
+Иванов С. П., Петрова-Водкина А.А., Dr. John Smith and Mary O'Neil (Corresponding author)
+Кафедра истории, приёмная: priem@univ.ru; Smith J. and K.Lee; Сергей Иванов
+"""
+LOCALS = [
+    "sergey.ivanov", "s_ivanov83", "ivanov.s", "petrova-vodkina", "a.petrova",
+    "john.smith", "jsmith", "smith_j", "mary", "oneil.m", "k.lee", "leek",
+    "info", "no-reply", "kafedra.history", "x", "", "abc123",
+]  # fmt: skip
+
+
+def _expected(emails, text, contexts=None):
+    pairs = fio_candidates(text)
+    result = []
+    for index, email in enumerate(emails):
+        local, _, domain = email.partition("@")
+        ctx = contexts[index] if contexts is not None else text
+        info = classify_email_role(local, domain, context_text=ctx)
+        info["fio_score"] = fio_match_score(local, text, candidates=pairs)
+        result.append(info)
+    return result
+
+
+@pytest.mark.parametrize("path", GOLD, ids=lambda p: p.stem)
+def test_classify_many_matches_single_address_helpers(path):
+    text = strip_html(path.read_text(encoding="utf-8")) + EXTRA
+    emails = sorted(set(EMAIL_RE.findall(text))) + [f"{local}@univ.ru" for local in LOCALS]
+    assert classify_many(emails, text) == _expected(emails, text)
+
+    contexts = [text[i * 50 : i * 50 + 300] for i in range(len(emails))]
+    assert classify_many(emails, text, contexts=contexts) == _expected(emails, text, contexts)
+
+
+def test_fio_matcher_scores_like_fio_match_score():
+    pairs = fio_candidates(EXTRA)
+    matcher = FioMatcher(pairs)
+    for local in LOCALS + ["SERGEY.Ivanov", "ivanovsergey", "ИВАНОВ.С"]:
+        assert matcher.score(local) == fio_match_score(local, EXTRA, candidates=pairs)
+    assert not FioMatcher([]) and FioMatcher([]).score("ivanov") == 0.0
@@ -0,0 +1,103 @@
+import csv
+from datetime import UTC, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from emailbot import daily_quota
+from emailbot import messaging_utils as mu
+
+FIELDS = ["key", "email", "last_sent_at", "source", "status"]
+
+
+def _write(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        for email, ts, status in rows:
+            w.writerow(
+                {
+                    "key": mu.canonical_for_history(email),
+                    "email": email,
+                    "last_sent_at": ts.isoformat(),
+                    "source": "g",
+                    "status": status,
+                }
+            )
+
+
+def test_counts_local_day_and_rolls_over_at_local_midnight(tmp_path):
+    log = tmp_path / "sent_log.csv"
+    tz = ZoneInfo("Asia/Tokyo")
+    now = datetime.now(tz)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    _write(
+        log,
+        [
+            ("a@example.com", midnight + timedelta(minutes=1), "ok"),
+            ("b@example.com", midnight - timedelta(minutes=1), "ok"),
+            # Naive timestamps are local time, like the writer stores them.
+            ("c@example.com", (midnight + timedelta(minutes=2)).replace(tzinfo=None), "sent"),
+            ("d@example.com", now.astimezone(UTC), "external"),
+        ],
+    )
+
+    assert daily_quota.sent_today(log, tz="Asia/Tokyo") == {"a@example.com", "c@example.com"}
+    assert daily_quota.count_today(log, tz="Asia/Tokyo") == 2
+    assert daily_quota.remaining_quota(log, 3, tz="Asia/Tokyo") == 1
+    assert daily_quota.remaining_quota(log, 1, tz="Asia/Tokyo") == 0
+
+
+def test_writer_updates_mirror_and_external_edits_rebuild(tmp_path, monkeypatch):
+    log = tmp_path / "sent_log.csv"
+    tz = mu.REPORT_TZ
+    now = datetime.now(ZoneInfo(tz))
+    _write(log, [("a@example.com", now, "ok")])
+    mu.ensure_sent_log_schema(str(log))
+    rebuilds = []
+    real_rebuild = daily_quota._rebuild
+
+    def counting_rebuild(*args):
+        rebuilds.append(args[1])
+        return real_rebuild(*args)
+
+    monkeypatch.setattr(daily_quota, "_rebuild", counting_rebuild)
+    assert daily_quota.count_today(log, tz=tz) == 1
+    assert len(rebuilds) == 1
+
+    mu.upsert_sent_log_many(
+        log,
+        [
+            ("b@example.com", now, "g", "ok", None),
+            ("c@example.com", now - timedelta(days=3), "g", "ok", None),
+        ],
+    )
+    assert daily_quota.sent_today(log, tz=tz) == {"a@example.com", "b@example.com"}
+    assert len(rebuilds) == 1
+
+    # A write that bypasses the writer is picked up from the file signature.
+    _write(log, [("z@example.com", now, "ok")])
+    assert daily_quota.sent_today(log, tz=tz) == {"z@example.com"}
+    assert len(rebuilds) == 2
+
+
+def test_sent_today_many_and_same_content(tmp_path, monkeypatch):
+    log = tmp_path / "sent_log.csv"
+    monkeypatch.setattr(mu, "SENT_LOG_PATH", str(log))
+    tz = mu.REPORT_TZ
+    now = datetime.now(ZoneInfo(tz))
+    _write(log, [("a@example.com", now, "ok"), ("b@example.com", now, "error")])
+    emails = [f"x{i}@example.com" for i in range(1200)] + ["A@Example.com", "b@example.com"]
+
+    assert daily_quota.sent_today_many(log, emails, tz=tz) == {"A@Example.com"}
+
+    mu.upsert_sent_log(
+        log,
+        "c@example.com",
+        now,
+        "g",
+        "ok",
+        {"subject": "Hi", "body": "Body"},
+        key="uuid-1",
+    )
+    assert mu.was_sent_today_same_content("c@example.com", "Hi", "Body")
+    assert not mu.was_sent_today_same_content("c@example.com", "Hi", "Other")
+    assert not mu.was_sent_today_same_content("a@example.com", "Hi", "Body")
@@ -0,0 +1,59 @@
+import pytest
+
+from emailbot import extraction_common, history_key, messaging, sanitizer
+from emailbot.services import cooldown
+from utils import email_clean
+from utils.email_key import get_email_key
+
+ADDRESSES = [
+    "Foo.Bar+tag@GMAIL.com",
+    " user@googlemail.com ",
+    "Ivan.Petrov+news@yandex.ru",
+    "пример@почта.рф",
+    "Name <USER@Example.COM>",
+    "​info@example.com,",
+    "user@bad_domain.com",
+    "no-at-sign",
+    "",
+]
+
+
+def test_key_is_interned():
+    assert get_email_key("a@b.ru") is get_email_key("a@b.ru")
+    assert get_email_key(None) is get_email_key("")
+
+
+@pytest.mark.parametrize("addr", ADDRESSES)
+def test_forms_match_uncached_normalizers(addr):
+    key = get_email_key(addr)
+    assert key.display == sanitizer._clean_display(addr)
+    assert key.normalized == sanitizer._normalize_email(addr)
+    assert key.unified == email_clean._normalize_email_unified(addr)
+    assert key.history == history_key._history_key(addr)
+    assert key.cooldown == cooldown._cooldown_key(addr)
+    assert key.dedupe == extraction_common._normalize_email(addr)
+    if "@" in addr:
+        assert key.canonical == email_clean._canonical_email(addr)
+    else:
+        with pytest.raises(ValueError):
+            email_clean.canonical_email(addr)
+    assert messaging.extract_domain(addr) == key.domain
+
+
+def test_wrappers_are_cached(monkeypatch):
+    calls = []
+
+    def counting(addr):
+        calls.append(addr)
+        return addr.lower()
+
+    monkeypatch.setattr(email_clean, "_normalize_email_unified", counting)
+    for _ in range(3):
+        assert email_clean.normalize_email_unified("A@B.ru") == "a@b.ru"
+        assert messaging._normalize_email_for_blocklist("A@B.ru") == "a@b.ru"
+    assert calls == ["A@B.ru"]
+
+
+def test_idna_form():
+    assert get_email_key("Ivan@Почта.РФ").idna == "ivan@xn--80a1acny.xn--p1ai"
+    assert get_email_key("x.y+z@googlemail.com").idna == "xy@gmail.com"
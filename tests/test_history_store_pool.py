@@ -0,0 +1,70 @@
+from datetime import UTC, datetime, timedelta
+
+from emailbot import history_service, history_store
+from emailbot.services.cooldown import CooldownService
+
+
+def _fill(count):
+    now = datetime.now(UTC).replace(microsecond=0)
+    rows = [
+        (
+            f"user{idx}@example.com",
+            "grp" if idx % 2 else "other",
+            now - timedelta(days=idx),
+            "",
+            "",
+            "ok",
+        )
+        for idx in range(count)
+    ]
+    assert history_store.record_send_many(rows) == count
+    return now
+
+
+def test_connection_is_reused_per_thread_and_reopened_on_init(tmp_path):
+    history_store.init_db(tmp_path / "a.db")
+    conn = history_store.get_connection()
+    history_store.record_send("a@example.com", "g", datetime.now(UTC))
+    history_store.last_send("a@example.com", "g")
+    assert history_store.get_connection() is conn
+
+    history_store.init_db(tmp_path / "b.db")
+    assert history_store.get_connection() is not conn
+    assert history_store.last_send("a@example.com", "g") is None
+
+
+def test_bulk_lookups_match_single_queries(tmp_path, monkeypatch):
+    history_store.init_db(tmp_path / "state.db")
+    monkeypatch.setattr(history_store, "_IN_CHUNK", 3)
+    _fill(10)
+    emails = [f"USER{idx}@example.com" for idx in range(12)]
+
+    by_group = history_store.last_send_many(emails, "GRP")
+    any_group = history_store.last_send_any_group_many(emails)
+
+    for email in emails:
+        norm = email.lower()
+        assert by_group.get(norm) == history_store.last_send(norm, "grp")
+        assert any_group.get(norm) == history_store.last_send_any_group(norm)
+    assert len(by_group) == 5
+    assert len(any_group) == 10
+
+
+def test_cooldown_filters_do_not_query_per_address(monkeypatch):
+    history_service.ensure_initialized()
+    _fill(4)
+
+    def _single(*_args, **_kwargs):
+        raise AssertionError("per-address history lookup")
+
+    monkeypatch.setattr(history_store, "last_send", _single)
+    monkeypatch.setattr(history_store, "last_send_any_group", _single)
+
+    emails = ["user1@example.com", "user3@example.com", "new@example.com"]
+    allowed, rejected = history_service.filter_by_days(emails, "grp", 2)
+    assert rejected == ["user1@example.com"]
+    assert allowed == ["user3@example.com", "new@example.com"]
+
+    ready, hits = CooldownService(days=2).filter_ready(emails + ["user0@example.com"])
+    assert ready == ["user3@example.com", "new@example.com"]
+    assert [hit.email for hit in hits] == ["user1@example.com", "user0@example.com"]
@@ -0,0 +1,78 @@
+import email
+
+from emailbot import messaging
+from emailbot.mail import imap_pool
+from tests.util_imap import FakeImap, make_message
+
+
+def _connect_factory(created):
+    def connect(host, port, timeout=None):
+        imap = FakeImap({"INBOX": [], "Sent": []})
+        created.append(imap)
+        return imap
+
+    return connect
+
+
+def test_sessions_are_reused_and_selection_is_tracked():
+    created = []
+    pool = imap_pool.ImapPool()
+    connect = _connect_factory(created)
+
+    with pool.session("h", 993, "u", "p", connect=connect) as imap:
+        imap.select("INBOX", readonly=True)
+        imap.select('"INBOX"', readonly=True)
+    with pool.session("h", 993, "u", "p", connect=connect) as imap:
+        imap.select("INBOX", readonly=True)
+        imap.select("INBOX")
+
+    assert len(created) == 1
+    assert created[0].count("LOGIN") == 1
+    # Selection is remembered within a checkout; a new checkout re-selects
+    # so that a changed UIDVALIDITY is noticed.
+    assert created[0].count("SELECT") == 3
+    assert pool.idle_count() == 1
+
+
+def test_stale_and_broken_sessions_are_replaced():
+    created = []
+    pool = imap_pool.ImapPool(check_after=0)
+    connect = _connect_factory(created)
+
+    with pool.session("h", 993, "u", "p", connect=connect):
+        pass
+    created[0].logged_in = False  # server dropped the connection
+    with pool.session("h", 993, "u", "p", connect=connect) as imap:
+        assert imap.client is created[1]
+    assert created[1].count("NOOP") == 0
+
+    try:
+        with pool.session("h", 993, "u", "p", connect=connect):
+            raise OSError("reset by peer")
+    except OSError:
+        pass
+    assert pool.idle_count() == 0
+    assert created[1].count("LOGOUT") == 1
+
+    pool.idle_timeout = -1
+    with pool.session("h", 993, "u", "p", connect=connect):
+        pass
+    with pool.session("h", 993, "u", "p", connect=connect):
+        pass
+    assert len(created) == 4
+
+
+def test_save_to_sent_folder_reuses_pooled_session(monkeypatch, tmp_path):
+    created = []
+    monkeypatch.setattr(messaging, "imap_connect_ssl", _connect_factory(created))
+    monkeypatch.setattr(messaging, "IMAP_FOLDER_FILE", tmp_path / "folder.txt")
+
+    for idx in range(3):
+        messaging.save_to_sent_folder(make_message(f"user{idx}@example.com"))
+
+    assert len(created) == 1
+    imap = created[0]
+    assert imap.count("LIST") == 1
+    assert imap.count("APPEND", "Sent") == 3
+    stored = [email.message_from_bytes(raw)["To"] for raw in imap.boxes["Sent"].values()]
+    assert stored == ["user0@example.com", "user1@example.com", "user2@example.com"]
@@ -0,0 +1,119 @@
+import email.utils
+from datetime import UTC, datetime, timedelta
+
+from emailbot import history_service, messaging
+from emailbot import messaging_utils as mu
+from emailbot.mail import uid_sync
+from tests.util_imap import FakeImap, make_message
+
+
+def _setup(monkeypatch, tmp_path, imap):
+    monkeypatch.setattr(messaging, "LOG_FILE", str(tmp_path / "sent_log.csv"))
+    seen = tmp_path / "seen.csv"
+    monkeypatch.setattr(mu, "SYNC_SEEN_EVENTS_PATH", seen)
+    monkeypatch.setattr(messaging, "SYNC_SEEN_EVENTS_PATH", seen)
+    monkeypatch.setattr(messaging, "SYNC_STATE_PATH", str(tmp_path / "sync_state.json"))
+    monkeypatch.setattr(messaging, "IMAP_FOLDER_FILE", tmp_path / "imap_sent_folder.txt")
+    monkeypatch.setattr(messaging, "imap_connect_ssl", lambda *a, **k: imap)
+
+
+def _date(days_ago: int = 0) -> str:
+    return email.utils.format_datetime(datetime.now(UTC) - timedelta(days=days_ago))
+
+
+def test_uid_set_compresses_ranges():
+    assert uid_sync.uid_set([1, 2, 3, 5, 7, 8]) == "1:3,5,7:8"
+    assert uid_sync.uid_set([42]) == "42"
+    assert uid_sync.uid_set([]) == ""
+
+
+def test_search_uids_drops_star_match_below_cursor():
+    imap = FakeImap({"Sent": [make_message("a@example.com").as_bytes()]})
+    imap.select("Sent")
+    assert uid_sync.search_uids(imap, after_uid=1) == []
+    assert uid_sync.search_uids(imap) == [1]
+
+
+def test_sync_fetches_headers_in_batches(monkeypatch, tmp_path):
+    monkeypatch.setattr(uid_sync, "DEFAULT_BATCH_SIZE", 4)
+    messages = [
+        make_message(f"user{i}@example.com", msgid=f"<m{i}@x>", date=_date(1))
+        for i in range(10)
+    ]
+    imap = FakeImap({"Sent": messages})
+    _setup(monkeypatch, tmp_path, imap)
+
+    stats = messaging.sync_log_with_imap()
+
+    assert stats["new_contacts"] == 10
+    assert imap.count("UID", "FETCH") == 3
+    assert imap.count("FETCH") == 0
+    fetch = next(call for call in imap.calls if call[:2] == ("UID", "FETCH"))
+    assert "BODY.PEEK[HEADER.FIELDS" in fetch[3]
+    assert history_service.get_last_sent("user3@example.com", "imap_sync") is not None
+
+
+def test_sync_is_incremental_and_resets_on_uidvalidity(monkeypatch, tmp_path):
+    imap = FakeImap({"Sent": [make_message("a@example.com", msgid="<a@x>", date=_date())]})
+    _setup(monkeypatch, tmp_path, imap)
+
+    assert messaging.sync_log_with_imap()["new_contacts"] == 1
+
+    imap.add("Sent", make_message("b@example.com", msgid="<b@x>", date=_date()))
+    imap.calls.clear()
+    assert messaging.sync_log_with_imap()["new_contacts"] == 1
+    search = next(call for call in imap.calls if call[:2] == ("UID", "SEARCH"))
+    assert search[2] == "UID 2:*"
+    assert imap.count("UID", "FETCH") == 1
+
+    imap.uidvalidity += 1
+    imap.calls.clear()
+    stats = messaging.sync_log_with_imap()
+    search = next(call for call in imap.calls if call[:2] == ("UID", "SEARCH"))
+    assert search[2].startswith("SINCE ")
+    assert stats["new_contacts"] == 0
+    assert stats["skipped_events"] == 2
+
+
+def test_sync_keeps_message_timezone(monkeypatch, tmp_path):
+    sent = datetime.now(UTC).replace(microsecond=0)
+    imap = FakeImap(
+        {"Sent": [make_message("tz@example.com", msgid="<tz@x>", date=email.utils.format_datetime(sent))]}
+    )
+    _setup(monkeypatch, tmp_path, imap)
+
+    messaging.sync_log_with_imap()
+
+    logged = mu.load_sent_log(tmp_path / "sent_log.csv")
+    assert logged[mu.canonical_for_history("tz@example.com")] == sent
+    assert history_service.get_last_sent("tz@example.com", "imap_sync") == sent
+
+
+def test_sync_skips_history_for_undated_messages(monkeypatch, tmp_path):
+    imap = FakeImap({"Sent": [make_message("nodate@example.com", msgid="<nd@x>")]})
+    _setup(monkeypatch, tmp_path, imap)
+
+    assert messaging.sync_log_with_imap()["new_contacts"] == 1
+    assert history_service.get_last_sent("nodate@example.com", "imap_sync") is None
+
+
+def test_sync_retries_batch_when_history_write_fails(monkeypatch, tmp_path):
+    imap = FakeImap({"Sent": [make_message("h@example.com", msgid="<h@x>", date=_date())]})
+    _setup(monkeypatch, tmp_path, imap)
+
+    real_mark_sent_many = history_service.mark_sent_many
+    failures = [RuntimeError("database is locked")]
+
+    def _flaky(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return real_mark_sent_many(*args, **kwargs)
+
+    monkeypatch.setattr(history_service, "mark_sent_many", _flaky)
+    assert messaging.sync_log_with_imap()["history_failed"] is True
+
+    imap.calls.clear()
+    stats = messaging.sync_log_with_imap()
+    assert stats["history_failed"] is False
+    assert imap.count("UID", "FETCH") == 1
+    assert history_service.get_last_sent("h@example.com", "imap_sync") is not None
@@ -0,0 +1,91 @@
+from email.message import EmailMessage
+
+from emailbot.mail import inbox_scan
+from services import unsubscribe_scanner
+from tests.util_imap import FakeImap, make_message
+from utils import bounce
+from utils.blocked_store import BlockedStore
+
+
+def _bounce_message(rcpt: str) -> EmailMessage:
+    original = make_message(rcpt, headers={"X-EBOT-UUID": "u-1"}, msgid="<orig@x>")
+    msg = EmailMessage()
+    msg["From"] = "MAILER-DAEMON@mx.example.com"
+    msg["To"] = "me@example.com"
+    msg["Subject"] = "Undelivered Mail Returned to Sender"
+    msg.set_content("delivery failed")
+    msg.add_attachment(original)
+    return msg
+
+
+def _inbox() -> FakeImap:
+    return FakeImap(
+        {
+            "INBOX": [
+                make_message("me@example.com", sender="news@shop.example", subject="sale"),
+                _bounce_message("gone@example.com"),
+                make_message(
+                    "me@example.com",
+                    sender="Reader <reader@example.com>",
+                    subject="Re: our offer",
+                    body="please unsubscribe me",
+                ),
+            ]
+        }
+    )
+
+
+def test_single_pass_dispatches_and_fetches_only_candidates(monkeypatch, tmp_path):
+    bounced = []
+    monkeypatch.setattr(bounce, "log_bounce", lambda rcpt, *a, **k: bounced.append(rcpt))
+    store = BlockedStore(tmp_path / "blocked.txt")
+    imap = _inbox()
+
+    totals = inbox_scan.scan_mailbox(
+        imap,
+        "INBOX",
+        [bounce.bounce_consumer(), unsubscribe_scanner.unsubscribe_consumer(store)],
+    )
+
+    assert totals == {"bounce": 1, "unsubscribe": 1}
+    assert bounced == ["gone@example.com"]
+    assert store.read_all() == {"reader@example.com"}
+    body_fetches = [c for c in imap.calls if c[:2] == ("UID", "FETCH") and "HEADER" not in c[3]]
+    assert [c[2] for c in body_fetches] == ["2:3"]
+
+
+def test_cursor_is_kept_per_consumer(monkeypatch, tmp_path):
+    monkeypatch.setattr(bounce, "log_bounce", lambda *a, **k: None)
+    store = BlockedStore(tmp_path / "blocked.txt")
+    imap = _inbox()
+    inbox_scan.scan_mailbox(imap, "INBOX", [bounce.bounce_consumer()])
+    assert inbox_scan.get_cursor("INBOX", "bounce").last_uid == 3
+
+    imap.calls.clear()
+    totals = inbox_scan.scan_mailbox(
+        imap,
+        "INBOX",
+        [bounce.bounce_consumer(), unsubscribe_scanner.unsubscribe_consumer(store)],
+    )
+    assert totals == {"bounce": 0, "unsubscribe": 1}
+
+    imap.calls.clear()
+    totals = inbox_scan.scan_mailbox(
+        imap,
+        "INBOX",
+        [bounce.bounce_consumer(), unsubscribe_scanner.unsubscribe_consumer(store)],
+    )
+    assert totals == {"bounce": 0, "unsubscribe": 0}
+    assert imap.count("UID", "FETCH") == 0
+
+
+def test_sync_bounces_uses_inbox_scan(monkeypatch):
+    bounced = []
+    imap = _inbox()
+    monkeypatch.setattr(bounce, "try_imap_connect", lambda: imap)
+    monkeypatch.setattr(bounce, "log_bounce", lambda rcpt, *a, **k: bounced.append(rcpt))
+
+    assert bounce.sync_bounces() == 1
+    assert bounce.sync_bounces() == 0
+    assert bounced == ["gone@example.com"]
+    assert imap.count("LOGIN") == 1
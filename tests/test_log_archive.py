@@ -0,0 +1,98 @@
+import json
+from datetime import UTC, date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from emailbot import log_archive, messaging, report_rollup
+from emailbot.messaging_utils import load_sent_log
+from utils import rules
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=UTC)
+
+
+def _jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def test_bloom_filter_roundtrip():
+    bloom = log_archive.BloomFilter.for_count(100)
+    for idx in range(100):
+        bloom.add(f"user{idx}@example.com")
+    restored = log_archive.BloomFilter.from_dict(bloom.to_dict())
+
+    assert all(f"user{idx}@example.com" in restored for idx in range(100))
+    misses = sum(f"other{idx}@example.com" in restored for idx in range(1000))
+    assert misses < 50
+
+
+def test_rotation_partitions_by_day_and_prunes_segments(tmp_path):
+    log = tmp_path / "send_history.jsonl"
+    _jsonl(
+        log,
+        [
+            {"email": "a@x.ru", "ts": "2024-01-10T10:00:00+00:00"},
+            {"email": "b@x.ru", "ts": "2024-01-10T11:00:00+00:00"},
+            {"email": "c@x.ru", "ts": "2024-03-05T09:00:00+00:00"},
+            {"email": "d@x.ru"},
+        ],
+    )
+    spec = log_archive.LogSpec("history", lambda: log, max_age_days=30)
+
+    written = log_archive.rotate(spec, now=NOW)
+
+    assert not log.exists()
+    days = sorted(seg.path.parent.name for seg in written)
+    assert days == ["2024-01-10", "2024-03-05", "undated"]
+    assert sum(seg.rows for seg in written) == 4
+    assert log_archive.rotate(spec, now=NOW) == []
+
+    march = datetime(2024, 3, 1, tzinfo=UTC)
+    recent = {seg.path.parent.name for seg in log_archive.segments(log, march)}
+    assert recent == {"2024-03-05", "undated"}
+    by_email = log_archive.segments(log, email="a@x.ru")
+    assert "2024-01-10" in {seg.path.parent.name for seg in by_email}
+    assert "2024-03-05" not in {seg.path.parent.name for seg in by_email}
+    records = list(log_archive.iter_records(log, march))
+    assert {r["email"] for r in records} == {"c@x.ru", "d@x.ru"}
+
+
+def test_sent_log_compaction_keeps_recent_rows_and_readers_see_archive(tmp_path):
+    log = tmp_path / "sent_log.csv"
+    old = (NOW - timedelta(days=500)).isoformat()
+    new = (NOW - timedelta(days=5)).isoformat()
+    log.write_text(
+        "key,email,last_sent_at,source,status\n"
+        f"old@x.ru,old@x.ru,{old},manual,sent\n"
+        f"new@x.ru,new@x.ru,{new},manual,sent\n",
+        encoding="utf-8",
+    )
+    spec = log_archive.LogSpec(
+        "sent_log", lambda: log, mode="table", ts_fields=("last_sent_at",), max_age_days=400
+    )
+
+    written = log_archive.rotate(spec, now=NOW, force=True)
+
+    assert [seg.rows for seg in written] == [1]
+    assert "old@x.ru" not in log.read_text(encoding="utf-8")
+    assert set(load_sent_log(log)) == {"old@x.ru", "new@x.ru"}
+    assert set(load_sent_log(log, since=NOW - timedelta(days=30))) == {"new@x.ru"}
+
+    source = report_rollup.RollupSource(
+        "sent_log", log, ZoneInfo("UTC"), ts_fields=("last_sent_at",)
+    )
+    sources = report_rollup.with_archive(source)
+    assert len(sources) == 2
+    assert report_rollup.counts(sources) == {"sent": 2}
+    first = (NOW - timedelta(days=10)).date()
+    assert report_rollup.with_archive(source, first, date(2024, 6, 1)) == [source]
+
+
+def test_local_history_lookup_reads_rotated_segments(tmp_path, monkeypatch):
+    history = tmp_path / "send_history.jsonl"
+    monkeypatch.setattr(rules, "HISTORY_PATH", history)
+    recent = datetime.now(UTC) - timedelta(days=3)
+    _jsonl(history, [{"email": "a@x.ru", "ts": recent.isoformat()}])
+    log_archive.rotate(log_archive.LogSpec("history", lambda: history), force=True)
+
+    assert not history.exists()
+    assert messaging._seen_in_local_history("a@x.ru", 30)
+    assert not messaging._seen_in_local_history("b@x.ru", 30)
@@ -0,0 +1,99 @@
+import json
+
+from emailbot import mass_state
+from emailbot.mass_state import MassStateStore
+
+
+def _state(pending, sent, sources):
+    return {
+        "group": "g",
+        "template": "t.html",
+        "pending": list(pending),
+        "sent_ok": list(sent),
+        "source_map": dict(sources),
+    }
+
+
+def test_progress_saves_append_small_deltas_and_replay(tmp_path):
+    store = MassStateStore(tmp_path, background=False)
+    pending = [f"user{i}@example.com" for i in range(2000)]
+    sources = {addr: ["file.xlsx"] for addr in pending}
+    store.save(1, _state(pending, [], sources))
+    log = tmp_path / "1.log"
+    first = log.stat().st_size
+
+    sent = []
+    for _ in range(5):
+        addr = pending.pop(0)
+        sources.pop(addr)
+        sent.append(addr)
+        store.save(1, _state(pending, sent, sources))
+    store.save(1, _state(pending, sent, sources))  # unchanged: nothing appended
+
+    lines = log.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 6
+    assert all(len(line) < 200 for line in lines[1:])
+    assert log.stat().st_size - first < 1000
+    store.close()
+
+    reopened = MassStateStore(tmp_path, background=False)
+    assert reopened.load(1) == _state(pending, sent, sources)
+    assert reopened.resume_info(1) == {
+        "batch_id": None,
+        "group": "g",
+        "template": "t.html",
+        "pending": 1995,
+        "sent": 5,
+    }
+    assert reopened.load(2) is None
+
+
+def test_compaction_and_interrupted_compaction(tmp_path):
+    store = MassStateStore(tmp_path, compact_min_bytes=0, background=False)
+    store.save(7, {"pending": ["a", "b", "c"], "sent_ok": []})
+    # Every append exceeds the threshold, so each save compacts right away.
+    assert store.compactions == 1
+    assert not (tmp_path / "7.log").exists()
+    assert json.loads((tmp_path / "7.json").read_text(encoding="utf-8"))["seq"] == 1
+
+    store.compact_min_bytes = 1 << 30
+    store.save(7, {"pending": ["b", "c"], "sent_ok": ["a"]})
+    store.close()
+    # A compaction that died after moving the log aside but before writing
+    # the snapshot leaves deltas in ``.log.old``; one that died after the
+    # snapshot leaves deltas the snapshot already contains.
+    (tmp_path / "7.log").rename(tmp_path / "7.log.old")
+    (tmp_path / "7.log").write_text(
+        (tmp_path / "7.log.old").read_text(encoding="utf-8")
+        + json.dumps({"seq": 3, "ops": [["drop", "pending", [0]], ["extend", "sent_ok", ["b"]]]})
+        + "\n",
+        encoding="utf-8",
+    )
+    reopened = MassStateStore(tmp_path, background=False)
+    assert reopened.load(7) == {"pending": ["c"], "sent_ok": ["a", "b"]}
+    assert reopened.compact(7)
+    assert not (tmp_path / "7.log.old").exists()
+    assert MassStateStore(tmp_path).load(7) == {"pending": ["c"], "sent_ok": ["a", "b"]}
+
+
+def test_module_api_batches_and_legacy_migration(tmp_path):
+    mass_state.STATE_PATH.write_text(
+        json.dumps({"5": {"pending": ["x@example.com"], "batch_id": "old"}}),
+        encoding="utf-8",
+    )
+    assert mass_state.get_batch(5) == "old"
+    assert not mass_state.STATE_PATH.exists()
+
+    mass_state.set_batch(5, "b1")
+    assert mass_state.load_chat_state(5) == {"pending": ["x@example.com"], "batch_id": "b1"}
+    mass_state.clear_batch(5)
+    assert mass_state.get_batch(5) is None
+
+    saved = mass_state.load_chat_state(5)
+    saved["pending"].append("mutated@example.com")
+    assert mass_state.load_chat_state(5) == {"pending": ["x@example.com"]}
+
+    mass_state.clear_chat_state(5)
+    assert mass_state.load_chat_state(5) is None
+    assert mass_state.resume_info(5) is None
+    assert list((tmp_path / "mass_state").iterdir()) == []
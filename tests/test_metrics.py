@@ -0,0 +1,88 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from emailbot import metrics, perf, unsubscribe
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = metrics.Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 2.0):
+        hist.observe(value, op="x")
+
+    text = "\n".join(hist.render())
+    assert 't_seconds_bucket{op="x",le="0.1"} 2' in text
+    assert 't_seconds_bucket{op="x",le="1"} 9' in text
+    assert 't_seconds_bucket{op="x",le="+Inf"} 10' in text
+    assert 't_seconds_count{op="x"} 10' in text
+    assert hist.quantile(0.5, op="x") == pytest.approx(0.1 + 0.9 * 3 / 7)
+    assert hist.quantile(0.99, op="x") == 1.0
+    assert hist.quantile(0.5, op="missing") is None
+
+
+def test_timer_decorates_sync_and_async_functions():
+    hist = metrics.Histogram("t2_seconds", "test")
+
+    @hist.time(kind="sync")
+    def work(x):
+        return x * 2
+
+    @hist.time(kind="async")
+    async def awork(x):
+        await asyncio.sleep(0)
+        return x + 1
+
+    assert work(2) == 4
+    assert asyncio.run(awork(2)) == 3
+    with pytest.raises(RuntimeError), hist.time(kind="sync"):
+        raise RuntimeError("smtp down")
+    counts = {dict(key)["kind"]: count for key, _, _, count in hist.snapshot()}
+    assert counts == {"sync": 2, "async": 1}
+
+
+def test_perf_timer_feeds_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "PERF_LOG_PATH", str(tmp_path / "perf.log"))
+    with perf.PerfTimer("filtering_bulk"):
+        pass
+    assert metrics.PERF_SECONDS.quantile(0.5, event="filtering_bulk") is not None
+    lines = metrics.summary_lines()
+    assert any(
+        line.startswith("  emailbot_perf_seconds{event=filtering_bulk}: n=1") for line in lines
+    )
+
+
+def test_counter_registration_is_idempotent():
+    assert metrics.counter("emailbot_pdf_pages_total", "x") is metrics.PDF_PAGES
+    with pytest.raises(ValueError):
+        metrics.histogram("emailbot_pdf_pages_total", "x")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text():
+    metrics.SMTP_SEND_SECONDS.observe(0.2)
+    metrics.PDF_PAGES.inc(12)
+    runner = web.AppRunner(unsubscribe.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "localhost", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            resp = await session.get(f"http://localhost:{port}/metrics")
+            body = await resp.text()
+    finally:
+        await runner.cleanup()
+    assert resp.status == 200
+    assert resp.content_type == "text/plain"
+    assert "# TYPE emailbot_smtp_send_seconds histogram" in body
+    assert 'emailbot_smtp_send_seconds_bucket{le="0.25"} 1' in body
+    assert "emailbot_pdf_pages_total 12" in body
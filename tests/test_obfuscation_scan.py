@@ -0,0 +1,98 @@
+import random
+import re
+import time
+
+import pytest
+
+import utils.email_clean as email_clean
+import utils.email_deobfuscate as email_deobfuscate
+from emailbot.parsing import harvester
+from emailbot.parsing.harvester import harvest_emails
+from utils.email_clean import EMAIL_RE, OBFUSCATED_EMAIL_RE, preclean_obfuscations
+from utils.email_deobfuscate import deobfuscate_text
+from utils.obfuscation_scan import iter_at_matches, scan
+
+# The backtracking forms the linear code replaced, kept as references.
+OLD_AT = re.compile(r"(?i)\s*(?:\[at\]|\(at\)|\{at\}|<\s*at\s*>|\(a\)|&commat;| at | собака )\s*")
+OLD_DOT = re.compile(r"(?i)\s*(?:\[dot\]|\(dot\)|\{dot\}|<\s*dot\s*>| dot | точка |[·•∙‧⸳・])\s*")
+OLD_STRICT = re.compile(r"\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b")
+
+
+def _old_collapse(s):
+    t = email_clean._DOT_LIKE_RE.sub(".", s)
+    t = email_clean._AT_BRACKET_RE.sub("@", t)
+    t = email_clean._DOT_BRACKET_RE.sub(".", t)
+    t = email_clean._AT_WORD_RE.sub("@", t)
+    t = email_clean._DOT_WORD_RE.sub(".", t)
+    t = t.replace("&commat;", "@")
+    t = re.sub(r"\s*@\s*", "@", t)
+    t = re.sub(r"\s*\.\s*", ".", t)
+    while True:
+        new = re.sub(r"(?i)\b([a-z0-9])\s+(?=[a-z0-9@])", r"\1", t)
+        if new == t:
+            break
+        t = new
+    return re.sub(r"\s+", "", t)
+
+
+PIECES = [
+    " ", "  ", "\t", "\n", "a", "t", "at", " at ", "[at]", "( at )", "<", ">", "@", ".", "·",
+    "dot", " dot ", "[dot]", "(a)", "&commat;", "собака", " точка ", "x", "Z", "7", "-", "_",
+    "я", "(", ")", "{", "}", ",", "mail", "ru", "%", "+",
+]  # fmt: skip
+
+
+def _samples(seed, count=3000, size=12):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(PIECES) for _ in range(rng.randint(1, size)))
+
+
+def test_token_substitutions_match_backtracking_regexes():
+    for text in _samples(1):
+        assert email_clean._AT_TOKEN_RE.sub("@", text) == OLD_AT.sub("@", text), text
+        assert email_clean._DOT_TOKEN_RE.sub(".", text) == OLD_DOT.sub(".", text), text
+        assert email_clean._AT_SIGN_RE.sub("@", text) == re.sub(r"\s*@\s*", "@", text), text
+        assert email_clean._collapse_spaced_tokens(text) == _old_collapse(text), text
+
+
+def test_address_scans_match_finditer():
+    for text in _samples(2, size=20):
+        expected = [(m.group(1), m.group(3)) for m in OBFUSCATED_EMAIL_RE.finditer(text)]
+        found = scan(
+            text,
+            email_clean._OBFUSCATED_SEP_RE,
+            email_clean._obfuscated_local_start,
+            email_clean._obfuscated_domain_end,
+        )
+        assert [(text[s:a], text[b:e]) for s, a, b, e in found] == expected, text
+        assert email_clean._find_emails(text) == EMAIL_RE.findall(text), text
+        strict = iter_at_matches(text, harvester.STRICT_LOCAL_CHARS, harvester.STRICT_DOMAIN)
+        assert [text[s:e] for s, e in strict] == OLD_STRICT.findall(text), text
+
+
+def test_deobfuscate_text_terminates_on_noop_rewrites():
+    assert deobfuscate_text("name-\nname@domain.ru") == "name-name@domain.ru"
+    assert deobfuscate_text.last_rules == ["hyphen"]
+    for text in ("a-b", "a\tb"):
+        assert deobfuscate_text(text) == text
+        assert deobfuscate_text.last_rules == []
+
+
+MB10 = 10_000_000
+PATHOLOGICAL = {
+    "whitespace_run": " " * MB10 + "x@",
+    "dot_chain": "a." * (MB10 // 2),
+    "spaced_letters": "a " * (MB10 // 2),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_inputs_take_linear_time(name, monkeypatch):
+    monkeypatch.setattr(email_deobfuscate, "_DEOBF_MAX_CHARS", 0)
+    text = PATHOLOGICAL[name]
+    for func in (harvest_emails, preclean_obfuscations, deobfuscate_text):
+        started = time.perf_counter()
+        func(text)
+        # Each of these used to run for minutes (or forever) on 10 MB.
+        assert time.perf_counter() - started < 30, func.__name__
@@ -0,0 +1,64 @@
+from datetime import UTC, datetime
+
+from emailbot import history_service, messaging, preview_decisions
+
+
+def _fake_prepare(calls):
+    def prepare(emails, group, chat_id=None, ignore_cooldown=False):
+        calls.append(list(emails))
+        ready = [e for e in emails if not e.startswith(("blocked", "recent", "foreign"))]
+        foreign = [e for e in emails if e.startswith("foreign")]
+        blocked = [e for e in emails if e.startswith("blocked")]
+        recent = [e for e in emails if e.startswith("recent")]
+        return ready, foreign, blocked, recent, {"total": len(emails)}
+
+    return prepare
+
+
+def test_classify_filters_only_new_addresses(monkeypatch):
+    calls = []
+    monkeypatch.setattr(messaging, "prepare_mass_mailing", _fake_prepare(calls))
+    chat_data = {}
+    emails = ["a@x.ru", "blocked@x.ru", "b@x.ru", "recent@x.ru", "foreign@x.com"]
+    preview_decisions.seed(chat_data, "grp", False, *_fake_prepare([])(emails, "grp")[:4])
+
+    decisions = preview_decisions.for_context(chat_data, "grp")
+    edited = ["a@x.ru", "blocked@x.ru", "c@x.ru", "recent@x.ru", "foreign@x.com", "A@X.RU"]
+    ready, foreign, blocked, recent, digest = decisions.classify(edited)
+
+    assert calls == [["c@x.ru"]]
+    assert decisions.recomputed == 1
+    assert ready == ["a@x.ru", "c@x.ru"]
+    assert (foreign, blocked, recent) == (["foreign@x.com"], ["blocked@x.ru"], ["recent@x.ru"])
+    assert digest == {"total": 1}
+    assert "b@x.ru" not in decisions.decisions
+
+    decisions.classify(edited)
+    assert calls == [["c@x.ru"]]
+
+
+def test_decisions_reset_on_group_or_override_change(monkeypatch):
+    chat_data = {}
+    first = preview_decisions.seed(chat_data, "grp", False, ["a@x.ru"], [], [], [])
+    assert preview_decisions.for_context(chat_data, "grp") is first
+    assert preview_decisions.for_context(chat_data, "other") is not first
+    assert preview_decisions.for_context(chat_data, "other", True).decisions == {}
+
+    monkeypatch.setenv("PREVIEW_DECISIONS_TTL", "0")
+    assert not preview_decisions.for_context(chat_data, "other", True).matches("other", True)
+
+
+def test_last_sent_is_looked_up_once(monkeypatch):
+    seen = []
+    when = datetime(2025, 1, 1, tzinfo=UTC)
+
+    def get_last_sent(email, group):
+        seen.append((email, group))
+        return when if email == "a@x.ru" else None
+
+    monkeypatch.setattr(history_service, "get_last_sent", get_last_sent)
+    decisions = preview_decisions.PreviewDecisions("grp")
+    for _ in range(3):
+        assert decisions.last_sent("a@x.ru") == when
+        assert decisions.last_sent("b@x.ru") is None
+    assert seen == [("a@x.ru", "grp"), ("b@x.ru", "grp")]
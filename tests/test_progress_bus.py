@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from emailbot.ui import progress_bus
+from emailbot.ui.progress import Heartbeat, ProgressUI
+
+
+class FakeBot:
+    def __init__(self, *, retry_after: int = 0):
+        self.edits = []
+        self.retry_after = retry_after
+
+    async def send_message(self, chat_id, text):
+        return type("Sent", (), {"message_id": 100 + chat_id})()
+
+    async def edit_message_text(self, *, chat_id, message_id, text):
+        now = asyncio.get_running_loop().time()
+        if self.retry_after:
+            self.retry_after, delay = 0, self.retry_after
+            self.edits.append((now, chat_id, None))
+            raise RetryAfter(delay)
+        self.edits.append((now, chat_id, text))
+
+
+def _gaps(edits, chat_id):
+    times = [ts for ts, chat, _ in edits if chat == chat_id]
+    return [b - a for a, b in zip(times, times[1:], strict=False)]
+
+
+@pytest.mark.asyncio
+async def test_updates_coalesce_per_chat_interval():
+    bot = FakeBot()
+    bus = progress_bus.ProgressBus(interval=0.05)
+    for step in range(20):
+        for chat_id in (1, 2):
+            bus.publish(
+                (chat_id, 7),
+                f"{chat_id}:{step}",
+                progress_bus._bot_edit(bot, chat_id, 7, {}),
+            )
+        await asyncio.sleep(0.01)
+    await bus.flush()
+
+    for chat_id in (1, 2):
+        texts = [text for _, chat, text in bot.edits if chat == chat_id]
+        assert texts[-1] == f"{chat_id}:19"
+        assert len(texts) < 10
+        assert all(gap >= 0.045 for gap in _gaps(bot.edits, chat_id))
+    assert bus.stats["superseded"] > 0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_every_chat_and_resends_latest():
+    bot = FakeBot(retry_after=1)
+    bus = progress_bus.ProgressBus(interval=0.0)
+    bus.publish((1, 7), "one", progress_bus._bot_edit(bot, 1, 7, {}))
+    await asyncio.sleep(0)
+    done = bus.deliver((2, 7), "two", progress_bus._bot_edit(bot, 2, 7, {}))
+    bus.publish((1, 7), "one, newer", progress_bus._bot_edit(bot, 1, 7, {}))
+    assert await done is True
+
+    (failed_at, _, _), *sent = bot.edits
+    assert sorted(text for _, _, text in sent) == ["one, newer", "two"]
+    assert all(ts - failed_at >= 0.95 for ts, _, _ in sent)
+    assert bus.stats["retry_after"] == 1
+
+
+@pytest.mark.asyncio
+async def test_producers_never_wait_for_telegram(monkeypatch):
+    monkeypatch.setenv("PROGRESS_EDIT_INTERVAL", "0.2")
+    progress_bus.reset()
+    release = asyncio.Event()
+
+    class SlowMessage:
+        chat_id, message_id = 1, 5
+        texts = []
+
+        async def edit_text(self, text):
+            await release.wait()
+            self.texts.append(text)
+
+    msg = SlowMessage()
+    hb = Heartbeat(msg, interval_sec=0)
+    assert await hb.tick("step 0")
+    await asyncio.sleep(0)  # the drain task is now stuck inside edit_text
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for step in range(1, 50):
+        assert await hb.tick(f"step {step}")
+    assert loop.time() - started < 0.1
+
+    release.set()
+    await progress_bus.deliver_message(msg, "done")
+    assert msg.texts == ["step 0", "done"]
+
+
+@pytest.mark.asyncio
+async def test_progress_ui_routes_through_bus(monkeypatch):
+    monkeypatch.setenv("PROGRESS_EDIT_INTERVAL", "0")
+    progress_bus.reset()
+    bot = FakeBot()
+    ui = ProgressUI(bot, 3)
+    await ui.start(4)
+    for processed in range(1, 5):
+        await ui.update(processed)
+    await ui.finish()
+    assert [text for _, _, text in bot.edits][-1] == "Готово. Отправлено 4 из 4."
@@ -0,0 +1,91 @@
+import json
+from datetime import UTC, date
+from zoneinfo import ZoneInfo
+
+from emailbot import report_rollup
+from emailbot.report_rollup import RollupSource, RollupStore
+
+MSK = ZoneInfo("Europe/Moscow")
+
+
+def _append(path, *records):
+    with path.open("a", encoding="utf-8") as fh:
+        for record in records:
+            fh.write(json.dumps(record) + "\n")
+
+
+def test_tailer_reads_only_appended_records(tmp_path):
+    stats = tmp_path / "send_stats.jsonl"
+    store = RollupStore(tmp_path / "rollup.sqlite")
+    source = RollupSource("send_stats", stats, MSK, naive_utc=True)
+    _append(
+        stats,
+        {"ts": "2024-05-01T10:00:00Z", "email": "a@x.ru", "group": "sport", "status": "success"},
+        {"ts": "2024-05-01T21:30:00Z", "email": "b@y.ru", "group": "sport", "status": "error"},
+    )
+
+    assert store.sync(source) == 2
+    # 21:30Z is already 2 May in Moscow.
+    assert store.counts(source, date(2024, 5, 1), date(2024, 5, 1)) == {"success": 1}
+
+    _append(stats, {"ts": "2024-05-02T08:00:00Z", "email": "c@y.ru", "status": "bounce"})
+    with stats.open("a", encoding="utf-8") as fh:
+        fh.write('{"ts": "2024-05-02T09:00:00Z", "sta')  # not terminated yet
+    assert store.sync(source) == 1
+    assert store.sync(source) == 0
+
+    by_domain = store.counts(source, date(2024, 5, 2), date(2024, 5, 2), by=("domain",))
+    assert by_domain == {"y.ru": 2}
+    grouped = store.counts(source, by=("group", "status"))
+    assert grouped[("sport", "success")] == 1
+    assert grouped[("", "bounce")] == 1
+
+
+def test_rewritten_file_is_ingested_again(tmp_path):
+    log = tmp_path / "sent_log.csv"
+    store = RollupStore(tmp_path / "rollup.sqlite")
+    source = RollupSource("sent_log", log, UTC, ts_fields=("last_sent_at",))
+    log.write_text(
+        "key,email,last_sent_at,source,status\nk1,a@x.ru,2024-05-01T10:00:00+00:00,manual,sent\n",
+        encoding="utf-8",
+    )
+    assert store.counts(source) == {"sent": 1}
+
+    replacement = tmp_path / "sent_log.tmp"
+    replacement.write_text(
+        "key,email,last_sent_at,source,status\n"
+        "k1,a@x.ru,2024-05-02T10:00:00+00:00,manual,sent\n"
+        "k2,b@x.ru,2024-05-02T11:00:00+00:00,manual,failed\n",
+        encoding="utf-8",
+    )
+    replacement.replace(log)
+
+    assert store.counts(source, date(2024, 5, 2), date(2024, 5, 2)) == {"sent": 1, "failed": 1}
+    assert store.counts(source, date(2024, 5, 1), date(2024, 5, 1)) == {}
+    assert store.rebuilds == 1
+
+    log.unlink()
+    assert store.counts(source) == {}
+
+
+def test_audit_summary_uses_rollup(tmp_path, monkeypatch):
+    from emailbot import bot_handlers
+
+    audit = tmp_path / "bulk_audit_1.jsonl"
+    _append(
+        audit,
+        {"timestamp": "2024-05-01T10:00:00+03:00", "outcome": "sent"},
+        {"timestamp": "2024-05-01T11:00:00+03:00", "outcome": "blocked"},
+        {"timestamp": "2024-05-03T11:00:00+03:00", "outcome": "sent"},
+        {"outcome": "sent"},
+    )
+    monkeypatch.setattr(bot_handlers, "LOCAL_TZ", MSK)
+    start = bot_handlers.datetime(2024, 5, 1, tzinfo=MSK)
+    end = bot_handlers.datetime(2024, 5, 1, 23, 59, tzinfo=MSK)
+
+    text = bot_handlers._summarize_audit(tmp_path, start, end)
+
+    assert "Всего записей: 2" in text
+    assert "sent: 1" in text and "blocked: 1" in text
+    assert "Без timestamp: 1" in text
+    assert report_rollup.get_store().path == tmp_path / "report_rollup.sqlite"
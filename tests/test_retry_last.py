@@ -11,6 +11,7 @@ pytest.importorskip("emailbot.bot_handlers")
 
 import emailbot.bot_handlers as bh
 from emailbot import messaging_utils as mu, messaging
+from tests.util_imap import FakeImap
 
 
 class DummyMessage:
@@ -115,30 +116,16 @@ def test_sync_uses_upsert_and_no_duplicates(monkeypatch, tmp_path):
     msg["Date"] = email.utils.format_datetime(datetime.utcnow())
     raw = msg.as_bytes()
 
-    class DummyImap:
-        def login(self, *a, **k):
-            pass
-
-        def select(self, folder):
-            return "OK", [None]
-
-        def list(self, *a, **k):
-            return "OK", [b"Sent"]
-
-        def search(self, charset, criteria):
-            return "OK", [b"1"]
-
-        def fetch(self, num, what):
-            return "OK", [(b"", raw)]
-
-        def logout(self):
-            pass
-
-    monkeypatch.setattr(messaging, "imap_connect_ssl", lambda *a, **k: DummyImap())
+    imap = FakeImap({"Sent": [raw]})
+    monkeypatch.setattr(messaging, "imap_connect_ssl", lambda *a, **k: imap)
+    monkeypatch.setattr(messaging, "SYNC_STATE_PATH", str(tmp_path / "sync_state.json"))
+    monkeypatch.setattr(messaging, "IMAP_FOLDER_FILE", tmp_path / "imap_sent_folder.txt")
 
     stats1 = messaging.sync_log_with_imap()
     stats2 = messaging.sync_log_with_imap()
 
     assert stats1["new_contacts"] == 1
     assert stats2["new_contacts"] == 0
-    assert stats2["skipped_events"] == 1
+    # second run resumes after the stored UID and fetches nothing
+    assert imap.count("UID", "FETCH") == 1
+    assert imap.count("FETCH") == 0
@@ -0,0 +1,102 @@
+import csv
+import json
+
+from emailbot import messaging, send_journal
+from emailbot import messaging_utils as mu
+
+
+def _journal(tmp_path, applied, **kwargs):
+    def apply(records):
+        applied.append([rec["n"] for rec in records])
+
+    return send_journal.SendJournal(tmp_path / "journal.wal", appliers={"n": apply}, **kwargs)
+
+
+def test_records_are_applied_in_group_commits(tmp_path):
+    applied = []
+    journal = _journal(tmp_path, applied, max_batch=3, max_delay=60)
+
+    for n in range(7):
+        journal.submit("n", {"n": n}, keys=(f"k{n}",))
+
+    assert applied == [[0, 1, 2], [3, 4, 5]]
+    assert journal.has_pending("k6")
+    assert journal.flush() == 1
+    assert applied[-1] == [6]
+    assert not journal.has_pending("k6")
+    assert not journal.path.exists() or journal.path.read_text() == ""
+    journal.close()
+
+
+def test_unapplied_records_are_replayed_after_crash(tmp_path):
+    crashed = _journal(tmp_path, [], max_batch=100, max_delay=60)
+    crashed.submit("n", {"n": 1})
+    crashed.submit("n", {"n": 2})
+    # Simulate a crash: the process dies without flushing, leaving a torn line.
+    with crashed.path.open("a", encoding="utf-8") as fh:
+        fh.write('{"kind": "n", "da')
+
+    applied = []
+    journal = _journal(tmp_path, applied)
+    assert journal.recover() == 2
+    assert applied == [[1, 2]]
+    assert not journal.path.exists()
+
+
+def test_failed_commit_is_retried_without_losing_records(tmp_path):
+    applied = []
+    fail = [True]
+
+    def apply(records):
+        if fail[0]:
+            raise OSError("disk full")
+        applied.append([rec["n"] for rec in records])
+
+    journal = send_journal.SendJournal(
+        tmp_path / "journal.wal", appliers={"n": apply}, max_batch=100, max_delay=60
+    )
+    journal.submit("n", {"n": 1})
+    try:
+        journal.flush()
+    except OSError:
+        pass
+    journal.submit("n", {"n": 2})
+    lines = [json.loads(x) for x in journal.commit_path.read_text().splitlines()]
+    assert [rec["data"]["n"] for rec in lines] == [1]
+
+    fail[0] = False
+    assert journal.flush() == 2
+    assert applied == [[1, 2]]
+    assert not journal.commit_path.exists()
+
+
+def test_send_writes_sent_log_through_journal(tmp_path, monkeypatch):
+    html = tmp_path / "template.html"
+    html.write_text("<html><body>Hi</body></html>", encoding="utf-8")
+    log_path = tmp_path / "sent_log.csv"
+    monkeypatch.setattr(messaging, "LOG_FILE", str(log_path))
+    monkeypatch.setattr(mu, "SENT_LOG_PATH", str(log_path))
+    monkeypatch.setattr(messaging, "EMAIL_ADDRESS", "sender@example.com")
+    monkeypatch.setattr(messaging, "save_to_sent_folder", lambda *a, **k: None)
+    monkeypatch.setenv("SEND_JOURNAL_DELAY_MS", "60000")
+
+    class DummyClient:
+        def send(self, *args):
+            pass
+
+    outcome, token, log_key, _ = messaging.send_email_with_sessions(
+        DummyClient(), object(), "Sent", "user@example.com", str(html), subject="Hi"
+    )
+    assert outcome is messaging.SendOutcome.SENT
+    messaging.log_sent_email(
+        "user@example.com", "grp", "ok", 42, unsubscribe_token=token, key=log_key
+    )
+    assert not log_path.exists()
+
+    send_journal.flush()
+    with log_path.open(encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    assert len(rows) == 1
+    assert rows[0]["key"] == log_key
+    assert rows[0]["user_id"] == "42"
+    assert rows[0]["unsubscribe_token"] == token
@@ -0,0 +1,77 @@
+import email.utils
+from datetime import UTC, datetime, timedelta
+
+from emailbot import imap_reconcile
+from emailbot.mail import imap_lookup, sent_index
+from tests.util_imap import FakeImap, make_message
+
+
+def _date(days_ago: int) -> str:
+    return email.utils.format_datetime(datetime.now(UTC) - timedelta(days=days_ago))
+
+
+def _mailbox():
+    return FakeImap(
+        {
+            "Sent": [
+                make_message("A@Example.com", msgid="<1@x>", date=_date(20)),
+                make_message(["a@example.com", "b@example.com"], msgid="<2@x>", date=_date(3)),
+            ]
+        }
+    )
+
+
+def test_sync_builds_sorted_index():
+    imap = _mailbox()
+
+    assert sent_index.sync(imap, "Sent") == 3
+
+    dates = sent_index.sent_dates("a@example.com")
+    assert [msgid for _, msgid in dates] == ["<1@x>", "<2@x>"]
+    assert sent_index.last_sent_at("a@example.com", "Sent", 7) == dates[-1][0]
+    assert sent_index.last_sent_at("b@example.com", "Sent", 1) is None
+
+
+def test_sync_only_fetches_new_uids_and_resets_on_uidvalidity():
+    imap = _mailbox()
+    sent_index.sync(imap, "Sent")
+
+    imap.calls.clear()
+    assert sent_index.sync(imap, "Sent") == 0
+    assert imap.count("UID", "FETCH") == 0
+
+    imap.add("Sent", make_message("c@example.com", msgid="<3@x>", date=_date(0)))
+    assert sent_index.sync(imap, "Sent") == 1
+    assert sent_index.get_cursor("Sent").last_uid == 3
+
+    imap.uidvalidity += 1
+    imap.boxes["Sent"] = {1: make_message("d@example.com", date=_date(0)).as_bytes()}
+    sent_index.sync(imap, "Sent")
+    assert sent_index.sent_dates("a@example.com") == []
+    assert sent_index.last_sent_at("d@example.com") is not None
+
+
+def test_find_last_sent_at_uses_local_index(monkeypatch):
+    imap = _mailbox()
+    monkeypatch.setenv("IMAP_HOST", "imap.test")
+    monkeypatch.setenv("EMAIL_ADDRESS", "me@example.com")
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+    monkeypatch.setattr(imap_lookup, "imap_connect_ssl", lambda *a, **k: imap)
+
+    first = imap_lookup.find_last_sent_at("a@example.com", "Sent", 30)
+    imap.calls.clear()
+    second = imap_lookup.find_last_sent_at("b@example.com", "Sent", 30)
+
+    assert first == second
+    assert imap.count("UID", "FETCH") == 0
+
+
+def test_reconcile_reads_index(monkeypatch, tmp_path):
+    imap = _mailbox()
+    monkeypatch.setattr(imap_reconcile, "imap_connect_ssl", lambda *a, **k: imap)
+    monkeypatch.setattr(imap_reconcile, "LOG_FILE", str(tmp_path / "sent_log.csv"))
+
+    result = imap_reconcile.reconcile_csv_vs_imap(7)
+
+    assert result["imap_count"] == 2
+    assert {email for email, _ in result["only_imap"]} == {"a@example.com", "b@example.com"}
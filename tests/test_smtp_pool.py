@@ -0,0 +1,145 @@
+import json
+import smtplib
+import socketserver
+import threading
+
+import pytest
+
+from emailbot.smtp_pool import AccountPool, load_accounts
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def _reply(self, text):
+        self.wfile.write(text.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self._reply("220 stand-in")
+        recipients = []
+        while line := self.rfile.readline():
+            verb = line.decode().split(" ", 1)[0].strip().upper()
+            if verb == "EHLO":
+                self._reply("250-stand-in\r\n250 AUTH PLAIN")
+            elif verb == "AUTH":
+                self._reply("235 ok")
+            elif verb == "RCPT":
+                with server.lock:
+                    refuse = server.refuse > 0
+                    server.refuse -= refuse
+                if refuse:
+                    self._reply("451 try again later")
+                else:
+                    recipients.append(line.decode().split(":", 1)[1].strip(" <>\r\n"))
+                    self._reply("250 ok")
+            elif verb == "DATA":
+                self._reply("354 go on")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                server.received.extend(recipients)
+                self._reply("250 queued")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:  # MAIL, RSET, NOOP
+                if verb in ("MAIL", "RSET"):
+                    recipients = []
+                self._reply("250 ok")
+
+
+class _StandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self, refuse=0):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.lock = threading.Lock()
+        self.refuse = refuse
+        self.received = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def servers():
+    started = [_StandIn(), _StandIn(refuse=3)]
+    yield started
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def _deliver(pool, plan):
+    for account, recipients in plan:
+        with account.client() as client:
+            for rcpt in recipients:
+                try:
+                    client.send(account.address, rcpt, "Subject: hi\r\n\r\nbody\r\n")
+                except smtplib.SMTPRecipientsRefused as exc:
+                    pool.record_failure(account, exc.recipients[rcpt][0])
+                    if pool.resting(account):
+                        break
+                else:
+                    pool.record_success(account)
+
+
+def test_pool_shards_by_capacity_and_rests_failing_accounts(servers):
+    good, flaky = servers
+    accounts = load_accounts(
+        json.dumps(
+            [
+                {
+                    "name": "a",
+                    "address": "a@one.test",
+                    "password": "x",
+                    "host": "127.0.0.1",
+                    "port": good.server_address[1],
+                    "ssl": False,
+                    "starttls": False,
+                    "daily_cap": 5,
+                },
+                {
+                    "name": "b",
+                    "address": "b@two.test",
+                    "password": "y",
+                    "host": "127.0.0.1",
+                    "port": flaky.server_address[1],
+                    "ssl": False,
+                    "starttls": False,
+                },
+            ]
+        )
+    )
+    now = [1000.0]
+    pool = AccountPool(accounts, burst=3, backoff_base=30, clock=lambda: now[0])
+    recipients = [f"user{i}@example.com" for i in range(10)]
+
+    plan = pool.shard(recipients)
+    assert [(account.name, len(chunk)) for account, chunk in plan] == [("a", 3), ("b", 7)]
+    _deliver(pool, plan)
+    # Three 4xx replies in a row rest the second account before it sends anything.
+    assert good.received == recipients[:3] and flaky.received == []
+    assert pool.resting(accounts[1]) and pool.retry_after() == 30
+
+    plan = pool.shard(recipients[3:])
+    assert [(account.name, chunk) for account, chunk in plan] == [("a", recipients[3:5])]
+    _deliver(pool, plan)
+    assert pool.sent_today(accounts[0]) == 5 and pool.remaining(accounts[0]) == 0
+    assert pool.shard(recipients[5:]) == []
+
+    now[0] += 31
+    plan = pool.shard(recipients[5:])
+    assert [(account.name, chunk) for account, chunk in plan] == [("b", recipients[5:])]
+    _deliver(pool, plan)
+    assert flaky.received == recipients[5:]
+    assert pool.remaining(accounts[1]) is None
+
+
+def test_recipient_rejections_do_not_rest_but_auth_failures_do(monkeypatch):
+    monkeypatch.setenv("EMAIL_ADDRESS", "me@example.com")
+    (account,) = load_accounts("")
+    assert account.name == "default" and account.address == "me@example.com"
+    pool = AccountPool([account], burst=2, backoff_max=900, clock=lambda: 0.0)
+    for _ in range(5):
+        pool.record_failure(account, 550)
+    assert not pool.resting(account)
+    pool.record_failure(account, 535, "bad credentials")
+    assert pool.resting(account) and pool.retry_after() == 900
+    assert pool.status()[0]["last_error"] == "bad credentials"
@@ -0,0 +1,65 @@
+import csv
+
+from emailbot import messaging_utils as mu
+from emailbot import stoplist_index, suppress_list
+from utils import rules
+from utils.blocked_store import BlockedStore
+
+
+def _index(tmp_path, monkeypatch):
+    blocked = tmp_path / "blocked_emails.txt"
+    blocked.write_text("one@example.com\n", encoding="utf-8")
+    suppress_list.init_blocked(blocked)
+    rules.BLOCKLIST_PATH.write_text("Two@Example.com\n", encoding="utf-8")
+    suppress = tmp_path / "suppress.csv"
+    with suppress.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=["email", "code", "reason"])
+        writer.writeheader()
+        writer.writerow({"email": "three@example.com", "code": "550", "reason": "hard"})
+    monkeypatch.setattr(mu, "SUPPRESS_PATH", suppress)
+    return stoplist_index.StopListIndex(), blocked
+
+
+def test_index_merges_sources_and_filters_in_bulk(tmp_path, monkeypatch):
+    index, _ = _index(tmp_path, monkeypatch)
+
+    allowed, blocked = index.filter_blocked(
+        ["ONE@example.com", "ok@example.com", "two@example.com", "three@example.com"]
+    )
+
+    assert allowed == ["ok@example.com"]
+    assert blocked == ["ONE@example.com", "two@example.com", "three@example.com"]
+    assert index.is_blocked("One@Example.com")
+    assert {"one@example.com", "two@example.com", "three@example.com"} <= index.snapshot()
+
+
+def test_index_reloads_only_changed_sources(tmp_path, monkeypatch):
+    index, blocked = _index(tmp_path, monkeypatch)
+    index.refresh()
+    reloads = index.reloads
+
+    for _ in range(100):
+        assert not index.is_blocked("new@example.com")
+    assert index.reloads == reloads
+
+    suppress_list.add_blocked(["new@example.com"])
+    assert index.is_blocked("new@example.com")
+    assert index.reloads == reloads + 1
+
+
+def test_blocklist_writes_are_append_only(tmp_path):
+    path = tmp_path / "blocked_emails.txt"
+    path.write_text("z@example.com", encoding="utf-8")
+    suppress_list.init_blocked(path)
+
+    assert suppress_list.add_blocked(["b@example.com", "a@example.com", "z@example.com"]) == 2
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "z@example.com",
+        "a@example.com",
+        "b@example.com",
+    ]
+
+    store = BlockedStore(path)
+    assert store.contains("a@example.com")
+    assert store.add_many(["c@example.com"]) == 1
+    assert store.contains("c@example.com")
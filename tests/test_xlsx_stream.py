@@ -0,0 +1,73 @@
+import csv
+import tracemalloc
+
+from openpyxl import load_workbook
+
+from emailbot.reporting import xlsx_stream
+from emailbot.reporting.xlsx_stream import Sheet, estimate_widths, export, write_xlsx
+
+
+def _rows(count):
+    for i in range(count):
+        yield [f"user{i}@example.com", i, None]
+
+
+def test_widths_come_from_sample_and_header():
+    widths = estimate_widths(["email", "n"], [["a@b.c", 1], ["x" * 200, None, "extra"]])
+    assert widths == [80, 3 + 2, len("extra") + 2]
+    assert estimate_widths(None, []) == []
+
+
+def test_write_xlsx_streams_rows_and_sizes_columns(tmp_path):
+    path = write_xlsx(
+        tmp_path / "out.xlsx",
+        [
+            Sheet("list", ["email", "n", "note"], _rows(1200), bold_header=True),
+            Sheet("summary", None, [["total", 1200], [], ["done"]]),
+        ],
+        sample_rows=10,
+    )
+    wb = load_workbook(path)
+    ws = wb["list"]
+    assert ws.max_row == 1201
+    assert ws["A1"].value == "email" and ws["A1"].font.b
+    assert ws["A1201"].value == "user1199@example.com"
+    # Widths are fixed from the first ten rows only.
+    assert ws.column_dimensions["A"].width == len("user9@example.com") + 2
+    assert [c.value for c in wb["summary"]["A"]] == ["total", None, "done"]
+    wb.close()
+
+
+def test_csv_fast_path_and_format_selection(tmp_path, monkeypatch):
+    sheets = [Sheet("to_send", ["email"], [["a@x.com"]]), Sheet("suspects", ["email"], [])]
+    path = export(tmp_path / "preview.xlsx", sheets, fmt="csv")
+    assert path.suffix == ".csv"
+    with path.open(encoding="utf-8-sig", newline="") as fh:
+        assert list(csv.reader(fh)) == [
+            ["to_send"],
+            ["email"],
+            ["a@x.com"],
+            [],
+            ["suspects"],
+            ["email"],
+        ]
+
+    monkeypatch.delenv("EXPORT_FORMAT", raising=False)
+    monkeypatch.setenv("EXPORT_CSV_ABOVE_ROWS", "100")
+    assert xlsx_stream.export_format(50) == "xlsx"
+    assert xlsx_stream.export_format(101) == "csv"
+    monkeypatch.setenv("EXPORT_FORMAT", "csv")
+    assert xlsx_stream.export_format(1) == "csv"
+
+
+def test_peak_memory_does_not_grow_with_rows(tmp_path):
+    def peak(count):
+        tracemalloc.start()
+        write_xlsx(tmp_path / f"rows{count}.xlsx", [Sheet("s", ["email", "n", "x"], _rows(count))])
+        _, high = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return high
+
+    small = peak(1_000)
+    large = peak(20_000)
+    assert large < small * 2
@@ -0,0 +1,184 @@
+"""In-memory IMAP stand-in for tests exercising UID based scans."""
+
+from __future__ import annotations
+
+import email
+import re
+from collections.abc import Iterable
+from email.message import EmailMessage
+
+
+class FakeImap:
+    """Tiny subset of :class:`imaplib.IMAP4` backed by Python dictionaries.
+
+    Supports ``login``/``select``/``response``/``list``/``noop``/``append``/
+    ``close``/``uid`` (``SEARCH`` and ``FETCH``) and records every command in
+    :attr:`calls`.
+    """
+
+    def __init__(self, mailboxes: dict[str, list[bytes]] | None = None, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.boxes: dict[str, dict[int, bytes]] = {}
+        self.next_uid: dict[str, int] = {}
+        self.calls: list[tuple] = []
+        self.selected: str | None = None
+        self.logged_in = False
+        for name, messages in (mailboxes or {}).items():
+            self.boxes.setdefault(name, {})
+            for raw in messages:
+                self.add(name, raw)
+
+    # -- helpers -----------------------------------------------------------
+    def add(self, mailbox: str, raw: bytes | EmailMessage) -> int:
+        if isinstance(raw, EmailMessage):
+            raw = raw.as_bytes()
+        box = self.boxes.setdefault(mailbox, {})
+        uid = self.next_uid.get(mailbox, 1)
+        box[uid] = raw
+        self.next_uid[mailbox] = uid + 1
+        return uid
+
+    @staticmethod
+    def _name(mailbox: str) -> str:
+        return mailbox.strip('"')
+
+    def _box(self) -> dict[int, bytes]:
+        return self.boxes.get(self.selected or "", {})
+
+    def _parse_set(self, spec: str) -> list[int]:
+        box = self._box()
+        top = max(box) if box else 0
+        result: set[int] = set()
+        for part in spec.split(","):
+            if ":" in part:
+                lo, hi = part.split(":", 1)
+                lo_i = int(lo)
+                hi_i = top if hi == "*" else int(hi)
+                if hi == "*" and top and top < lo_i:
+                    result.add(top)
+                    continue
+                result.update(u for u in box if min(lo_i, hi_i) <= u <= max(lo_i, hi_i))
+            elif part:
+                result.add(int(part))
+        return sorted(u for u in result if u in box)
+
+    # -- imaplib API ---------------------------------------------------------
+    def login(self, *_args):
+        self.calls.append(("LOGIN",))
+        self.logged_in = True
+        return "OK", [b"Logged in"]
+
+    def list(self, *_args):
+        self.calls.append(("LIST",))
+        return "OK", [f'(\\HasNoChildren) "/" "{name}"'.encode() for name in self.boxes]
+
+    def select(self, mailbox="INBOX", readonly=False):
+        self.calls.append(("SELECT", mailbox))
+        name = self._name(mailbox)
+        if name not in self.boxes:
+            return "NO", [b"no such mailbox"]
+        self.selected = name
+        return "OK", [str(len(self.boxes[name])).encode()]
+
+    def response(self, code):
+        if code.upper() == "UIDVALIDITY":
+            return code, [str(self.uidvalidity).encode()]
+        return code, [None]
+
+    def status(self, mailbox, names):
+        return "OK", [f'"{self._name(mailbox)}" (UIDVALIDITY {self.uidvalidity})'.encode()]
+
+    def noop(self):
+        self.calls.append(("NOOP",))
+        if not self.logged_in:
+            raise OSError("connection closed")
+        return "OK", [b"NOOP completed"]
+
+    def append(self, mailbox, flags, date_time, message):
+        self.calls.append(("APPEND", self._name(mailbox)))
+        self.add(self._name(mailbox), message)
+        return "OK", [b"APPEND completed"]
+
+    def close(self):
+        self.calls.append(("CLOSE",))
+        self.selected = None
+        return "OK", [b"CLOSE completed"]
+
+    def search(self, charset, *criteria):
+        self.calls.append(("SEARCH",) + criteria)
+        return "OK", [b" ".join(str(u).encode() for u in sorted(self._box()))]
+
+    def fetch(self, num, what):
+        self.calls.append(("FETCH", num, what))
+        raw = self._box().get(int(num))
+        if raw is None:
+            return "NO", [None]
+        return "OK", [(f"{int(num)} (RFC822 {{{len(raw)}}}".encode(), raw), b")"]
+
+    def uid(self, command, *args):
+        command = command.upper()
+        args = tuple(a for a in args if a is not None)
+        self.calls.append(("UID", command) + args)
+        if command == "SEARCH":
+            criteria = " ".join(args)
+            match = re.match(r"UID\s+(\S+)", criteria)
+            if match:
+                uids = self._parse_set(match.group(1))
+            else:
+                uids = sorted(self._box())
+            return "OK", [" ".join(str(u) for u in uids).encode()]
+        if command == "FETCH":
+            spec, items = args[0], args[1]
+            fields = re.search(r"HEADER\.FIELDS \(([^)]*)\)", items)
+            wanted = fields.group(1).split() if fields else None
+            data: list = []
+            for uid in self._parse_set(spec):
+                raw = self._box()[uid]
+                if wanted is not None:
+                    msg = email.message_from_bytes(raw)
+                    lines = []
+                    for name in wanted:
+                        for value in msg.get_all(name, []):
+                            lines.append(f"{name.title()}: {value}")
+                    payload = ("\r\n".join(lines) + "\r\n\r\n").encode()
+                    label = "BODY[HEADER.FIELDS ({})]".format(" ".join(wanted))
+                else:
+                    payload = raw
+                    label = "BODY[]"
+                data.append((f"{uid} (UID {uid} {label} {{{len(payload)}}}".encode(), payload))
+                data.append(b")")
+            return "OK", data
+        return "BAD", [b"unsupported"]
+
+    def logout(self):
+        self.calls.append(("LOGOUT",))
+        self.logged_in = False
+        return "BYE", [b"bye"]
+
+    # -- assertions ------------------------------------------------------------
+    def count(self, *prefix: str) -> int:
+        return sum(1 for call in self.calls if call[: len(prefix)] == prefix)
+
+
+def make_message(
+    to: str | Iterable[str],
+    *,
+    subject: str = "hello",
+    date: str | None = None,
+    msgid: str | None = None,
+    sender: str = "me@example.com",
+    headers: dict[str, str] | None = None,
+    body: str = "body",
+) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = to if isinstance(to, str) else ", ".join(to)
+    msg["Subject"] = subject
+    if date:
+        msg["Date"] = date
+    if msgid:
+        msg["Message-ID"] = msgid
+    for key, value in (headers or {}).items():
+        msg[key] = value
+    msg.set_content(body)
+    return msg
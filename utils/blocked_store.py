@@ -8,20 +8,38 @@ from filelock import FileLock
 from .email_normalize import normalize_email
 
 
+_CACHE: dict[str, tuple[tuple[int, int], frozenset[str]]] = {}
+
+
 class BlockedStore:
     def __init__(self, path: Path | str):
         self.path = Path(path)
         self.lock = FileLock(str(self.path) + ".lock")
 
-    def read_all(self) -> set[str]:
-        if not self.path.exists():
-            return set()
+    def _snapshot(self) -> frozenset[str]:
+        """Parsed file contents, re-read only when mtime or size changed."""
+
+        key = str(self.path)
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            _CACHE.pop(key, None)
+            return frozenset()
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = _CACHE.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
         with self.lock:
             with self.path.open("r", encoding="utf-8") as handler:
-                return {line.strip().lower() for line in handler if line.strip()}
+                items = frozenset(line.strip().lower() for line in handler if line.strip())
+        _CACHE[key] = (signature, items)
+        return items
+
+    def read_all(self) -> set[str]:
+        return set(self._snapshot())
 
     def add_many(self, emails: Iterable[str]) -> int:
-        existing = self.read_all()
+        existing = self._snapshot()
         to_add: set[str] = set()
         for email in emails:
             normalized = normalize_email(email)
@@ -39,4 +57,4 @@ class BlockedStore:
         normalized = normalize_email(email)
         if not normalized:
             return False
-        return normalized in self.read_all()
+        return normalized in self._snapshot()
@@ -1,5 +1,4 @@
-import os, email, time
-from datetime import datetime, timedelta, timezone
+import os, time
 from .send_stats import log_bounce
 from .bounce_pop3 import sync_bounces_pop3
 from .bounce_common import (
@@ -8,6 +7,8 @@ from .bounce_common import (
     extract_recipient_fallback,
 )
 
+from emailbot.mail.imap_pool import imap_session
+from emailbot.mail.inbox_scan import InboxConsumer, scan_mailbox
 from emailbot.net_imap import get_imap_timeout, imap_connect_ssl
 
 BOUNCE_SINCE_DAYS = int(os.getenv("BOUNCE_SINCE_DAYS","7"))
@@ -40,54 +41,73 @@ def try_imap_connect():
             raise
     return None
 
-def sync_bounces():
-    """Сканирует INBOX, находит bounce, логирует их в send_stats как status='bounce'."""
+
+class _ImapUnavailable(ConnectionError):
+    pass
+
+
+def _pooled_connect(host, port, timeout=None):
     imap = try_imap_connect()
     if imap is None:
-        backend = os.getenv("BOUNCE_FETCH_BACKEND", "auto").lower()
-        if backend in ("auto", "pop3"):
-            return sync_bounces_pop3()
-        raise RuntimeError("IMAP unavailable and POP3 fallback disabled")
+        raise _ImapUnavailable(f"IMAP {host}:{port} unavailable")
+    return imap
 
-    imap.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-    imap.select(INBOX_MAILBOX)
 
-    since = (datetime.now(timezone.utc) - timedelta(days=BOUNCE_SINCE_DAYS)).strftime("%d-%b-%Y")
-    typ, data = imap.search(None, 'SINCE', since)
-    if typ != "OK":
-        imap.logout()
+def _log_bounce_message(m) -> int:
+    orig = extract_original_message(m)
+
+    if not orig:
+        # fallback: иногда поле Diagnostic-Code в тексте даёт получателя
+        rcpt = extract_recipient_fallback(m)
+        if rcpt:
+            log_bounce(rcpt, m.get('Subject','(bounce)'))
+            return 1
         return 0
 
-    count = 0
-    uids = data[0].split() if data and data[0] else []
-    for uid in uids:
-        typ, msgd = imap.fetch(uid, '(RFC822)')
-        if typ != "OK" or not msgd:
-            continue
-        m = email.message_from_bytes(msgd[0][1])
-        if not is_bounce_from(m.get('From','')):
-            continue
+    uuid = orig.get('X-EBOT-UUID','')
+    rcpt = orig.get('X-EBOT-Recipient','') or orig.get('To','')
+    mid  = orig.get('Message-ID','')
+    reason = m.get('Subject','(bounce)')
+    if rcpt:
+        log_bounce(rcpt, reason, uuid=uuid, message_id=mid)
+        return 1
+    return 0
 
-        orig = extract_original_message(m)
 
-        if not orig:
-            # fallback: иногда поле Diagnostic-Code в тексте даёт получателя
-            rcpt = extract_recipient_fallback(m)
-            if rcpt:
-                log_bounce(rcpt, m.get('Subject','(bounce)'))
-                count += 1
-            continue
+def bounce_consumer() -> InboxConsumer:
+    """Consumer for :mod:`emailbot.mail.inbox_scan`: only MAILER-DAEMON mail is fetched."""
+
+    return InboxConsumer(
+        name="bounce",
+        accepts=lambda m: is_bounce_from(m.get('From','')),
+        handle=_log_bounce_message,
+    )
 
-        uuid = orig.get('X-EBOT-UUID','')
-        rcpt = orig.get('X-EBOT-Recipient','') or orig.get('To','')
-        mid  = orig.get('Message-ID','')
-        reason = m.get('Subject','(bounce)')
-        if rcpt:
-            log_bounce(rcpt, reason, uuid=uuid, message_id=mid)
-            count += 1
 
-    imap.logout()
-    return count
+def sync_bounces():
+    """Сканирует INBOX, находит bounce, логирует их в send_stats как status='bounce'.
+
+    Просматриваются только письма с UID больше сохранённого курсора; тела
+    скачиваются лишь для писем от MAILER-DAEMON/postmaster.
+    """
+    try:
+        with imap_session(
+            IMAP_HOST,
+            IMAP_PORT,
+            EMAIL_ADDRESS,
+            EMAIL_PASSWORD,
+            timeout=IMAP_TIMEOUT,
+            connect=_pooled_connect,
+        ) as imap:
+            totals = scan_mailbox(
+                imap, INBOX_MAILBOX, [bounce_consumer()], since_days=BOUNCE_SINCE_DAYS
+            )
+    except _ImapUnavailable:
+        backend = os.getenv("BOUNCE_FETCH_BACKEND", "auto").lower()
+        if backend in ("auto", "pop3"):
+            return sync_bounces_pop3()
+        raise RuntimeError("IMAP unavailable and POP3 fallback disabled")
+    return totals.get("bounce", 0)
 
 
 def scan_bounces() -> int:
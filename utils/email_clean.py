@@ -3,9 +3,21 @@ from __future__ import annotations
 import logging
 import os
 import re
+import string
 import unicodedata
 from typing import Iterable, Set
 
+from utils.email_key import get_email_key
+from utils.obfuscation_scan import (
+    IGNORECASE_EXTRA,
+    LEADING_SPACE,
+    at_boundary,
+    iter_at_matches,
+    run_end,
+    run_start,
+    scan,
+)
+
 try:
     import idna  # type: ignore
 except Exception:  # fallback
@@ -43,11 +55,16 @@ CYR_TO_LAT = {
     "Х": "X",
 }
 
+_CYR_TO_LAT_TABLE = str.maketrans(CYR_TO_LAT)
+
 _INVISIBLES_RE = re.compile(r"[\u200B-\u200F\u202A-\u202E\u2066-\u2069\uFEFF]")
 
 LOCAL_PLUS_TAG_RE = re.compile(r"\+[^@]+$")
 
 EMAIL_RE = re.compile(r"(?ix)\b[a-z0-9._%+\-]+@(?:[a-z0-9\-]+\.)+[a-z0-9\-]{2,}\b")
+# EMAIL_RE, разобранный на части для iter_at_matches (поиск от «@», без перебора стартов)
+_EMAIL_LOCAL_CHARS = string.ascii_letters + string.digits + IGNORECASE_EXTRA + "._%+-"
+_EMAIL_DOMAIN_RE = re.compile(r"(?i)(?:[a-z0-9\-]+\.)+[a-z0-9\-]{2,}\b")
 EMAIL_STRICT_VALIDATE_RE = re.compile(
     r"^[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-zА-Яа-яЁё]{2,}$"
 )
@@ -74,6 +91,17 @@ OBFUSCATED_EMAIL_RE = re.compile(
     """
 )
 
+# OBFUSCATED_EMAIL_RE пробует каждую стартовую позицию с ленивым local и
+# жадным доменом до 255 символов; тот же результат считается линейно
+# через obfuscation_scan.scan: сначала разделитель, затем части вокруг него.
+_OBFUSCATED_SEP_RE = re.compile(
+    r"(?i)@|\(\s*at\s*\)|\[\s*at\s*\]|\{\s*at\s*\}|<\s*at\s*>|\b(?:at|собака)\b|&commat;"
+)
+_CYRILLIC = "".join(chr(c) for c in range(0x0400, 0x0500))
+_OBF_LOCAL_FIRST = string.ascii_letters + string.digits + IGNORECASE_EXTRA
+_OBF_LOCAL_CHARS = _OBF_LOCAL_FIRST + " ._-+" + _CYRILLIC + _DOT_LIKE_CHARS
+_OBF_DOMAIN_CHARS = _OBF_LOCAL_FIRST + " -." + _CYRILLIC + _DOT_LIKE_CHARS + "()[]{}<>"
+
 # ВАЖНО: (?<!@) — чтобы доменная часть e-mail не считалась ссылкой
 SAFE_URL_RE = re.compile(
     r"(?ix)(?<!@)\b((?:https?://)?(?:www\.)?[^\s<>()]+?\.[^\s<>()]{2,}[^\s<>()]*)(?=$|[\s,;:!?)}\]])"
@@ -87,6 +115,16 @@ _DOT_WORD_RE = re.compile(r"(?i)\b(?:dot|точка)\b")
 _AT_BRACKET_RE = re.compile(r"(?i)[\(\[\{<]\s*(?:at|собака)\s*[\)\]\}>]")
 _DOT_BRACKET_RE = re.compile(r"(?i)[\(\[\{<]\s*(?:dot|точка)\s*[\)\]\}>]")
 
+# ``\s*(?:…)\s*`` с LEADING_SPACE вместо ведущего ``\s*``: результат тот же,
+# но длинная серия пробелов перебирается один раз, а не с каждой позиции.
+_AT_SIGN_RE = re.compile(rf"{LEADING_SPACE}@\s*")
+_AT_TOKEN_RE = re.compile(
+    rf"(?i){LEADING_SPACE}(?:\[at\]|\(at\)|\{{at\}}|<\s*at\s*>|\(a\)|&commat;| at | собака )\s*"
+)
+_DOT_TOKEN_RE = re.compile(
+    rf"(?i){LEADING_SPACE}(?:\[dot\]|\(dot\)|\{{dot\}}|<\s*dot\s*>| dot | точка |[{_DOT_LIKE_CLASS}])\s*"
+)
+
 # ---------------------------------------------------------------------------
 #  Дедупликация с сохранением ОРИГИНАЛА (нужна для emailbot/handlers/preview.py)
 #  Объявляем РАНО (выше по файлу), чтобы точно успеть к моменту импорта.
@@ -162,7 +200,7 @@ def _normalize_confusables(text: str) -> str:
     if not text or not CONFUSABLES_NORMALIZE:
         return text
     t = unicodedata.normalize("NFC", text)
-    return "".join(CYR_TO_LAT.get(ch, ch) for ch in t)
+    return t.translate(_CYR_TO_LAT_TABLE)
 
 
 def strip_invisibles(text: str) -> str:
@@ -186,7 +224,8 @@ def preclean_for_email_extraction(text: str) -> str:
     t = t.replace("\u00A0", " ").replace("\u00AD", "")
     t = t.replace("\r", "\n")
     # Убираем разрывы вокруг @ и «точек»
-    t = re.sub(r"\s*@\s*", "@", t)
+    if "@" in t:
+        t = _AT_SIGN_RE.sub("@", t)
     t = re.sub(rf"(?<=\w)[{_DOT_LIKE_CLASS}](?=\w)", ".", t)
     t = re.sub(r"[ \t]+", " ", t)
     return t.strip()
@@ -196,24 +235,9 @@ def _deobfuscate_chunks(chunks: Iterable[str]) -> Iterable[str]:
     if not OBFUSCATION_ENABLE:
         yield from chunks
         return
-    subs = [
-        (
-            re.compile(
-                r"(?i)\s*(?:\[at\]|\(at\)|\{at\}|<\s*at\s*>|\(a\)|&commat;| at | собака )\s*"
-            ),
-            "@",
-        ),
-        (
-            re.compile(
-                rf"(?i)\s*(?:\[dot\]|\(dot\)|\{{dot\}}|<\s*dot\s*>| dot | точка |[{_DOT_LIKE_CLASS}])\s*"
-            ),
-            ".",
-        ),
-    ]
     for s in chunks:
-        t = s
-        for rx, rep in subs:
-            t = rx.sub(rep, t)
+        t = _AT_TOKEN_RE.sub("@", s)
+        t = _DOT_TOKEN_RE.sub(".", t)
         needs_collapse = (
             "@" in t
             or _AT_WORD_RE.search(t)
@@ -240,19 +264,37 @@ def _collapse_spaced_tokens(s: str) -> str:
     t = _AT_WORD_RE.sub("@", t)
     t = _DOT_WORD_RE.sub(".", t)
     t = t.replace("&commat;", "@")
-    t = re.sub(r"\s*@\s*", "@", t)
-    t = re.sub(r"\s*\.\s*", ".", t)
-    t = re.sub(rf"\s*[{_DOT_LIKE_CLASS}]\s*", ".", t)
+    # Склейка вокруг «@»/«.» и одиночных символов сводится к удалению всех
+    # пробелов — делаем это сразу, без квадратичных \s*…\s* проходов.
+    return "".join(t.split())
+
+
+def _find_emails(text: str) -> list[str]:
+    """``EMAIL_RE.findall(text)`` in linear time."""
+
+    return [
+        text[start:end]
+        for start, end in iter_at_matches(text, _EMAIL_LOCAL_CHARS, _EMAIL_DOMAIN_RE)
+    ]
 
-    # склейка одиночных символов, разделённых пробелами
-    while True:
-        new = re.sub(r"(?i)\b([a-z0-9])\s+(?=[a-z0-9@])", r"\1", t)
-        if new == t:
-            break
-        t = new
 
-    t = re.sub(r"\s+", "", t)
-    return t
+def _obfuscated_local_start(text: str, sep: int, lo: int) -> int:
+    """Leftmost start of OBFUSCATED_EMAIL_RE's local part before ``sep``."""
+
+    start = run_start(text, sep, _OBF_LOCAL_CHARS, max(lo, sep - 65))
+    for i in range(start, sep):
+        if text[i] in _OBF_LOCAL_FIRST and at_boundary(text, i):
+            return i
+    return -1
+
+
+def _obfuscated_domain_end(text: str, sep_end: int) -> int:
+    """End of OBFUSCATED_EMAIL_RE's domain: the longest run up to a ``\\b``."""
+
+    end = run_end(text, sep_end, _OBF_DOMAIN_CHARS, sep_end + 255)
+    while end > sep_end and not at_boundary(text, end):
+        end -= 1
+    return end if end > sep_end else -1
 
 
 def preclean_obfuscations(text: str) -> str:
@@ -291,8 +333,7 @@ def parse_emails_unified(text: str, return_meta: bool = False):
     def _add_match(candidate: str) -> None:
         if not candidate:
             return
-        for m in EMAIL_RE.finditer(candidate):
-            raw_email = m.group(0)
+        for raw_email in _find_emails(candidate):
             local, dom = raw_email.split("@", 1)
             normalized = f"{local.lower()}@{_idna_domain(dom)}"
             found.add(normalized)
@@ -315,12 +356,10 @@ def parse_emails_unified(text: str, return_meta: bool = False):
         for candidate in variants:
             _add_match(candidate)
 
-    for m in OBFUSCATED_EMAIL_RE.finditer(src):
-        local_raw = m.group(1) or ""
-        sep = m.group(2) or ""
-        domain_raw = m.group(3) or ""
-        cand = f"{local_raw}{'@' if '@' in sep else '@'}{domain_raw}"
-        cand = _collapse_spaced_tokens(cand)
+    for start, sep, sep_end, end in scan(
+        src, _OBFUSCATED_SEP_RE, _obfuscated_local_start, _obfuscated_domain_end
+    ):
+        cand = _collapse_spaced_tokens(f"{src[start:sep]}@{src[sep_end:end]}")
         if not cand or "@" not in cand:
             continue
         _add_match(cand)
@@ -337,7 +376,7 @@ def parse_emails_unified(text: str, return_meta: bool = False):
 
 def contains_url_but_not_email(text: str) -> bool:
     cleaned = preclean_for_email_extraction(text or "")
-    if EMAIL_RE.search(cleaned):
+    if _find_emails(cleaned):
         return False
     return bool(SAFE_URL_RE.search(cleaned))
 
@@ -367,6 +406,16 @@ _GMAIL_EQUIV_DOMAINS = {"gmail.com", "googlemail.com"}
 def normalize_email_unified(addr: str) -> str:
     """Return an address normalised consistently for stop-list handling.
 
+    Memoized through :func:`utils.email_key.get_email_key`; see
+    :func:`_normalize_email_unified` for the policy.
+    """
+
+    return get_email_key(addr).unified
+
+
+def _normalize_email_unified(addr: str) -> str:
+    """Uncached :func:`normalize_email_unified`.
+
     Policy:
     - strip surrounding whitespace and lowercase the value;
     - for Gmail domains remove dots in the local part and drop ``+tag``
@@ -436,8 +485,13 @@ def canonical_email(addr: str) -> str:
     """
     Каноникализация адреса: lowercase, IDNA для домена, провайдер-спец. правила.
     Предполагается, что вход уже синтаксически валиден.
+    Результат кэшируется в :func:`utils.email_key.get_email_key`.
     """
 
+    return get_email_key(addr).canonical
+
+
+def _canonical_email(addr: str) -> str:
     local, dom = addr.split("@", 1)
     dom_c = _canonical_domain(dom)
     loc_c = _canonical_local(local, dom_c)
@@ -462,13 +516,7 @@ def dedupe_with_variants(emails, return_map: bool = False):
         e = (raw or "").strip().lower()
         if not e or "@" not in e:
             continue
-        try:
-            local, dom = e.split("@", 1)
-        except ValueError:
-            continue
-        dom_c = _canonical_domain(dom)
-        loc_c = _canonical_local(local, dom_c)
-        canon = f"{loc_c}@{dom_c}"
+        canon = get_email_key(e).canonical
         mapping.setdefault(canon, set()).add(e)
     uniques = sorted(mapping.keys())
     if return_map:
@@ -688,7 +736,7 @@ def strict_validate_domain(addr: str) -> bool:
 
 def looks_like_email(text: str) -> bool:
     """Простая проверка, похоже ли на e-mail (раньше использовалась в пайплайне)."""
-    return bool(EMAIL_RE.search(text or ""))
+    return bool(_find_emails(text or ""))
 
 
 def safe_parse_email(text: str):
@@ -725,7 +773,7 @@ def normalize_domain(dom: str) -> str:
 def extract_possible_emails(text: str):
     """Раньше возвращала список всех найденных адресов (без нормализации)."""
     try:
-        return EMAIL_RE.findall(preclean_for_email_extraction(text))
+        return _find_emails(preclean_for_email_extraction(text))
     except Exception:
         return []
 
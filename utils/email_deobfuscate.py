@@ -26,11 +26,11 @@ _DEOBF_TIMEOUT_SEC = max(_DEOBF_TIMEOUT_MS, 0) / 1000.0
 _COUNT_LIMIT = max(_DEOBF_MAX_REPLACES, 0)
 
 _regex_mod = _regex or _re
-_TIMEOUT_ERRORS: Tuple[type[BaseException], ...]
+# ``regex`` сообщает о таймауте встроенным TimeoutError (в старых версиях —
+# собственным regex.TimeoutError).
+_TIMEOUT_ERRORS: Tuple[type[BaseException], ...] = (TimeoutError,)
 if _regex is not None and hasattr(_regex, "TimeoutError"):
-    _TIMEOUT_ERRORS = (_regex.TimeoutError,)  # type: ignore[attr-defined]
-else:
-    _TIMEOUT_ERRORS = tuple()
+    _TIMEOUT_ERRORS += (_regex.TimeoutError,)  # type: ignore[attr-defined]
 
 try:  # pragma: no cover - optional dependency
     from emailbot.progress_watchdog import heartbeat_now as _heartbeat_now
@@ -81,65 +81,33 @@ def _subn_kwargs() -> dict[str, object]:
     return kwargs
 
 
-def _safe_subn(
+def _safe_sub(
     pattern,
     text: str,
     repl: Callable[[object], str] | str,
     *,
     rule_name: str,
     rules: Set[str],
-) -> Tuple[str, int]:
-    """Run ``pattern.subn`` with limits and guard against catastrophic cases."""
+) -> str:
+    """Run ``pattern.sub`` with limits; record ``rule_name`` if the text changed.
+
+    A substitution that reproduces its input (``"-"`` for ``"-"``) is not a
+    change, otherwise the fixed-point loop below would never stop.
+    """
 
-    kwargs = _subn_kwargs()
     try:
-        if callable(repl):
-            def _wrapped(match):
-                rules.add(rule_name)
-                return repl(match)
-
-            return pattern.subn(_wrapped, text, **kwargs)
-        new_text, count = pattern.subn(repl, text, **kwargs)
-        if count:
-            rules.add(rule_name)
-        return new_text, count
+        new_text = pattern.sub(repl, text, **_subn_kwargs())
     except _TIMEOUT_ERRORS:
-        return text, 0
-
-
-def _word_pattern(base: str) -> str:
-    """Allow obfuscated words like "s o b a k a" or "d-o-t"."""
-
-    letters = list(base)
-    if not letters:
-        return ""
-    rest = [rf"\\W?{_regex_mod.escape(ch)}" for ch in letters[1:]]
-    return rf"{_regex_mod.escape(letters[0])}\\s*" + "\\s*".join(rest)
-
-
-_LOCAL_FRAGMENT = r"[\w.%+\-]{1,64}"
-_DOMAIN_LABEL = r"[A-Za-z0-9-]{1,63}"
-
-# Разделитель между local-part и обфусцированным «at»: хотя бы один не-алфанумерик.
-_AT_SEP = r"\W+"
-
-_PAT_ATS = [
-    _regex_mod.compile(
-        rf"(?P<L>{_LOCAL_FRAGMENT}){_AT_SEP}(?:{_word_pattern('собака')}|{_word_pattern('at')}){_AT_SEP}(?P<R>{_DOMAIN_LABEL}(?:\.{_DOMAIN_LABEL})*)",
-        _regex_mod.IGNORECASE,
-    )
-]
+        return text
+    if new_text != text:
+        rules.add(rule_name)
+    return new_text
 
-_PAT_DOTS = [
-    _regex_mod.compile(
-        rf"(?P<L>{_DOMAIN_LABEL})\s*[\(\[\{{]?\s*(?:{_word_pattern('точка')}|{_word_pattern('dot')})\s*[\)\]\}}]?\s*(?P<R>{_DOMAIN_LABEL})",
-        _regex_mod.IGNORECASE,
-    )
-]
 
-_PAT_SPACED_LETTERS = [
-    _regex_mod.compile(r"\b(?:[A-Za-z0-9]\s+){1,}[A-Za-z0-9]\b")
-]
+# «Обфусцированные» собака/at и точка/dot раскрываются в utils.email_clean;
+# здесь остаются разреженные буквы и дефисы. В обоих шаблонах нет вложенных
+# квантификаторов с пересекающимися классами.
+_PAT_SPACED_LETTERS = _regex_mod.compile(r"\b(?:[A-Za-z0-9]\s+){1,}[A-Za-z0-9]\b")
 
 _HYPHEN_RE = _regex_mod.compile(r"(?<=\w)\s*-\s*(?=\w)")
 
@@ -151,48 +119,17 @@ def _deobfuscate_chunk(text: str, rules: Set[str]) -> str:
         return text
 
     current = text
-
-    def _apply(patterns, repl_func: Callable[[object], str], rule_name: str) -> bool:
-        nonlocal current
-        changed = False
-        for pat in patterns:
-            new_current, count = _safe_subn(pat, current, repl_func, rule_name=rule_name, rules=rules)
-            if count:
-                current = new_current
-                changed = True
-        return changed
-
     while True:
-        changed = False
-        if _apply(
-            _PAT_DOTS,
-            lambda m: f"{m.group('L')}.{m.group('R')}",
-            "dot",
-        ):
-            changed = True
-        if _apply(
-            _PAT_ATS,
-            lambda m: f"{m.group('L')}@{m.group('R')}",
-            "at",
-        ):
-            changed = True
-        if _apply(
+        previous = current
+        current = _safe_sub(
             _PAT_SPACED_LETTERS,
-            lambda m: m.group(0).replace(" ", ""),
-            "spaced",
-        ):
-            changed = True
-        new_current, hyphen_count = _safe_subn(
-            _HYPHEN_RE,
             current,
-            "-",
-            rule_name="hyphen",
+            lambda m: m.group(0).replace(" ", ""),
+            rule_name="spaced",
             rules=rules,
         )
-        if hyphen_count:
-            current = new_current
-            changed = True
-        if not changed:
+        current = _safe_sub(_HYPHEN_RE, current, "-", rule_name="hyphen", rules=rules)
+        if current == previous:
             break
     return current
 
@@ -0,0 +1,225 @@
+"""Memoized canonical forms of an e-mail address.
+
+Every filter in a preview or send run used to normalise the same address on
+its own: the sanitizer, the stop-list, the block list, the cooldown cache and
+the send history each repeated NFKC, IDNA and provider folding, several times
+per address.  :func:`get_email_key` returns one interned :class:`EmailKey`
+per input string from a bounded LRU cache (``EMAIL_KEY_CACHE_SIZE`` entries,
+65536 by default).  Each form is computed on first access and then kept on
+the key, so an address costs one normalisation per form per run however many
+filters look at it.
+
+The public normalisers (``normalize_email_unified``, ``canonical_email``,
+``normalize_history_key``, ``normalize_email_for_key``, ``sanitizer.email_key``
+and ``extraction_common.normalize_email``) are thin wrappers over these forms
+and keep their exact results.
+"""
+
+from __future__ import annotations
+
+import os
+from email.utils import parseaddr
+from functools import lru_cache
+
+try:
+    import idna  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    idna = None  # type: ignore
+
+
+def _cache_size() -> int:
+    try:
+        return max(0, int(os.getenv("EMAIL_KEY_CACHE_SIZE", "") or 65536))
+    except ValueError:
+        return 65536
+
+
+def _to_idna(domain: str) -> str:
+    if not domain or idna is None:
+        return domain
+    try:
+        return idna.encode(domain, uts46=True).decode("ascii")
+    except Exception:
+        return domain
+
+
+def _display(raw: str) -> str:
+    from emailbot.sanitizer import _clean_display
+
+    return _clean_display(raw)
+
+
+def _normalized(raw: str) -> str:
+    from emailbot.sanitizer import _normalize_email
+
+    return _normalize_email(raw)
+
+
+def _canonical(raw: str) -> str:
+    from utils.email_clean import _canonical_email
+
+    return _canonical_email(raw)
+
+
+def _unified(raw: str) -> str:
+    from utils.email_clean import _normalize_email_unified
+
+    return _normalize_email_unified(raw)
+
+
+def _dedupe(raw: str) -> str:
+    from emailbot.extraction_common import _normalize_email
+
+    return _normalize_email(raw)
+
+
+def _history(raw: str) -> str:
+    from emailbot.history_key import _history_key
+
+    return _history_key(raw)
+
+
+def _cooldown(raw: str) -> str:
+    from emailbot.services.cooldown import _cooldown_key
+
+    return _cooldown_key(raw)
+
+
+class EmailKey:
+    """Canonical forms of one address, each computed on first access.
+
+    ``display``
+        the address as shown to the user: invisibles and stray punctuation
+        removed, the local part untouched (the sanitizer's display form);
+    ``normalized``
+        NFKC, lowercased, IDNA domain (``sanitizer.email_key``);
+    ``canonical``
+        provider-folded: Gmail/Yandex dots and ``+tag`` dropped, IDNA domain
+        (``canonical_email``; raises ``ValueError`` without an ``@``);
+    ``unified``
+        the stop-list form, folding Gmail only (``normalize_email_unified``);
+    ``idna``
+        ``unified`` with an IDNA domain, as block lists and history store it;
+    ``domain``
+        the lower-cased IDNA domain, ``""`` for anything without one;
+    ``dedupe``
+        homoglyph-folded, Gmail-folded key of the extraction pipeline and the
+        cross-source dedupe (``extraction_common.normalize_email``);
+    ``history``
+        the send-history key (``normalize_history_key``);
+    ``cooldown``
+        the cooldown cache key (``normalize_email_for_key``).
+    """
+
+    __slots__ = (
+        "raw",
+        "_display",
+        "_normalized",
+        "_canonical",
+        "_unified",
+        "_idna",
+        "_domain",
+        "_dedupe",
+        "_history",
+        "_cooldown",
+    )
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self._display = self._normalized = self._canonical = self._unified = None
+        self._idna = self._domain = self._dedupe = None
+        self._history = self._cooldown = None
+
+    def __repr__(self) -> str:
+        return f"EmailKey({self.raw!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EmailKey) and other.raw == self.raw
+
+    def __hash__(self) -> int:
+        return hash(self.raw)
+
+    @property
+    def display(self) -> str:
+        if self._display is None:
+            self._display = _display(self.raw)
+        return self._display
+
+    @property
+    def normalized(self) -> str:
+        if self._normalized is None:
+            self._normalized = _normalized(self.raw)
+        return self._normalized
+
+    @property
+    def canonical(self) -> str:
+        if self._canonical is None:
+            self._canonical = _canonical(self.raw)
+        return self._canonical
+
+    @property
+    def unified(self) -> str:
+        if self._unified is None:
+            self._unified = _unified(self.raw)
+        return self._unified
+
+    @property
+    def idna(self) -> str:
+        if self._idna is None:
+            unified = self.unified
+            local, sep, domain = unified.partition("@")
+            domain = _to_idna(domain) if sep else ""
+            self._idna = f"{local}@{domain.lower()}" if domain else unified
+        return self._idna
+
+    @property
+    def domain(self) -> str:
+        if self._domain is None:
+            parsed = parseaddr(self.raw)[1] if self.raw else ""
+            domain = parsed.split("@", 1)[1].strip().lower() if "@" in parsed else ""
+            self._domain = _to_idna(domain).lower() if domain else ""
+        return self._domain
+
+    @property
+    def dedupe(self) -> str:
+        if self._dedupe is None:
+            self._dedupe = _dedupe(self.raw)
+        return self._dedupe
+
+    @property
+    def history(self) -> str:
+        if self._history is None:
+            self._history = _history(self.raw)
+        return self._history
+
+    @property
+    def cooldown(self) -> str:
+        if self._cooldown is None:
+            self._cooldown = _cooldown(self.raw)
+        return self._cooldown
+
+
+@lru_cache(maxsize=_cache_size())
+def _interned(raw: str) -> EmailKey:
+    return EmailKey(raw)
+
+
+def get_email_key(addr: object) -> EmailKey:
+    """Return the shared :class:`EmailKey` for ``addr`` (``None`` counts as ``""``)."""
+
+    if not isinstance(addr, str):
+        addr = "" if addr is None else str(addr)
+    return _interned(addr)
+
+
+def clear_cache() -> None:
+    """Forget every cached key, e.g. after canonicalisation settings change."""
+
+    _interned.cache_clear()
+
+
+def cache_info():
+    return _interned.cache_info()
+
+
+__all__ = ["EmailKey", "cache_info", "clear_cache", "get_email_key"]
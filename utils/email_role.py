@@ -5,7 +5,11 @@ from __future__ import annotations
 import json
 import os
 import re
-from typing import Dict, Iterable
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Sequence, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from utils.name_match import FioMatcher
 
 # Keywords frequently used for shared/departmental mailboxes.
 #
@@ -212,23 +216,21 @@ def _merge_reasons(reasons: Iterable[str]) -> str:
     return ",".join(unique) if unique else "baseline"
 
 
-def classify_email_role(
-    local: str, domain: str, context_text: str = ""
-) -> Dict[str, object]:
-    """Return heuristics-based role classification.
+def _context_flags(context_text: str) -> Tuple[bool, bool]:
+    """``(author hint, department hint)`` found in ``context_text``."""
 
-    The output follows the ``{"class", "score", "reason"}`` convention used by
-    the extraction pipeline. The score is normalised to ``[0.0, 1.0]`` with
-    ``0.5`` representing an undecided baseline. Results are:
+    ctx = (context_text or "").lower()
+    return bool(PERSONAL_HINT_RE.search(ctx)), bool(ROLE_CONTEXT_RE.search(ctx))
 
-    ``role``
-        Highly confident that the address points to a shared mailbox.
-    ``personal``
-        Looks like a personal mailbox (FIO pattern or explicit hint).
-    ``unknown``
-        Not enough evidence either way; callers may keep such addresses.
-    """
 
+@lru_cache(maxsize=4096)
+def _domain_is_role(domain_lower: str) -> bool:
+    return bool(_tokenise(domain_lower) & ROLE_KEYWORDS)
+
+
+def _classify(
+    local: str, domain: str, context_flags: Callable[[], Tuple[bool, bool]]
+) -> Dict[str, object]:
     local = (local or "").strip()
     domain = (domain or "").strip()
 
@@ -250,8 +252,7 @@ def classify_email_role(
 
     score = 0.5
 
-    domain_tokens = _tokenise(domain.lower()) if domain else set()
-    if domain_tokens & ROLE_KEYWORDS:
+    if domain and _domain_is_role(domain.lower()):
         score -= 0.15
         reason.append("role-domain")
 
@@ -259,12 +260,12 @@ def classify_email_role(
         score += 0.25
         reason.append("fio-like")
 
-    ctx = (context_text or "").lower()
-    if PERSONAL_HINT_RE.search(ctx):
+    author_hint, dept_hint = context_flags()
+    if author_hint:
         score += 0.15
         reason.append("author-context")
 
-    if ROLE_CONTEXT_RE.search(ctx):
+    if dept_hint:
         score -= 0.2
         reason.append("dept-context")
 
@@ -279,5 +280,70 @@ def classify_email_role(
     return {"class": cls, "score": round(score, 3), "reason": _merge_reasons(reason)}
 
 
-__all__ = ["classify_email_role"]
+def classify_email_role(
+    local: str, domain: str, context_text: str = ""
+) -> Dict[str, object]:
+    """Return heuristics-based role classification.
+
+    The output follows the ``{"class", "score", "reason"}`` convention used by
+    the extraction pipeline. The score is normalised to ``[0.0, 1.0]`` with
+    ``0.5`` representing an undecided baseline. Results are:
+
+    ``role``
+        Highly confident that the address points to a shared mailbox.
+    ``personal``
+        Looks like a personal mailbox (FIO pattern or explicit hint).
+    ``unknown``
+        Not enough evidence either way; callers may keep such addresses.
+    """
+
+    return _classify(local, domain, lambda: _context_flags(context_text))
+
+
+def classify_many(
+    emails: Iterable[str],
+    context_text: str = "",
+    *,
+    contexts: Sequence[str] | None = None,
+    candidates: "Iterable[Tuple[str, str]] | FioMatcher | None" = None,
+) -> List[Dict[str, object]]:
+    """Classify all ``emails`` of one document in a single pass.
+
+    Each result is what :func:`classify_email_role` returns for the address
+    plus ``fio_score``, equal to
+    ``fio_match_score(local, context_text, candidates=candidates)``.  Name
+    candidates are computed once (unless given) and compiled into a
+    :class:`utils.name_match.FioMatcher`; context hints are evaluated once per
+    distinct context.  ``candidates`` may also be a ready
+    :class:`~utils.name_match.FioMatcher`.  ``contexts`` optionally gives a context per address
+    (same order as ``emails``); ``context_text`` is used otherwise.
+    """
+
+    from utils.name_match import FioMatcher, fio_candidates
+
+    if isinstance(candidates, FioMatcher):
+        matcher = candidates
+    else:
+        matcher = FioMatcher(
+            candidates if candidates is not None else fio_candidates(context_text)
+        )
+    flags: Dict[str, Tuple[bool, bool]] = {}
+
+    def flags_for(ctx: str) -> Tuple[bool, bool]:
+        cached = flags.get(ctx)
+        if cached is None:
+            cached = flags[ctx] = _context_flags(ctx)
+        return cached
+
+    results: List[Dict[str, object]] = []
+    for index, email in enumerate(emails):
+        local, _, domain = (email or "").partition("@")
+        ctx = contexts[index] if contexts is not None else context_text
+        info = _classify(local, domain, lambda ctx=ctx: flags_for(ctx))
+        info["fio_score"] = matcher.score(local)
+        results.append(info)
+    return results
+
+
+__all__ = ["classify_email_role", "classify_many"]
 
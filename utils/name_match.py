@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import re
 import unicodedata as ud
-from typing import Iterable, List, Sequence, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
 
 NAME_WORD = r"[A-ZА-ЯЁ][A-Za-zА-ЯЁа-яё']*(?:-[A-Za-zА-ЯЁа-яё']+)*"
 NAME_RE = re.compile(
@@ -82,6 +83,7 @@ def translit_basic(s: str) -> str:
     return _strip_diacritics(transliterated)
 
 
+@lru_cache(maxsize=65536)
 def _slug(text: str) -> str:
     """Lowercase, transliterate and strip punctuation from ``text``."""
 
@@ -239,4 +241,58 @@ def fio_match_score(
     return round(best, 3)
 
 
-__all__ = ["extract_names", "fio_candidates", "fio_match_score", "translit_basic"]
+class FioMatcher:
+    """:func:`fio_match_score` for many local parts against one set of candidates.
+
+    Every ``_patterns_for_pair`` variant of every candidate pair is compiled
+    once into a table of pattern → best score.  Scoring a local part then
+    looks up its substrings of the lengths present in the table, so the cost
+    depends on the length of the local part rather than on the number of
+    names found in the document.
+    """
+
+    def __init__(self, candidates: Iterable[Tuple[str, str]]):
+        table: Dict[str, float] = {}
+        for first, last in candidates:
+            if not first or not last:
+                continue
+            for pattern, score in _patterns_for_pair(first, last):
+                if score > table.get(pattern, 0.0):
+                    table[pattern] = score
+        self._table = table
+        self._lengths = sorted({len(pattern) for pattern in table})
+
+    @classmethod
+    def from_text(cls, text: str) -> "FioMatcher":
+        return cls(fio_candidates(text))
+
+    def __bool__(self) -> bool:
+        return bool(self._table)
+
+    def score(self, local: str) -> float:
+        local_raw = (local or "").lower()
+        if not local_raw or not self._table:
+            return 0.0
+        table = self._table
+        best = 0.0
+        for subject in {local_raw, _slug(local_raw)}:
+            size = len(subject)
+            for length in self._lengths:
+                if length > size:
+                    break
+                for start in range(size - length + 1):
+                    score = table.get(subject[start : start + length])
+                    if score is not None and score > best:
+                        best = score
+        if best >= 0.99:
+            return 1.0
+        return round(best, 3)
+
+
+__all__ = [
+    "FioMatcher",
+    "extract_names",
+    "fio_candidates",
+    "fio_match_score",
+    "translit_basic",
+]
@@ -0,0 +1,145 @@
+"""Linear-time building blocks for undoing e-mail obfuscations.
+
+The obfuscation passes used to be plain regular expressions such as
+``\\s*(?:\\[at\\]|\\(at\\)| at |…)\\s*`` and one address pattern with nested
+quantifiers.  Both backtrack: the leading ``\\s*`` restarts at every position
+of a long whitespace run (quadratic), and a run like ``a.a.a.…`` can be split
+between the nested quantifiers in exponentially many ways, so a single pasted
+document was enough to stall extraction.
+
+:data:`LEADING_SPACE` keeps the ``\\s*(?:…)\\s*`` substitutions exact while
+backtracking each whitespace run once.  :func:`scan` and :func:`iter_at_matches`
+find addresses by locating the separator first and growing the local part and
+the domain outwards from it with bounded lengths.  Runs of characters are
+measured with ``str.rstrip``/``str.lstrip`` on chunks of doubling size, so even
+megabytes of whitespace are skipped at C speed.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Iterator
+
+SPACE_RUN = re.compile(r"\s*")
+
+# Drop-in replacement for a leading ``\s*``: ``re.sub(LEADING_SPACE + r"(?:…)\s*")``
+# gives the same result as ``re.sub(r"\s*(?:…)\s*")``, but the whitespace
+# before a token is only backtracked from the start of its run (the
+# lookbehind fails everywhere inside it), so long runs cost linear time.
+LEADING_SPACE = r"(?:(?<!\s)\s+)?"
+
+# Letters that ``[a-z]`` also matches under ``re.IGNORECASE``.
+IGNORECASE_EXTRA = "İıſK"
+
+
+def run_start(text: str, end: int, chars: str | None = None, lo: int = 0) -> int:
+    """Start of the run of ``chars`` (whitespace for ``None``) ending at ``end``.
+
+    The run is not extended before ``lo``.
+    """
+
+    size = 32
+    while end > lo:
+        start = max(lo, end - size)
+        kept = len(text[start:end].rstrip(chars))
+        if kept:
+            return start + kept
+        end = start
+        size *= 2
+    return lo
+
+
+def run_end(text: str, start: int, chars: str | None = None, hi: int | None = None) -> int:
+    """End of the run of ``chars`` (whitespace for ``None``) starting at ``start``.
+
+    The run is not extended past ``hi``.
+    """
+
+    hi = len(text) if hi is None else min(hi, len(text))
+    size = 32
+    while start < hi:
+        end = min(hi, start + size)
+        chunk = text[start:end]
+        skipped = len(chunk) - len(chunk.lstrip(chars))
+        if skipped < len(chunk):
+            return start + skipped
+        start = end
+        size *= 2
+    return hi
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def at_boundary(text: str, index: int) -> bool:
+    """Whether ``\\b`` matches at ``index`` of ``text``."""
+
+    before = index > 0 and _is_word(text[index - 1])
+    after = index < len(text) and _is_word(text[index])
+    return before != after
+
+
+def scan(
+    text: str,
+    separators: re.Pattern[str],
+    local: Callable[[str, int, int], int],
+    domain: Callable[[str, int], int],
+) -> Iterator[tuple[int, int, int, int]]:
+    """Yield ``(start, sep_start, sep_end, end)`` for addresses around separators.
+
+    ``local(text, sep_start, lo)`` returns where the local part begins, never
+    before ``lo`` (the end of the previous address), or ``-1``;
+    ``domain(text, sep_end)`` returns where the domain ends or ``-1``.  Both
+    must look at a bounded stretch of text.  A separator without an address
+    is skipped and the search resumes after its first character, as
+    ``finditer`` would.
+    """
+
+    lo = pos = 0
+    while (match := separators.search(text, pos)) is not None:
+        sep_start, sep_end = match.span()
+        start = local(text, sep_start, lo)
+        end = domain(text, sep_end) if start >= 0 else -1
+        if end < 0:
+            pos = sep_start + 1
+            continue
+        yield start, sep_start, sep_end, end
+        lo = pos = end
+
+
+_BOUNDARY = re.compile(r"\b")
+
+
+def iter_at_matches(
+    text: str, local_chars: str, domain: re.Pattern[str]
+) -> Iterator[tuple[int, int]]:
+    """Spans ``finditer`` yields for ``\\b[<local_chars>]+@<domain>``.
+
+    ``local_chars`` must not contain ``@``.  Each ``@`` is visited once and
+    its local part is measured backwards, so a long local-looking run before
+    an ``@`` whose domain does not match is not rescanned from every start.
+    """
+
+    pos = 0
+    while (at := text.find("@", pos)) >= 0:
+        run = run_start(text, at, local_chars, pos)
+        start = _BOUNDARY.search(text, run, at) if run < at else None
+        match = domain.match(text, at + 1) if start is not None else None
+        if start is None or start.start() >= at or match is None:
+            pos = at + 1
+            continue
+        yield start.start(), match.end()
+        pos = match.end()
+
+
+__all__ = [
+    "IGNORECASE_EXTRA",
+    "LEADING_SPACE",
+    "SPACE_RUN",
+    "at_boundary",
+    "iter_at_matches",
+    "run_end",
+    "run_start",
+    "scan",
+]
@@ -32,21 +32,38 @@ def ensure_dirs() -> None:
     ensure_parent(BLOCKLIST_PATH)
 
 
-def load_blocklist() -> set[str]:
-    if not BLOCKLIST_PATH.exists():
-        return set()
+_BLOCKLIST_CACHE: tuple[Any, frozenset[str]] = (None, frozenset())
+
+
+def _cached_blocklist() -> frozenset[str]:
+    """Parsed blocklist, re-read only when the file's mtime/size changes."""
+
+    global _BLOCKLIST_CACHE
     try:
-        return {
+        st = BLOCKLIST_PATH.stat()
+        signature: Any = (str(BLOCKLIST_PATH), st.st_mtime_ns, st.st_size)
+    except OSError:
+        return frozenset()
+    if _BLOCKLIST_CACHE[0] == signature:
+        return _BLOCKLIST_CACHE[1]
+    try:
+        items = frozenset(
             line.strip().lower()
             for line in BLOCKLIST_PATH.read_text(encoding="utf-8").splitlines()
             if line.strip()
-        }
+        )
     except Exception:
-        return set()
+        return frozenset()
+    _BLOCKLIST_CACHE = (signature, items)
+    return items
+
+
+def load_blocklist() -> set[str]:
+    return set(_cached_blocklist())
 
 
 def is_blocked(addr: str) -> bool:
-    return addr.strip().lower() in load_blocklist()
+    return addr.strip().lower() in _cached_blocklist()
 
 
 def append_history(addr: str) -> None:
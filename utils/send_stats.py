@@ -1,10 +1,12 @@
-import json, os
+import os
 from collections import Counter
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
 from utils.paths import ensure_parent
 from emailbot.utils.paths import resolve_project_path
+from emailbot import report_rollup
+from emailbot.report_rollup import RollupSource
 from emailbot.utils.fs import append_jsonl_atomic
 
 try:
@@ -122,9 +124,7 @@ def log_bounce(email: str, reason: str, uuid: str = "", message_id: str = "") ->
     append_jsonl_atomic(path, rec)
 
 
-def _iter_today_week(scope: str):
-    """Предикат для отбора записей по ЛОКАЛЬНОЙ (REPORT_TZ/фоллбэк MSK) дате/неделе."""
-
+def _scope_bounds(scope: str) -> tuple[datetime, datetime]:
     now_local = _to_local(_now_utc())
     if scope == "day":
         start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -137,39 +137,24 @@ def _iter_today_week(scope: str):
         end = start + timedelta(days=7)
     else:  # pragma: no cover - defensive
         raise ValueError("scope must be 'day' or 'week'")
+    return start, end
 
-    def pred(ts_iso: str) -> bool:
-        try:
-            dt = datetime.fromisoformat(ts_iso.replace("Z", "+00:00"))
-        except Exception:
-            return False
-        loc = _to_local(dt)
-        return start <= loc < end
 
-    return pred
+def _rollup_source() -> RollupSource:
+    """Rollup view of ``send_stats.jsonl`` bucketed by the report day."""
+
+    return RollupSource("send_stats", _stats_path(), _tzinfo(), naive_utc=True)
 
 
 def summarize(scope: str) -> dict:
-    ok = 0
-    err = 0
-    path = _stats_path()
-    if not path.exists():
+    start, end = _scope_bounds(scope)
+    first, last = start.date(), (end - timedelta(days=1)).date()
+    sources = report_rollup.with_archive(_rollup_source(), first, last)
+    if len(sources) == 1 and not sources[0].path.exists():
         return {"ok": 0, "err": 0}
-    pred = _iter_today_week(scope)
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            ts = rec.get("ts")
-            if not ts or not pred(ts):
-                continue
-            status = rec.get("status")
-            if status == "success":
-                ok += 1
-            elif status in ("error", "bounce"):
-                err += 1
+    by_status = report_rollup.counts(sources, first, last)
+    ok = by_status.get("success", 0)
+    err = by_status.get("error", 0) + by_status.get("bounce", 0)
     return {"ok": ok, "err": err, "success": ok, "error": err}
 
 
@@ -189,67 +174,24 @@ def current_tz_label() -> str:
     return _TZ_NAME
 
 
-def _ts_to_epoch(value) -> float | None:
-    if isinstance(value, (int, float)):
-        return float(value)
-    if not value:
-        return None
-    if isinstance(value, str):
-        value = value.strip()
-        if not value:
-            return None
-        try:
-            return float(value)
-        except Exception:
-            try:
-                dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return None
-            return dt.timestamp()
-    return None
-
-
 def print_summary_report(days: int = 180) -> None:
     """Aggregate ``var/send_stats.jsonl`` into a concise console report."""
 
-    path = _stats_path()
-    if not path.exists():
+    cutoff = _to_local(_now_utc() - timedelta(days=max(days, 0))).date()
+    sources = report_rollup.with_archive(_rollup_source(), cutoff, None)
+    if len(sources) == 1 and not sources[0].path.exists():
         print("No send stats found.")
         return
 
-    cutoff = _now_utc() - timedelta(days=max(days, 0))
-    cutoff_ts = cutoff.timestamp()
+    counts = report_rollup.counts(sources, cutoff, None, by=("status", "domain", "group"))
     by_domain: Counter[str] = Counter()
     by_status: Counter[str] = Counter()
     by_group: Counter[str] = Counter()
-    total = 0
-
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                record = json.loads(line)
-            except Exception:
-                continue
-
-            ts = _ts_to_epoch(record.get("ts"))
-            if ts is None or ts < cutoff_ts:
-                continue
-
-            email = (record.get("email") or "").strip().lower()
-            status = (record.get("status") or "unknown").strip().lower()
-            group = (record.get("group") or "n/a").strip().lower()
-            if "@" in email:
-                domain = email.rsplit("@", 1)[-1] or "n/a"
-            else:
-                domain = "n/a"
-
-            by_domain[domain] += 1
-            by_status[status] += 1
-            by_group[group] += 1
-            total += 1
+    for (status, domain, group), value in counts.items():
+        by_status[status or "unknown"] += value
+        by_domain[domain or "n/a"] += value
+        by_group[group or "n/a"] += value
+    total = sum(counts.values())
 
     print(f"Report for last {days} days: {total} record(s)\n")
 